@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+异步入库流水线
+将解析、转换、写库三个阶段重叠执行：生产者按块读取报告和线段日志，转换阶段在线程池或进程池中
+把数据块转换为插入行，写库阶段在独立的数据库线程中按块顺序写入；阶段之间用有界队列连接形成背压，
+总耗时接近最慢的单个阶段而不是各阶段之和
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from StorageBackend import create_backend
+from FrameSchema import optimize_segment_log_frame
+from TradeDataProcessor import TradeDataProcessor, ORDERS_INSERT_QUERY, DEALS_INSERT_QUERY
+from SegmentDataProcessor import SegmentDataProcessor, SEGMENTS_INSERT_QUERY
+from TradeSummaryProcessor import TradeSummaryProcessor
+from SchemaRevision import SchemaMigrator
+from TablePartitions import TablePartitioner, PARTITIONED_TABLES
+
+logger = logging.getLogger("AsyncPipeline")
+
+# 默认每块行数
+DEFAULT_CHUNK_ROWS = 5000
+
+# 默认队列长度（块数），队列满时上游阶段等待
+DEFAULT_QUEUE_SIZE = 4
+
+# 数据类别 -> (目标表, 插入语句)
+PIPELINE_TABLES = {
+    'orders': ('report_orders', ORDERS_INSERT_QUERY),
+    'deals': ('report_deals', DEALS_INSERT_QUERY),
+    'segments': ('segment_info', SEGMENTS_INSERT_QUERY),
+}
+
+# 进程内缓存的处理器（转换函数不连接数据库，只使用行转换方法）
+_processors = {}
+
+
+def transform_chunk(kind, chunk, report_file=None):
+    """
+    将一个数据块转换为插入行（顶层函数，可被进程池序列化调用）
+
+    Args:
+        kind (str): orders / deals / segments / summary
+        chunk (DataFrame): 数据块
+        report_file (str): 报告文件名（订单和成交）
+
+    Returns:
+        list: 插入行
+    """
+    if kind not in _processors:
+        if kind in ('orders', 'deals'):
+            _processors[kind] = TradeDataProcessor({})
+        elif kind == 'segments':
+            _processors[kind] = SegmentDataProcessor({})
+        else:
+            _processors[kind] = TradeSummaryProcessor({})
+    processor = _processors[kind]
+    if kind == 'orders':
+        return processor.build_order_rows(chunk, report_file)
+    if kind == 'deals':
+        return processor.build_deal_rows(chunk, report_file)
+    if kind == 'segments':
+        return processor.build_segment_rows(chunk)
+    return processor.build_summary_rows(chunk)
+
+
+def frame_chunks(df, chunk_rows):
+    """将DataFrame按行切分为数据块"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def report_chunks(path, chunk_rows, db_config=None):
+    """
+    报告文件的数据块：(类别, 数据块, 报告文件名)
+
+    xlsx只能整体解析，解析完成后订单和成交按块交给下游，转换和写库仍可与后续文件的解析重叠
+    """
+    orders_df, deals_df = TradeDataProcessor(db_config or {}).read_order_deal_data(path)
+    if orders_df is None and deals_df is None:
+        raise ValueError(f"解析报告失败: {path}")
+    report_file = os.path.basename(path)
+    for kind, df in (('orders', orders_df), ('deals', deals_df)):
+        if df is not None:
+            for chunk in frame_chunks(df, chunk_rows):
+                yield kind, chunk, report_file
+
+
+def segment_chunks(path, chunk_rows):
+    """线段日志（UTF-16、分号分隔）按块读取：(类别, 数据块, None)"""
+    with pd.read_csv(path, sep=';', encoding='utf-16', chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield 'segments', optimize_segment_log_frame(chunk), None
+
+
+class AsyncPipeline:
+    """异步入库流水线"""
+
+    def __init__(self, db_config, chunk_rows=DEFAULT_CHUNK_ROWS, queue_size=DEFAULT_QUEUE_SIZE,
+                 workers=2, executor='process', replace=True, summary_workers=1, summary_start=None, summary_end=None):
+        """
+        初始化流水线
+
+        Args:
+            db_config (dict): 数据库配置
+            chunk_rows (int): 每块行数
+            queue_size (int): 阶段之间队列的最大块数
+            workers (int): 转换并发数
+            executor (str): process 进程池 / thread 线程池（转换为纯Python循环，进程池才能利用多核）
+            replace (bool): 写入前清除目标表（与GUI保存到数据库时一致）；False为追加
+            summary_workers (int): 分区并行生成汇总表的进程数，0或None为CPU核数
+            summary_start: 汇总时间窗口起点（包含），None为不限
+            summary_end: 汇总时间窗口终点（不包含），None为不限
+        """
+        self.db_config = db_config
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.queue_size = max(1, int(queue_size))
+        self.workers = max(1, int(workers))
+        self.executor = executor
+        self.replace = replace
+        self.summary_workers = summary_workers
+        self.summary_start = summary_start
+        self.summary_end = summary_end
+        self.backend = create_backend(db_config)
+        self.stage_seconds = {}
+
+    def _create_tables(self):
+        """创建订单、成交、线段和汇总表"""
+        trade_processor = TradeDataProcessor(self.db_config)
+        segment_processor = SegmentDataProcessor(self.db_config)
+        summary_processor = TradeSummaryProcessor(self.db_config)
+        for processor, create in ((trade_processor, trade_processor.create_tables),
+                                  (segment_processor, segment_processor.create_tables),
+                                  (summary_processor, summary_processor.create_summary_table)):
+            if not processor.connect_db():
+                raise ConnectionError("无法连接到数据库")
+            try:
+                if not create():
+                    raise RuntimeError("创建数据表失败")
+            finally:
+                processor.close_db()
+
+    def _add_time(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    async def _produce(self, loop, io_executor, sources, raw_queue):
+        """生产者：在线程中逐块读取，队列满时等待"""
+        sequence = 0
+        for source in sources:
+            iterator = iter(source)
+            while True:
+                started = time.perf_counter()
+                item = await loop.run_in_executor(io_executor, next, iterator, None)
+                self._add_time('parse', time.perf_counter() - started)
+                if item is None:
+                    break
+                await raw_queue.put((sequence,) + item)
+                sequence += 1
+        for _ in range(self.workers):
+            await raw_queue.put(None)
+
+    async def _transform(self, loop, cpu_executor, raw_queue, row_queue):
+        """转换：把数据块交给执行器转换为插入行"""
+        while True:
+            item = await raw_queue.get()
+            if item is None:
+                await row_queue.put(None)
+                return
+            sequence, kind, chunk, report_file = item
+            started = time.perf_counter()
+            rows = await loop.run_in_executor(cpu_executor, transform_chunk, kind, chunk, report_file)
+            self._add_time('transform', time.perf_counter() - started)
+            await row_queue.put((sequence, kind, rows))
+
+    async def _write(self, loop, db_executor, row_queue, conn, clear_kinds):
+        """写库：单独的数据库线程按块顺序写入，每块一个事务"""
+        cursor = await loop.run_in_executor(db_executor, conn.cursor)
+        partitioner = TablePartitioner(self.backend, conn)
+        migrator = SchemaMigrator(self.backend, conn)
+        counts = {}
+        cleared = set()
+        buffered = {}
+        next_sequence = 0
+        finished = 0
+        while finished < self.workers:
+            item = await row_queue.get()
+            if item is None:
+                finished += 1
+                continue
+            buffered[item[0]] = item
+            # 转换并发完成的顺序不固定，按生产顺序写入以保持自增id顺序
+            while next_sequence in buffered:
+                _, kind, rows = buffered.pop(next_sequence)
+                next_sequence += 1
+                table, query = PIPELINE_TABLES[kind]
+                started = time.perf_counter()
+                if rows and table in PARTITIONED_TABLES:
+                    # 成交和线段插入行的第一列为分区时间，添加分区的DDL会隐式提交，在写入本块之前执行；
+                    # 分区表跳过时间为空的行
+                    rows = await loop.run_in_executor(db_executor, partitioner.writable_rows, table, rows)
+                    await loop.run_in_executor(db_executor, partitioner.ensure_partitions, table,
+                                               [row[0] for row in rows])
+                if rows:
+                    # 超过列宽的文本不截断，先加宽列（DDL同样隐式提交）
+                    await loop.run_in_executor(db_executor, migrator.fit_text_columns, table, query, rows)
+                if kind in clear_kinds and kind not in cleared:
+                    await loop.run_in_executor(db_executor, cursor.execute, f"DELETE FROM {table}")
+                    cleared.add(kind)
+                if rows:
+                    await loop.run_in_executor(db_executor, cursor.executemany, query, rows)
+                await loop.run_in_executor(db_executor, conn.commit)
+                self._add_time('write', time.perf_counter() - started)
+                counts[table] = counts.get(table, 0) + len(rows)
+        await loop.run_in_executor(db_executor, cursor.close)
+        return counts
+
+    async def _run(self, sources, clear_kinds):
+        loop = asyncio.get_running_loop()
+        raw_queue = asyncio.Queue(maxsize=self.queue_size)
+        row_queue = asyncio.Queue(maxsize=self.queue_size)
+        executor_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as io_executor, \
+                ThreadPoolExecutor(max_workers=1) as db_executor, \
+                executor_class(max_workers=self.workers) as cpu_executor:
+            # 数据库连接在数据库线程中创建和使用（SQLite连接不能跨线程）
+            conn = await loop.run_in_executor(db_executor, self.backend.connect)
+            try:
+                _, _, counts = await asyncio.gather(
+                    self._produce(loop, io_executor, sources, raw_queue),
+                    asyncio.gather(*(self._transform(loop, cpu_executor, raw_queue, row_queue)
+                                     for _ in range(self.workers))),
+                    self._write(loop, db_executor, row_queue, conn, clear_kinds))
+            except BaseException:
+                await loop.run_in_executor(db_executor, conn.rollback)
+                raise
+            finally:
+                await loop.run_in_executor(db_executor, conn.close)
+        return counts
+
+    def run(self, report_paths=(), segment_paths=(), summarize=True):
+        """
+        运行流水线：报告和线段日志入库，完成后生成汇总表并增量保存
+
+        Args:
+            report_paths (list): ReportTester.xlsx路径
+            segment_paths (list): segment_info.csv路径
+            summarize (bool): 入库后是否生成汇总表
+
+        Returns:
+            dict: 表名 -> 写入行数
+        """
+        self._create_tables()
+        self.stage_seconds = {}
+        started = time.perf_counter()
+
+        sources = [report_chunks(path, self.chunk_rows, self.db_config) for path in report_paths]
+        sources += [segment_chunks(path, self.chunk_rows) for path in segment_paths]
+        clear_kinds = set()
+        if self.replace:
+            if report_paths:
+                clear_kinds.update(('orders', 'deals'))
+            if segment_paths:
+                clear_kinds.add('segments')
+        counts = asyncio.run(self._run(sources, clear_kinds)) if sources else {}
+
+        if summarize:
+            counts.update(self._summarize())
+
+        elapsed = time.perf_counter() - started
+        stages = "，".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.stage_seconds.items())
+        logger.info(f"流水线完成，总耗时 {elapsed:.2f}s（各阶段累计: {stages}），写入: {counts}")
+        return counts
+
+    def _summarize(self):
+        """
+        从数据库生成汇总数据并增量保存（只删除和插入有变化的行，见TradeSummaryProcessor.save_summary_to_db）
+
+        Returns:
+            dict: {'trade_summary': 保存后的汇总记录数}，汇总生成失败时为空
+        """
+        processor = TradeSummaryProcessor(self.db_config, workers=self.summary_workers,
+                                          start=self.summary_start, end=self.summary_end)
+        if not processor.connect_db():
+            raise ConnectionError("无法连接到数据库")
+        try:
+            started = time.perf_counter()
+            summary_df = processor.generate_summary_data()
+            self._add_time('summary', time.perf_counter() - started)
+            if summary_df is None:
+                return {}
+            started = time.perf_counter()
+            count = processor.save_summary_to_db(summary_df, commit_rows=self.chunk_rows)
+            self._add_time('write', time.perf_counter() - started)
+        finally:
+            processor.close_db()
+        return {'trade_summary': count}
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+回测统计
+直接根据report_deals的结余、盈利、手续费、库存费以及汇总表计算资金曲线、最大回撤、
+盈利因子、期望收益、连续盈亏和按小时/星期的分布，全部以NumPy数组运算完成
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from FrameSchema import classify_deal_column, optimize_deals_frame, optimize_summary_frame
+from TablePartitions import with_time_window
+
+logger = logging.getLogger("BacktestStatistics")
+
+# 资金类成交（入金、出金等）不属于交易，只影响结余
+TRADE_DEAL_TYPES = ('buy', 'sell')
+
+# 平仓方向的成交
+EXIT_DIRECTIONS = ('out', 'inout', 'out by', 'out_by')
+
+# 汇总表中表示已平仓交易的状态（旧汇总方式没有exit_count列时使用）
+CLOSED_TRADE_STATUSES = ('盈利', '亏损', '持平')
+
+WEEKDAY_NAMES = ('周一', '周二', '周三', '周四', '周五', '周六', '周日')
+
+
+def deals_from_report(report_deals_df):
+    """
+    将ReportTester.xlsx解析出的成交数据（中文列名）转换为report_deals列名和类型
+
+    Args:
+        report_deals_df (DataFrame): read_order_deal_data返回的成交数据
+
+    Returns:
+        DataFrame: report_deals列名的成交数据
+    """
+    columns = {}
+    for col in report_deals_df.columns:
+        if pd.isna(col):
+            continue
+        field = classify_deal_column(str(col))
+        if field is not None and field not in columns.values():
+            columns[col] = field
+    deals_df = report_deals_df[list(columns)].rename(columns=columns)
+    return optimize_deals_frame(deals_df)
+
+
+def _sorted_deals(deals_df):
+    """按成交时间、成交号排序（报告末尾的合计行没有时间，排除）"""
+    deals = deals_df[deals_df['deal_time'].notna()]
+    if deals['deal_time'].is_monotonic_increasing:
+        return deals
+    order = np.lexsort((deals['deal_id'].to_numpy(dtype='float64', na_value=np.nan),
+                        deals['deal_time'].to_numpy(dtype='datetime64[ns]')))
+    return deals.iloc[order]
+
+
+def _column_values(df, column):
+    """取数值列为float数组，缺失值为0"""
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return np.nan_to_num(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype='float64'))
+
+
+def _isin_lower(series, values):
+    """
+    忽略大小写判断列值是否属于values
+
+    category列只比较类别，再按编码取结果，避免逐行比较字符串
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    categories = pd.Index(series.cat.categories.astype(str).str.lower().str.strip())
+    matched = np.append(categories.isin(values), False)
+    # 缺失值编码为-1，对应末尾追加的False
+    return matched[series.cat.codes.to_numpy()]
+
+
+def max_drawdown(values, times=None):
+    """
+    计算曲线的最大回撤和最长水下时间
+
+    Args:
+        values (ndarray): 资金曲线
+        times (ndarray): 对应的时间（datetime64），None时以点数计算持续时间
+
+    Returns:
+        dict: max_drawdown, max_drawdown_pct, peak_index, trough_index, recovery_index,
+            max_drawdown_duration（回撤从峰值到恢复或到曲线结束的时间）, max_underwater_duration
+    """
+    values = np.asarray(values, dtype='float64')
+    result = {
+        'max_drawdown': 0.0, 'max_drawdown_pct': 0.0,
+        'peak_index': None, 'trough_index': None, 'recovery_index': None,
+        'max_drawdown_duration': None, 'max_underwater_duration': None,
+    }
+    if len(values) == 0:
+        return result
+
+    running_max = np.maximum.accumulate(values)
+    drawdown = running_max - values
+    trough = int(np.argmax(drawdown))
+    peak = int(np.argmax(values[:trough + 1]))
+    recovered = np.flatnonzero(values[trough:] >= values[peak])
+    recovery = trough + int(recovered[0]) if len(recovered) else None
+
+    positions = np.arange(len(values)) if times is None else np.asarray(times, dtype='datetime64[ns]')
+    to_duration = (lambda x: int(x)) if times is None else pd.Timedelta
+    end = recovery if recovery is not None else len(values) - 1
+
+    # 每个点最近一次创新高的位置，水下时间 = 当前时间 - 该位置时间
+    last_peak = np.maximum.accumulate(np.where(values >= running_max, np.arange(len(values)), 0))
+    underwater = positions - positions[last_peak]
+
+    result.update({
+        'max_drawdown': float(drawdown[trough]),
+        'max_drawdown_pct': float(drawdown[trough] / running_max[trough] * 100) if running_max[trough] > 0 else 0.0,
+        'peak_index': peak,
+        'trough_index': trough,
+        'recovery_index': recovery,
+        'max_drawdown_duration': to_duration(positions[end] - positions[peak]),
+        'max_underwater_duration': to_duration(underwater.max()),
+    })
+    return result
+
+
+def streaks(net_profits):
+    """
+    计算最长连续盈利和连续亏损次数（持平交易中断连续）
+
+    Args:
+        net_profits (ndarray): 按时间排序的每笔交易净盈亏
+
+    Returns:
+        tuple: (最长连续盈利次数, 最长连续亏损次数)
+    """
+    signs = np.sign(np.asarray(net_profits, dtype='float64'))
+    if len(signs) == 0:
+        return 0, 0
+    # 游程编码：符号变化处为新游程起点
+    starts = np.flatnonzero(np.concatenate(([True], signs[1:] != signs[:-1])))
+    lengths = np.diff(np.append(starts, len(signs)))
+    run_signs = signs[starts]
+    max_wins = int(lengths[run_signs > 0].max()) if (run_signs > 0).any() else 0
+    max_losses = int(lengths[run_signs < 0].max()) if (run_signs < 0).any() else 0
+    return max_wins, max_losses
+
+
+def trade_metrics(net_profits):
+    """
+    计算交易统计指标
+
+    Args:
+        net_profits (ndarray): 每笔交易净盈亏（盈利 + 手续费 + 库存费）
+
+    Returns:
+        dict: 交易次数、胜率、盈利因子、期望收益等
+    """
+    net = np.asarray(net_profits, dtype='float64')
+    wins = net[net > 0]
+    losses = net[net < 0]
+    gross_profit = float(wins.sum())
+    gross_loss = float(-losses.sum())
+    max_wins, max_losses = streaks(net)
+    trades = len(net)
+    average_win = float(wins.mean()) if len(wins) else 0.0
+    average_loss = float(losses.mean()) if len(losses) else 0.0
+    return {
+        'trades': trades,
+        'wins': int(len(wins)),
+        'losses': int(len(losses)),
+        'win_rate': float(len(wins) / trades * 100) if trades else 0.0,
+        'net_profit': float(net.sum()),
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else (np.inf if gross_profit > 0 else 0.0),
+        'expectancy': float(net.mean()) if trades else 0.0,
+        'average_win': average_win,
+        'average_loss': average_loss,
+        'payoff_ratio': average_win / -average_loss if average_loss < 0 else 0.0,
+        'largest_win': float(wins.max()) if len(wins) else 0.0,
+        'largest_loss': float(losses.min()) if len(losses) else 0.0,
+        'max_consecutive_wins': max_wins,
+        'max_consecutive_losses': max_losses,
+    }
+
+
+def _breakdown(keys, size, net_profits, labels):
+    """按整数键（小时0-23、星期0-6）用bincount分组统计"""
+    net = np.asarray(net_profits, dtype='float64')
+    count = np.bincount(keys, minlength=size)
+    wins = np.bincount(keys, weights=(net > 0).astype('float64'), minlength=size)
+    profit = np.bincount(keys, weights=net, minlength=size)
+    gross_profit = np.bincount(keys, weights=np.where(net > 0, net, 0.0), minlength=size)
+    gross_loss = np.bincount(keys, weights=np.where(net < 0, -net, 0.0), minlength=size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'bucket': labels,
+            'trades': count,
+            'win_rate': np.where(count > 0, wins / np.maximum(count, 1) * 100, 0.0),
+            'net_profit': profit,
+            'expectancy': np.where(count > 0, profit / np.maximum(count, 1), 0.0),
+            'profit_factor': np.where(gross_loss > 0, gross_profit / np.where(gross_loss > 0, gross_loss, 1),
+                                      np.where(gross_profit > 0, np.inf, 0.0)),
+        })
+
+
+class BacktestStatistics:
+    """回测统计计算器"""
+
+    def __init__(self, closed_statuses=CLOSED_TRADE_STATUSES):
+        """
+        初始化统计计算器
+
+        Args:
+            closed_statuses (tuple): 汇总表中表示已平仓交易的状态
+        """
+        self.closed_statuses = tuple(closed_statuses)
+
+    def balance_curves(self, deals_df):
+        """
+        由成交记录生成结余曲线和权益曲线
+
+        结余曲线取报告中的结余列；权益曲线为初始资金加逐笔成交净盈亏（盈利 + 手续费 + 库存费）的累计，
+        没有K线数据时只能在成交时刻采样，未平仓浮动盈亏不计入
+
+        Args:
+            deals_df (DataFrame): 成交数据（report_deals列名）
+
+        Returns:
+            DataFrame: deal_time, deal_id, balance, equity, net_profit
+        """
+        deals = _sorted_deals(deals_df)
+        is_trade = _isin_lower(deals['type'], TRADE_DEAL_TYPES)
+
+        net = _column_values(deals, 'profit') + _column_values(deals, 'commission') + _column_values(deals, 'swap')
+        balance = pd.to_numeric(deals['balance'], errors='coerce').to_numpy(dtype='float64') \
+            if 'balance' in deals.columns else np.full(len(deals), np.nan)
+
+        # 入金等资金类成交的金额记录在盈利列
+        cash = np.where(is_trade, 0.0, _column_values(deals, 'profit'))
+        equity = np.cumsum(np.where(is_trade, net, cash))
+        if np.isnan(balance).all():
+            balance = equity.copy()
+        else:
+            balance = pd.Series(balance).ffill().fillna(0).to_numpy()
+
+        return pd.DataFrame({
+            'deal_time': deals['deal_time'].to_numpy(),
+            'deal_id': deals['deal_id'].to_numpy(),
+            'balance': balance,
+            'equity': equity,
+            'net_profit': np.where(is_trade, net, 0.0),
+        })
+
+    def closed_trades(self, deals_df=None, summary_df=None):
+        """
+        取已平仓交易的平仓时间和净盈亏
+
+        有汇总表时每个仓位一笔交易；否则以每笔平仓成交为一笔交易
+
+        Returns:
+            DataFrame: close_time, net_profit（按平仓时间排序）
+        """
+        if summary_df is not None and len(summary_df) > 0:
+            summary = optimize_summary_frame(summary_df)
+            if 'exit_count' in summary.columns:
+                closed = pd.to_numeric(summary['exit_count'], errors='coerce').fillna(0).to_numpy() > 0
+            else:
+                closed = summary['status'].astype(object).isin(self.closed_statuses).to_numpy()
+            trades = summary.loc[closed]
+            times = trades['close_time'].to_numpy(dtype='datetime64[ns]')
+            net = _column_values(trades, 'profit') + _column_values(trades, 'commission') + _column_values(trades, 'swap')
+        else:
+            deals = _sorted_deals(deals_df)
+            is_exit = _isin_lower(deals['direction'], EXIT_DIRECTIONS) & _isin_lower(deals['type'], TRADE_DEAL_TYPES)
+            trades = deals.loc[is_exit]
+            times = trades['deal_time'].to_numpy(dtype='datetime64[ns]')
+            net = _column_values(trades, 'profit') + _column_values(trades, 'commission') + _column_values(trades, 'swap')
+
+        order = np.argsort(times, kind='stable')
+        return pd.DataFrame({'close_time': times[order], 'net_profit': net[order]})
+
+    def compute(self, deals_df, summary_df=None):
+        """
+        计算全部统计
+
+        Args:
+            deals_df (DataFrame): 成交数据（report_deals列名）
+            summary_df (DataFrame): 汇总数据，可选，提供时按仓位统计交易
+
+        Returns:
+            dict: metrics（指标字典）, curve（资金曲线）, trades（已平仓交易）, by_hour, by_weekday（分组统计）
+        """
+        curve = self.balance_curves(deals_df)
+        trades = self.closed_trades(deals_df, summary_df)
+        net = trades['net_profit'].to_numpy()
+        times = trades['close_time'].to_numpy(dtype='datetime64[ns]')
+
+        metrics = trade_metrics(net)
+        curve_times = curve['deal_time'].to_numpy(dtype='datetime64[ns]')
+        for name in ('balance', 'equity'):
+            drawdown = max_drawdown(curve[name].to_numpy(), curve_times)
+            metrics[f'{name}_max_drawdown'] = drawdown['max_drawdown']
+            metrics[f'{name}_max_drawdown_pct'] = drawdown['max_drawdown_pct']
+            metrics[f'{name}_max_drawdown_duration'] = drawdown['max_drawdown_duration']
+            metrics[f'{name}_max_underwater_duration'] = drawdown['max_underwater_duration']
+        if len(curve):
+            metrics['initial_balance'] = float(curve['balance'].iloc[0])
+            metrics['final_balance'] = float(curve['balance'].iloc[-1])
+        metrics['commission'] = float(_column_values(deals_df, 'commission').sum())
+        metrics['swap'] = float(_column_values(deals_df, 'swap').sum())
+
+        valid = ~np.isnat(times)
+        # datetime64[ns] -> 小时、星期（1970-01-01为周四）
+        hours = ((times[valid].astype('datetime64[h]').astype('int64')) % 24).astype('int64')
+        weekdays = ((times[valid].astype('datetime64[D]').astype('int64') + 3) % 7).astype('int64')
+        by_hour = _breakdown(hours, 24, net[valid], [f'{h:02d}' for h in range(24)])
+        by_weekday = _breakdown(weekdays, 7, net[valid], list(WEEKDAY_NAMES))
+
+        logger.info(f"统计完成: {metrics['trades']} 笔交易，净盈亏 {metrics['net_profit']:.2f}，"
+                    f"最大回撤 {metrics['balance_max_drawdown']:.2f}")
+        return {'metrics': metrics, 'curve': curve, 'trades': trades, 'by_hour': by_hour, 'by_weekday': by_weekday}
+
+    def load_from_db(self, backend, conn, with_summary=True, start=None, end=None):
+        """
+        从数据库读取成交和汇总数据并计算统计
+
+        Args:
+            backend: StorageBackend中的后端实例
+            conn: 数据库连接
+            with_summary (bool): 是否读取trade_summary按仓位统计
+            start: 时间窗口起点（包含），只读取该时间之后的成交和平仓的仓位，None为不限
+            end: 时间窗口终点（不包含），None为不限
+
+        Returns:
+            dict: 同compute
+        """
+        deals_df = optimize_deals_frame(backend.read_sql(with_time_window("""
+            SELECT deal_id, deal_time, symbol, type, direction, volume, price, order_id,
+                   commission, swap, profit, balance
+            FROM report_deals
+        """, 'deal_time', start, end), conn))
+        summary_df = None
+        if with_summary:
+            summary_df = backend.read_sql(with_time_window("""
+                SELECT position_id, order_id, symbol, status, close_time, commission, swap, profit
+                FROM trade_summary
+            """, 'close_time', start, end), conn)
+        return self.compute(deals_df, summary_df)
+
+
+def format_statistics(stats):
+    """
+    将统计结果格式化为文本报告
+
+    Args:
+        stats (dict): compute返回的结果
+
+    Returns:
+        str: 文本报告
+    """
+    m = stats['metrics']
+    lines = [
+        f"交易次数: {m['trades']}（盈利 {m['wins']}，亏损 {m['losses']}），胜率 {m['win_rate']:.2f}%",
+        f"净盈亏: {m['net_profit']:.2f}（总盈利 {m['gross_profit']:.2f}，总亏损 {m['gross_loss']:.2f}）",
+        f"盈利因子: {m['profit_factor']:.2f}，期望收益: {m['expectancy']:.2f}，盈亏比: {m['payoff_ratio']:.2f}",
+        f"平均盈利: {m['average_win']:.2f}，平均亏损: {m['average_loss']:.2f}，"
+        f"最大盈利: {m['largest_win']:.2f}，最大亏损: {m['largest_loss']:.2f}",
+        f"最长连续盈利: {m['max_consecutive_wins']} 笔，最长连续亏损: {m['max_consecutive_losses']} 笔",
+        f"结余最大回撤: {m['balance_max_drawdown']:.2f}（{m['balance_max_drawdown_pct']:.2f}%），"
+        f"持续 {m['balance_max_drawdown_duration']}，最长水下 {m['balance_max_underwater_duration']}",
+        f"权益最大回撤: {m['equity_max_drawdown']:.2f}（{m['equity_max_drawdown_pct']:.2f}%）",
+        f"手续费: {m['commission']:.2f}，库存费: {m['swap']:.2f}",
+        "",
+        "按星期:",
+    ]
+    for row in stats['by_weekday'].itertuples(index=False):
+        lines.append(f"  {row.bucket}: {row.trades} 笔，胜率 {row.win_rate:.1f}%，净盈亏 {row.net_profit:.2f}")
+    lines.append("按小时:")
+    for row in stats['by_hour'][stats['by_hour']['trades'] > 0].itertuples(index=False):
+        lines.append(f"  {row.bucket}时: {row.trades} 笔，胜率 {row.win_rate:.1f}%，净盈亏 {row.net_profit:.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图表降采样
+绘制全年回测的结余/权益曲线时，先按时间二分查找截取可见范围，再降采样到与画布像素宽度相当的点数：
+按像素分桶取最小/最大值（保留每个像素列的完整上下包络，缩放平移时使用），
+或LTTB（Largest-Triangle-Three-Buckets，保留曲线形状的固定点数采样），全部以NumPy数组运算完成
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("ChartDownsample")
+
+# 降采样方式
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+
+def time_axis(times):
+    """
+    时间转换为横轴坐标（秒，float64）
+
+    Args:
+        times: datetime64数组或Series
+
+    Returns:
+        ndarray: 自1970-01-01起的秒数，缺失时间为NaN
+    """
+    values = np.asarray(times, dtype='datetime64[ns]')
+    seconds = values.astype('int64').astype('float64') / 1e9
+    seconds[np.isnat(values)] = np.nan
+    return seconds
+
+
+def visible_slice(x, x0, x1):
+    """
+    有序横轴上可见范围 [x0, x1] 的下标区间，两侧各多取一点使折线延伸到画布边缘
+
+    Returns:
+        slice: 可见范围的下标切片
+    """
+    start = max(int(np.searchsorted(x, x0, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x1, side='right')) + 1, len(x))
+    return slice(start, stop)
+
+
+def minmax_downsample(x, y, x0, x1, buckets):
+    """
+    按像素分桶降采样：[x0, x1] 等分为buckets个桶，每个桶保留最小值和最大值两点（按原顺序），
+    首尾点始终保留。结果绘制的折线与原始数据逐像素的上下包络一致
+
+    Args:
+        x (ndarray): 有序横轴坐标
+        y (ndarray): 纵轴数值（不含NaN）
+        x0, x1 (float): 分桶范围
+        buckets (int): 桶数（通常为画布宽度的像素数）
+
+    Returns:
+        tuple: (x, y) 降采样后的数组
+    """
+    n = len(x)
+    if n <= 2 * buckets + 2 or x1 <= x0:
+        return x, y
+    edges = np.searchsorted(x, np.linspace(x0, x1, buckets + 1)[1:-1], side='left')
+    starts = np.unique(np.concatenate(([0], edges)))
+    starts = starts[starts < n]
+    # 每个点所属的桶
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    index = np.arange(n)
+
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    # 各桶中第一个等于最小值/最大值的点
+    low_index = np.minimum.reduceat(np.where(y == lows[bucket], index, n), starts)
+    high_index = np.minimum.reduceat(np.where(y == highs[bucket], index, n), starts)
+
+    keep = np.concatenate(([0], np.minimum(low_index, high_index), np.maximum(low_index, high_index), [n - 1]))
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, threshold):
+    """
+    LTTB降采样到threshold个点
+
+    首尾点保留，中间的点按数量等分为threshold-2个桶；每个桶选出与上一个选中点、下一个桶平均点
+    构成的三角形面积最大的点。各桶的平均点一次算出，桶内面积按数组计算，
+    只有依赖上一个选中点的逐桶选择按桶循环（循环次数等于输出点数）
+
+    Args:
+        x (ndarray): 有序横轴坐标
+        y (ndarray): 纵轴数值（不含NaN）
+        threshold (int): 输出点数
+
+    Returns:
+        tuple: (x, y) 降采样后的数组
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    bucket_count = threshold - 2
+    edges = (np.arange(bucket_count + 1) * ((n - 2) / bucket_count)).astype('int64') + 1
+    edges[-1] = n - 1
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    # 最后一个桶的“下一个桶”为末尾点
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    keep = np.empty(threshold, dtype='int64')
+    keep[0], keep[-1] = 0, n - 1
+    selected = 0
+    for i in range(bucket_count):
+        start, stop = edges[i], edges[i + 1]
+        ax, ay = x[selected], y[selected]
+        area = np.abs((ax - next_x[i]) * (y[start:stop] - ay) - (ax - x[start:stop]) * (next_y[i] - ay))
+        selected = start + int(np.argmax(area))
+        keep[i + 1] = selected
+    return x[keep], y[keep]
+
+
+def downsample(x, y, x0, x1, width, method='minmax'):
+    """
+    截取可见范围并降采样
+
+    Args:
+        x (ndarray): 有序横轴坐标
+        y (ndarray): 纵轴数值
+        x0, x1 (float): 可见范围
+        width (int): 画布宽度（像素）
+        method (str): minmax / lttb
+
+    Returns:
+        tuple: (x, y) 用于绘制的点
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方式: {method}")
+    window = visible_slice(x, x0, x1)
+    x, y = x[window], y[window]
+    valid = ~np.isnan(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    width = max(int(width), 1)
+    if method == 'lttb':
+        return lttb_downsample(x, y, 2 * width)
+    return minmax_downsample(x, y, x0, x1, width)
+
+
+def thin_markers(x, x0, x1, width):
+    """
+    标记点稀疏化：可见范围内每个像素列只保留第一个标记
+
+    Returns:
+        ndarray: 保留的标记下标
+    """
+    index = np.flatnonzero((x >= x0) & (x <= x1))
+    if len(index) <= width or x1 <= x0:
+        return index
+    pixels = ((x[index] - x0) / (x1 - x0) * width).astype('int64')
+    _, first = np.unique(pixels, return_index=True)
+    return index[first]
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+资金曲线与价格线段图表
+上图绘制report_deals的结余/权益曲线，下图绘制成交价格轨迹、开平仓标记和segment_info中所选周期的
+当前线段（起点价到终点价的竖线，按方向着色）。直接在tkinter画布上绘制，不依赖额外的绘图库；
+每次重绘只截取可见时间范围并降采样到画布宽度（ChartDownsample），全年数据缩放平移时仍然流畅
+"""
+
+import logging
+import time
+import tkinter as tk
+
+import numpy as np
+import pandas as pd
+
+from BacktestStatistics import BacktestStatistics, TRADE_DEAL_TYPES, EXIT_DIRECTIONS
+from ChartDownsample import time_axis, downsample, thin_markers, DOWNSAMPLE_METHODS
+from FrameSchema import optimize_deals_frame
+from TablePartitions import with_time_window
+
+logger = logging.getLogger("ChartPanel")
+
+# 画布边距（像素）：左侧为纵轴刻度，底部为时间刻度
+MARGIN_LEFT = 80
+MARGIN_RIGHT = 15
+MARGIN_TOP = 10
+MARGIN_BOTTOM = 28
+PANE_GAP = 22
+
+# 上图（资金曲线）占绘图区高度的比例
+EQUITY_PANE_RATIO = 0.55
+
+# 每次滚轮缩放的比例
+ZOOM_STEP = 0.8
+
+# 最小可见时间跨度（秒）
+MIN_SPAN_SECONDS = 60
+
+COLORS = {
+    'balance': '#1565C0',
+    'equity': '#EF6C00',
+    'price': '#9E9E9E',
+    'buy': '#2E7D32',
+    'sell': '#C62828',
+    'exit': '#424242',
+    'UP': '#81C784',
+    'DOWN': '#E57373',
+    'grid': '#EEEEEE',
+    'axis': '#616161',
+}
+
+DOWNSAMPLE_LABELS = {'minmax': '像素最小/最大', 'lttb': 'LTTB'}
+
+
+def load_chart_data(backend, conn, start=None, end=None):
+    """
+    从数据库读取绘图数据
+
+    Args:
+        backend: StorageBackend后端
+        conn: 数据库连接
+        start: 时间窗口起点（包含），None为不限
+        end: 时间窗口终点（不包含），None为不限
+
+    Returns:
+        dict: curve（结余/权益曲线）, deals（成交时间、类型、方向、价格）,
+              segments（各周期的当前线段：交易时间、周期、起点价、终点价、方向）
+    """
+    deals_df = optimize_deals_frame(backend.read_sql(with_time_window("""
+        SELECT deal_id, deal_time, type, direction, price, commission, swap, profit, balance
+        FROM report_deals
+    """, 'deal_time', start, end), conn))
+    segments_df = backend.read_sql(with_time_window("""
+        SELECT trade_time, timeframe, start_price, end_price, direction
+        FROM segment_info WHERE segment_index = 1 ORDER BY trade_time
+    """, 'trade_time', start, end), conn)
+    curve = BacktestStatistics().balance_curves(deals_df)
+    logger.info(f"图表数据: {len(curve)} 个资金曲线点，{len(segments_df)} 条线段")
+    return {'curve': curve, 'deals': deals_df, 'segments': segments_df}
+
+
+class ChartPanel:
+    """结余/权益曲线和价格线段图表（滚轮缩放、拖动平移、双击复原）"""
+
+    def __init__(self, master, data, method='minmax'):
+        """
+        初始化图表
+
+        Args:
+            master: 放置图表的窗口（tk.Toplevel或tk.Tk）
+            data (dict): load_chart_data的返回值
+            method (str): 降采样方式（minmax / lttb）
+        """
+        self.master = master
+        self.master.title("资金曲线与线段")
+        self.master.geometry("1100x700")
+        self._prepare(data)
+
+        self.method = tk.StringVar(value=method)
+        self.timeframe = tk.StringVar(value=self.timeframes[0] if self.timeframes else '')
+        self.show = {name: tk.BooleanVar(value=True) for name in ('balance', 'equity', 'markers', 'segments')}
+        self.status = tk.StringVar()
+        self.view = self.full_range
+        self._drag_x = None
+        self._pending = None
+
+        self.create_widgets()
+        self.schedule_redraw()
+
+    def _prepare(self, data):
+        """转换为有序的NumPy数组（只在打开图表时执行一次）"""
+        curve = data['curve']
+        self.curve_x = time_axis(curve['deal_time'])
+        self.balance = curve['balance'].to_numpy(dtype='float64')
+        self.equity = curve['equity'].to_numpy(dtype='float64')
+
+        deals = data['deals']
+        deals = deals[deals['deal_time'].notna()].sort_values('deal_time', kind='stable')
+        deal_type = deals['type'].astype(str).str.lower().str.strip()
+        direction = deals['direction'].astype(str).str.lower().str.strip()
+        is_trade = deal_type.isin(TRADE_DEAL_TYPES).to_numpy()
+        is_exit = direction.isin(EXIT_DIRECTIONS).to_numpy() & is_trade
+        self.deal_x = time_axis(deals['deal_time'])[is_trade]
+        self.deal_price = pd.to_numeric(deals['price'], errors='coerce').to_numpy(dtype='float64')[is_trade]
+        entry = ~is_exit[is_trade]
+        is_buy = (deal_type == 'buy').to_numpy()[is_trade]
+        self.markers = {
+            'buy': np.flatnonzero(entry & is_buy),
+            'sell': np.flatnonzero(entry & ~is_buy),
+            'exit': np.flatnonzero(~entry),
+        }
+
+        segments = data['segments']
+        self.segments = {}
+        for timeframe, group in segments.groupby(segments['timeframe'].astype(str), sort=False):
+            self.segments[timeframe] = (time_axis(pd.to_datetime(group['trade_time'])),
+                                        pd.to_numeric(group['start_price'], errors='coerce').to_numpy(dtype='float64'),
+                                        pd.to_numeric(group['end_price'], errors='coerce').to_numpy(dtype='float64'),
+                                        group['direction'].astype(str).str.upper().to_numpy())
+        self.timeframes = sorted(self.segments)
+
+        times = [x[~np.isnan(x)] for x in [self.curve_x, self.deal_x] + [s[0] for s in self.segments.values()]]
+        times = [x for x in times if len(x)]
+        if times:
+            self.full_range = (min(x.min() for x in times), max(x.max() for x in times))
+        else:
+            now = time.time()
+            self.full_range = (now - 86400, now)
+        if self.full_range[1] - self.full_range[0] < MIN_SPAN_SECONDS:
+            self.full_range = (self.full_range[0], self.full_range[0] + MIN_SPAN_SECONDS)
+
+    def create_widgets(self):
+        """创建工具栏和画布"""
+        toolbar = tk.Frame(self.master)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+
+        tk.Label(toolbar, text="降采样:").pack(side=tk.LEFT)
+        for method in DOWNSAMPLE_METHODS:
+            tk.Radiobutton(toolbar, text=DOWNSAMPLE_LABELS[method], variable=self.method, value=method,
+                           command=self.schedule_redraw).pack(side=tk.LEFT)
+        for name, text in (('balance', '结余'), ('equity', '权益'), ('markers', '开平仓'), ('segments', '线段')):
+            tk.Checkbutton(toolbar, text=text, variable=self.show[name],
+                           command=self.schedule_redraw).pack(side=tk.LEFT, padx=(5, 0))
+        if self.timeframes:
+            tk.Label(toolbar, text="线段周期:").pack(side=tk.LEFT, padx=(10, 0))
+            tk.OptionMenu(toolbar, self.timeframe, *self.timeframes,
+                          command=lambda _: self.schedule_redraw()).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="复原", command=self.reset_view).pack(side=tk.LEFT, padx=(10, 0))
+        tk.Label(toolbar, textvariable=self.status, fg="gray").pack(side=tk.RIGHT)
+
+        self.canvas = tk.Canvas(self.master, bg="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda _: self.schedule_redraw())
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom(e.x, ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(e.x, ZOOM_STEP))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom(e.x, 1 / ZOOM_STEP))
+        self.canvas.bind("<ButtonPress-1>", self._start_drag)
+        self.canvas.bind("<B1-Motion>", self._drag)
+        self.canvas.bind("<Double-Button-1>", lambda _: self.reset_view())
+
+    # ---------- 视图 ----------
+
+    def _plot_width(self):
+        return max(self.canvas.winfo_width() - MARGIN_LEFT - MARGIN_RIGHT, 1)
+
+    def _set_view(self, x0, x1):
+        """设置可见时间范围（限制在数据范围内，且不小于最小跨度）"""
+        low, high = self.full_range
+        span = min(max(x1 - x0, MIN_SPAN_SECONDS), high - low)
+        x0 = min(max(x0, low), high - span)
+        self.view = (x0, x0 + span)
+        self.schedule_redraw()
+
+    def zoom(self, pixel_x, factor):
+        """以鼠标所在时间为中心缩放"""
+        x0, x1 = self.view
+        ratio = min(max((pixel_x - MARGIN_LEFT) / self._plot_width(), 0.0), 1.0)
+        center = x0 + (x1 - x0) * ratio
+        span = (x1 - x0) * factor
+        self._set_view(center - span * ratio, center - span * ratio + span)
+
+    def _start_drag(self, event):
+        self._drag_x = event.x
+
+    def _drag(self, event):
+        if self._drag_x is None:
+            return
+        x0, x1 = self.view
+        shift = (self._drag_x - event.x) / self._plot_width() * (x1 - x0)
+        self._drag_x = event.x
+        self._set_view(x0 + shift, x1 + shift)
+
+    def reset_view(self):
+        self._set_view(*self.full_range)
+
+    def schedule_redraw(self):
+        """合并连续的重绘请求（滚轮和拖动事件密集时只在空闲时重绘一次）"""
+        if self._pending is None:
+            self._pending = self.master.after_idle(self.redraw)
+
+    # ---------- 绘制 ----------
+
+    def redraw(self):
+        """重绘可见范围"""
+        self._pending = None
+        started = time.perf_counter()
+        canvas = self.canvas
+        canvas.delete('all')
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        plot_width = self._plot_width()
+        plot_height = height - MARGIN_TOP - MARGIN_BOTTOM - PANE_GAP
+        if plot_width < 10 or plot_height < 40:
+            return
+        equity_bottom = MARGIN_TOP + plot_height * EQUITY_PANE_RATIO
+        equity_pane = (MARGIN_TOP, equity_bottom)
+        price_pane = (equity_bottom + PANE_GAP, height - MARGIN_BOTTOM)
+        x0, x1 = self.view
+        method = self.method.get()
+        points = 0
+
+        # 上图：结余/权益曲线
+        lines = [(name, *downsample(self.curve_x, values, x0, x1, plot_width, method))
+                 for name, values in (('balance', self.balance), ('equity', self.equity)) if self.show[name].get()]
+        y_range = self._value_range([y for _, _, y in lines])
+        self._draw_frame(equity_pane, y_range, width)
+        for name, x, y in lines:
+            points += self._draw_line(x, y, equity_pane, y_range, COLORS[name])
+
+        # 下图：成交价格轨迹、线段、开平仓标记
+        price_x, price_y = downsample(self.deal_x, self.deal_price, x0, x1, plot_width, method)
+        segment = self.segments.get(self.timeframe.get()) if self.show['segments'].get() else None
+        segment_index = thin_markers(segment[0], x0, x1, plot_width) if segment is not None else np.array([], int)
+        values = [price_y]
+        if len(segment_index):
+            values += [segment[1][segment_index], segment[2][segment_index]]
+        price_range = self._value_range(values)
+        self._draw_frame(price_pane, price_range, width)
+        if len(segment_index):
+            self._draw_segments(segment, segment_index, price_pane, price_range)
+        points += self._draw_line(price_x, price_y, price_pane, price_range, COLORS['price'])
+        if self.show['markers'].get():
+            points += self._draw_markers(price_pane, price_range, plot_width)
+
+        self._draw_time_axis(height, plot_width)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.status.set(f"{len(self.curve_x)} 个资金曲线点，绘制 {points} 点，{elapsed:.0f} ms")
+
+    @staticmethod
+    def _value_range(arrays):
+        """可见数据的纵轴范围（上下留5%空白）"""
+        arrays = [a[~np.isnan(a)] for a in arrays if len(a)]
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return 0.0, 1.0
+        low = min(a.min() for a in arrays)
+        high = max(a.max() for a in arrays)
+        pad = (high - low) * 0.05 or max(abs(high) * 0.01, 1.0)
+        return low - pad, high + pad
+
+    def _to_pixels(self, x, y, pane, y_range):
+        x0, x1 = self.view
+        top, bottom = pane
+        px = MARGIN_LEFT + (x - x0) / (x1 - x0) * self._plot_width()
+        py = bottom - (y - y_range[0]) / (y_range[1] - y_range[0]) * (bottom - top)
+        return px, py
+
+    def _draw_line(self, x, y, pane, y_range, color):
+        if len(x) < 2:
+            return 0
+        px, py = self._to_pixels(x, y, pane, y_range)
+        self.canvas.create_line(np.column_stack((px, py)).ravel().tolist(), fill=color, width=1)
+        return len(x)
+
+    def _draw_segments(self, segment, index, pane, y_range):
+        """线段：在交易时间处画起点价到终点价的竖线"""
+        times, start_prices, end_prices, directions = segment
+        px, start_py = self._to_pixels(times[index], start_prices[index], pane, y_range)
+        _, end_py = self._to_pixels(times[index], end_prices[index], pane, y_range)
+        for x, y0, y1, direction in zip(px.tolist(), start_py.tolist(), end_py.tolist(), directions[index]):
+            self.canvas.create_line(x, y0, x, y1, fill=COLORS.get(direction, COLORS['price']), width=3)
+
+    def _draw_markers(self, pane, y_range, plot_width):
+        """开仓（买入向上三角、卖出向下三角）和平仓（圆点）标记，每个像素列每类只画一个"""
+        x0, x1 = self.view
+        count = 0
+        for kind, index in self.markers.items():
+            if not len(index):
+                continue
+            index = index[thin_markers(self.deal_x[index], x0, x1, plot_width)]
+            index = index[~np.isnan(self.deal_price[index])]
+            px, py = self._to_pixels(self.deal_x[index], self.deal_price[index], pane, y_range)
+            for x, y in zip(px.tolist(), py.tolist()):
+                if kind == 'buy':
+                    self.canvas.create_polygon(x, y - 4, x - 4, y + 4, x + 4, y + 4, fill=COLORS[kind], outline='')
+                elif kind == 'sell':
+                    self.canvas.create_polygon(x, y + 4, x - 4, y - 4, x + 4, y - 4, fill=COLORS[kind], outline='')
+                else:
+                    self.canvas.create_oval(x - 3, y - 3, x + 3, y + 3, outline=COLORS[kind])
+            count += len(index)
+        return count
+
+    def _draw_frame(self, pane, y_range, width):
+        """图框和纵轴刻度"""
+        top, bottom = pane
+        canvas = self.canvas
+        for value in np.linspace(y_range[0], y_range[1], 5):
+            y = bottom - (value - y_range[0]) / (y_range[1] - y_range[0]) * (bottom - top)
+            canvas.create_line(MARGIN_LEFT, y, width - MARGIN_RIGHT, y, fill=COLORS['grid'])
+            canvas.create_text(MARGIN_LEFT - 5, y, text=f"{value:,.2f}", anchor=tk.E, fill=COLORS['axis'])
+        canvas.create_rectangle(MARGIN_LEFT, top, width - MARGIN_RIGHT, bottom, outline=COLORS['axis'])
+
+    def _draw_time_axis(self, height, plot_width):
+        """底部时间刻度（跨度超过两天时只显示日期）"""
+        x0, x1 = self.view
+        fmt = '%Y-%m-%d' if x1 - x0 > 2 * 86400 else '%m-%d %H:%M'
+        for ratio in np.linspace(0, 1, 7):
+            label = pd.Timestamp((x0 + (x1 - x0) * ratio) * 1e9).strftime(fmt)
+            x = MARGIN_LEFT + ratio * plot_width
+            anchor = tk.NW if ratio == 0 else tk.NE if ratio == 1 else tk.N
+            self.canvas.create_text(x, height - MARGIN_BOTTOM + 6, text=label, anchor=anchor, fill=COLORS['axis'])
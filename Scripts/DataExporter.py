@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大结果集分块导出
+将汇总、线段等数据按块写入CSV、压缩Parquet、Arrow IPC（供其他工具零拷贝读取）或XLSX：
+数据库中的表通过游标逐块读取，内存中的DataFrame按行切片，每块写完即释放，
+导出数百万行时不会在内存中再生成一份完整副本
+"""
+
+import logging
+import os
+
+import pandas as pd
+
+from FrameSchema import ORDER_SCHEMA, DEAL_SCHEMA, SEGMENT_SCHEMA, SUMMARY_SCHEMA, ORDER_LOG_SCHEMA, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖，仅Parquet和Arrow格式需要
+    pa = pa_ipc = pq = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl为可选依赖，仅XLSX格式需要
+    Workbook = None
+
+logger = logging.getLogger("DataExporter")
+
+# 默认每块行数
+DEFAULT_EXPORT_CHUNK_ROWS = 50000
+
+# 默认Parquet压缩算法
+DEFAULT_PARQUET_COMPRESSION = 'zstd'
+
+# Excel单个工作表的最大行数（含表头），超出时续写到新工作表
+XLSX_MAX_ROWS = 1048576
+
+# 文件扩展名 -> 导出格式
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.ipc': 'arrow',
+    '.feather': 'arrow',
+    '.xlsx': 'xlsx',
+}
+
+# 可导出的数据表 -> 列类型（未迁移的旧结构订单表交易量是"请求量 / 成交量"文本，交易量列按读取的类型原样导出）
+EXPORT_TABLES = {
+    'trade_summary': SUMMARY_SCHEMA,
+    'segment_info': SEGMENT_SCHEMA,
+    'report_orders': {col: kind for col, kind in ORDER_SCHEMA.items() if col not in ('volume', 'filled_volume')},
+    'report_deals': DEAL_SCHEMA,
+    'order_logs': ORDER_LOG_SCHEMA,
+}
+
+
+def export_format(path, fmt=None):
+    """
+    确定导出格式
+
+    Args:
+        path (str): 输出文件路径
+        fmt (str): 指定的格式，None时按扩展名判断
+
+    Returns:
+        str: csv / parquet / arrow / xlsx
+    """
+    if fmt is None:
+        fmt = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise ValueError(f"无法根据扩展名判断导出格式: {path}")
+    if fmt not in set(EXPORT_FORMATS.values()):
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if fmt in ('parquet', 'arrow') and pa is None:
+        raise ImportError("导出Parquet/Arrow需要pyarrow，请执行: pip install pyarrow")
+    if fmt == 'xlsx' and Workbook is None:
+        raise ImportError("导出XLSX需要openpyxl，请执行: pip install openpyxl")
+    return fmt
+
+
+def frame_chunks(df, chunk_rows):
+    """将DataFrame按行切分为数据块（切片不复制数据）"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def arrow_type(kind):
+    """列类型定义对应的Arrow类型"""
+    return {
+        'datetime': pa.timestamp('us'),
+        'int': pa.int64(),
+        'count': pa.int32(),
+        'float': pa.float64(),
+        'category': pa.string(),
+        'string': pa.string(),
+    }.get(kind)
+
+
+class CsvChunkWriter:
+    """CSV分块写入（UTF-8带BOM，与save_summary_to_csv一致，Excel可直接打开）"""
+
+    def __init__(self, path, schema=None):
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowChunkWriter:
+    """
+    Parquet / Arrow IPC分块写入
+
+    Arrow表结构由列类型定义和第一块数据确定，之后每块按同一结构转换，
+    避免某一块中整列缺失或类别不同导致各块类型不一致
+    """
+
+    def __init__(self, path, schema=None, fmt='parquet', compression=DEFAULT_PARQUET_COMPRESSION):
+        self.path = path
+        self.schema = schema or {}
+        self.fmt = fmt
+        self.compression = compression
+        self.arrow_schema = None
+        self.writer = None
+
+    def _arrow_schema(self, chunk):
+        inferred = pa.Schema.from_pandas(chunk, preserve_index=False)
+        fields = []
+        for field in inferred:
+            field_type = arrow_type(self.schema.get(field.name))
+            if field_type is None:
+                field_type = pa.string() if pa.types.is_null(field.type) else field.type
+            fields.append(pa.field(field.name, field_type))
+        return pa.schema(fields)
+
+    def write(self, chunk):
+        # 类别列按字符串写入（每块的类别集合不同，Parquet写入时自行做字典编码）
+        chunk = chunk.copy()
+        for col in chunk.columns:
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                chunk[col] = chunk[col].astype(object)
+        if self.writer is None:
+            self.arrow_schema = self._arrow_schema(chunk)
+            if self.fmt == 'parquet':
+                self.writer = pq.ParquetWriter(self.path, self.arrow_schema, compression=self.compression)
+            else:
+                self.writer = pa_ipc.new_file(self.path, self.arrow_schema)
+        table = pa.Table.from_pandas(chunk, schema=self.arrow_schema, preserve_index=False, safe=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # 没有数据时按列类型定义写出只有表结构的空文件
+            self.write(pd.DataFrame({col: pd.Series(dtype=object) for col in self.schema}))
+        self.writer.close()
+
+
+class XlsxChunkWriter:
+    """
+    XLSX分块写入
+
+    使用openpyxl只写模式，行数据写入后即序列化到临时文件，内存占用与总行数无关；
+    超出Excel单表行数上限时续写到新工作表（每个工作表都有表头）
+    """
+
+    def __init__(self, path, schema=None, sheet_name='data'):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.columns = None
+
+    def _new_sheet(self):
+        index = len(self.workbook.worksheets)
+        self.sheet = self.workbook.create_sheet(self.sheet_name if index == 0 else f"{self.sheet_name}_{index + 1}")
+        self.sheet.append(self.columns)
+        self.sheet_rows = 1
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = [str(col) for col in chunk.columns]
+            self._new_sheet()
+        # 缺失值写为空单元格，numpy标量和时间戳转换为Python对象
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp)
+                               else value.item() if hasattr(value, 'item') else value for value in row])
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.columns is None:
+            self.workbook.create_sheet(self.sheet_name)
+        self.workbook.save(self.path)
+
+
+class DataExporter:
+    """分块导出数据"""
+
+    def __init__(self, chunk_rows=DEFAULT_EXPORT_CHUNK_ROWS, compression=DEFAULT_PARQUET_COMPRESSION):
+        """
+        初始化导出器
+
+        Args:
+            chunk_rows (int): 每块行数
+            compression (str): Parquet压缩算法（zstd / snappy / gzip / none）
+        """
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.compression = None if compression in (None, 'none') else compression
+
+    def _writer(self, path, fmt, schema):
+        if fmt == 'csv':
+            return CsvChunkWriter(path, schema)
+        if fmt == 'xlsx':
+            return XlsxChunkWriter(path, schema)
+        return ArrowChunkWriter(path, schema, fmt=fmt, compression=self.compression)
+
+    def export_chunks(self, chunks, path, fmt=None, schema=None):
+        """
+        将数据块依次写入文件（先写临时文件，完成后替换，中断时不会留下不完整的文件）
+
+        Args:
+            chunks (iterable): DataFrame数据块
+            path (str): 输出文件路径
+            fmt (str): 导出格式，None时按扩展名判断
+            schema (dict): 列名 -> 类型，用于统一各块的列类型
+
+        Returns:
+            int: 导出行数
+        """
+        fmt = export_format(path, fmt)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        writer = self._writer(temp_path, fmt, schema)
+        rows = 0
+        try:
+            for chunk in chunks:
+                if schema:
+                    chunk = apply_schema(chunk, schema)
+                writer.write(chunk)
+                rows += len(chunk)
+            writer.close()
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                writer.close()
+            except Exception:
+                pass
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.info(f"已导出 {rows} 行到 {path}（{fmt}）")
+        return rows
+
+    def export_frame(self, df, path, fmt=None, schema=None):
+        """
+        导出内存中的DataFrame（按行切片分块写入）
+
+        Args:
+            df (DataFrame): 数据
+            path (str): 输出文件路径
+            fmt (str): 导出格式，None时按扩展名判断
+            schema (dict): 列名 -> 类型
+
+        Returns:
+            int: 导出行数
+        """
+        return self.export_chunks(frame_chunks(df, self.chunk_rows), path, fmt, schema)
+
+    def export_table(self, backend, conn, table, path, fmt=None, columns=None, where=None):
+        """
+        从数据库逐块读取数据表并导出（MySQL使用非缓冲游标，结果在服务器端按需读取）
+
+        Args:
+            backend: StorageBackend后端
+            conn: 数据库连接
+            table (str): 表名（EXPORT_TABLES中的表）
+            path (str): 输出文件路径
+            fmt (str): 导出格式，None时按扩展名判断
+            columns (list): 导出的列，None为除自增id外的全部列
+            where (str): 过滤条件（SQL表达式）
+
+        Returns:
+            int: 导出行数
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"不支持导出的数据表: {table}")
+        fmt = export_format(path, fmt)
+        select = ", ".join(columns) if columns else "*"
+        query = f"SELECT {select} FROM {table}" + (f" WHERE {where}" if where else "") + " ORDER BY id"
+        chunks = (chunk.drop(columns=['id']) if not columns and 'id' in chunk.columns else chunk
+                  for chunk in backend.iter_sql(query, conn, self.chunk_rows))
+        return self.export_chunks(chunks, path, fmt, EXPORT_TABLES[table])
@@ -0,0 +1,603 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+差分校验
+同一份输入分别交给原有实现和加速实现（分块/流水线转换、分块提交写入、分区并行和流式汇总、向量化ZigZag）
+计算，逐列比较输出（数值列按容差，时间和文本列精确比较），并记录每一对实现的耗时和加速比。
+写入和汇总的原有实现是LegacyBaseline中冻结的基线副本，与当前代码无关；表结构修订带来的差异（订单交易量拆列、
+成交交易量改为数值列）先把基线输出转换为修订后的结构再比较，其余有意的列差异列在 INTENDED_DIFFERENCES 中。
+输入为ReportTester.xlsx、segment_info.csv，以及将它们按票号和时间
+平移复制、扰动盈亏生成的放大数据和随机游走K线。替换 _process_summary_data、save_orders_to_db、
+save_segments_to_db 等方法前先用它确认隐含规则（按开价时间取前两个订单、最后一笔成交的注释覆盖注释、
+线段长度保留两位小数等）没有改变
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from StorageBackend import create_backend
+from LegacyBaseline import LegacyBaseline
+from TradeDataProcessor import TradeDataProcessor, ORDERS_INSERT_QUERY, DEALS_INSERT_QUERY
+from SegmentDataProcessor import SegmentDataProcessor, SEGMENTS_INSERT_QUERY
+from TradeSummaryProcessor import TradeSummaryProcessor
+from AsyncPipeline import transform_chunk, frame_chunks, DEFAULT_CHUNK_ROWS
+from ImportCheckpoint import DEFAULT_COMMIT_ROWS
+from SchemaRevision import insert_columns
+from ZigzagEngine import ZigzagCalculator
+
+logger = logging.getLogger("DifferentialHarness")
+
+# 数值列的默认容差（绝对误差）
+DEFAULT_TOLERANCE = 1e-9
+
+# 生成数据时真实数据的复制份数
+DEFAULT_COPIES = 5
+
+# 生成的随机游走K线数量
+DEFAULT_ZIGZAG_BARS = 20000
+
+# 生成数据时票号的平移量（每份复制）
+TICKET_OFFSET = 10000000
+
+# 校验流式汇总时每块的行数（取较小的值，使票号和仓位跨越多个块）
+STREAM_CHUNK_ROWS = 997
+
+# 比较数据表时忽略的列（自增id和写入时间每次都不同）
+IGNORED_COLUMNS = ('id', 'created_at')
+
+# 基线汇总与positions方式汇总之间有意的列差异：列名 -> 原因（只记录，不计为失败）
+INTENDED_DIFFERENCES = {
+    'exit_count': 'positions方式新增的列，记录仓位的出场次数',
+}
+
+# 基线线段日志中的时间格式（基线直接读取CSV文本，写入时再解析）
+SEGMENT_TIME_FORMAT = '%Y.%m.%d %H:%M:%S'
+
+# 校验的ZigZag参数：(depth, deviation, backstep)
+ZIGZAG_PARAMETERS = ((12, 5, 3), (5, 3, 2))
+
+# 报告订单、成交和线段日志中的票号列
+ORDER_TICKET_COLUMNS = ('订单',)
+DEAL_TICKET_COLUMNS = ('成交', '订单')
+SEGMENT_TICKET_COLUMNS = ('OrderTicket', 'PositionId')
+
+# 报告中的交易品种列（每份复制使用不同的品种后缀，分区并行汇总时分为多个分区）
+SYMBOL_COLUMNS = ('交易品种',)
+
+
+def _time_positions(df):
+    """时间列的位置（报告数据中有多个列名为空的列，按位置访问）"""
+    return [i for i, dtype in enumerate(df.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+
+
+def _tile(df, copies, ticket_columns, shift, rng, noise_columns=()):
+    """
+    平移复制数据：第k份的票号加 k*TICKET_OFFSET（0保持为0，表示无票号），时间加 k*shift，
+    交易品种加后缀 _k，noise_columns按随机比例缩放并随机变号（改变盈亏状态的分布）
+    """
+    columns = list(df.columns)
+    times = _time_positions(df)
+    parts = []
+    for k in range(copies):
+        part = df.copy()
+        part.columns = range(len(columns))
+        for i, col in enumerate(columns):
+            values = part[i]
+            if col in ticket_columns:
+                part[i] = values.where(values.isna() | (values == 0), values + k * TICKET_OFFSET)
+            elif i in times:
+                part[i] = values + k * shift
+            elif col in SYMBOL_COLUMNS and k > 0:
+                part[i] = values.astype(object).where(values.isna(), values.astype(str) + f"_{k}")
+            elif col in noise_columns and k > 0:
+                factor = rng.uniform(0.5, 1.5, len(part)) * np.where(rng.random(len(part)) < 0.3, -1, 1)
+                part[i] = (values * factor).round(2)
+        parts.append(part)
+    # 拼接后恢复category类型（交易品种的类别集合随后缀扩大）
+    tiled = pd.concat(parts, ignore_index=True)
+    for i, dtype in enumerate(df.dtypes):
+        if isinstance(dtype, pd.CategoricalDtype):
+            tiled[i] = tiled[i].astype('category' if columns[i] in SYMBOL_COLUMNS else dtype)
+    tiled.columns = columns
+    return tiled
+
+
+def generate_inputs(orders_df, deals_df, segments_df, copies=DEFAULT_COPIES, seed=0):
+    """
+    由真实数据生成放大的输入：票号和时间平移后复制copies份，复制出的成交盈亏随机缩放和变号
+
+    Args:
+        orders_df (DataFrame): 报告订单数据（read_order_deal_data）
+        deals_df (DataFrame): 报告成交数据
+        segments_df (DataFrame): 线段日志数据（read_segment_data）
+        copies (int): 复制份数
+        seed (int): 随机种子
+
+    Returns:
+        tuple: (orders_df, deals_df, segments_df)
+    """
+    rng = np.random.default_rng(seed)
+    times = [df.iloc[:, i] for df in (orders_df, deals_df, segments_df) for i in _time_positions(df)]
+    first = min(t.min() for t in times)
+    last = max(t.max() for t in times)
+    shift = (last - first).ceil('D') + pd.Timedelta(days=1)
+    # 报告末尾的合计行（没有成交号）只保留一份，放在最后
+    total = deals_df['成交'].isna() if '成交' in deals_df.columns else pd.Series(False, index=deals_df.index)
+    deals = _tile(deals_df[~total], copies, DEAL_TICKET_COLUMNS, shift, rng, noise_columns=('盈利',))
+    deals = pd.concat([deals, deals_df[total]], ignore_index=True)
+    orders = _tile(orders_df, copies, ORDER_TICKET_COLUMNS, shift, rng)
+    segments = _tile(segments_df, copies, SEGMENT_TICKET_COLUMNS, shift, rng)
+    logger.info(f"生成数据: 订单 {len(orders)} 条，成交 {len(deals)} 条，线段 {len(segments)} 条（复制 {copies} 份）")
+    return orders, deals, segments
+
+
+def generate_bars(count=DEFAULT_ZIGZAG_BARS, seed=0, point=0.01):
+    """
+    生成随机游走K线（价格按point取整，包含相等的高低点，用于覆盖极值相等时的分支）
+
+    Returns:
+        DataFrame: time, open, high, low, close
+    """
+    rng = np.random.default_rng(seed)
+    close = np.round((2000 + np.cumsum(rng.normal(0, 0.5, count))) / point) * point
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + np.round(rng.exponential(0.3, count) / point) * point
+    low = np.minimum(open_, close) - np.round(rng.exponential(0.3, count) / point) * point
+    return pd.DataFrame({'time': pd.date_range('2025-01-01', periods=count, freq='min'),
+                         'open': open_, 'high': high, 'low': low, 'close': close})
+
+
+def _number_text(values):
+    """文本列转为数值，空字符串和缺失值为NaN"""
+    text = values.astype(object).where(values.notna(), '').astype(str).str.strip()
+    return pd.to_numeric(text.replace('', np.nan), errors='coerce')
+
+
+def revise_legacy_orders(orders_df):
+    """基线report_orders的volume为“请求量 / 成交量”文本，修订后的表结构拆为volume和filled_volume两个数值列"""
+    orders_df = orders_df.copy()
+    parts = orders_df['volume'].astype(object).where(orders_df['volume'].notna(), '').astype(str).str.split('/', n=1)
+    orders_df['volume'] = _number_text(parts.str[0])
+    orders_df.insert(orders_df.columns.get_loc('volume') + 1, 'filled_volume', _number_text(parts.str[1]))
+    return orders_df
+
+
+def revise_legacy_deals(deals_df):
+    """基线report_deals的volume为文本（空值写为空字符串），修订后的表结构为数值列"""
+    deals_df = deals_df.copy()
+    deals_df['volume'] = _number_text(deals_df['volume'])
+    return deals_df
+
+
+def revise_legacy_summary(summary_df):
+    """基线汇总的volume沿用订单表的“请求量 / 成交量”文本，修订后为请求量数值"""
+    summary_df = summary_df.copy()
+    summary_df['volume'] = _number_text(summary_df['volume'].astype(object).where(
+        summary_df['volume'].notna(), '').astype(str).str.split('/', n=1).str[0])
+    return summary_df
+
+
+def legacy_segment_frame(segments_df):
+    """基线线段写入的输入：基线直接读取CSV文本，时间列按日志格式还原为文本，category列还原为object"""
+    segments_df = segments_df.copy()
+    for column in segments_df.columns:
+        values = segments_df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            segments_df[column] = values.dt.strftime(SEGMENT_TIME_FORMAT).astype(object).where(values.notna(), np.nan)
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            segments_df[column] = values.astype(object)
+    return segments_df
+
+
+def _comparable(expected, actual):
+    """
+    将两列转换为可比较的类型
+
+    Returns:
+        tuple: (kind, expected, actual)，kind为 numeric / datetime / text
+    """
+    if isinstance(expected.dtype, pd.CategoricalDtype):
+        expected = expected.astype(object)
+    if isinstance(actual.dtype, pd.CategoricalDtype):
+        actual = actual.astype(object)
+    is_time = [pd.api.types.is_datetime64_any_dtype(s) for s in (expected, actual)]
+    if any(is_time):
+        try:
+            return ('datetime', pd.to_datetime(expected).astype('datetime64[ns]'),
+                    pd.to_datetime(actual).astype('datetime64[ns]'))
+        except (ValueError, TypeError):
+            pass
+    is_number = [pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) for s in (expected, actual)]
+    if all(is_number) or any(is_number):
+        numbers = [pd.to_numeric(s, errors='coerce') for s in (expected, actual)]
+        # 非数值列转换后不能多出缺失值，否则按文本比较
+        if all(n.isna().sum() == s.isna().sum() for n, s in zip(numbers, (expected, actual))):
+            return ('numeric', numbers[0].astype('float64'), numbers[1].astype('float64'))
+    return 'text', expected.astype(object), actual.astype(object)
+
+
+def diff_frames(expected, actual, key=None, tolerance=DEFAULT_TOLERANCE, tolerances=None):
+    """
+    逐列比较两个DataFrame
+
+    Args:
+        expected (DataFrame): 原有实现的输出
+        actual (DataFrame): 加速实现的输出
+        key (list): 对齐的键列，None为按行位置对齐；键中的缺失值视为相等
+        tolerance (float): 数值列的默认容差（绝对误差）
+        tolerances (dict): 列名 -> 容差
+
+    Returns:
+        DataFrame: 每列一行：column, kind, compared, mismatches, max_abs_diff, example（第一处差异）；
+            行数不一致、只在一侧出现的键和列也各记一行
+    """
+    tolerances = tolerances or {}
+    records = []
+    expected = expected.reset_index(drop=True)
+    actual = actual.reset_index(drop=True)
+    if key:
+        def keyed(df):
+            keys = df[key].copy()
+            for column in key:
+                # 整数值的浮点键（基线汇总中含缺失值的票号列）按整数对齐
+                values = keys[column]
+                if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+                    keys[column] = values.astype('Int64')
+            index = pd.MultiIndex.from_frame(keys.astype(object).where(keys.notna(), None).astype(str))
+            return df.drop(columns=key).set_axis(index, axis=0)
+        expected, actual = keyed(expected), keyed(actual)
+        missing = expected.index.difference(actual.index)
+        extra = actual.index.difference(expected.index)
+        for label, keys in (('<missing rows>', missing), ('<extra rows>', extra)):
+            if len(keys):
+                records.append({'column': label, 'kind': 'rows', 'compared': len(keys), 'mismatches': len(keys),
+                                'max_abs_diff': np.nan, 'example': str(keys[0])})
+        common = expected.index.intersection(actual.index, sort=False)
+        if expected.index.has_duplicates or actual.index.has_duplicates:
+            raise ValueError(f"对齐键不唯一: {key}")
+        expected, actual = expected.loc[common], actual.loc[common]
+    elif len(expected) != len(actual):
+        records.append({'column': '<row count>', 'kind': 'rows', 'compared': max(len(expected), len(actual)),
+                        'mismatches': abs(len(expected) - len(actual)), 'max_abs_diff': np.nan,
+                        'example': f"{len(expected)} != {len(actual)}"})
+        rows = min(len(expected), len(actual))
+        expected, actual = expected.iloc[:rows], actual.iloc[:rows]
+
+    for label, columns in (('<missing column>', [c for c in expected.columns if c not in actual.columns]),
+                           ('<extra column>', [c for c in actual.columns if c not in expected.columns])):
+        for column in columns:
+            records.append({'column': column, 'kind': label, 'compared': 0, 'mismatches': len(expected),
+                            'max_abs_diff': np.nan, 'example': label})
+
+    for column in [c for c in expected.columns if c in actual.columns]:
+        kind, left, right = _comparable(expected[column], actual[column])
+        both_missing = left.isna().to_numpy() & right.isna().to_numpy()
+        max_abs_diff = np.nan
+        if kind == 'numeric':
+            diff = np.abs(left.to_numpy() - right.to_numpy())
+            with np.errstate(invalid='ignore'):
+                equal = both_missing | (diff <= tolerances.get(column, tolerance))
+            finite = diff[~np.isnan(diff)]
+            max_abs_diff = float(finite.max()) if len(finite) else np.nan
+        else:
+            equal = both_missing | (left.to_numpy() == right.to_numpy())
+        mismatched = np.flatnonzero(~equal)
+        example = ''
+        if len(mismatched):
+            i = mismatched[0]
+            pair = (left.iloc[i], right.iloc[i]) if kind == 'text' else (str(left.iloc[i]), str(right.iloc[i]))
+            example = f"{expected.index[i]}: {pair[0]!r} != {pair[1]!r}"
+        records.append({'column': column, 'kind': kind, 'compared': len(left), 'mismatches': len(mismatched),
+                        'max_abs_diff': max_abs_diff, 'example': example})
+    return pd.DataFrame(records, columns=['column', 'kind', 'compared', 'mismatches', 'max_abs_diff', 'example'])
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+class DifferentialHarness:
+    """原有实现与加速实现的差分校验"""
+
+    def __init__(self, work_dir=None, workers=2, tolerance=DEFAULT_TOLERANCE, tolerances=None,
+                 candidate_backend='sqlite', chunk_rows=DEFAULT_CHUNK_ROWS, commit_rows=DEFAULT_COMMIT_ROWS):
+        """
+        初始化
+
+        Args:
+            work_dir (str): 存放临时数据库的目录，None时使用临时目录并在结束后删除
+            workers (int): 分区并行汇总和分块转换的进程数
+            tolerance (float): 数值列的默认容差
+            tolerances (dict): 列名 -> 容差
+            candidate_backend (str): 加速写入路径使用的嵌入式后端（sqlite / duckdb），原有写入路径固定为sqlite
+            chunk_rows (int): 分块转换的每块行数
+            commit_rows (int): 分块提交写入的每个事务行数
+        """
+        self.work_dir = work_dir
+        self.workers = max(1, int(workers))
+        self.tolerance = tolerance
+        self.tolerances = dict(tolerances or {})
+        self.candidate_backend = candidate_backend
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.commit_rows = max(1, int(commit_rows))
+        self.results = []
+        self.details = []
+
+    # ---------- 比较 ----------
+
+    def compare(self, name, input_name, legacy, candidate, key=None, allowed=None):
+        """
+        运行一对实现并比较输出
+
+        Args:
+            name (str): 实现对的名称
+            input_name (str): 输入名称（real / generated 等）
+            legacy (callable): 原有实现，返回DataFrame
+            candidate (callable): 加速实现，返回DataFrame
+            key (list): 对齐的键列，None为按行位置对齐
+            allowed (dict): 有意不同的列 -> 原因；差异只出现在这些列时状态为allowed，不计为失败
+
+        Returns:
+            DataFrame: 逐列比较结果
+        """
+        allowed = allowed or {}
+        logger.info(f"校验 {name}（{input_name}）")
+        expected, legacy_seconds = _timed(legacy)
+        actual, candidate_seconds = _timed(candidate)
+        if expected is None or actual is None:
+            raise RuntimeError(f"{name}: 实现返回空结果（原有 {expected is None}，加速 {actual is None}）")
+        diff = diff_frames(expected, actual, key, self.tolerance, self.tolerances)
+        diff['allowed'] = diff['column'].map(allowed).fillna('')
+        mismatched = diff[diff['mismatches'] > 0]
+        unexpected = mismatched[mismatched['allowed'] == '']
+        status = 'diff' if not unexpected.empty else ('allowed' if not mismatched.empty else 'ok')
+        self.results.append({
+            'pair': name,
+            'input': input_name,
+            'rows': len(expected),
+            'legacy_seconds': round(legacy_seconds, 4),
+            'candidate_seconds': round(candidate_seconds, 4),
+            'speedup': round(legacy_seconds / candidate_seconds, 2) if candidate_seconds > 0 else np.nan,
+            'mismatched_columns': ", ".join(str(c) for c in mismatched['column']),
+            'status': status,
+        })
+        diff.insert(0, 'input', input_name)
+        diff.insert(0, 'pair', name)
+        self.details.append(diff)
+        if status == 'diff':
+            logger.warning(f"{name}（{input_name}）输出不一致: " + "；".join(
+                f"{row.column} {row.mismatches} 处（{row.example}）" for row in unexpected.itertuples()))
+        elif status == 'allowed':
+            logger.info(f"{name}（{input_name}）有意的差异: " + "；".join(
+                f"{row.column}（{row.allowed}）" for row in mismatched.itertuples()))
+        return diff
+
+    def failed(self):
+        """是否有实现对在允许范围之外输出不一致"""
+        return any(result['status'] == 'diff' for result in self.results)
+
+    def report(self):
+        """各实现对的耗时、加速比和不一致的列"""
+        return pd.DataFrame(self.results)
+
+    def column_report(self):
+        """全部逐列比较结果"""
+        return pd.concat(self.details, ignore_index=True) if self.details else pd.DataFrame()
+
+    # ---------- 数据库 ----------
+
+    def _db_config(self, name, backend='sqlite'):
+        """工作目录中的嵌入式数据库（已存在时先删除）"""
+        path = os.path.join(self.work_dir, f"{name}.{backend}")
+        for suffix in ('', '.wal', '-journal', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return {'backend': backend, 'path': path}
+
+    @staticmethod
+    def _read_table(db_config, table):
+        """按写入顺序读取数据表（去掉自增id和写入时间）"""
+        backend = create_backend(db_config)
+        conn = backend.connect()
+        try:
+            df = backend.read_sql(f"SELECT * FROM {table} ORDER BY id", conn)
+        finally:
+            conn.close()
+        return df.drop(columns=[c for c in IGNORED_COLUMNS if c in df.columns])
+
+    @staticmethod
+    def _legacy_save(db_config, save):
+        """基线写入（save接收已连接并建好表的LegacyBaseline）"""
+        baseline = LegacyBaseline(db_config)
+        if not baseline.connect_db():
+            raise RuntimeError("无法连接到数据库")
+        try:
+            baseline.create_trade_tables()
+            baseline.create_segment_tables()
+            save(baseline)
+        finally:
+            baseline.close_db()
+
+    @staticmethod
+    def _checkpointed_save(processor, save):
+        """分块提交写入（save接收已连接的处理器）"""
+        if not processor.connect_db():
+            raise RuntimeError("无法连接到数据库")
+        try:
+            processor.create_tables()
+            return save(processor)
+        finally:
+            processor.close_db()
+
+    # ---------- 校验项 ----------
+
+    def _chunked_rows(self, kind, df, report_file=None):
+        """流水线的转换方式：按块在进程池中转换后按顺序拼接"""
+        chunks = list(frame_chunks(df, self.chunk_rows))
+        if self.workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                parts = list(executor.map(transform_chunk, [kind] * len(chunks), chunks, [report_file] * len(chunks)))
+        else:
+            parts = [transform_chunk(kind, chunk, report_file) for chunk in chunks]
+        return [row for part in parts for row in part]
+
+    def check_rows(self, input_name, orders_df, deals_df, segments_df, report_file):
+        """整体逐行转换（build_*_rows）与流水线分块转换的插入行"""
+        trade = TradeDataProcessor({})
+        segment = SegmentDataProcessor({})
+        for kind, query, df, build in (
+                ('orders', ORDERS_INSERT_QUERY, orders_df, lambda: trade.build_order_rows(orders_df, report_file)),
+                ('deals', DEALS_INSERT_QUERY, deals_df, lambda: trade.build_deal_rows(deals_df, report_file)),
+                ('segments', SEGMENTS_INSERT_QUERY, segments_df, lambda: segment.build_segment_rows(segments_df))):
+            columns = insert_columns(query)
+            self.compare(f"{kind}_rows_chunked", input_name,
+                         lambda: pd.DataFrame(build(), columns=columns),
+                         lambda: pd.DataFrame(self._chunked_rows(kind, df, report_file), columns=columns))
+
+    def check_saves(self, input_name, orders_df, deals_df, segments_df, report_file):
+        """
+        基线逐行写入与save_*_to_db分块提交写入后读回的数据表；
+        基线表的交易量文本列先转换为修订后的数值列再比较
+
+        Returns:
+            tuple: (基线数据库配置, 加速写入路径的数据库配置)，后续汇总校验使用
+        """
+        legacy_config = self._db_config(f"{input_name}_legacy")
+        candidate_config = self._db_config(f"{input_name}_candidate", self.candidate_backend)
+        commit_rows = self.commit_rows
+        legacy_segments = legacy_segment_frame(segments_df)
+        pairs = (
+            ('report_orders', TradeDataProcessor, revise_legacy_orders,
+             lambda b: b.save_orders_to_db(orders_df, report_file),
+             lambda p: p.save_orders_to_db(orders_df, report_file, replace=True, commit_rows=commit_rows)),
+            ('report_deals', TradeDataProcessor, revise_legacy_deals,
+             lambda b: b.save_deals_to_db(deals_df, report_file),
+             lambda p: p.save_deals_to_db(deals_df, report_file, replace=True, commit_rows=commit_rows)),
+            ('segment_info', SegmentDataProcessor, None,
+             lambda b: b.save_segments_to_db(legacy_segments),
+             lambda p: p.save_segments_to_db(segments_df, replace=True, commit_rows=commit_rows)),
+        )
+        for table, processor_class, revise, legacy_save, save in pairs:
+            def legacy(legacy_save=legacy_save, revise=revise, table=table):
+                self._legacy_save(legacy_config, legacy_save)
+                df = self._read_table(legacy_config, table)
+                return revise(df) if revise else df
+
+            def candidate(processor_class=processor_class, save=save, table=table):
+                self._checkpointed_save(processor_class(candidate_config), save)
+                return self._read_table(candidate_config, table)
+
+            self.compare(f"{table}_save", input_name, legacy, candidate)
+        return legacy_config, candidate_config
+
+    def check_summaries(self, input_name, legacy_config, db_config):
+        """
+        汇总：基线 _process_summary_data 分别与orders方式、positions方式严格比较（positions方式按
+        (position_id, order_id) 对齐，只允许 INTENDED_DIFFERENCES 中的列不同）；
+        orders方式的分区并行、positions方式的分区并行和流式读取与当前的串行汇总比较
+        """
+        def summarize(**settings):
+            def run():
+                processor = TradeSummaryProcessor(db_config, **settings)
+                if not processor.connect_db():
+                    raise RuntimeError("无法连接到数据库")
+                try:
+                    return processor.generate_summary_data()
+                finally:
+                    processor.close_db()
+            return run
+
+        def baseline():
+            processor = LegacyBaseline(legacy_config)
+            if not processor.connect_db():
+                raise RuntimeError("无法连接到数据库")
+            try:
+                summary = processor.generate_summary_data()
+            finally:
+                processor.close_db()
+            return revise_legacy_summary(summary) if summary is not None else None
+
+        self.compare('summary_legacy_vs_orders', input_name,
+                     baseline, summarize(summary_mode='orders', asof_features=False))
+        self.compare('summary_legacy_vs_positions', input_name,
+                     baseline, summarize(summary_mode='positions', asof_features=False),
+                     key=['position_id', 'order_id'], allowed=INTENDED_DIFFERENCES)
+
+        workers = max(self.workers, 2)
+        self.compare('summary_orders_partitioned', input_name,
+                     summarize(summary_mode='orders'), summarize(summary_mode='orders', workers=workers))
+        self.compare('summary_positions_partitioned', input_name,
+                     summarize(summary_mode='positions'), summarize(summary_mode='positions', workers=workers))
+        self.compare('summary_positions_streaming', input_name,
+                     summarize(summary_mode='positions'), summarize(summary_mode='positions', streaming=True,
+                                                              chunk_rows=STREAM_CHUNK_ROWS))
+
+    def check_zigzag(self, input_name, bars):
+        """ZigZag逐根循环参考实现（calculate_loop）与向量化实现（calculate）"""
+        high, low = bars['high'].to_numpy(), bars['low'].to_numpy()
+        for depth, deviation, backstep in ZIGZAG_PARAMETERS:
+            calculator = ZigzagCalculator(depth, deviation, backstep)
+
+            def run(method):
+                peaks, bottoms = method(high, low)
+                return pd.DataFrame({'peak': peaks, 'bottom': bottoms})
+
+            self.compare(f"zigzag_d{depth}_v{deviation}_b{backstep}", input_name,
+                         lambda: run(calculator.calculate_loop), lambda: run(calculator.calculate))
+
+    # ---------- 运行 ----------
+
+    def run_inputs(self, input_name, orders_df, deals_df, segments_df, report_file):
+        """对一组报告和线段输入运行全部转换、写入和汇总校验"""
+        self.check_rows(input_name, orders_df, deals_df, segments_df, report_file)
+        legacy_config, db_config = self.check_saves(input_name, orders_df, deals_df, segments_df, report_file)
+        self.check_summaries(input_name, legacy_config, db_config)
+
+    def run(self, report_path, segments_path, copies=DEFAULT_COPIES, seed=0, zigzag_bars=DEFAULT_ZIGZAG_BARS):
+        """
+        读取真实报告和线段日志，对真实数据和生成数据运行全部校验
+
+        Args:
+            report_path (str): ReportTester.xlsx路径
+            segments_path (str): segment_info.csv路径
+            copies (int): 生成数据的复制份数，0为不校验生成数据
+            seed (int): 随机种子
+            zigzag_bars (int): 生成的K线数量，0为不校验ZigZag
+
+        Returns:
+            DataFrame: 同report
+        """
+        cleanup = self.work_dir is None
+        if cleanup:
+            self.work_dir = tempfile.mkdtemp(prefix='differential_')
+        os.makedirs(self.work_dir, exist_ok=True)
+        try:
+            orders_df, deals_df = TradeDataProcessor({}).read_order_deal_data(report_path)
+            if orders_df is None or deals_df is None:
+                raise ValueError(f"读取报告失败: {report_path}")
+            segments_df = SegmentDataProcessor({}).read_segment_data(segments_path)
+            if segments_df is None:
+                raise ValueError(f"读取线段日志失败: {segments_path}")
+            report_file = os.path.basename(report_path)
+
+            self.run_inputs('real', orders_df, deals_df, segments_df, report_file)
+            if copies > 0:
+                generated = generate_inputs(orders_df, deals_df, segments_df, copies, seed)
+                self.run_inputs('generated', *generated, report_file)
+            if zigzag_bars > 0:
+                self.check_zigzag('generated', generate_bars(zigzag_bars, seed))
+        finally:
+            if cleanup:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+                self.work_dir = None
+        return self.report()
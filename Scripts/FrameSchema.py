@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据帧类型定义
+为订单、成交、线段和汇总数据统一定义紧凑的列类型：
+低基数字符串使用category，票号使用int64，时间使用datetime64，交易量使用数值类型
+"""
+
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger("FrameSchema")
+
+# 报告中的时间格式
+REPORT_TIME_FORMAT = '%Y.%m.%d %H:%M:%S'
+
+# 数据库列名 -> 类型（datetime / int / count / float / category / string）
+ORDER_SCHEMA = {
+    'open_time': 'datetime',
+    'order_id': 'int',
+    'symbol': 'category',
+    'type': 'category',
+    'volume': 'float',
+    'filled_volume': 'float',
+    'price': 'float',
+    'sl': 'float',
+    'tp': 'float',
+    'time': 'datetime',
+    'status': 'category',
+    'comment': 'string',
+}
+
+DEAL_SCHEMA = {
+    'deal_time': 'datetime',
+    'deal_id': 'int',
+    'symbol': 'category',
+    'type': 'category',
+    'direction': 'category',
+    'volume': 'float',
+    'price': 'float',
+    'order_id': 'int',
+    'commission': 'float',
+    'swap': 'float',
+    'profit': 'float',
+    'balance': 'float',
+    'comment': 'string',
+}
+
+SEGMENT_SCHEMA = {
+    'trade_time': 'datetime',
+    'order_ticket': 'int',
+    'position_id': 'int',
+    'reference_price': 'float',
+    'reference_time': 'datetime',
+    'reference_bar_index': 'int',
+    'timeframe': 'category',
+    'segment_side': 'category',
+    'segment_index': 'int',
+    'start_price': 'float',
+    'end_price': 'float',
+    'amplitude': 'float',
+    'direction': 'category',
+    'trade_action': 'category',
+    'trade_price': 'float',
+    'trade_volume': 'float',
+    'trade_comment': 'string',
+    'trade_status': 'category',
+}
+
+# segment_info.csv列名 -> 数据库列名
+SEGMENT_LOG_COLUMNS = {
+    'TradeTime': 'trade_time',
+    'OrderTicket': 'order_ticket',
+    'PositionId': 'position_id',
+    'ReferencePrice': 'reference_price',
+    'ReferenceTime': 'reference_time',
+    'ReferenceBarIndex': 'reference_bar_index',
+    'Timeframe': 'timeframe',
+    'SegmentSide': 'segment_side',
+    'SegmentIndex': 'segment_index',
+    'StartPrice': 'start_price',
+    'EndPrice': 'end_price',
+    'Amplitude': 'amplitude',
+    'Direction': 'direction',
+    'TradeAction': 'trade_action',
+    'TradePrice': 'trade_price',
+    'TradeVolume': 'trade_volume',
+    'TradeComment': 'trade_comment',
+    'TradeStatus': 'trade_status',
+}
+
+ORDER_LOG_SCHEMA = {
+    'entry_time': 'datetime',
+    'exit_time': 'datetime',
+    'event_type': 'category',
+    'symbol': 'category',
+    'order_type': 'category',
+    'volume': 'float',
+    'entry_price': 'float',
+    'stop_loss': 'float',
+    'take_profit': 'float',
+    'exit_price': 'float',
+    'profit': 'float',
+    'order_ticket': 'int',
+    'position_id': 'int',
+    'magic_number': 'int',
+    'comment': 'string',
+    'result': 'string',
+    'error_code': 'int',
+    'deal_entry': 'category',
+}
+
+# order_log.csv列名（CSimpleCSVLogger） -> 数据库列名
+ORDER_LOG_COLUMNS = {
+    'EntryTime': 'entry_time',
+    'ExitTime': 'exit_time',
+    'EventType': 'event_type',
+    'Symbol': 'symbol',
+    'OrderType': 'order_type',
+    'Volume': 'volume',
+    'EntryPrice': 'entry_price',
+    'StopLoss': 'stop_loss',
+    'TakeProfit': 'take_profit',
+    'ExitPrice': 'exit_price',
+    'Profit': 'profit',
+    'OrderTicket': 'order_ticket',
+    'PositionId': 'position_id',
+    'MagicNumber': 'magic_number',
+    'Comment': 'comment',
+    'Result': 'result',
+    'ErrorCode': 'error_code',
+    'DealEntry': 'deal_entry',
+}
+
+SUMMARY_SCHEMA = {
+    'order_id': 'int',
+    'position_id': 'int',
+    'symbol': 'category',
+    'order_type': 'category',
+    'volume': 'float',
+    'open_price': 'float',
+    'close_price': 'float',
+    'sl': 'float',
+    'tp': 'float',
+    'open_time': 'datetime',
+    'close_time': 'datetime',
+    'status': 'category',
+    'commission': 'float',
+    'swap': 'float',
+    'profit': 'float',
+    'comment': 'string',
+    'exit_count': 'count',
+    'right_segments_5min': 'count',
+    'right_segments_15min': 'count',
+    'right_segments_30min': 'count',
+    'first_segment_length': 'float',
+    'entry_right_segments_5min': 'count',
+    'entry_right_segments_15min': 'count',
+    'entry_right_segments_30min': 'count',
+    'exit_right_segments_5min': 'count',
+    'exit_right_segments_15min': 'count',
+    'exit_right_segments_30min': 'count',
+    'entry_first_segment_length': 'float',
+    'exit_first_segment_length': 'float',
+    'asof_right_segments_5min': 'count',
+    'asof_right_segments_15min': 'count',
+    'asof_right_segments_30min': 'count',
+    'asof_first_segment_length_5min': 'float',
+    'asof_first_segment_length_15min': 'float',
+    'asof_first_segment_length_30min': 'float',
+    'asof_snapshot_time_5min': 'datetime',
+    'asof_snapshot_time_15min': 'datetime',
+    'asof_snapshot_time_30min': 'datetime',
+    'asof_exit_right_segments_5min': 'count',
+    'asof_exit_right_segments_15min': 'count',
+    'asof_exit_right_segments_30min': 'count',
+    'asof_exit_first_segment_length_5min': 'float',
+    'asof_exit_first_segment_length_15min': 'float',
+    'asof_exit_first_segment_length_30min': 'float',
+    'asof_exit_snapshot_time_5min': 'datetime',
+    'asof_exit_snapshot_time_15min': 'datetime',
+    'asof_exit_snapshot_time_30min': 'datetime',
+    'sr_level': 'float',
+    'sr_reference_time': 'datetime',
+    'sr_type': 'category',
+    'sr_penetration_time': 'datetime',
+    'sr_penetration_price': 'float',
+    'sr_minutes_to_penetration': 'float',
+}
+
+
+def classify_order_column(col_name):
+    """
+    按save_orders_to_db相同的关键字规则，将报告订单表的中文列名映射为数据库列名
+
+    Args:
+        col_name (str): 报告中的列名
+
+    Returns:
+        str: 数据库列名，无法识别时返回None
+    """
+    if '开价时间' in col_name:
+        return 'open_time'
+    if '订单' in col_name:
+        return 'order_id'
+    if '交易品种' in col_name:
+        return 'symbol'
+    if '类型' in col_name:
+        return 'type'
+    if '交易量' in col_name:
+        return 'volume'
+    if '价位' in col_name:
+        return 'price'
+    if '止损' in col_name:
+        return 'sl'
+    if '止盈' in col_name:
+        return 'tp'
+    if '时间' in col_name:
+        return 'time'
+    if '状态' in col_name:
+        return 'status'
+    if '注释' in col_name:
+        return 'comment'
+    return None
+
+
+def classify_deal_column(col_name):
+    """
+    按save_deals_to_db相同的关键字规则，将报告成交表的中文列名映射为数据库列名
+
+    Args:
+        col_name (str): 报告中的列名
+
+    Returns:
+        str: 数据库列名，无法识别时返回None
+    """
+    if '时间' in col_name and '成交' not in col_name:
+        return 'deal_time'
+    if '成交' in col_name and '时间' not in col_name:
+        return 'deal_id'
+    if '交易品种' in col_name:
+        return 'symbol'
+    if '类型' in col_name:
+        return 'type'
+    if '趋势' in col_name or '方向' in col_name:
+        return 'direction'
+    if '交易量' in col_name:
+        return 'volume'
+    if '价位' in col_name:
+        return 'price'
+    if '订单' in col_name:
+        return 'order_id'
+    if '手续费' in col_name:
+        return 'commission'
+    if '库存费' in col_name or '掉期' in col_name:
+        return 'swap'
+    if '盈利' in col_name:
+        return 'profit'
+    if '结余' in col_name:
+        return 'balance'
+    if '注释' in col_name:
+        return 'comment'
+    return None
+
+
+def to_datetime_column(series):
+    """将报告时间文本（2025.04.01 05:31:00）或其他时间表示转换为datetime64"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    converted = pd.to_datetime(series, format=REPORT_TIME_FORMAT, errors='coerce')
+    unparsed = converted.isna() & series.notna()
+    if unparsed.any():
+        # 数据库读取的时间可能是ISO格式文本或datetime对象
+        converted[unparsed] = pd.to_datetime(series[unparsed], errors='coerce')
+    return converted
+
+
+def split_order_volume(series):
+    """
+    拆分报告订单表中的交易量（"请求量 / 成交量"，如 "0.1 / 0.1"）
+
+    Args:
+        series (Series): 交易量列
+
+    Returns:
+        tuple: (请求量Series, 成交量Series)，均为float64
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        volume = series.astype('float64')
+        return volume, volume.copy()
+    parts = series.astype('string').str.split('/', n=1, expand=True)
+    requested = pd.to_numeric(parts[0].str.strip(), errors='coerce').astype('float64')
+    if parts.shape[1] > 1:
+        filled = pd.to_numeric(parts[1].str.strip(), errors='coerce').astype('float64')
+        filled = filled.fillna(requested)
+    else:
+        filled = requested.copy()
+    return requested, filled
+
+
+def parse_order_volume(value):
+    """
+    拆分单个订单交易量文本（"请求量 / 成交量"，如 "0.1 / 0.1"）
+
+    Returns:
+        tuple: (请求量, 成交量)，无法解析的部分为None，没有成交量时与请求量相同
+    """
+    parts = [part.strip() for part in str(value).split('/', 1)]
+    numbers = []
+    for part in parts:
+        try:
+            numbers.append(float(part))
+        except ValueError:
+            numbers.append(None)
+    requested = numbers[0]
+    filled = numbers[1] if len(numbers) > 1 and numbers[1] is not None else requested
+    return requested, filled
+
+
+def cast_column(series, kind):
+    """
+    按类型定义转换单列
+
+    Args:
+        series (Series): 原始列
+        kind (str): datetime / int / count / float / category / string
+
+    Returns:
+        Series: 转换后的列
+    """
+    if kind == 'datetime':
+        return to_datetime_column(series)
+    if kind in ('int', 'count'):
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.isna().any():
+            return numeric.astype('Int64' if kind == 'int' else 'Int32')
+        return numeric.astype('int64' if kind == 'int' else 'int32')
+    if kind == 'float':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if kind == 'category':
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        return series.astype('category')
+    if kind == 'string':
+        # 自由文本保持普通字符串列，缺失值仍为NaN
+        return series.astype(object)
+    return series
+
+
+def apply_schema(df, schema):
+    """
+    按类型定义转换DataFrame中存在的列（不存在的列忽略）
+
+    Args:
+        df (DataFrame): 数据
+        schema (dict): 列名 -> 类型
+
+    Returns:
+        DataFrame: 转换后的数据
+    """
+    if df is None:
+        return None
+    df = df.copy()
+    for col, kind in schema.items():
+        if col in df.columns:
+            df[col] = cast_column(df[col], kind)
+    return df
+
+
+def optimize_orders_frame(orders_df):
+    """
+    转换数据库读取的订单数据
+
+    旧结构的交易量文本拆分为数值的请求量(volume)和成交量(filled_volume)，
+    新结构中两者已是数值列
+    """
+    if orders_df is None:
+        return None
+    orders_df = orders_df.copy()
+    if 'volume' in orders_df.columns and 'filled_volume' not in orders_df.columns:
+        orders_df['volume'], orders_df['filled_volume'] = split_order_volume(orders_df['volume'])
+    return apply_schema(orders_df, ORDER_SCHEMA)
+
+
+def optimize_deals_frame(deals_df):
+    """转换数据库读取的成交数据"""
+    return apply_schema(deals_df, DEAL_SCHEMA)
+
+
+def optimize_segments_frame(segments_df):
+    """转换数据库读取的线段数据"""
+    return apply_schema(segments_df, SEGMENT_SCHEMA)
+
+
+def optimize_summary_frame(summary_df):
+    """转换汇总数据"""
+    return apply_schema(summary_df, SUMMARY_SCHEMA)
+
+
+def optimize_order_logs_frame(order_logs_df):
+    """转换order_logs数据（数据库读取或已按ORDER_LOG_COLUMNS改名的CSV数据）"""
+    return apply_schema(order_logs_df, ORDER_LOG_SCHEMA)
+
+
+def optimize_segment_log_frame(segments_df):
+    """
+    转换从segment_info.csv读取的线段数据（保留CSV原始列名）
+    """
+    if segments_df is None:
+        return None
+    schema = {csv_col: SEGMENT_SCHEMA[db_col] for csv_col, db_col in SEGMENT_LOG_COLUMNS.items()}
+    return apply_schema(segments_df, schema)
+
+
+def optimize_report_frame(report_df, kind):
+    """
+    转换从ReportTester.xlsx解析出的订单/成交数据（保留报告中的中文列名）
+
+    订单表的交易量是"请求量 / 成交量"文本，保持为category以便原样写入数据库；
+    成交表的交易量转换为数值
+
+    Args:
+        report_df (DataFrame): 报告数据
+        kind (str): orders / deals
+
+    Returns:
+        DataFrame: 转换后的数据
+    """
+    if report_df is None:
+        return None
+    classify = classify_order_column if kind == 'orders' else classify_deal_column
+    schema = ORDER_SCHEMA if kind == 'orders' else DEAL_SCHEMA
+
+    report_df = report_df.copy()
+    for position, col in enumerate(report_df.columns):
+        if pd.isna(col):
+            continue
+        field = classify(str(col))
+        if field is None:
+            continue
+        kind_name = schema[field]
+        if kind == 'orders' and field == 'volume':
+            kind_name = 'category'
+        report_df.isetitem(position, cast_column(report_df.iloc[:, position], kind_name))
+    return report_df
+
+
+def memory_usage_mb(df):
+    """DataFrame占用内存（MB，含字符串实际大小）"""
+    if df is None:
+        return 0.0
+    return float(df.memory_usage(deep=True).sum()) / (1024 * 1024)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+可续传的分块导入
+大批量写入按块提交，每块的插入行和导入检查点（来源、已提交的源数据行数、块序号）在同一个事务中提交，
+连接中断时只回滚当前块，不会产生占满undo日志的大事务；连接断开、锁等待超时、死锁等暂时性错误
+按指数退避重新连接后重试当前块。中断后重新导入同一来源时从最后提交的块之后继续，不再从头写入；
+已完整导入的来源只在末尾增加了数据时（如仍在写入的线段日志），只导入上次之后的新行
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+import pandas as pd
+from mysql.connector import errorcode
+
+from StorageBackend import DB_ERRORS
+from SchemaRevision import SchemaMigrator
+
+logger = logging.getLogger("ImportCheckpoint")
+
+# 默认每个事务提交的源数据行数
+DEFAULT_COMMIT_ROWS = 5000
+
+# 暂时性错误的默认最大重试次数
+DEFAULT_MAX_RETRIES = 5
+
+# 第一次重试前的等待秒数，之后每次加倍
+DEFAULT_RETRY_DELAY = 1.0
+
+# 重试等待的上限（秒）
+MAX_RETRY_DELAY = 30.0
+
+# 可重试的MySQL错误码：连接断开/无法连接、连接数已满、锁等待超时、死锁
+TRANSIENT_MYSQL_ERRORS = {
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.ER_CON_COUNT_ERROR,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.ER_LOCK_DEADLOCK,
+}
+
+CHECKPOINT_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    source_key CHAR(64) PRIMARY KEY COMMENT '目标表和来源的SHA-256',
+    target_table VARCHAR(64) COMMENT '目标表',
+    source VARCHAR(500) COMMENT '来源（文件路径或报告文件名）',
+    signature VARCHAR(128) COMMENT '来源签名（文件大小和修改时间，或数据内容哈希）',
+    row_offset BIGINT COMMENT '已提交的源数据行数',
+    chunk_id INT COMMENT '已提交的块序号',
+    rows_written BIGINT COMMENT '已写入目标表的行数',
+    status VARCHAR(20) COMMENT '导入状态（running / done）',
+    updated_at DATETIME COMMENT '更新时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+def is_transient_error(error):
+    """判断数据库错误是否为暂时性错误（重新连接后重试可能成功）"""
+    if getattr(error, 'errno', None) in TRANSIENT_MYSQL_ERRORS:
+        return True
+    # SQLite数据库文件被其他连接锁定
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+
+def source_key(table, source):
+    """检查点主键"""
+    return hashlib.sha256(f"{table}\n{source}".encode('utf-8')).hexdigest()
+
+
+def file_signature(path):
+    """文件签名：大小和修改时间（文件变化后已有的检查点失效）"""
+    stat = os.stat(path)
+    return f"file:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def frame_signature(df):
+    """内存数据的签名：行数和逐行内容哈希之和"""
+    digest = int(pd.util.hash_pandas_object(df, index=False).sum()) if len(df) else 0
+    return f"frame:{len(df)}:{digest:016x}"
+
+
+def frame_chunks_from(df, offset, chunk_rows):
+    """从第offset行开始按行切分DataFrame"""
+    for start in range(offset, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+class CheckpointedImport:
+    """
+    分块提交、可续传的导入
+
+    处理器需提供backend、conn、cursor属性（TradeDataProcessor、SegmentDataProcessor、TradeSummaryProcessor），
+    重试时重新连接并替换处理器的连接和游标
+    """
+
+    def __init__(self, processor, commit_rows=DEFAULT_COMMIT_ROWS, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        """
+        初始化
+
+        Args:
+            processor: 持有数据库连接的处理器
+            commit_rows (int): 每个事务提交的源数据行数
+            max_retries (int): 每个事务遇到暂时性错误时的最大重试次数
+            retry_delay (float): 第一次重试前的等待秒数，之后每次加倍（上限MAX_RETRY_DELAY）
+        """
+        self.processor = processor
+        self.commit_rows = max(1, int(commit_rows))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay = retry_delay
+        self._checkpoint_exists = False
+
+    def _connect(self):
+        self.processor.conn = self.processor.backend.connect()
+        self.processor.cursor = self.processor.conn.cursor()
+
+    def _disconnect(self):
+        """放弃当前连接（连接可能已经断开，回滚和关闭的错误都忽略）"""
+        conn = self.processor.conn
+        self.processor.conn = self.processor.cursor = None
+        if conn is None:
+            return
+        for action in (conn.rollback, conn.close):
+            try:
+                action()
+            except Exception:
+                pass
+
+    def _transaction(self, work, committed=None):
+        """
+        在一个事务中执行work(cursor)并提交，暂时性错误时按指数退避重新连接后重试
+
+        Args:
+            work (callable): 接收游标并执行语句
+            committed (callable): 重试前检查该事务是否已在连接断开前提交（提交应答丢失），已提交时不再重试
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.processor.conn is None:
+                    self._connect()
+                if attempt and committed is not None and committed():
+                    logger.info("该事务已在连接断开前提交，不再重试")
+                    return
+                cursor = self.processor.conn.cursor()
+                try:
+                    work(cursor)
+                finally:
+                    cursor.close()
+                self.processor.conn.commit()
+                return
+            except DB_ERRORS as e:
+                if not is_transient_error(e) or attempt >= self.max_retries:
+                    self._rollback()
+                    raise
+                attempt += 1
+                delay = min(self.retry_delay * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+                logger.warning(f"数据库暂时性错误: {e}，{delay:.1f} 秒后重新连接并第 {attempt} 次重试")
+                self._disconnect()
+                time.sleep(delay)
+
+    def _rollback(self):
+        if self.processor.conn is not None:
+            try:
+                self.processor.conn.rollback()
+            except Exception:
+                pass
+
+    def load_checkpoint(self, table, source):
+        """
+        读取检查点
+
+        Returns:
+            dict: 检查点各列，不存在时返回None
+        """
+        df = self.processor.backend.read_sql(
+            f"SELECT signature, row_offset, chunk_id, rows_written, status FROM import_checkpoints "
+            f"WHERE source_key = '{source_key(table, source)}'", self.processor.conn)
+        if df.empty:
+            return None
+        row = df.iloc[0]
+        return {'signature': row['signature'], 'row_offset': int(row['row_offset']), 'chunk_id': int(row['chunk_id']),
+                'rows_written': int(row['rows_written']), 'status': row['status']}
+
+    def _save_checkpoint(self, cursor, table, source, signature, row_offset, chunk_id, rows_written, status):
+        """在当前事务中写入检查点（与数据块一起提交）"""
+        updated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        key = source_key(table, source)
+        if self._checkpoint_exists:
+            cursor.execute("""
+            UPDATE import_checkpoints SET signature = %s, row_offset = %s, chunk_id = %s, rows_written = %s,
+            status = %s, updated_at = %s WHERE source_key = %s
+            """, (signature, row_offset, chunk_id, rows_written, status, updated_at, key))
+        else:
+            cursor.execute("""
+            INSERT INTO import_checkpoints
+            (source_key, target_table, source, signature, row_offset, chunk_id, rows_written, status, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (key, table, str(source)[:500], signature, row_offset, chunk_id, rows_written, status, updated_at))
+
+    def _is_committed(self, table, source, signature, chunk_id, status):
+        checkpoint = self.load_checkpoint(table, source)
+        return checkpoint is not None and checkpoint['signature'] == signature \
+            and checkpoint['status'] == status and checkpoint['chunk_id'] >= chunk_id
+
+    def run(self, table, query, source, signature, chunks_from, build_rows, replace=False, prepare=None,
+            replace_where=None, prefix_signature=None):
+        """
+        分块导入一个来源
+
+        Args:
+            table (str): 目标表
+            query (str): 插入语句
+            source (str): 来源名称（文件路径或报告文件名），与目标表一起确定检查点
+            signature (str): 来源签名，与未完成的检查点不一致时从头导入
+            chunks_from (callable): chunks_from(offset) 从源数据第offset行开始逐块返回DataFrame
+            build_rows (callable): 数据块 -> 插入行
+            replace (bool): 从头导入时先清除目标表（与第一个检查点在同一事务中提交，续传时不清除）
+            prepare (callable): 写入每块之前以插入行调用并返回实际写入的行，在数据块的事务之外单独执行
+                （用于添加分区等会隐式提交的DDL），暂时性错误时同样按指数退避重新连接后重试
+            replace_where (tuple): (列名, 值)，replace时只清除该列等于该值的记录（如同一报告文件），None为清除整表
+            prefix_signature (callable): prefix_signature(n) 返回来源前n行的签名；签名变化但前row_offset行
+                与上次完整导入的来源相同时，视为只在末尾追加了数据，从上次的位置继续导入新行
+
+        Returns:
+            int: 该来源累计写入的行数（含之前运行已提交的部分）；未清除目标表且同一来源（签名相同）
+                已完整导入过时不再写入，直接返回上次写入的行数
+        """
+        self._transaction(lambda cursor: cursor.execute(CHECKPOINT_TABLE_QUERY))
+        checkpoint = self.load_checkpoint(table, source)
+        self._checkpoint_exists = checkpoint is not None
+
+        if checkpoint is not None and checkpoint['status'] == 'done' and checkpoint['signature'] == signature \
+                and not replace:
+            # 同一来源已完整导入过，追加方式再次导入会重复写入全部记录
+            logger.info(f"{table}: {source} 已完整导入（{checkpoint['rows_written']} 行记录），跳过")
+            return checkpoint['rows_written']
+
+        if checkpoint is not None and checkpoint['status'] == 'running' and checkpoint['signature'] == signature:
+            offset, chunk_id, written = checkpoint['row_offset'], checkpoint['chunk_id'], checkpoint['rows_written']
+            logger.info(f"{table}: 从第 {offset} 行（第 {chunk_id} 块之后）继续导入 {source}")
+        elif checkpoint is not None and checkpoint['status'] == 'done' and not replace \
+                and prefix_signature is not None and checkpoint['row_offset'] > 0 \
+                and prefix_signature(checkpoint['row_offset']) == checkpoint['signature']:
+            # 来源只在末尾追加了数据：已导入的行保留，只导入新增的行，避免重复写入
+            offset, chunk_id, written = checkpoint['row_offset'], checkpoint['chunk_id'], checkpoint['rows_written']
+            logger.info(f"{table}: {source} 在已导入的 {offset} 行之后追加了数据，只导入新增的行")
+        else:
+            if checkpoint is not None and checkpoint['status'] == 'running':
+                logger.warning(f"{table}: {source} 已变化，未完成的导入从头开始")
+            offset, chunk_id, written = 0, 0, 0
+
+            def start(cursor):
+                if replace and replace_where is not None:
+                    cursor.execute(f"DELETE FROM {table} WHERE {replace_where[0]} = %s", (replace_where[1],))
+                elif replace:
+                    cursor.execute(f"DELETE FROM {table}")
+                self._save_checkpoint(cursor, table, source, signature, 0, 0, 0, 'running')
+
+            self._transaction(start, lambda: self._is_committed(table, source, signature, 0, 'running'))
+            self._checkpoint_exists = True
+
+        for chunk in chunks_from(offset):
+            rows = build_rows(chunk)
+            if prepare is not None and rows:
+                rows = self._prepare(prepare, rows)
+            if rows:
+                self._prepare(lambda batch: self._fit_text_columns(table, query, batch), rows)
+            offset += len(chunk)
+            chunk_id += 1
+            written += len(rows)
+
+            def write(cursor):
+                if rows:
+                    cursor.executemany(query, rows)
+                self._save_checkpoint(cursor, table, source, signature, offset, chunk_id, written, 'running')
+
+            self._transaction(write, lambda: self._is_committed(table, source, signature, chunk_id, 'running'))
+            logger.info(f"{table}: 已提交第 {chunk_id} 块，累计 {offset} 行源数据、{written} 行记录")
+
+        self._transaction(
+            lambda cursor: self._save_checkpoint(cursor, table, source, signature, offset, chunk_id, written, 'done'),
+            lambda: self._is_committed(table, source, signature, chunk_id, 'done'))
+        return written
+
+    def _fit_text_columns(self, table, query, rows):
+        """写入前加宽容纳不下的文本列（不截断，见SchemaMigrator.fit_text_columns）"""
+        SchemaMigrator(self.processor.backend, self.processor.conn).fit_text_columns(table, query, rows)
+        return rows
+
+    def _prepare(self, prepare, rows):
+        """执行写入前的准备（DDL），暂时性错误时重新连接后重试"""
+        prepared = []
+        self._transaction(lambda cursor: prepared.append(prepare(rows)))
+        return prepared[-1]
+
+    def run_frame(self, table, query, df, build_rows, source, replace=False, prepare=None, replace_where=None):
+        """
+        分块导入内存中的DataFrame（签名为内容哈希，同一份数据重新导入时从检查点继续；
+        前面的行与上次完整导入的数据相同时只导入新增的行）
+        """
+        return self.run(table, query, source, frame_signature(df),
+                        lambda offset: frame_chunks_from(df, offset, self.commit_rows), build_rows, replace, prepare,
+                        replace_where, prefix_signature=lambda rows: frame_signature(df.iloc[:rows]))
+
+    def list_checkpoints(self):
+        """全部检查点（检查点表不存在时返回空表）"""
+        try:
+            return self.processor.backend.read_sql(
+                "SELECT target_table, source, row_offset, chunk_id, rows_written, status, updated_at "
+                "FROM import_checkpoints ORDER BY updated_at", self.processor.conn)
+        except Exception:
+            self._rollback()
+            return pd.DataFrame()
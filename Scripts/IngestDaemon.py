@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+监视目录自动入库
+定时扫描MT5测试代理输出目录中的 *.xlsx 报告和 segment_info*.csv 线段日志，
+文件大小和修改时间稳定一段时间后（写入完成）按内容哈希登记，交给有界进程池解析，
+解析结果依次写入数据库，队列处理完毕后重新生成汇总表；同一内容的文件成功入库后不再处理，
+写入数据库失败的文件稍后自动重试，失败或处理中断（程序退出时仍为processing）的文件在下次启动时重新处理
+"""
+
+import fnmatch
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from StorageBackend import create_backend
+
+logger = logging.getLogger("IngestDaemon")
+
+# 文件模式 -> 文件类别
+FILE_PATTERNS = (('*.xlsx', 'report'), ('segment_info*.csv', 'segments'))
+
+# 文件大小和修改时间保持不变多少秒后视为写入完成
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# 扫描间隔（秒）
+DEFAULT_POLL_SECONDS = 2.0
+
+# 写入数据库失败后多少秒重新尝试
+DEFAULT_RETRY_SECONDS = 60.0
+
+# 判断源数据是否变化的指纹查询（变化时才重新生成汇总表）
+SOURCE_FINGERPRINT_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM report_orders) AS orders_count,
+    (SELECT MAX(id) FROM report_orders) AS orders_max_id,
+    (SELECT COUNT(*) FROM report_deals) AS deals_count,
+    (SELECT MAX(id) FROM report_deals) AS deals_max_id,
+    (SELECT COUNT(*) FROM segment_info) AS segments_count,
+    (SELECT MAX(id) FROM segment_info) AS segments_max_id
+"""
+
+
+def file_kind(file_name):
+    """按文件名判断类别，不匹配时返回None（忽略Excel临时文件 ~$*.xlsx）"""
+    if file_name.startswith('~$'):
+        return None
+    for pattern, kind in FILE_PATTERNS:
+        if fnmatch.fnmatch(file_name.lower(), pattern):
+            return kind
+    return None
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_file(path, kind, db_config):
+    """
+    解析一个文件（在进程池中执行）
+
+    Returns:
+        dict: report -> {'orders': DataFrame, 'deals': DataFrame}；segments -> {'segments': DataFrame}
+    """
+    if kind == 'report':
+        from TradeDataProcessor import TradeDataProcessor
+        orders_df, deals_df = TradeDataProcessor(db_config).read_order_deal_data(path)
+        if orders_df is None and deals_df is None:
+            raise ValueError(f"解析报告失败: {path}")
+        return {'orders': orders_df, 'deals': deals_df}
+    from SegmentDataProcessor import SegmentDataProcessor
+    segments_df = SegmentDataProcessor(db_config).read_segment_data(path)
+    if segments_df is None:
+        raise ValueError(f"解析线段日志失败: {path}")
+    return {'segments': segments_df}
+
+
+class IngestLedger:
+    """已处理文件登记表（ingest_files），按内容哈希记录处理状态（processing / done / failed）"""
+
+    def __init__(self, backend, conn):
+        self.backend = backend
+        self.conn = conn
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_files (
+            file_hash CHAR(64) PRIMARY KEY COMMENT '文件内容SHA-256',
+            file_path VARCHAR(500) COMMENT '文件路径',
+            file_kind VARCHAR(20) COMMENT '文件类别',
+            file_size BIGINT COMMENT '文件大小',
+            status VARCHAR(20) COMMENT '处理状态',
+            message VARCHAR(500) COMMENT '处理结果',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '登记时间',
+            finished_at DATETIME COMMENT '完成时间'
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        conn.commit()
+        cursor.close()
+
+    def seen(self):
+        """已成功入库的文件哈希（失败和处理中断的文件可重新登记）"""
+        df = self.backend.read_sql("SELECT file_hash FROM ingest_files WHERE status = 'done'", self.conn)
+        return set(df['file_hash'].astype(str))
+
+    def claim(self, digest, path, kind, size):
+        """登记开始处理；失败或处理中断的记录重新置为processing"""
+        existing = self.backend.read_sql(
+            f"SELECT status FROM ingest_files WHERE file_hash = '{digest}'", self.conn)
+        cursor = self.conn.cursor()
+        if existing.empty:
+            cursor.execute("""
+            INSERT INTO ingest_files (file_hash, file_path, file_kind, file_size, status)
+            VALUES (%s, %s, %s, %s, %s)
+            """, (digest, path, kind, int(size), 'processing'))
+        else:
+            logger.info(f"重新处理（上次状态 {existing['status'].iloc[0]}）: {path}")
+            cursor.execute("""
+            UPDATE ingest_files SET file_path = %s, file_kind = %s, file_size = %s, status = %s, message = %s,
+            finished_at = NULL WHERE file_hash = %s
+            """, (path, kind, int(size), 'processing', '', digest))
+        self.conn.commit()
+        cursor.close()
+
+    def finish(self, digest, status, message=''):
+        """登记处理结果"""
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE ingest_files SET status = %s, message = %s, finished_at = %s WHERE file_hash = %s",
+                       (status, str(message)[:500], time.strftime('%Y-%m-%d %H:%M:%S'), digest))
+        self.conn.commit()
+        cursor.close()
+
+
+class IngestDaemon:
+    """监视目录自动入库"""
+
+    def __init__(self, watch_dir, db_config, workers=2, max_pending=None, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_seconds=DEFAULT_POLL_SECONDS, replace=False, summarize=True,
+                 retry_seconds=DEFAULT_RETRY_SECONDS):
+        """
+        初始化
+
+        Args:
+            watch_dir (str): 监视目录
+            db_config (dict): 数据库配置
+            workers (int): 解析进程数
+            max_pending (int): 同时提交到进程池的最大文件数（有界队列），默认为 2 * workers
+            settle_seconds (float): 文件大小和修改时间稳定多久后开始处理
+            poll_seconds (float): 扫描间隔
+            replace (bool): 报告入库前先清除同一报告文件（report_file）的订单和成交，其他报告的数据保留；
+                默认False为追加。线段表没有来源文件列，线段日志始终追加；同名线段日志只在末尾增加了记录时
+                （EA仍在写入），只导入上次入库之后的新行，内容被改写时按新的一次运行整体追加
+            summarize (bool): 入库后是否重新生成汇总表
+            retry_seconds (float): 写入数据库失败后多少秒重新处理该文件（解析失败的文件不自动重试）
+        """
+        self.watch_dir = watch_dir
+        self.db_config = db_config
+        self.workers = max(1, int(workers))
+        self.max_pending = max_pending or 2 * self.workers
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.replace = replace
+        self.summarize = summarize
+        self.retry_seconds = retry_seconds
+
+        self.backend = create_backend(db_config)
+        self.conn = None
+        self.ledger = None
+        self._observed = {}
+        self._retry_after = {}
+        self._seen = set()
+        self._summary_pending = False
+        self._source_fingerprint = None
+
+    def scan(self, now=None):
+        """
+        扫描目录，返回写入已完成的文件
+
+        Returns:
+            list: (路径, 类别, 大小)
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        observed = {}
+        with os.scandir(self.watch_dir) as entries:
+            for entry in entries:
+                kind = file_kind(entry.name) if entry.is_file() else None
+                if kind is None:
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self._observed.get(entry.path)
+                if previous and previous[0] == signature:
+                    since, handled = previous[1], previous[2]
+                else:
+                    # 新文件，或大小/修改时间变化：重新开始计时
+                    since, handled = now, False
+                observed[entry.path] = (signature, since, handled)
+                retry_after = self._retry_after.get(entry.path, now)
+                if not handled and now - since >= self.settle_seconds and now >= retry_after:
+                    ready.append((entry.path, kind, stat.st_size))
+        self._observed = observed
+        return ready
+
+    def _mark_handled(self, path):
+        """标记文件当前版本已处理（内容变化后会重新检测）"""
+        signature, since, _ = self._observed[path]
+        self._observed[path] = (signature, since, True)
+
+    def _schedule_retry(self, path):
+        """写入失败的文件在retry_seconds秒后重新处理（内容未变化时同样重新处理）"""
+        self._retry_after[path] = time.monotonic() + self.retry_seconds
+        if path in self._observed:
+            signature, since, _ = self._observed[path]
+            self._observed[path] = (signature, since, False)
+
+    def load(self, kind, frames, path):
+        """将解析结果写入数据库（在主进程中串行执行），写入失败时抛出异常"""
+        report_file = os.path.basename(path)
+        if kind == 'report':
+            from TradeDataProcessor import TradeDataProcessor
+            processor = TradeDataProcessor(self.db_config)
+            if not processor.connect_db():
+                raise ConnectionError("无法连接到数据库")
+            try:
+                if not processor.create_tables():
+                    raise RuntimeError("创建数据表失败")
+                orders_count = processor.save_orders_to_db(frames['orders'], report_file, replace=self.replace,
+                                                           same_report=True, raise_errors=True)
+                deals_count = processor.save_deals_to_db(frames['deals'], report_file, replace=self.replace,
+                                                         same_report=True, raise_errors=True)
+            finally:
+                processor.close_db()
+            return f"{orders_count} 条订单，{deals_count} 条成交"
+
+        from SegmentDataProcessor import SegmentDataProcessor
+        processor = SegmentDataProcessor(self.db_config)
+        if not processor.connect_db():
+            raise ConnectionError("无法连接到数据库")
+        try:
+            if not processor.create_tables():
+                raise RuntimeError("创建线段表失败")
+            segments_count = processor.save_segments_to_db(frames['segments'], report_file, raise_errors=True)
+        finally:
+            processor.close_db()
+        return f"{segments_count} 条线段"
+
+    def source_fingerprint(self):
+        """订单、成交、线段三张表的行数和最大id；表不存在或数据库不可用时返回None"""
+        try:
+            self._ledger()
+            row = self.backend.read_sql(SOURCE_FINGERPRINT_QUERY, self.conn).iloc[0]
+        except Exception:
+            self._drop_connection()
+            return None
+        return tuple(None if v is None or v != v else int(v) for v in row.tolist())
+
+    def refresh_summary(self):
+        """
+        源数据变化时重新生成汇总表
+
+        汇总表中没有来源报告列，仓位重建和快照匹配也需要同一交易品种的全部成交和线段，
+        因此每次都整表重新生成，不只更新新入库报告涉及的仓位
+        """
+        self._summary_pending = False
+        fingerprint = self.source_fingerprint()
+        if fingerprint is None:
+            logger.info("订单、成交或线段表尚未全部创建（或数据库不可用），暂不生成汇总")
+            return False
+        if fingerprint == self._source_fingerprint:
+            logger.info("源数据未变化，跳过汇总")
+            return False
+
+        from TradeSummaryProcessor import TradeSummaryProcessor
+        processor = TradeSummaryProcessor(self.db_config)
+        if not processor.connect_db():
+            logger.error("无法连接到数据库，汇总未生成")
+            return False
+        try:
+            if not processor.create_summary_table():
+                return False
+            summary_df = processor.generate_summary_data()
+            if summary_df is None:
+                logger.error("生成汇总数据失败")
+                return False
+            count = processor.save_summary_to_db(summary_df)
+        finally:
+            processor.close_db()
+        self._source_fingerprint = fingerprint
+        logger.info(f"汇总表已更新: {count} 条记录")
+        return True
+
+    def run(self, max_cycles=None):
+        """
+        运行监视循环
+
+        Args:
+            max_cycles (int): 最多扫描次数（None为一直运行，Ctrl+C停止）
+        """
+        self._seen = self._ledger().seen()
+        logger.info(f"开始监视目录: {self.watch_dir}（已登记 {len(self._seen)} 个文件）")
+
+        pending = {}
+        cycles = 0
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                while max_cycles is None or cycles < max_cycles:
+                    cycles += 1
+                    for path, kind, size in self.scan():
+                        if len(pending) >= self.max_pending:
+                            # 队列已满，留到下一轮扫描再提交
+                            break
+                        self._mark_handled(path)
+                        try:
+                            digest = file_hash(path)
+                        except OSError as e:
+                            logger.warning(f"读取文件失败，稍后重试: {path}: {e}")
+                            continue
+                        if digest in self._seen:
+                            logger.info(f"内容已处理过，跳过: {path}")
+                            continue
+                        try:
+                            self._ledger().claim(digest, path, kind, size)
+                        except Exception as e:
+                            logger.error(f"登记失败，{self.retry_seconds:g} 秒后重试: {path}: {e}")
+                            self._drop_connection()
+                            self._schedule_retry(path)
+                            continue
+                        self._seen.add(digest)
+                        logger.info(f"提交解析: {path}（{kind}）")
+                        pending[executor.submit(parse_file, path, kind, self.db_config)] = (digest, path, kind)
+
+                    if pending:
+                        done, _ = wait(list(pending), timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            digest, path, kind = pending.pop(future)
+                            self._complete(future, digest, path, kind)
+                    else:
+                        if self._summary_pending and self.summarize:
+                            self.refresh_summary()
+                        time.sleep(self.poll_seconds)
+                # 退出前处理完已提交的文件
+                for future in list(pending):
+                    digest, path, kind = pending.pop(future)
+                    self._complete(future, digest, path, kind)
+                if self._summary_pending and self.summarize:
+                    self.refresh_summary()
+        except KeyboardInterrupt:
+            logger.info("停止监视")
+        finally:
+            self._drop_connection()
+
+    def _ledger(self):
+        """登记表（连接因数据库错误断开后重新连接）"""
+        if self.ledger is None:
+            self.conn = self.backend.connect()
+            self.ledger = IngestLedger(self.backend, self.conn)
+        return self.ledger
+
+    def _drop_connection(self):
+        """放弃出错的登记表连接，下次登记时重新连接"""
+        conn, self.conn, self.ledger = self.conn, None, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _record(self, digest, status, message):
+        """
+        登记处理结果；数据库不可用时登记失败，记录保持processing，下次启动时重新处理
+
+        Returns:
+            bool: 是否登记成功
+        """
+        try:
+            self._ledger().finish(digest, status, message)
+            return True
+        except Exception as e:
+            logger.error(f"登记处理结果（{status}）失败: {e}")
+            self._drop_connection()
+            return False
+
+    def _complete(self, future, digest, path, kind):
+        """解析完成后入库并登记结果"""
+        try:
+            frames = future.result()
+        except Exception as e:
+            # 解析失败与数据库无关，内容不变时重试结果相同，等文件变化或下次启动再处理
+            logger.error(f"解析失败: {path}: {e}")
+            self._record(digest, 'failed', e)
+            self._seen.discard(digest)
+            return
+        try:
+            message = self.load(kind, frames, path)
+        except Exception as e:
+            # 写入失败（如数据库不可用）时已提交的块保留，重试时从检查点继续
+            logger.error(f"入库失败，{self.retry_seconds:g} 秒后重试: {path}: {e}")
+            self._record(digest, 'failed', e)
+            self._seen.discard(digest)
+            self._schedule_retry(path)
+            return
+        self._record(digest, 'done', message)
+        self._retry_after.pop(path, None)
+        self._summary_pending = True
+        logger.info(f"入库完成: {path}（{message}）")
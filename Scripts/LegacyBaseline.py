@@ -0,0 +1,973 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基线实现（冻结副本）
+逐行循环写入的 save_orders_to_db、save_deals_to_db、save_segments_to_db 和逐仓位循环的 _process_summary_data，
+连同它们使用的建表语句和读取查询，原样保留重构之前的版本，作为差分校验（DifferentialHarness）的原有实现一侧。
+只把MySQL连接换成StorageBackend的连接，以便写入嵌入式数据库；不要随加速实现一起修改本文件
+"""
+
+import datetime
+import logging
+
+import pandas as pd
+
+from StorageBackend import create_backend, DB_ERRORS
+
+logger = logging.getLogger("LegacyBaseline")
+
+
+class LegacyBaseline:
+    """基线处理器：订单、成交、线段的逐行写入和汇总"""
+
+    def __init__(self, db_config):
+        """
+        初始化处理器
+
+        Args:
+            db_config (dict): 数据库配置
+        """
+        self.db_config = db_config
+        self.backend = create_backend(db_config)
+        self.conn = None
+        self.cursor = None
+
+    def connect_db(self):
+        """连接到数据库"""
+        try:
+            self.conn = self.backend.connect()
+            self.cursor = self.conn.cursor()
+            return True
+        except DB_ERRORS as e:
+            logger.error(f"数据库连接失败: {e}")
+            return False
+
+    def close_db(self):
+        """关闭数据库连接"""
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+
+    def create_trade_tables(self):
+        """创建订单和成交记录表"""
+        try:
+            # 创建订单表（根据ReportTester.xlsx的实际列结构调整）
+            self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS report_orders (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                open_time DATETIME COMMENT '开价时间',
+                order_id BIGINT COMMENT '订单号',
+                symbol VARCHAR(20) COMMENT '交易品种',
+                type VARCHAR(50) COMMENT '类型',
+                volume VARCHAR(20) COMMENT '交易量',
+                price DOUBLE COMMENT '价位',
+                sl DOUBLE COMMENT '止损',
+                tp DOUBLE COMMENT '止盈',
+                time DATETIME COMMENT '时间',
+                status VARCHAR(20) COMMENT '状态',
+                comment VARCHAR(255) COMMENT '注释',
+                report_file VARCHAR(255) COMMENT '报告文件名',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            
+            # 创建成交记录表（根据ReportTester.xlsx的实际列结构调整）
+            self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS report_deals (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                deal_time DATETIME COMMENT '时间',
+                deal_id BIGINT COMMENT '成交号',
+                symbol VARCHAR(20) COMMENT '交易品种',
+                type VARCHAR(50) COMMENT '类型',
+                direction VARCHAR(20) COMMENT '趋势',
+                volume VARCHAR(20) COMMENT '交易量',
+                price DOUBLE COMMENT '价位',
+                order_id BIGINT COMMENT '订单号',
+                commission DOUBLE COMMENT '手续费',
+                swap DOUBLE COMMENT '库存费',
+                profit DOUBLE COMMENT '盈利',
+                balance DOUBLE COMMENT '结余',
+                comment VARCHAR(255) COMMENT '注释',
+                report_file VARCHAR(255) COMMENT '报告文件名',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            
+            self.conn.commit()
+            logger.info("数据表创建成功")
+            return True
+        except Exception as e:
+            logger.error(f"创建数据表失败: {e}")
+            self.conn.rollback()
+            return False
+
+    def create_segment_tables(self):
+        """创建线段信息表"""
+        try:
+            # 创建线段信息表（更新为新的格式）
+            self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS segment_info (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                trade_time DATETIME COMMENT '交易时间',
+                order_ticket BIGINT COMMENT '订单号',
+                position_id BIGINT COMMENT '仓位ID',
+                reference_price DOUBLE COMMENT '参考价格',
+                reference_time DATETIME COMMENT '参考时间',
+                reference_bar_index INT COMMENT '参考K线索引',
+                timeframe VARCHAR(10) COMMENT '时间周期',
+                segment_side VARCHAR(10) COMMENT '线段方向（Left/Right）',
+                segment_index INT COMMENT '线段序号',
+                start_price DOUBLE COMMENT '起始价格',
+                end_price DOUBLE COMMENT '结束价格',
+                amplitude DOUBLE COMMENT '幅度',
+                direction VARCHAR(10) COMMENT '方向',
+                trade_action VARCHAR(20) COMMENT '交易操作类型',
+                trade_price DOUBLE COMMENT '交易价格',
+                trade_volume DOUBLE COMMENT '交易量',
+                trade_comment VARCHAR(255) COMMENT '交易注释',
+                trade_status VARCHAR(50) COMMENT '交易状态',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            
+            self.conn.commit()
+            logger.info("数据表创建成功")
+            return True
+        except Exception as e:
+            logger.error(f"创建数据表失败: {e}")
+            self.conn.rollback()
+            return False
+
+    def read_segment_data(self, file_path):
+        """
+        从CSV文件中读取线段数据
+        
+        Args:
+            file_path (str): CSV文件路径
+            
+        Returns:
+            DataFrame: 线段数据的DataFrame
+        """
+        try:
+            # 读取segment_info.csv文件
+            df = pd.read_csv(file_path, sep=';', encoding='utf-16')
+            logger.info(f"成功读取线段数据文件，包含 {len(df)} 行数据")
+            logger.info(f"列名: {list(df.columns)}")
+            return df
+        except Exception as e:
+            logger.error(f"读取线段数据文件失败: {e}")
+            return None
+
+    def save_orders_to_db(self, orders_df, report_file):
+        """
+        将订单数据保存到数据库
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            report_file (str): 报告文件名
+            
+        Returns:
+            int: 成功插入的记录数
+        """
+        if orders_df is None or len(orders_df) == 0:
+            logger.warning("订单数据为空，跳过保存到数据库")
+            return 0
+        
+        try:
+            insert_query = """
+            INSERT INTO report_orders 
+            (open_time, order_id, symbol, type, volume, price, sl, tp, time, status, comment, report_file)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            open_time=VALUES(open_time), symbol=VALUES(symbol), type=VALUES(type), 
+            volume=VALUES(volume), price=VALUES(price), sl=VALUES(sl), tp=VALUES(tp), 
+            time=VALUES(time), status=VALUES(status), comment=VALUES(comment), report_file=VALUES(report_file)
+            """
+            
+            count = 0
+            for idx, row in orders_df.iterrows():
+                # 提取各字段值
+                open_time = None
+                order_id = None
+                symbol = ""
+                type_val = ""
+                volume = ""
+                price = 0.0
+                sl = 0.0
+                tp = 0.0
+                time_val = None
+                status = ""
+                comment = ""
+                
+                # 遍历列查找匹配的字段
+                for col in orders_df.columns:
+                    # 确保col不是NaN
+                    if pd.isna(col):
+                        continue
+                        
+                    col_name = str(col)
+                    col_lower = col_name.lower()
+                    value = row[col]
+                    
+                    # 检查值是否为空，使用any()方法处理可能的Series情况
+                    try:
+                        if pd.isna(value).any():
+                            continue
+                    except AttributeError:
+                        # 如果不是Series，直接检查
+                        if pd.isna(value):
+                            continue
+                    
+                    # 开价时间
+                    if '开价时间' in col_name:
+                        if isinstance(value, datetime.datetime):
+                            open_time = value
+                        elif isinstance(value, str):
+                            try:
+                                open_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                            except ValueError:
+                                pass
+                    
+                    # 订单号
+                    elif '订单' in col_name and '开价时间' not in col_name:
+                        try:
+                            order_id = int(float(value))
+                        except (ValueError, TypeError):
+                            order_id = None
+                    
+                    # 交易品种
+                    elif '交易品种' in col_name:
+                        symbol = str(value)
+                    
+                    # 类型
+                    elif '类型' in col_name:
+                        type_val = str(value)
+                    
+                    # 交易量
+                    elif '交易量' in col_name:
+                        volume = str(value)
+                    
+                    # 价位
+                    elif '价位' in col_name:
+                        try:
+                            price = float(value)
+                        except (ValueError, TypeError):
+                            price = 0.0
+                    
+                    # 止损
+                    elif '止损' in col_name:
+                        try:
+                            sl = float(value)
+                        except (ValueError, TypeError):
+                            sl = 0.0
+                    
+                    # 止盈
+                    elif '止盈' in col_name:
+                        try:
+                            tp = float(value)
+                        except (ValueError, TypeError):
+                            tp = 0.0
+                    
+                    # 时间
+                    elif '时间' in col_name and '开价时间' not in col_name:
+                        if isinstance(value, datetime.datetime):
+                            time_val = value
+                        elif isinstance(value, str):
+                            try:
+                                time_val = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                            except ValueError:
+                                pass
+                    
+                    # 状态
+                    elif '状态' in col_name:
+                        status = str(value)
+                    
+                    # 注释
+                    elif '注释' in col_name:
+                        comment = str(value)
+                
+                # 如果订单号为空，跳过此行
+                if order_id is None:
+                    logger.warning(f"跳过第{idx+1}行，订单号为空: {row.to_dict()}")
+                    continue
+                
+                values = (
+                    open_time,
+                    order_id,
+                    symbol,
+                    type_val,
+                    volume,
+                    price,
+                    sl,
+                    tp,
+                    time_val,
+                    status,
+                    comment,
+                    report_file
+                )
+                
+                self.cursor.execute(insert_query, values)
+                count += 1
+            
+            self.conn.commit()
+            logger.info(f"成功将{count}条订单记录保存到数据库")
+            return count
+            
+        except DB_ERRORS as e:
+            logger.error(f"保存订单数据到数据库失败: {e}")
+            self.conn.rollback()
+            return 0
+
+    def save_deals_to_db(self, deals_df, report_file):
+        """
+        将成交记录数据保存到数据库
+        
+        Args:
+            deals_df (DataFrame): 成交记录数据
+            report_file (str): 报告文件名
+            
+        Returns:
+            int: 成功插入的记录数
+        """
+        if deals_df is None or len(deals_df) == 0:
+            logger.warning("成交记录数据为空，跳过保存到数据库")
+            return 0
+        
+        try:
+            insert_query = """
+            INSERT INTO report_deals 
+            (deal_time, deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, report_file)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            deal_time=VALUES(deal_time), symbol=VALUES(symbol), type=VALUES(type), direction=VALUES(direction),
+            volume=VALUES(volume), price=VALUES(price), order_id=VALUES(order_id), commission=VALUES(commission),
+            swap=VALUES(swap), profit=VALUES(profit), balance=VALUES(balance), comment=VALUES(comment), 
+            report_file=VALUES(report_file)
+            """
+            
+            count = 0
+            for idx, row in deals_df.iterrows():
+                # 提取各字段值
+                deal_time = None
+                deal_id = None
+                symbol = ""
+                type_val = ""
+                direction = ""
+                volume = ""
+                price = 0.0
+                order_id = 0
+                commission = 0.0
+                swap = 0.0
+                profit = 0.0
+                balance = 0.0
+                comment = ""
+                
+                # 遍历列查找匹配的字段
+                for col in deals_df.columns:
+                    # 确保col不是NaN
+                    if pd.isna(col):
+                        continue
+                        
+                    col_name = str(col)
+                    col_lower = col_name.lower()
+                    value = row[col]
+                    
+                    # 检查值是否为空，使用any()方法处理可能的Series情况
+                    try:
+                        if pd.isna(value).any():
+                            continue
+                    except AttributeError:
+                        # 如果不是Series，直接检查
+                        if pd.isna(value):
+                            continue
+                    
+                    # 时间
+                    if '时间' in col_name and '成交' not in col_name:
+                        if isinstance(value, datetime.datetime):
+                            deal_time = value
+                        elif isinstance(value, str):
+                            try:
+                                deal_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                            except ValueError:
+                                pass
+                    
+                    # 成交号
+                    elif '成交' in col_name and '时间' not in col_name:
+                        try:
+                            deal_id = int(float(value))
+                        except (ValueError, TypeError):
+                            deal_id = None
+                    
+                    # 交易品种
+                    elif '交易品种' in col_name:
+                        symbol = str(value)
+                    
+                    # 类型
+                    elif '类型' in col_name:
+                        type_val = str(value)
+                    
+                    # 趋势/方向
+                    elif '趋势' in col_name or '方向' in col_name:
+                        direction = str(value)
+                    
+                    # 交易量
+                    elif '交易量' in col_name:
+                        volume = str(value)
+                    
+                    # 价位
+                    elif '价位' in col_name:
+                        try:
+                            price = float(value)
+                        except (ValueError, TypeError):
+                            price = 0.0
+                    
+                    # 订单号
+                    elif '订单' in col_name and '成交' not in col_name:
+                        try:
+                            order_id = int(float(value))
+                        except (ValueError, TypeError):
+                            order_id = 0
+                    
+                    # 手续费
+                    elif '手续费' in col_name:
+                        try:
+                            commission = float(value)
+                        except (ValueError, TypeError):
+                            commission = 0.0
+                    
+                    # 库存费/掉期
+                    elif '库存费' in col_name or '掉期' in col_name:
+                        try:
+                            swap = float(value)
+                        except (ValueError, TypeError):
+                            swap = 0.0
+                    
+                    # 盈利
+                    elif '盈利' in col_name:
+                        try:
+                            profit = float(value)
+                        except (ValueError, TypeError):
+                            profit = 0.0
+                    
+                    # 结余
+                    elif '结余' in col_name:
+                        try:
+                            balance = float(value)
+                        except (ValueError, TypeError):
+                            balance = 0.0
+                    
+                    # 注释
+                    elif '注释' in col_name:
+                        comment = str(value)
+                
+                # 如果成交号为空，跳过此行
+                if deal_id is None:
+                    logger.warning(f"跳过第{idx+1}行，成交号为空: {row.to_dict()}")
+                    continue
+                
+                values = (
+                    deal_time,
+                    deal_id,
+                    symbol,
+                    type_val,
+                    direction,
+                    volume,
+                    price,
+                    order_id,
+                    commission,
+                    swap,
+                    profit,
+                    balance,
+                    comment,
+                    report_file
+                )
+                
+                self.cursor.execute(insert_query, values)
+                count += 1
+            
+            self.conn.commit()
+            logger.info(f"成功将{count}条成交记录保存到数据库")
+            return count
+            
+        except DB_ERRORS as e:
+            logger.error(f"保存成交记录数据到数据库失败: {e}")
+            self.conn.rollback()
+            return 0
+
+    def save_segments_to_db(self, segments_df):
+        """
+        将线段数据保存到数据库
+        
+        Args:
+            segments_df (DataFrame): 线段数据
+            
+        Returns:
+            int: 成功插入的记录数
+        """
+        if segments_df is None or len(segments_df) == 0:
+            logger.warning("线段数据为空，跳过保存到数据库")
+            return 0
+        
+        try:
+            insert_query = """
+            INSERT INTO segment_info 
+            (trade_time, order_ticket, position_id, reference_price, reference_time, 
+             reference_bar_index, timeframe, segment_side, segment_index, start_price,
+             end_price, amplitude, direction, trade_action, trade_price, trade_volume,
+             trade_comment, trade_status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            
+            count = 0
+            for idx, row in segments_df.iterrows():
+                # 提取各字段值
+                trade_time = None
+                order_ticket = None
+                position_id = None
+                reference_price = 0.0
+                reference_time = None
+                reference_bar_index = 0
+                timeframe = ""
+                segment_side = ""
+                segment_index = 0
+                start_price = 0.0
+                end_price = 0.0
+                amplitude = 0.0
+                direction = ""
+                trade_action = ""
+                trade_price = 0.0
+                trade_volume = 0.0
+                trade_comment = ""
+                trade_status = ""
+                
+                # 处理时间字段
+                if 'TradeTime' in row and pd.notna(row['TradeTime']):
+                    try:
+                        trade_time = datetime.datetime.strptime(row['TradeTime'], '%Y.%m.%d %H:%M:%S')
+                    except ValueError:
+                        pass
+                
+                if 'ReferenceTime' in row and pd.notna(row['ReferenceTime']):
+                    try:
+                        reference_time = datetime.datetime.strptime(row['ReferenceTime'], '%Y.%m.%d %H:%M:%S')
+                    except ValueError:
+                        pass
+                
+                # 处理其他字段
+                if 'OrderTicket' in row and pd.notna(row['OrderTicket']):
+                    order_ticket = int(row['OrderTicket'])
+                
+                if 'PositionId' in row and pd.notna(row['PositionId']):
+                    position_id = int(row['PositionId'])
+                
+                if 'ReferencePrice' in row and pd.notna(row['ReferencePrice']):
+                    reference_price = float(row['ReferencePrice'])
+                
+                if 'ReferenceBarIndex' in row and pd.notna(row['ReferenceBarIndex']):
+                    reference_bar_index = int(row['ReferenceBarIndex'])
+                
+                if 'Timeframe' in row and pd.notna(row['Timeframe']):
+                    timeframe = str(row['Timeframe'])
+                
+                if 'SegmentSide' in row and pd.notna(row['SegmentSide']):
+                    segment_side = str(row['SegmentSide'])
+                
+                if 'SegmentIndex' in row and pd.notna(row['SegmentIndex']):
+                    segment_index = int(row['SegmentIndex'])
+                
+                if 'StartPrice' in row and pd.notna(row['StartPrice']):
+                    start_price = float(row['StartPrice'])
+                
+                if 'EndPrice' in row and pd.notna(row['EndPrice']):
+                    end_price = float(row['EndPrice'])
+                
+                if 'Amplitude' in row and pd.notna(row['Amplitude']):
+                    amplitude = float(row['Amplitude'])
+                
+                if 'Direction' in row and pd.notna(row['Direction']):
+                    direction = str(row['Direction'])
+                    
+                # 新增的交易操作相关字段
+                if 'TradeAction' in row and pd.notna(row['TradeAction']):
+                    trade_action = str(row['TradeAction'])
+                
+                if 'TradePrice' in row and pd.notna(row['TradePrice']):
+                    trade_price = float(row['TradePrice'])
+                
+                if 'TradeVolume' in row and pd.notna(row['TradeVolume']):
+                    trade_volume = float(row['TradeVolume'])
+                
+                if 'TradeComment' in row and pd.notna(row['TradeComment']):
+                    trade_comment = str(row['TradeComment'])
+                
+                if 'TradeStatus' in row and pd.notna(row['TradeStatus']):
+                    trade_status = str(row['TradeStatus'])
+                
+                values = (
+                    trade_time,
+                    order_ticket,
+                    position_id,
+                    reference_price,
+                    reference_time,
+                    reference_bar_index,
+                    timeframe,
+                    segment_side,
+                    segment_index,
+                    start_price,
+                    end_price,
+                    amplitude,
+                    direction,
+                    trade_action,
+                    trade_price,
+                    trade_volume,
+                    trade_comment,
+                    trade_status
+                )
+                
+                self.cursor.execute(insert_query, values)
+                count += 1
+            
+            self.conn.commit()
+            logger.info(f"成功将{count}条线段记录保存到数据库")
+            return count
+            
+        except DB_ERRORS as e:
+            logger.error(f"保存线段数据到数据库失败: {e}")
+            self.conn.rollback()
+            return 0
+
+    def generate_summary_data(self):
+        """
+        生成汇总数据
+        以订单表为主表，关联成交表和线段表数据
+        """
+        try:
+            # 读取订单表数据
+            orders_query = """
+            SELECT 
+                order_id, symbol, type, volume, price, sl, tp, open_time, time, status, comment
+            FROM report_orders
+            """
+            orders_df = self.backend.read_sql(orders_query, self.conn)
+            logger.info(f"读取订单数据 {len(orders_df)} 条")
+            
+            # 读取成交表数据
+            deals_query = """
+            SELECT 
+                deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, deal_time
+            FROM report_deals
+            """
+            deals_df = self.backend.read_sql(deals_query, self.conn)
+            logger.info(f"读取成交数据 {len(deals_df)} 条")
+            
+            # 读取线段表数据
+            segments_query = """
+            SELECT 
+                order_ticket, position_id, reference_price, reference_time, timeframe, 
+                segment_side, segment_index, start_price, end_price, amplitude, direction,
+                trade_action, trade_price, trade_volume, trade_comment, trade_status
+            FROM segment_info
+            """
+            segments_df = self.backend.read_sql(segments_query, self.conn)
+            logger.info(f"读取线段数据 {len(segments_df)} 条")
+            
+            # 处理数据汇总
+            summary_data = self._process_summary_data(orders_df, deals_df, segments_df)
+            
+            return summary_data
+            
+        except Exception as e:
+            logger.error(f"生成汇总数据失败: {e}")
+            return None
+
+    def _process_summary_data(self, orders_df, deals_df, segments_df):
+        """
+        处理汇总数据
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            deals_df (DataFrame): 成交数据
+            segments_df (DataFrame): 线段数据
+        """
+        try:
+            # 创建汇总数据列表
+            summary_list = []
+            
+            # 处理所有订单，而不仅仅是已成交的仓位
+            logger.info(f"处理所有 {len(orders_df)} 条订单记录")
+            
+            # 首先处理有position_id的已成交订单（进场/出场对）
+            # 从线段表中获取所有有效的position_id（大于0的）
+            valid_positions = segments_df[segments_df['position_id'] > 0]['position_id'].unique()
+            logger.info(f"找到 {len(valid_positions)} 个有效的仓位ID")
+            
+            # 处理每个仓位
+            processed_order_ids = set()  # 记录已处理的订单ID
+            
+            for position_id in valid_positions:
+                # 获取该仓位的所有线段记录
+                position_segments = segments_df[segments_df['position_id'] == position_id]
+                
+                # 获取该仓位涉及的所有订单票号
+                order_tickets = position_segments['order_ticket'].unique()
+                processed_order_ids.update(order_tickets)
+                
+                # 获取这些订单票号对应的订单记录
+                position_orders = orders_df[orders_df['order_id'].isin(order_tickets)]
+                
+                # 获取这些订单对应的成交记录
+                position_deals = deals_df[deals_df['order_id'].isin(order_tickets)]
+                
+                # 确定进场和出场订单
+                entry_order = None
+                exit_order = None
+                
+                if len(position_orders) >= 2:
+                    # 按时间排序确定进场和出场
+                    sorted_orders = position_orders.sort_values('open_time')
+                    entry_order = sorted_orders.iloc[0]
+                    exit_order = sorted_orders.iloc[1]
+                elif len(position_orders) == 1:
+                    # 只有一个订单
+                    entry_order = position_orders.iloc[0]
+                
+                # 创建汇总记录
+                if entry_order is not None:
+                    summary_record = {
+                        'position_id': position_id,
+                        'symbol': entry_order['symbol'],
+                        'order_type': entry_order['type'],
+                        'volume': entry_order['volume'],
+                        'open_price': entry_order['price'],
+                        'sl': entry_order['sl'],
+                        'tp': entry_order['tp'],
+                        'open_time': entry_order['open_time'],
+                        'status': entry_order['status'],
+                        'comment': entry_order['comment']
+                    }
+                    
+                    # 如果有出场订单，添加出场信息
+                    if exit_order is not None:
+                        summary_record['order_id'] = exit_order['order_id']
+                        summary_record['close_time'] = exit_order['time']
+                        summary_record['close_price'] = exit_order['price']
+                        # 合并状态
+                        profit_value = 0
+                        if not position_deals.empty:
+                            profit_value = position_deals['profit'].sum()
+                        summary_record['status'] = self._merge_status(entry_order['status'], exit_order['status'], profit_value)
+                        summary_record['comment'] = f"{entry_order['comment']} | {exit_order['comment']}"
+                    else:
+                        summary_record['order_id'] = entry_order['order_id']
+                        summary_record['close_time'] = entry_order['time']
+                        summary_record['close_price'] = entry_order['price']
+                    
+                    # 添加成交相关信息
+                    if not position_deals.empty:
+                        # 计算总手续费、库存费和盈利
+                        summary_record['commission'] = position_deals['commission'].sum()
+                        summary_record['swap'] = position_deals['swap'].sum()
+                        summary_record['profit'] = position_deals['profit'].sum()
+                        
+                        # 获取最后一条成交记录的信息
+                        last_deal = position_deals.iloc[-1]
+                        summary_record['close_price'] = last_deal['price']
+                        summary_record['close_time'] = last_deal['deal_time']
+                        summary_record['comment'] = last_deal['comment']
+                    
+                    # 添加线段相关信息
+                    if not position_segments.empty:
+                        # 分离进场和出场的线段
+                        entry_segments = pd.DataFrame()
+                        exit_segments = pd.DataFrame()
+                        
+                        if entry_order is not None:
+                            entry_segments = position_segments[position_segments['order_ticket'] == entry_order['order_id']]
+                        
+                        if exit_order is not None:
+                            exit_segments = position_segments[position_segments['order_ticket'] == exit_order['order_id']]
+                        
+                        # 进场线段统计
+                        if not entry_segments.empty:
+                            summary_record['entry_right_segments_5min'] = len(entry_segments[
+                                (entry_segments['timeframe'] == 'M5') & 
+                                (entry_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            summary_record['entry_right_segments_15min'] = len(entry_segments[
+                                (entry_segments['timeframe'] == 'M15') & 
+                                (entry_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            summary_record['entry_right_segments_30min'] = len(entry_segments[
+                                (entry_segments['timeframe'] == 'M30') & 
+                                (entry_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            # 进场第一个线段长度
+                            first_entry_segment = entry_segments[
+                                (entry_segments['segment_side'] == 'Right')
+                            ].sort_values('segment_index').iloc[0] if not entry_segments[
+                                (entry_segments['segment_side'] == 'Right')
+                            ].empty else None
+                            
+                            if first_entry_segment is not None:
+                                summary_record['entry_first_segment_length'] = round(abs(
+                                    first_entry_segment['end_price'] - first_entry_segment['start_price']
+                                ), 2)
+                        
+                        # 出场线段统计
+                        if not exit_segments.empty:
+                            summary_record['exit_right_segments_5min'] = len(exit_segments[
+                                (exit_segments['timeframe'] == 'M5') & 
+                                (exit_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            summary_record['exit_right_segments_15min'] = len(exit_segments[
+                                (exit_segments['timeframe'] == 'M15') & 
+                                (exit_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            summary_record['exit_right_segments_30min'] = len(exit_segments[
+                                (exit_segments['timeframe'] == 'M30') & 
+                                (exit_segments['segment_side'] == 'Right')
+                            ])
+                            
+                            # 出场第一个线段长度
+                            first_exit_segment = exit_segments[
+                                (exit_segments['segment_side'] == 'Right')
+                            ].sort_values('segment_index').iloc[0] if not exit_segments[
+                                (exit_segments['segment_side'] == 'Right')
+                            ].empty else None
+                            
+                            if first_exit_segment is not None:
+                                summary_record['exit_first_segment_length'] = round(abs(
+                                    first_exit_segment['end_price'] - first_exit_segment['start_price']
+                                ), 2)
+                    
+                    summary_list.append(summary_record)
+            
+            # 处理未成交的订单（没有position_id关联的订单）
+            logger.info(f"已处理 {len(processed_order_ids)} 条订单，剩余 {len(orders_df) - len(processed_order_ids)} 条未处理订单")
+            unprocessed_orders = orders_df[~orders_df['order_id'].isin(processed_order_ids)]
+            
+            for _, order_row in unprocessed_orders.iterrows():
+                order_id = order_row['order_id']
+                
+                # 获取该订单的成交记录
+                order_deals = deals_df[deals_df['order_id'] == order_id]
+                
+                # 获取该订单的线段记录
+                order_segments = segments_df[segments_df['order_ticket'] == order_id]
+                
+                # 创建汇总记录
+                summary_record = {
+                    'order_id': order_id,
+                    'symbol': order_row['symbol'],
+                    'order_type': order_row['type'],
+                    'volume': order_row['volume'],
+                    'open_price': order_row['price'],
+                    'sl': order_row['sl'],
+                    'tp': order_row['tp'],
+                    'open_time': order_row['open_time'],
+                    'close_time': order_row['time'],
+                    'status': order_row['status'],
+                    'comment': order_row['comment']
+                }
+                
+                # 添加成交相关信息
+                profit_value = 0
+                if not order_deals.empty:
+                    # 计算总手续费、库存费和盈利
+                    summary_record['commission'] = order_deals['commission'].sum()
+                    summary_record['swap'] = order_deals['swap'].sum()
+                    summary_record['profit'] = order_deals['profit'].sum()
+                    profit_value = order_deals['profit'].sum()
+                    
+                    # 获取最后一条成交记录的注释作为平仓注释
+                    summary_record['comment'] = order_deals.iloc[-1]['comment']
+                    
+                    # 获取平仓价格和时间
+                    summary_record['close_price'] = order_deals.iloc[-1]['price']
+                    summary_record['close_time'] = order_deals.iloc[-1]['deal_time']
+                
+                # 根据盈利金额更新状态
+                summary_record['status'] = self._merge_status(order_row['status'], order_row['status'], profit_value)
+                
+                # 添加线段相关信息
+                if not order_segments.empty:
+                    # 按时间周期统计右线段数量
+                    right_segments_5min = len(order_segments[
+                        (order_segments['timeframe'] == 'M5') & 
+                        (order_segments['segment_side'] == 'Right')
+                    ])
+                    
+                    right_segments_15min = len(order_segments[
+                        (order_segments['timeframe'] == 'M15') & 
+                        (order_segments['segment_side'] == 'Right')
+                    ])
+                    
+                    right_segments_30min = len(order_segments[
+                        (order_segments['timeframe'] == 'M30') & 
+                        (order_segments['segment_side'] == 'Right')
+                    ])
+                    
+                    summary_record['right_segments_5min'] = right_segments_5min
+                    summary_record['right_segments_15min'] = right_segments_15min
+                    summary_record['right_segments_30min'] = right_segments_30min
+                    
+                    # 获取参考点价格右侧第一个线段的长度
+                    first_right_segment = order_segments[
+                        (order_segments['segment_side'] == 'Right')
+                    ].sort_values('segment_index').iloc[0] if not order_segments[
+                        (order_segments['segment_side'] == 'Right')
+                    ].empty else None
+                    
+                    if first_right_segment is not None:
+                        summary_record['first_segment_length'] = round(abs(
+                            first_right_segment['end_price'] - first_right_segment['start_price']
+                        ), 2)
+                
+                summary_list.append(summary_record)
+            
+            # 转换为DataFrame
+            summary_df = pd.DataFrame(summary_list)
+            logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录")
+            return summary_df
+            
+        except Exception as e:
+            logger.error(f"处理汇总数据失败: {e}")
+            return None
+
+    def _merge_status(self, entry_status, exit_status, profit=0):
+        """
+        合并订单状态
+        
+        Args:
+            entry_status (str): 进场状态
+            exit_status (str): 出场状态
+            profit (float): 盈利金额
+            
+        Returns:
+            str: 合并后的状态
+        """
+        # 如果任意一个是取消，则为取消
+        if 'cancel' in str(entry_status).lower() or 'cancel' in str(exit_status).lower():
+            return '取消'
+        
+        # 如果任意一个是过期，则为过期
+        if 'expired' in str(entry_status).lower() or 'expired' in str(exit_status).lower():
+            return '过期'
+        
+        # 根据盈利金额判断状态
+        if profit > 0:
+            return '盈利'
+        elif profit < 0:
+            return '亏损'
+        else:
+            return '持平'
+        
+        # 默认返回原始状态
+        return entry_status if not pd.isna(entry_status) else exit_status
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+交易结果蒙特卡洛模拟
+基于汇总表中每个仓位的净盈亏做重采样（有放回抽样、交易顺序打乱、随机跳过交易），
+模拟以NumPy矩阵批量计算并分发到多进程，输出最终权益和最大回撤的分位数区间
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("MonteCarloSimulator")
+
+# 模拟方式：bootstrap 有放回抽样；shuffle 打乱交易顺序；skip 以一定概率跳过每笔交易
+SIMULATION_METHODS = ('bootstrap', 'shuffle', 'skip')
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def simulate_batch(profits, method, simulations, seed, initial_balance, skip_probability=0.1):
+    """
+    模拟一批资金曲线（顶层函数，可被进程池序列化调用）
+
+    Args:
+        profits (ndarray): 每笔交易净盈亏（按时间排序）
+        method (str): 模拟方式，见SIMULATION_METHODS
+        simulations (int): 本批模拟次数
+        seed: 本批随机数种子（SeedSequence或整数）
+        initial_balance (float): 初始资金
+        skip_probability (float): skip方式下每笔交易被跳过的概率
+
+    Returns:
+        tuple: (最终权益, 最大回撤金额, 最大回撤百分比)，均为长度simulations的数组
+    """
+    rng = np.random.default_rng(seed)
+    profits = np.asarray(profits, dtype='float64')
+    trades = len(profits)
+
+    if method == 'bootstrap':
+        pnl = profits[rng.integers(0, trades, size=(simulations, trades))]
+    elif method == 'shuffle':
+        pnl = rng.permuted(np.broadcast_to(profits, (simulations, trades)), axis=1)
+    elif method == 'skip':
+        pnl = np.where(rng.random((simulations, trades)) >= skip_probability, profits, 0.0)
+    else:
+        raise ValueError(f"不支持的模拟方式: {method}")
+
+    equity = np.empty((simulations, trades + 1))
+    equity[:, 0] = initial_balance
+    np.cumsum(pnl, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += initial_balance
+
+    running_max = np.maximum.accumulate(equity, axis=1)
+    drawdown = running_max - equity
+    worst = np.argmax(drawdown, axis=1)
+    rows = np.arange(simulations)
+    max_drawdown = drawdown[rows, worst]
+    peaks = running_max[rows, worst]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_drawdown_pct = np.where(peaks > 0, max_drawdown / peaks * 100, 0.0)
+    return equity[:, -1], max_drawdown, max_drawdown_pct
+
+
+class MonteCarloSimulator:
+    """蒙特卡洛模拟器"""
+
+    def __init__(self, simulations=10000, batch_size=500, workers=None, seed=20250401,
+                 skip_probability=0.1, percentiles=DEFAULT_PERCENTILES):
+        """
+        初始化模拟器
+
+        Args:
+            simulations (int): 每种方式的模拟次数
+            batch_size (int): 每批模拟次数（批次划分固定，结果与进程数无关）
+            workers (int): 进程数，None为CPU核数，1为在当前进程中计算
+            seed (int): 随机数种子，相同种子和参数得到相同结果
+            skip_probability (float): skip方式下每笔交易被跳过的概率
+            percentiles (tuple): 输出的分位数
+        """
+        self.simulations = int(simulations)
+        self.batch_size = max(1, int(batch_size))
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.skip_probability = skip_probability
+        self.percentiles = tuple(percentiles)
+
+    def _batches(self, method):
+        """按固定批次大小划分模拟任务，每批使用独立派生的种子"""
+        counts = [self.batch_size] * (self.simulations // self.batch_size)
+        if self.simulations % self.batch_size:
+            counts.append(self.simulations % self.batch_size)
+        # 各方式使用不同的种子序列，批次种子由SeedSequence派生，互不相关
+        method_seed = np.random.SeedSequence([self.seed, SIMULATION_METHODS.index(method)])
+        return list(zip(counts, method_seed.spawn(len(counts))))
+
+    def simulate(self, profits, method, initial_balance):
+        """
+        执行一种方式的全部模拟
+
+        Args:
+            profits (ndarray): 每笔交易净盈亏
+            method (str): 模拟方式
+            initial_balance (float): 初始资金
+
+        Returns:
+            DataFrame: final_equity, max_drawdown, max_drawdown_pct（每次模拟一行）
+        """
+        if method not in SIMULATION_METHODS:
+            raise ValueError(f"不支持的模拟方式: {method}")
+        profits = np.asarray(profits, dtype='float64')
+        if len(profits) == 0:
+            raise ValueError("没有可用于模拟的交易")
+
+        batches = self._batches(method)
+        args = [(profits, method, count, seed, initial_balance, self.skip_probability) for count, seed in batches]
+        if self.workers > 1 and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+                results = list(executor.map(simulate_batch, *zip(*args)))
+        else:
+            results = [simulate_batch(*a) for a in args]
+
+        final_equity, max_drawdown, max_drawdown_pct = (np.concatenate(parts) for parts in zip(*results))
+        return pd.DataFrame({'final_equity': final_equity, 'max_drawdown': max_drawdown,
+                             'max_drawdown_pct': max_drawdown_pct})
+
+    def percentile_bands(self, results):
+        """
+        计算分位数区间
+
+        Args:
+            results (DataFrame): simulate返回的结果
+
+        Returns:
+            DataFrame: 每个指标一行，列为 p5/p25/...，以及mean
+        """
+        values = np.percentile(results.to_numpy(), self.percentiles, axis=0).T
+        bands = pd.DataFrame(values, index=results.columns, columns=[f"p{p:g}" for p in self.percentiles])
+        bands['mean'] = results.mean().to_numpy()
+        return bands
+
+    def run(self, profits, initial_balance, methods=SIMULATION_METHODS):
+        """
+        执行多种方式的模拟并汇总分位数
+
+        Args:
+            profits (ndarray): 每笔交易净盈亏（按平仓时间排序）
+            initial_balance (float): 初始资金
+            methods (tuple): 模拟方式
+
+        Returns:
+            DataFrame: method, metric, 各分位数, mean
+        """
+        bands = []
+        for method in methods:
+            results = self.simulate(profits, method, initial_balance)
+            band = self.percentile_bands(results)
+            median = results.median()
+            logger.info(f"{method} 模拟 {len(results)} 次完成，最终权益中位数 {median['final_equity']:.2f}，"
+                        f"最大回撤中位数 {median['max_drawdown']:.2f}")
+            band = band.rename_axis('metric').reset_index()
+            band.insert(0, 'method', method)
+            bands.append(band)
+        return pd.concat(bands, ignore_index=True)
@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+订单日志处理器
+批量读取EA（CSimpleCSVLogger）输出的order_log CSV并写入order_logs表，
+再将order_logs与report_orders/report_deals对账：按仓位ID、票号、开仓时间建立哈希键索引逐级匹配，
+输出漏记成交、成交价偏差（滑点）、重复事件等不一致项
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from StorageBackend import create_backend, to_db_value, DB_ERRORS
+from FrameSchema import (ORDER_LOG_SCHEMA, ORDER_LOG_COLUMNS, optimize_order_logs_frame,
+                         optimize_deals_frame, optimize_orders_frame)
+from PositionReconstructor import PositionReconstructor
+from ImportCheckpoint import CheckpointedImport, DEFAULT_COMMIT_ROWS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("OrderLogProcessor.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("OrderLogProcessor")
+
+# 订单日志的插入语句（列与CTradeRecord::WriteToMySQL一致）
+ORDER_LOGS_INSERT_QUERY = """
+INSERT INTO order_logs
+(entry_time, exit_time, event_type, symbol, order_type, volume, entry_price, stop_loss, take_profit,
+ exit_price, profit, order_ticket, position_id, magic_number, comment, result, error_code, deal_entry)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# 同一事件的键：仓位ID + 进出场时间完全相同的多条记录视为重复写入
+EVENT_KEY = ['position_id', 'entry_time', 'exit_time']
+
+# 不一致类型
+ISSUE_MISSED_FILL = 'missed_fill'          # 报告中已平仓的仓位在日志中没有记录
+ISSUE_UNMATCHED_LOG = 'unmatched_log'      # 日志记录在报告中找不到对应成交
+ISSUE_DUPLICATE = 'duplicate_event'        # 同一事件或同一仓位被记录多次
+ISSUE_ENTRY_SLIPPAGE = 'entry_slippage'    # 开仓成交价与日志进场价不一致
+ISSUE_EXIT_SLIPPAGE = 'exit_slippage'      # 平仓成交价与日志出场价不一致
+ISSUE_VOLUME = 'volume_mismatch'           # 交易量不一致
+ISSUE_TIME = 'time_mismatch'               # 进出场时间不一致
+ISSUE_PROFIT = 'profit_mismatch'           # 盈利不一致
+ISSUE_NOT_CLOSED = 'not_closed'            # 日志已出场，报告中仓位仍未平仓
+
+# 对账结果的列
+MATCH_COLUMNS = [
+    'matched_by', 'log_id', 'position_id', 'order_ticket', 'symbol', 'side',
+    'log_entry_time', 'report_open_time', 'log_entry_price', 'report_open_price', 'entry_slippage',
+    'log_exit_time', 'report_close_time', 'log_exit_price', 'report_close_price', 'exit_slippage',
+    'log_volume', 'report_volume', 'log_profit', 'report_profit', 'report_closed',
+]
+
+ISSUE_COLUMNS = ['issue'] + MATCH_COLUMNS + ['detail']
+
+
+def order_log_side(order_type):
+    """日志中的订单类型（BUY / SELL / ORDER_TYPE_BUY_LIMIT 等）转换为 buy / sell"""
+    text = order_type.astype(str).str.upper()
+    return pd.Series(np.where(text.str.contains('BUY'), 'buy',
+                              np.where(text.str.contains('SELL'), 'sell', None)), index=order_type.index)
+
+
+class OrderLogReconciler:
+    """order_logs与报告成交的对账"""
+
+    def __init__(self, price_tolerance=1e-6, volume_tolerance=1e-6, profit_tolerance=0.01, time_tolerance='0s'):
+        """
+        初始化
+
+        Args:
+            price_tolerance (float): 价格差超过该值视为滑点
+            volume_tolerance (float): 交易量差超过该值视为不一致
+            profit_tolerance (float): 盈利差超过该值视为不一致（日志盈利保留两位小数）
+            time_tolerance (str): 时间差超过该值视为不一致（回测为0，实盘可放宽到若干秒）
+        """
+        self.price_tolerance = price_tolerance
+        self.volume_tolerance = volume_tolerance
+        self.profit_tolerance = profit_tolerance
+        self.time_tolerance = pd.Timedelta(time_tolerance)
+
+    @staticmethod
+    def _prepare_logs(logs_df):
+        """统一日志列类型，EA写入的0时间（1970-01-01）视为缺失"""
+        logs = optimize_order_logs_frame(logs_df).reset_index(drop=True)
+        for column in ('entry_time', 'exit_time'):
+            logs[column] = logs[column].where(logs[column] > pd.Timestamp('1971-01-01'))
+        if 'id' in logs.columns:
+            logs['log_id'] = pd.to_numeric(logs['id'], errors='coerce')
+        else:
+            logs['log_id'] = np.arange(1, len(logs) + 1)
+        logs['side'] = order_log_side(logs['order_type'])
+        for column in ('position_id', 'order_ticket'):
+            logs[column] = pd.to_numeric(logs[column], errors='coerce').fillna(0).astype('int64')
+        return logs
+
+    @staticmethod
+    def _ticket_index(deals, positions_df, deal_positions):
+        """票号 -> 仓位键的哈希索引：订单号优先，其次成交号（增量同步写入的是成交号）"""
+        order_map = PositionReconstructor().order_positions(positions_df)[['order_id', 'position_key']]
+        assigned = deal_positions[deal_positions >= 0]
+        deal_map = pd.DataFrame({
+            'order_id': pd.to_numeric(deals.loc[assigned.index, 'deal_id'], errors='coerce').to_numpy(),
+            'position_key': assigned.to_numpy(),
+        }).dropna()
+        tickets = pd.concat([order_map, deal_map], ignore_index=True)
+        tickets['order_id'] = tickets['order_id'].astype('int64')
+        return tickets.drop_duplicates('order_id').set_index('order_id')['position_key']
+
+    def _match(self, logs, positions_df, ticket_index):
+        """
+        逐级匹配日志与仓位，每级只处理尚未匹配的日志：
+        1. 仓位ID（MT5的仓位ID即开仓订单号）；2. 订单号/成交号；3. 品种 + 方向 + 开仓时间
+
+        Returns:
+            ndarray: 每条日志匹配到的仓位键（-1为未匹配）
+            ndarray: 匹配方式
+        """
+        position_key = np.full(len(logs), -1, dtype='int64')
+        matched_by = np.full(len(logs), None, dtype=object)
+
+        by_position = pd.Index(positions_df['position_id'].astype('int64')).get_indexer(logs['position_id'])
+        unique_ids = ~positions_df['position_id'].duplicated(keep=False).to_numpy()
+        hit = (by_position >= 0) & (logs['position_id'].to_numpy() > 0)
+        hit &= unique_ids[np.where(by_position >= 0, by_position, 0)]
+        position_key[hit] = positions_df['position_key'].to_numpy()[by_position[hit]]
+        matched_by[hit] = 'position_id'
+
+        pending = position_key < 0
+        by_ticket = ticket_index.reindex(logs['order_ticket']).to_numpy()
+        hit = pending & ~np.isnan(by_ticket) & (logs['order_ticket'].to_numpy() > 0)
+        position_key[hit] = by_ticket[hit].astype('int64')
+        matched_by[hit] = 'order_ticket'
+
+        pending = np.flatnonzero(position_key < 0)
+        if len(pending):
+            keys = ['symbol', 'side', 'open_time']
+            candidates = positions_df[~positions_df['position_key'].isin(position_key)]
+            candidates = candidates.drop_duplicates(keys, keep='first')
+            probe = pd.DataFrame({
+                'symbol': logs['symbol'].astype(str).to_numpy()[pending],
+                'side': logs['side'].to_numpy()[pending],
+                'open_time': logs['entry_time'].to_numpy()[pending],
+                '_row': pending,
+            })
+            joined = probe.merge(candidates.assign(symbol=candidates['symbol'].astype(str))[keys + ['position_key']],
+                                 on=keys, how='inner')
+            position_key[joined['_row'].to_numpy()] = joined['position_key'].to_numpy()
+            matched_by[joined['_row'].to_numpy()] = 'entry_time'
+        return position_key, matched_by
+
+    def reconcile(self, logs_df, deals_df, orders_df=None, restrict_to_report=True):
+        """
+        对账
+
+        Args:
+            logs_df (DataFrame): order_logs数据
+            deals_df (DataFrame): report_deals数据
+            orders_df (DataFrame): report_orders数据（可选，用于说明未成交的日志记录）
+            restrict_to_report (bool): 只检查进场时间落在报告成交时间范围内的日志
+                                       （order_logs会累积多次回测的记录）
+
+        Returns:
+            tuple: (matches_df, issues_df)
+                matches_df: 每条日志和每个未被记录的已平仓仓位一行（MATCH_COLUMNS）
+                issues_df: 每项不一致一行（ISSUE_COLUMNS），一行对账结果可能产生多项
+        """
+        deals = optimize_deals_frame(deals_df).reset_index(drop=True)
+        logs = self._prepare_logs(logs_df)
+        if restrict_to_report and len(deals) and len(logs):
+            first, last = deals['deal_time'].min(), deals['deal_time'].max()
+            in_range = logs['entry_time'].between(first, last) | logs['entry_time'].isna()
+            if (~in_range).any():
+                logger.info(f"跳过报告时间范围（{first} ~ {last}）之外的 {int((~in_range).sum())} 条日志")
+            logs = logs[in_range].reset_index(drop=True)
+
+        positions_df, deal_positions = PositionReconstructor().reconstruct(deals)
+        positions_df = positions_df.reset_index(drop=True)
+        position_key, matched_by = self._match(logs, positions_df, self._ticket_index(deals, positions_df,
+                                                                                      deal_positions))
+
+        # 日志侧：每条日志一行，匹配到的仓位信息按位置取出（仓位键即positions_df的行号）
+        positions = positions_df.set_index('position_key')
+        matched = positions.reindex(position_key)
+        side = logs['side'].where(logs['side'].notna(), pd.Series(matched['side'].to_numpy(), index=logs.index))
+        sign = np.where(side.to_numpy() == 'sell', -1.0, 1.0)
+        log_entry_price = logs['entry_price'].to_numpy(dtype='float64')
+        log_exit_price = logs['exit_price'].to_numpy(dtype='float64')
+        log_exit_price = np.where(log_exit_price > 0, log_exit_price, np.nan)
+        report_open_price = matched['open_price'].to_numpy(dtype='float64')
+        report_close_price = matched['close_price'].to_numpy(dtype='float64')
+        log_rows = pd.DataFrame({
+            'matched_by': matched_by,
+            'log_id': logs['log_id'].to_numpy(),
+            'position_id': np.where(position_key >= 0, matched['position_id'].fillna(0).to_numpy(dtype='int64'),
+                                    logs['position_id'].to_numpy()),
+            'order_ticket': logs['order_ticket'].to_numpy(),
+            'symbol': logs['symbol'].astype(object).to_numpy(),
+            'side': side.to_numpy(),
+            'log_entry_time': logs['entry_time'].to_numpy(),
+            'report_open_time': pd.to_datetime(matched['open_time']).to_numpy(),
+            'log_entry_price': log_entry_price,
+            'report_open_price': report_open_price,
+            # 正值表示报告成交价比日志价格不利
+            'entry_slippage': (report_open_price - log_entry_price) * sign,
+            'log_exit_time': logs['exit_time'].to_numpy(),
+            'report_close_time': pd.to_datetime(matched['close_time']).to_numpy(),
+            'log_exit_price': log_exit_price,
+            'report_close_price': report_close_price,
+            'exit_slippage': (log_exit_price - report_close_price) * sign,
+            'log_volume': logs['volume'].to_numpy(dtype='float64'),
+            'report_volume': matched['entry_volume'].to_numpy(dtype='float64'),
+            'log_profit': logs['profit'].to_numpy(dtype='float64'),
+            'report_profit': matched['profit'].to_numpy(dtype='float64'),
+            'report_closed': matched['is_closed'].to_numpy(),
+        })
+        log_rows['_position_key'] = position_key
+        log_rows['_event_duplicate'] = logs.duplicated(EVENT_KEY, keep='first').to_numpy()
+
+        # 仓位侧：没有任何日志记录的已平仓仓位（未平仓的仓位EA尚未写入，不算漏记）
+        missed = positions_df[~positions_df['position_key'].isin(position_key) & positions_df['is_closed']]
+        missed_rows = pd.DataFrame({
+            'matched_by': None,
+            'log_id': np.nan,
+            'position_id': missed['position_id'].to_numpy(),
+            'order_ticket': missed['entry_order_id'].to_numpy(),
+            'symbol': missed['symbol'].to_numpy(),
+            'side': missed['side'].to_numpy(),
+            'report_open_time': pd.to_datetime(missed['open_time']).to_numpy(),
+            'report_open_price': missed['open_price'].to_numpy(dtype='float64'),
+            'report_close_time': pd.to_datetime(missed['close_time']).to_numpy(),
+            'report_close_price': missed['close_price'].to_numpy(dtype='float64'),
+            'report_volume': missed['entry_volume'].to_numpy(dtype='float64'),
+            'report_profit': missed['profit'].to_numpy(dtype='float64'),
+            'report_closed': True,
+        }).reindex(columns=MATCH_COLUMNS)
+
+        issues = self._issues(log_rows, missed_rows, orders_df)
+        matches_df = pd.concat([log_rows[MATCH_COLUMNS], missed_rows], ignore_index=True)
+        counts = issues['issue'].value_counts().to_dict() if len(issues) else {}
+        logger.info(f"对账完成: 日志 {len(logs)} 条，仓位 {len(positions_df)} 个，"
+                    f"匹配 {int((position_key >= 0).sum())} 条，不一致 {len(issues)} 项 {counts}")
+        return matches_df, issues
+
+    def _issues(self, log_rows, missed_rows, orders_df):
+        """按检查规则从对账结果中筛选不一致项"""
+        matched = log_rows['_position_key'].to_numpy() >= 0
+        # 同一仓位被多条日志匹配时，第一条之后的都算重复
+        repeated = log_rows['_position_key'].duplicated(keep='first').to_numpy() & matched
+        duplicate = log_rows['_event_duplicate'].to_numpy() | repeated
+        checked = matched & ~duplicate
+
+        def outside(diff, tolerance):
+            return np.abs(diff) > tolerance
+
+        open_diff = (log_rows['report_open_time'] - log_rows['log_entry_time']).abs()
+        close_diff = (log_rows['report_close_time'] - log_rows['log_exit_time']).abs()
+        has_exit = log_rows['log_exit_time'].notna().to_numpy()
+        closed = log_rows['report_closed'].fillna(False).astype(bool).to_numpy()
+
+        checks = [
+            (ISSUE_DUPLICATE, duplicate, np.where(log_rows['_event_duplicate'], '重复写入的事件', '同一仓位的多条日志')),
+            (ISSUE_UNMATCHED_LOG, ~matched & ~log_rows['_event_duplicate'].to_numpy(),
+             self._unmatched_detail(log_rows, orders_df)),
+            (ISSUE_ENTRY_SLIPPAGE, checked & outside(log_rows['entry_slippage'].to_numpy(), self.price_tolerance),
+             '开仓价偏差'),
+            (ISSUE_EXIT_SLIPPAGE, checked & closed & has_exit
+             & outside(log_rows['exit_slippage'].to_numpy(), self.price_tolerance), '平仓价偏差'),
+            (ISSUE_VOLUME, checked & outside((log_rows['log_volume'] - log_rows['report_volume']).to_numpy(),
+                                             self.volume_tolerance), '交易量不一致'),
+            (ISSUE_TIME, checked & ((open_diff > self.time_tolerance).to_numpy()
+                                    | (closed & has_exit & (close_diff > self.time_tolerance).to_numpy())),
+             '进出场时间不一致'),
+            (ISSUE_PROFIT, checked & closed & has_exit
+             & outside((log_rows['log_profit'] - log_rows['report_profit']).to_numpy(), self.profit_tolerance),
+             '盈利不一致'),
+            (ISSUE_NOT_CLOSED, checked & has_exit & ~closed, '日志已出场但报告中仓位未平仓'),
+        ]
+        parts = []
+        for issue, mask, detail in checks:
+            mask = np.asarray(mask, dtype=bool)
+            if mask.any():
+                part = log_rows.loc[mask, MATCH_COLUMNS].copy()
+                part.insert(0, 'issue', issue)
+                part['detail'] = detail[mask] if isinstance(detail, np.ndarray) else detail
+                parts.append(part)
+        if len(missed_rows):
+            part = missed_rows.copy()
+            part.insert(0, 'issue', ISSUE_MISSED_FILL)
+            part['detail'] = '报告中已平仓的仓位没有日志记录'
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=ISSUE_COLUMNS)
+        return pd.concat(parts, ignore_index=True)[ISSUE_COLUMNS]
+
+    @staticmethod
+    def _unmatched_detail(log_rows, orders_df):
+        """未匹配日志的说明：票号出现在报告订单中时附上订单状态（如已撤销的挂单）"""
+        detail = np.full(len(log_rows), '报告中没有对应成交', dtype=object)
+        if orders_df is None or orders_df.empty:
+            return detail
+        orders = optimize_orders_frame(orders_df)
+        status = orders.drop_duplicates('order_id').set_index('order_id')['status'].astype(str)
+        found = status.reindex(log_rows['order_ticket'].to_numpy())
+        has_order = found.notna().to_numpy()
+        detail[has_order] = '报告订单状态: ' + found[has_order].to_numpy().astype(object)
+        return detail
+
+
+class OrderLogProcessor:
+    """订单日志处理器"""
+
+    def __init__(self, db_config):
+        """
+        初始化处理器
+
+        Args:
+            db_config (dict): 数据库配置
+        """
+        self.db_config = db_config
+        self.backend = create_backend(db_config)
+        self.conn = None
+        self.cursor = None
+
+    def connect_db(self):
+        """连接到数据库（MySQL或嵌入式后端）"""
+        try:
+            self.conn = self.backend.connect()
+            self.cursor = self.conn.cursor()
+            logger.info(f"成功连接到数据库（{self.backend.name}）")
+            return True
+        except (DB_ERRORS + (ImportError,)) as e:
+            logger.error(f"数据库连接失败: {e}")
+            return False
+
+    def close_db(self):
+        """关闭数据库连接"""
+        if self.cursor:
+            self.cursor.close()
+        if self.conn:
+            self.conn.close()
+        logger.info("数据库连接已关闭")
+
+    def create_tables(self):
+        """创建订单日志表（与CMySQLOrderLogger::CreateOrderLogsTable一致）"""
+        try:
+            self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_logs (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                entry_time DATETIME DEFAULT NULL COMMENT '进场时间',
+                exit_time DATETIME DEFAULT NULL COMMENT '出场时间',
+                event_type VARCHAR(20),
+                symbol VARCHAR(20),
+                order_type VARCHAR(20),
+                volume DOUBLE,
+                entry_price DOUBLE,
+                stop_loss DOUBLE,
+                take_profit DOUBLE,
+                exit_price DOUBLE COMMENT '出场价',
+                profit DOUBLE COMMENT '实际利润',
+                order_ticket BIGINT,
+                position_id BIGINT,
+                magic_number BIGINT,
+                comment TEXT,
+                result TEXT,
+                error_code INT,
+                deal_entry VARCHAR(20)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            self.conn.commit()
+            logger.info("数据表创建成功")
+            return True
+        except Exception as e:
+            logger.error(f"创建数据表失败: {e}")
+            self.conn.rollback()
+            return False
+
+    def read_order_log(self, file_path):
+        """
+        读取order_log CSV（分号分隔；MT5以FILE_CSV写入时为带BOM的UTF-16，也兼容UTF-8）
+
+        Args:
+            file_path (str): CSV文件路径
+
+        Returns:
+            DataFrame: 数据库列名的订单日志，失败返回None
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(2)
+            encoding = 'utf-16' if head in (b'\xff\xfe', b'\xfe\xff') else 'utf-8-sig'
+            df = pd.read_csv(file_path, sep=';', encoding=encoding, dtype=str, keep_default_na=False)
+            df.columns = [str(c).strip() for c in df.columns]
+            # 日志重新初始化时表头可能再次写入文件中间
+            df = df[df['EntryTime'] != 'EntryTime']
+            df = df.rename(columns=ORDER_LOG_COLUMNS)[list(ORDER_LOG_SCHEMA)]
+            df = df.replace('', np.nan)
+            df = optimize_order_logs_frame(df)
+            for column in ('entry_time', 'exit_time'):
+                df[column] = df[column].where(df[column] > pd.Timestamp('1971-01-01'))
+            logger.info(f"成功读取订单日志文件 {file_path}，包含 {len(df)} 行数据")
+            return df.reset_index(drop=True)
+        except Exception as e:
+            logger.error(f"读取订单日志文件失败: {e}")
+            return None
+
+    def load_order_logs(self):
+        """读取order_logs表"""
+        return optimize_order_logs_frame(self.backend.read_sql("SELECT * FROM order_logs ORDER BY id", self.conn))
+
+    def build_order_log_rows(self, order_logs_df):
+        """
+        将订单日志转换为order_logs的插入行
+
+        Args:
+            order_logs_df (DataFrame): 数据库列名的订单日志
+
+        Returns:
+            list: 插入行（与ORDER_LOGS_INSERT_QUERY的列顺序一致）
+        """
+        columns = list(ORDER_LOG_SCHEMA)
+        frame = order_logs_df.reindex(columns=columns).astype(object)
+        return [tuple(to_db_value(value) for value in row) for row in frame.itertuples(index=False, name=None)]
+
+    def save_order_logs_to_db(self, order_logs_df, skip_existing=True, commit_rows=DEFAULT_COMMIT_ROWS):
+        """
+        将订单日志批量写入数据库
+
+        Args:
+            order_logs_df (DataFrame): 订单日志
+            skip_existing (bool): 跳过表中已有的事件（按仓位ID和进出场时间）；
+                                  EA同时写CSV和数据库，重复导入同一文件不会产生重复事件
+            commit_rows (int): 每个事务提交的行数
+
+        Returns:
+            int: 成功插入的记录数
+        """
+        if order_logs_df is None or len(order_logs_df) == 0:
+            logger.warning("订单日志为空，跳过保存到数据库")
+            return 0
+
+        try:
+            if skip_existing:
+                existing = optimize_order_logs_frame(self.backend.read_sql(
+                    "SELECT DISTINCT position_id, entry_time, exit_time FROM order_logs", self.conn))
+                if len(existing):
+                    # 左反连接：按事件键哈希连接，保留表中没有的行（文件内部的重复行原样保留供对账）
+                    joined = order_logs_df.merge(existing.drop_duplicates(), on=EVENT_KEY, how='left',
+                                                 indicator=True)
+                    new_rows = (joined['_merge'] == 'left_only').to_numpy()
+                    if not new_rows.all():
+                        logger.info(f"跳过表中已有的 {int((~new_rows).sum())} 条事件")
+                    order_logs_df = order_logs_df[new_rows]
+
+            # 按块提交；中断后重新导入时已提交的事件被上面的跳过逻辑过滤
+            count = CheckpointedImport(self, commit_rows=commit_rows).run_frame(
+                'order_logs', ORDER_LOGS_INSERT_QUERY, order_logs_df, self.build_order_log_rows, 'order_logs')
+            logger.info(f"成功将{count}条订单日志保存到数据库")
+            return count
+
+        except DB_ERRORS as e:
+            logger.error(f"保存订单日志到数据库失败（已提交的块保留）: {e}")
+            return 0
+
+    def reconcile(self, report_file=None, reconciler=None, restrict_to_report=True):
+        """
+        将order_logs与数据库中的报告订单和成交对账
+
+        Args:
+            report_file (str): 只使用该报告文件的订单和成交（数据库中有多份报告时）
+            reconciler (OrderLogReconciler): 对账器，默认使用默认容差
+            restrict_to_report (bool): 只检查报告时间范围内的日志
+
+        Returns:
+            tuple: (matches_df, issues_df)
+        """
+        deals_df = self.backend.read_sql("SELECT * FROM report_deals ORDER BY id", self.conn)
+        orders_df = self.backend.read_sql("SELECT * FROM report_orders ORDER BY id", self.conn)
+        if report_file:
+            deals_df = deals_df[deals_df['report_file'] == report_file]
+            orders_df = orders_df[orders_df['report_file'] == report_file]
+        reconciler = reconciler or OrderLogReconciler()
+        return reconciler.reconcile(self.load_order_logs(), deals_df, orders_df,
+                                    restrict_to_report=restrict_to_report)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+仓位生命周期重建
+根据report_deals中成交的方向（in / out / inout）重建每个仓位的完整生命周期，
+支持分批平仓、多次出场和反手，不依赖segment_info中的position_id
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("PositionReconstructor")
+
+# 参与仓位计算的成交类型（balance、credit等资金类成交不属于任何仓位）
+TRADE_DEAL_TYPES = ('buy', 'sell')
+
+# 仓位重建结果的列
+POSITION_COLUMNS = [
+    'position_key', 'position_id', 'symbol', 'side',
+    'entry_deal_id', 'entry_order_id', 'exit_order_id', 'open_time', 'close_time', 'last_deal_time',
+    'entry_volume', 'exit_volume', 'open_price', 'close_price', 'last_price',
+    'commission', 'swap', 'profit', 'deal_count', 'exit_count',
+    'is_closed', 'is_reversal', 'comment', 'order_ids',
+]
+
+
+class PositionReconstructor:
+    """仓位生命周期重建器"""
+
+    def __init__(self, volume_epsilon=1e-9):
+        """
+        初始化重建器
+
+        Args:
+            volume_epsilon (float): 判断仓位是否已全部平仓的交易量容差
+        """
+        self.volume_epsilon = volume_epsilon
+        self.reset()
+
+    def reset(self):
+        """清空重建状态（已生成但尚未取出的仓位和未平仓仓位）"""
+        self._positions = []
+        # (交易品种, 方向) -> 按开仓先后排列的未平仓仓位列表
+        self._open_positions = {}
+        self._next_key = 0
+
+    def reconstruct(self, deals_df):
+        """
+        从成交记录重建仓位
+
+        成交按(交易品种, 成交时间, 成交号)排序后单次遍历：
+        每笔 in 成交开一个仓位，out 成交按先开先平减少相反方向的仓位，剩余量为0时仓位结束；
+        inout（反手）先平掉当前仓位，超出部分按相反方向开新仓，手续费按交易量分摊。
+        多空分别记账，同向的多个仓位按开仓顺序排队，因此对冲账户中同时存在的多个仓位也能区分；
+        方向无法识别的成交记录警告且不归入仓位
+
+        Args:
+            deals_df (DataFrame): 成交数据（report_deals列名）
+
+        Returns:
+            tuple: (positions_df, deal_positions)
+                positions_df: 每个仓位一行
+                deal_positions: 与deals_df同索引的Series，成交所属的position_key（非交易成交为-1）
+        """
+        self.reset()
+        if deals_df is None or deals_df.empty:
+            return pd.DataFrame(columns=POSITION_COLUMNS), pd.Series(dtype='int64')
+        deal_positions, trade_count = self._feed(deals_df)
+        positions_df = self.take_positions(closed_only=False)
+        if positions_df.empty:
+            return positions_df, deal_positions
+
+        logger.info(f"从 {trade_count} 条交易成交重建 {len(positions_df)} 个仓位，"
+                    f"其中已平仓 {int(positions_df['is_closed'].sum())} 个")
+        return positions_df, deal_positions
+
+    def feed(self, deals_df):
+        """
+        增量处理一批成交（分块读取成交表时使用），未平仓仓位保留在重建器中等待后续成交
+
+        各批成交整体需按(交易品种, 成交时间, 成交号)有序，即同一品种的成交不能早于之前批次中的成交；
+        已平仓的仓位不再变化，可随时用take_positions取出
+
+        Args:
+            deals_df (DataFrame): 成交数据（report_deals列名）
+
+        Returns:
+            Series: 与deals_df同索引，成交所属的position_key（非交易成交为-1）
+        """
+        if deals_df is None or deals_df.empty:
+            return pd.Series(dtype='int64')
+        return self._feed(deals_df)[0]
+
+    def _feed(self, deals_df):
+        """按顺序处理一批成交，返回 (deal_positions, 交易成交数)"""
+        deal_positions = pd.Series(-1, index=deals_df.index, dtype='int64')
+
+        deal_type = deals_df['type'].astype(str).str.lower().str.strip()
+        trade_mask = deal_type.isin(TRADE_DEAL_TYPES).to_numpy()
+        trades = deals_df.loc[trade_mask].copy()
+        trades['_side'] = np.where(deal_type[trade_mask] == 'buy', 1, -1)
+        trades['_direction'] = trades['direction'].astype(str).str.lower().str.strip().str.replace(' ', '_')
+        trades['_row'] = np.flatnonzero(trade_mask)
+        trades = trades.sort_values(['symbol', 'deal_time', 'deal_id'], kind='mergesort')
+
+        # 取出numpy数组后单次遍历，避免逐行访问DataFrame
+        symbols = trades['symbol'].astype(str).to_numpy()
+        sides = trades['_side'].to_numpy()
+        directions = trades['_direction'].to_numpy()
+        volumes = pd.to_numeric(trades['volume'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        prices = pd.to_numeric(trades['price'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        times = trades['deal_time'].to_numpy()
+        order_ids = pd.to_numeric(trades['order_id'], errors='coerce').fillna(0).to_numpy(dtype='int64')
+        commissions = pd.to_numeric(trades['commission'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        swaps = pd.to_numeric(trades['swap'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        profits = pd.to_numeric(trades['profit'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        comments = trades['comment'].to_numpy()
+        deal_ids = pd.to_numeric(trades['deal_id'], errors='coerce').to_numpy()
+        rows = trades['_row'].to_numpy()
+
+        positions = self._positions
+        open_positions = self._open_positions
+        assigned = np.full(len(trades), -1, dtype='int64')
+
+        def open_position(i, side, is_reversal):
+            position = {
+                'position_key': self._next_key,
+                'position_id': order_ids[i],
+                'symbol': symbols[i],
+                'side': 'buy' if side > 0 else 'sell',
+                'entry_deal_id': deal_ids[i],
+                'entry_order_id': order_ids[i],
+                'exit_order_id': None,
+                'open_time': times[i],
+                'close_time': None,
+                'last_deal_time': times[i],
+                'entry_volume': 0.0,
+                'exit_volume': 0.0,
+                '_open_value': 0.0,
+                '_close_value': 0.0,
+                'remaining': 0.0,
+                'last_price': prices[i],
+                'commission': 0.0,
+                'swap': 0.0,
+                'profit': 0.0,
+                'deal_count': 0,
+                'exit_count': 0,
+                'is_closed': False,
+                'is_reversal': is_reversal,
+                'comment': comments[i],
+                'order_ids': [],
+            }
+            self._next_key += 1
+            positions.append(position)
+            open_positions.setdefault((symbols[i], side), []).append(position)
+            return position
+
+        def add_deal(position, i):
+            position['deal_count'] += 1
+            position['last_deal_time'] = times[i]
+            position['last_price'] = prices[i]
+            position['comment'] = comments[i]
+            if not position['order_ids'] or position['order_ids'][-1] != order_ids[i]:
+                position['order_ids'].append(order_ids[i])
+
+        def add_entry(position, i, volume):
+            position['entry_volume'] += volume
+            position['_open_value'] += volume * prices[i]
+            position['remaining'] += volume
+
+        def add_exit(position, i, volume):
+            position['exit_volume'] += volume
+            position['_close_value'] += volume * prices[i]
+            position['remaining'] -= volume
+            position['exit_count'] += 1
+            position['exit_order_id'] = order_ids[i]
+            position['close_time'] = times[i]
+            if position['remaining'] <= self.volume_epsilon:
+                position['remaining'] = 0.0
+                position['is_closed'] = True
+                side = 1 if position['side'] == 'buy' else -1
+                open_positions[(position['symbol'], side)].remove(position)
+
+        def add_costs(position, i, share, commission_share=None):
+            position['commission'] += commissions[i] * (share if commission_share is None else commission_share)
+            position['swap'] += swaps[i] * share
+            position['profit'] += profits[i] * share
+
+        for i in range(len(trades)):
+            side = sides[i]
+            direction = directions[i]
+            volume = volumes[i]
+            opposite = open_positions.get((symbols[i], -side))
+
+            if direction != 'in' and not opposite:
+                # 报告截取不完整时可能出现没有对应仓位的平仓成交，按开仓处理
+                logger.warning(f"订单 {order_ids[i]} 的成交没有可平的仓位，按开仓处理")
+                direction = 'in'
+
+            if direction == 'in':
+                # 每笔开仓成交单独建仓（对冲账户的同向仓位互相独立），平仓时按先开先平分配
+                position = open_position(i, side, False)
+                add_entry(position, i, volume)
+                add_deal(position, i)
+                add_costs(position, i, 1.0)
+                assigned[i] = position['position_key']
+
+            elif direction in ('out', 'inout', 'out_by'):
+                # 平仓成交按开仓先后关闭相反方向的仓位，超出一个仓位剩余量的部分继续平下一个仓位，
+                # 手续费、库存费和盈亏按各仓位平仓量分摊
+                left = volume
+                closed = []
+                while opposite and left > self.volume_epsilon:
+                    position = opposite[0]
+                    close_volume = min(left, position['remaining'])
+                    add_exit(position, i, close_volume)
+                    add_deal(position, i)
+                    closed.append((position, close_volume))
+                    left -= close_volume
+                if not closed:
+                    # 交易量为0的平仓成交只记入最早的仓位，不改变剩余量
+                    add_deal(opposite[0], i)
+                    closed.append((opposite[0], 0.0))
+                if left > self.volume_epsilon and direction != 'inout':
+                    # 平仓量超过全部未平仓量时，超出部分计入最后平掉的仓位
+                    logger.warning(f"订单 {order_ids[i]} 的平仓量超过未平仓量 {left:g}")
+                    position, close_volume = closed[-1]
+                    position['exit_volume'] += left
+                    position['_close_value'] += left * prices[i]
+                    closed[-1] = (position, close_volume + left)
+                    left = 0.0
+                # 盈亏和库存费全部属于被平掉的仓位；反手时手续费按交易量在平仓和新仓之间分摊
+                closed_volume = volume - left
+                for position, close_volume in closed:
+                    share = close_volume / closed_volume if closed_volume > 0 else 1.0 / len(closed)
+                    add_costs(position, i, share, close_volume / volume if volume > 0 else share)
+                assigned[i] = closed[0][0]['position_key']
+
+                # 反手：超出平仓量的部分按成交方向开新仓，手续费按交易量分摊到新仓位
+                if direction == 'inout' and left > self.volume_epsilon:
+                    new_position = open_position(i, side, True)
+                    add_entry(new_position, i, left)
+                    add_deal(new_position, i)
+                    new_position['commission'] += commissions[i] * (left / volume)
+
+            else:
+                # 方向缺失或无法识别时无法判断是开仓还是平仓，不归入任何仓位
+                logger.warning(f"订单 {order_ids[i]} 的成交方向无法识别（{trades['direction'].iloc[i]!r}），"
+                               f"不归入仓位")
+
+        deal_positions.iloc[rows] = assigned
+        return deal_positions, len(trades)
+
+    def take_positions(self, closed_only=True):
+        """
+        取出已生成的仓位并从重建器中移除
+
+        Args:
+            closed_only (bool): 只取出已平仓的仓位，未平仓的仓位留待后续成交；False时全部取出
+
+        Returns:
+            DataFrame: 每个仓位一行（POSITION_COLUMNS），按建仓顺序排列
+        """
+        if closed_only:
+            taken = [position for position in self._positions if position['is_closed']]
+            self._positions = [position for position in self._positions if not position['is_closed']]
+        else:
+            taken, self._positions = self._positions, []
+            self._open_positions = {}
+        positions_df = pd.DataFrame(taken)
+        if positions_df.empty:
+            return pd.DataFrame(columns=POSITION_COLUMNS)
+
+        positions_df['open_price'] = np.where(positions_df['entry_volume'] > 0,
+                                              positions_df['_open_value'] / positions_df['entry_volume'].where(positions_df['entry_volume'] > 0, 1),
+                                              np.nan)
+        positions_df['close_price'] = np.where(positions_df['exit_volume'] > 0,
+                                               positions_df['_close_value'] / positions_df['exit_volume'].where(positions_df['exit_volume'] > 0, 1),
+                                               np.nan)
+        positions_df['order_ids'] = positions_df['order_ids'].apply(tuple)
+        return positions_df[POSITION_COLUMNS]
+
+    def order_positions(self, positions_df):
+        """
+        展开仓位涉及的订单，得到订单号到仓位的映射
+
+        Args:
+            positions_df (DataFrame): reconstruct返回的仓位数据
+
+        Returns:
+            DataFrame: order_id, position_key, position_id
+        """
+        if positions_df.empty:
+            return pd.DataFrame(columns=['order_id', 'position_key', 'position_id'])
+        exploded = positions_df[['position_key', 'position_id', 'order_ids']].explode('order_ids')
+        exploded = exploded.rename(columns={'order_ids': 'order_id'})
+        exploded['order_id'] = exploded['order_id'].astype('int64')
+        return exploded[['order_id', 'position_key', 'position_id']].reset_index(drop=True)
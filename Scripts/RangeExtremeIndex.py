@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+M1区间极值索引与回撤计算
+对K线的最高价/最低价建立分块区间极值索引（块内前缀/后缀极值 + 块间稀疏表），
+任意时间区间的最高/最低价及其时间可在常数时间内得到（时间定位为一次二分查找），
+据此离线复现CTradeAnalyzer::CalculateRetracement的回撤指标并附加到汇总表每一行
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("RangeExtremeIndex")
+
+# 默认块大小：块内查询最多扫描这么多根K线
+DEFAULT_BLOCK_SIZE = 32
+
+# 默认的回看窗口：开仓前这段时间内的最高/最低点构成区间
+DEFAULT_LOOKBACK = '4h'
+
+
+class RangeMaxIndex:
+    """
+    一维数组的区间最大值位置索引
+
+    查询区间 [left, right] 跨越多个块时，由左端块的后缀最大值、中间整块的稀疏表和右端块的前缀最大值
+    三段比较得到；同一块内的查询直接扫描该块。并列时取最早的位置（与在K线上从旧到新查找一致）。
+    额外内存约为 2n 个int32加上 (n/块大小)·log(n/块大小) 的稀疏表。
+    """
+
+    def __init__(self, values, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        建立索引
+
+        Args:
+            values (array): 数值数组（最小值查询传入相反数）
+            block_size (int): 块大小
+        """
+        self.values = np.ascontiguousarray(values, dtype='float64')
+        self.block_size = max(1, int(block_size))
+        n = len(self.values)
+        blocks = -(-n // self.block_size)
+
+        # 末尾块用-inf补齐，不会成为最大值
+        padded = np.full(blocks * self.block_size, -np.inf)
+        padded[:n] = self.values
+        grid = padded.reshape(blocks, self.block_size)
+        offsets = np.arange(self.block_size)
+        starts = (np.arange(blocks) * self.block_size)[:, None]
+
+        # 块内前缀最大值位置：严格大于之前的最大值才更新，保证并列时取最早位置
+        running = np.maximum.accumulate(grid, axis=1)
+        new_max = np.ones_like(grid, dtype=bool)
+        new_max[:, 1:] = grid[:, 1:] > running[:, :-1]
+        prefix = np.maximum.accumulate(np.where(new_max, offsets, 0), axis=1) + starts
+
+        # 块内后缀最大值位置：从右往左，大于等于即更新，保证并列时取最早位置
+        reverse = grid[:, ::-1]
+        running = np.maximum.accumulate(reverse, axis=1)
+        new_max = np.ones_like(reverse, dtype=bool)
+        new_max[:, 1:] = reverse[:, 1:] >= running[:, :-1]
+        suffix = (self.block_size - 1 - np.maximum.accumulate(np.where(new_max, offsets, 0), axis=1))[:, ::-1] + starts
+
+        self.prefix = prefix.ravel()[:n].astype('int32')
+        self.suffix = suffix.ravel()[:n].astype('int32')
+
+        # 块间稀疏表：sparse[k][i] 为第 i..i+2^k-1 块中最大值的位置
+        block_max = self.suffix[::self.block_size] if n else np.empty(0, dtype='int32')
+        self.sparse = [block_max]
+        span = 1
+        while span * 2 <= blocks:
+            previous = self.sparse[-1]
+            self.sparse.append(self._better(previous[:-span], previous[span:]))
+            span *= 2
+
+    def _better(self, left, right):
+        """两组位置中取值较大者（并列取左侧，即较早位置）"""
+        return np.where(self.values[left] >= self.values[right], left, right)
+
+    def argmax(self, left, right):
+        """
+        区间最大值位置
+
+        Args:
+            left (array): 区间起点（含）
+            right (array): 区间终点（含）
+
+        Returns:
+            ndarray: 最大值位置，空区间为-1
+        """
+        left = np.atleast_1d(np.asarray(left, dtype='int64'))
+        right = np.atleast_1d(np.asarray(right, dtype='int64'))
+        result = np.full(len(left), -1, dtype='int64')
+        valid = (left <= right) & (left >= 0) & (right < len(self.values))
+        if not valid.any():
+            return result
+
+        left_block = left // self.block_size
+        right_block = right // self.block_size
+
+        # 同一块内：扫描至多block_size个元素
+        same = valid & (left_block == right_block)
+        if same.any():
+            lo, hi = left[same], right[same]
+            window = lo[:, None] + np.arange(self.block_size)
+            inside = window <= hi[:, None]
+            window = np.where(inside, window, lo[:, None])
+            candidates = np.where(inside, self.values[window], -np.inf)
+            result[same] = window[np.arange(len(lo)), np.argmax(candidates, axis=1)]
+
+        # 跨块：左端后缀 + 中间整块 + 右端前缀
+        cross = valid & (left_block != right_block)
+        if cross.any():
+            lo, hi = left[cross], right[cross]
+            best = self._better(self.suffix[lo], self.prefix[hi])
+            first, last = left_block[cross] + 1, right_block[cross] - 1
+            middle = first <= last
+            if middle.any():
+                first, last = first[middle], last[middle]
+                level = np.floor(np.log2(last - first + 1)).astype('int64')
+                inner = np.empty(len(first), dtype='int64')
+                for k in np.unique(level):
+                    rows = level == k
+                    table = self.sparse[k]
+                    inner[rows] = self._better(table[first[rows]], table[last[rows] - (1 << k) + 1])
+                # 按从左到右的顺序比较，保证并列时取最早位置
+                left_part = self.suffix[lo[middle]]
+                merged = self._better(left_part, inner)
+                best[middle] = self._better(merged, self.prefix[hi[middle]])
+            result[cross] = best
+        return result
+
+    def first_above(self, left, right, threshold):
+        """
+        区间内第一个大于阈值的位置
+
+        区间前缀最大值随终点单调不减，因此对终点做向量化二分查找，每一步为一次常数时间的区间查询
+
+        Args:
+            left (array): 区间起点（含）
+            right (array): 区间终点（含）
+            threshold (array): 阈值
+
+        Returns:
+            ndarray: 第一个大于阈值的位置，不存在时为-1
+        """
+        left = np.atleast_1d(np.asarray(left, dtype='int64'))
+        right = np.atleast_1d(np.asarray(right, dtype='int64'))
+        threshold = np.broadcast_to(np.asarray(threshold, dtype='float64'), left.shape)
+        result = np.full(len(left), -1, dtype='int64')
+
+        whole = self.argmax(left, right)
+        hit = whole >= 0
+        hit[hit] = self.values[whole[hit]] > threshold[hit]
+        if not hit.any():
+            return result
+
+        start, lo, hi, level = left[hit], left[hit], right[hit], threshold[hit]
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi) // 2
+            reached = self.values[self.argmax(start, mid)] > level
+            hi = np.where(active & reached, mid, hi)
+            lo = np.where(active & ~reached, mid + 1, lo)
+        result[hit] = lo
+        return result
+
+
+class BarRangeIndex:
+    """K线时间区间的最高价/最低价查询"""
+
+    def __init__(self, bars, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        建立索引
+
+        Args:
+            bars (DataFrame): time, high, low（如load_bars读取的M1K线），按时间升序
+            block_size (int): 块大小
+        """
+        bars = bars.sort_values('time', kind='mergesort') if not bars['time'].is_monotonic_increasing else bars
+        self.times = bars['time'].to_numpy(dtype='datetime64[ns]')
+        self.high = bars['high'].to_numpy(dtype='float64')
+        self.low = bars['low'].to_numpy(dtype='float64')
+        self.high_index = RangeMaxIndex(self.high, block_size)
+        self.low_index = RangeMaxIndex(-self.low, block_size)
+        logger.info(f"区间极值索引建立完成: {len(self.times)} 根K线")
+
+    def locate(self, start, end, include_start=True):
+        """
+        时间区间 -> K线位置区间
+
+        Args:
+            start: 起始时间（数组或标量）
+            end: 结束时间（含）
+            include_start (bool): 是否包含起始时间所在的K线
+
+        Returns:
+            tuple: (left, right) 位置数组，空区间时left > right
+        """
+        start = np.atleast_1d(pd.to_datetime(start).to_numpy(dtype='datetime64[ns]'))
+        end = np.atleast_1d(pd.to_datetime(end).to_numpy(dtype='datetime64[ns]'))
+        left = np.searchsorted(self.times, start, side='left' if include_start else 'right')
+        right = np.searchsorted(self.times, end, side='right') - 1
+        # 缺失时间视为空区间
+        missing = np.isnat(start) | np.isnat(end)
+        left[missing], right[missing] = 1, 0
+        return left, right
+
+    def _extreme(self, index, prices, left, right):
+        """按位置区间查询极值，返回 (价格, 时间, 位置)"""
+        return self._position_values(index.argmax(left, right), prices)
+
+    def highest(self, start, end, include_start=True):
+        """
+        时间区间内的最高价及其时间
+
+        Returns:
+            tuple: (价格数组, 时间数组, K线位置数组)，无K线时为NaN/NaT/-1
+        """
+        left, right = self.locate(start, end, include_start)
+        return self._extreme(self.high_index, self.high, left, right)
+
+    def lowest(self, start, end, include_start=True):
+        """
+        时间区间内的最低价及其时间
+
+        Returns:
+            tuple: (价格数组, 时间数组, K线位置数组)，无K线时为NaN/NaT/-1
+        """
+        left, right = self.locate(start, end, include_start)
+        return self._extreme(self.low_index, self.low, left, right)
+
+    def first_above(self, start, end, level, include_start=True):
+        """
+        时间区间内最高价第一次高于level的K线
+
+        Returns:
+            tuple: (K线最高价, 时间, K线位置)，未突破时为NaN/NaT/-1
+        """
+        left, right = self.locate(start, end, include_start)
+        return self._position_values(self.high_index.first_above(left, right, level), self.high)
+
+    def first_below(self, start, end, level, include_start=True):
+        """
+        时间区间内最低价第一次低于level的K线
+
+        Returns:
+            tuple: (K线最低价, 时间, K线位置)，未跌破时为NaN/NaT/-1
+        """
+        left, right = self.locate(start, end, include_start)
+        level = -np.asarray(level, dtype='float64')
+        return self._position_values(self.low_index.first_above(left, right, level), self.low)
+
+    def _position_values(self, position, prices):
+        """K线位置 -> (价格, 时间, 位置)，-1表示不存在"""
+        found = position >= 0
+        if len(prices) == 0:
+            return np.full(len(position), np.nan), np.full(len(position), np.datetime64('NaT', 'ns')), position
+        price = np.where(found, prices[np.where(found, position, 0)], np.nan)
+        time = np.where(found, self.times[np.where(found, position, 0)], np.datetime64('NaT'))
+        return price, time, position
+
+    def retracement(self, start, end):
+        """
+        区间回撤（CTradeAnalyzer::CalculateRetracement）
+
+        以 [start, end] 内的最高点和最低点构成区间，最高点晚于最低点视为上涨区间：
+        上涨区间取最高点之后到end的最低价为回撤价，回撤 = 区间高点 - 回撤价；
+        下跌区间取最低点之后到end的最高价为反弹价，反弹 = 反弹价 - 区间低点；
+        回撤百分比 = 回撤 / (区间高点 - 区间低点) * 100。极值点之后没有K线时回撤价为极值点本身
+
+        Args:
+            start: 区间起始时间（数组）
+            end: 区间结束时间（数组）
+
+        Returns:
+            DataFrame: range_high, range_high_time, range_low, range_low_time, uptrend,
+                       retrace_price, retrace_time, retrace_diff, retrace_percent
+        """
+        left, right = self.locate(start, end)
+        range_high, high_time, high_pos = self._extreme(self.high_index, self.high, left, right)
+        range_low, low_time, low_pos = self._extreme(self.low_index, self.low, left, right)
+        uptrend = high_pos >= low_pos
+        empty = high_pos < 0
+
+        # 极值点之后（不含极值所在K线）的反向极值，与iLowest/iHighest从极值K线的下一根开始一致
+        after = np.where(uptrend, high_pos, low_pos) + 1
+        right = np.where(empty, -1, right)
+        after_low, after_low_time, _ = self._extreme(self.low_index, self.low, after, right)
+        after_high, after_high_time, _ = self._extreme(self.high_index, self.high, after, right)
+
+        retrace_price = np.where(uptrend, after_low, after_high)
+        retrace_time = np.where(uptrend, after_low_time, after_high_time)
+        no_bars = np.isnan(retrace_price)
+        retrace_price = np.where(no_bars, np.where(uptrend, range_high, range_low), retrace_price)
+        retrace_time = np.where(no_bars, np.where(uptrend, high_time, low_time), retrace_time)
+
+        retrace_diff = np.where(uptrend, range_high - retrace_price, retrace_price - range_low)
+        range_diff = range_high - range_low
+        with np.errstate(divide='ignore', invalid='ignore'):
+            retrace_percent = np.where(range_diff > 0, retrace_diff / range_diff * 100.0, 0.0)
+
+        result = pd.DataFrame({
+            'range_high': range_high,
+            'range_high_time': high_time,
+            'range_low': range_low,
+            'range_low_time': low_time,
+            'uptrend': pd.array(np.where(empty, pd.NA, uptrend), dtype='boolean'),
+            'retrace_price': retrace_price,
+            'retrace_time': retrace_time,
+            'retrace_diff': retrace_diff,
+            'retrace_percent': np.where(empty, np.nan, retrace_percent),
+        })
+        return result
+
+
+def attach_retracement(summary_df, index, lookback=DEFAULT_LOOKBACK, time_column='open_time',
+                       start_column=None, prefix='retrace_'):
+    """
+    为汇总数据每一行附加回撤指标
+
+    Args:
+        summary_df (DataFrame): 汇总数据
+        index (BarRangeIndex): K线区间极值索引
+        lookback (str): 区间起点 = time_column - lookback（指定start_column时忽略）
+        time_column (str): 区间终点列，默认开仓时间
+        start_column (str): 区间起点列（如线段起点时间）
+        prefix (str): 新增列名前缀
+
+    Returns:
+        DataFrame: 附加了 {prefix}range_high ... {prefix}retrace_percent 列的副本，行顺序不变
+    """
+    end = pd.to_datetime(summary_df[time_column])
+    if start_column:
+        start = pd.to_datetime(summary_df[start_column])
+    else:
+        start = end - pd.Timedelta(lookback)
+
+    metrics = index.retracement(start, end)
+    result = summary_df.copy()
+    for column in metrics.columns:
+        name = column if column.startswith(prefix) else f"{prefix}{column}"
+        result[name] = metrics[column].to_numpy()
+    logger.info(f"已为 {len(result)} 行附加回撤指标，其中 {int(metrics['range_high'].notna().sum())} 行有K线数据")
+    return result
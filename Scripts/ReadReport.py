@@ -21,6 +21,11 @@ import sys
 from TradeDataProcessor import TradeDataProcessor
 from SegmentDataProcessor import SegmentDataProcessor
 from TradeSummaryProcessor import TradeSummaryProcessor
+from SummaryCache import SummaryCache
+from DataExporter import DataExporter
+from SegmentArchive import SegmentArchive, file_run_id
+from BacktestStatistics import BacktestStatistics, format_statistics
+from ChartPanel import ChartPanel, load_chart_data
 
 # 配置日志
 logging.basicConfig(
@@ -48,7 +53,9 @@ class ReadReportGUI:
         self.root.geometry("800x600")
         
         # 数据库配置
+        # backend可选 mysql / sqlite / duckdb，嵌入式后端通过path指定数据库文件，无需启动MySQL服务
         self.db_config = {
+            'backend': 'mysql',
             'host': 'localhost',
             'user': 'root',
             'password': '!Aa123456',
@@ -59,7 +66,9 @@ class ReadReportGUI:
         # 初始化数据处理器
         self.trade_processor = TradeDataProcessor(self.db_config)
         self.segment_processor = SegmentDataProcessor(self.db_config)
-        self.summary_processor = TradeSummaryProcessor(self.db_config)
+        # 源数据未变化时重复生成汇总表直接使用本地缓存
+        self.summary_cache = SummaryCache(db_config=self.db_config)
+        self.summary_processor = TradeSummaryProcessor(self.db_config, cache=self.summary_cache)
         
         # 文件路径
         self.file_path = tk.StringVar()
@@ -94,6 +103,7 @@ class ReadReportGUI:
         # 线段操作按钮
         tk.Button(segment_frame, text="读取线段列表", command=self.read_segment_data, bg="#9C27B0", fg="white").pack(side=tk.LEFT, padx=(0, 5))
         tk.Button(segment_frame, text="写入线段表", command=self.save_segment_database, bg="#607D8B", fg="white").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Button(segment_frame, text="归档Parquet", command=self.archive_segment_data, bg="#795548", fg="white").pack(side=tk.LEFT, padx=(0, 5))
         
         # 汇总数据操作框架
         summary_frame = tk.LabelFrame(main_frame, text="汇总数据操作 - 生成订单、成交和线段综合分析数据", padx=5, pady=5)
@@ -102,7 +112,11 @@ class ReadReportGUI:
         # 汇总操作按钮
         tk.Button(summary_frame, text="生成汇总表", command=self.generate_summary_data, bg="#FF5722", fg="white").pack(side=tk.LEFT, padx=(0, 5))
         tk.Button(summary_frame, text="保存汇总CSV", command=self.save_summary_csv, bg="#FF9800", fg="white").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Button(summary_frame, text="导出汇总", command=self.export_summary, bg="#009688", fg="white").pack(side=tk.LEFT, padx=(0, 5))
         tk.Button(summary_frame, text="保存汇总数据库", command=self.save_summary_database, bg="#FFC107", fg="white").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Button(summary_frame, text="回测统计", command=self.show_statistics, bg="#3F51B5", fg="white").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Button(summary_frame, text="资金曲线图", command=self.show_chart, bg="#00796B", fg="white").pack(side=tk.LEFT, padx=(0, 5))
+        tk.Button(summary_frame, text="清除汇总缓存", command=self.clear_summary_cache, bg="#9E9E9E", fg="white").pack(side=tk.LEFT, padx=(0, 5))
         
         # 日志显示框架
         log_frame = tk.LabelFrame(main_frame, text="运行日志", padx=5, pady=5)
@@ -121,6 +135,11 @@ class ReadReportGUI:
 4. 在"交易历史操作"框中点击"清空日志"按钮清空日志显示
 5. 在"线段数据操作"框中点击"读取线段列表"按钮选择并读取线段信息数据
 6. 在"线段数据操作"框中点击"写入线段表"按钮将线段信息保存到数据库
+7. 在"线段数据操作"框中点击"归档Parquet"按钮将线段信息归档为按日期和周期分区的Parquet数据集
+8. 在"汇总数据操作"框中点击"回测统计"按钮根据数据库中的成交和汇总数据计算回撤、盈利因子等统计
+9. 源数据未变化时再次生成汇总表直接使用本地缓存，点击"清除汇总缓存"按钮强制重新生成
+10. 在"汇总数据操作"框中点击"导出汇总"按钮将汇总数据分块导出为XLSX、Parquet、Arrow或CSV文件
+11. 在"汇总数据操作"框中点击"资金曲线图"按钮查看结余/权益曲线、开平仓标记和线段（滚轮缩放、拖动平移、双击复原）
         """
         tk.Label(main_frame, text=info_text, justify=tk.LEFT, fg="blue").pack(fill=tk.X, pady=(10, 0))
     
@@ -194,11 +213,10 @@ class ReadReportGUI:
             logger.info("开始保存到数据库...")
             if self.trade_processor.connect_db():
                 if self.trade_processor.create_tables():
-                    # 在保存新数据之前清除现有数据
-                    self.trade_processor.clear_database()
+                    # 在保存新数据之前清除现有数据（上次保存中断时从最后提交的块继续，不清除）
                     # 使用默认文件名，因为我们现在不保存文件路径
-                    orders_count = self.trade_processor.save_orders_to_db(self.orders_df, "ReportTester.xlsx")
-                    deals_count = self.trade_processor.save_deals_to_db(self.deals_df, "ReportTester.xlsx")
+                    orders_count = self.trade_processor.save_orders_to_db(self.orders_df, "ReportTester.xlsx", replace=True)
+                    deals_count = self.trade_processor.save_deals_to_db(self.deals_df, "ReportTester.xlsx", replace=True)
                     logger.info(f"成功将 {orders_count} 条订单记录和 {deals_count} 条成交记录保存到数据库")
                     messagebox.showinfo("成功", f"成功将 {orders_count} 条订单记录和 {deals_count} 条成交记录保存到数据库")
                 self.trade_processor.close_db()
@@ -233,6 +251,8 @@ class ReadReportGUI:
             
             # 读取segment_info.csv文件
             self.segments_df = self.segment_processor.read_segment_data(file_path)
+            self.segment_source_name = os.path.basename(file_path)
+            self.segment_source_path = file_path
             if self.segments_df is not None:
                 logger.info(f"成功读取线段数据，共 {len(self.segments_df)} 条记录")
                 messagebox.showinfo("成功", f"成功读取线段数据，共 {len(self.segments_df)} 条记录")
@@ -253,9 +273,9 @@ class ReadReportGUI:
             logger.info("开始保存线段数据到数据库...")
             if self.segment_processor.connect_db():
                 if self.segment_processor.create_tables():
-                    # 在保存新数据之前清除现有线段数据
-                    self.segment_processor.clear_segment_database()
-                    segments_count = self.segment_processor.save_segments_to_db(self.segments_df)
+                    # 在保存新数据之前清除现有线段数据（上次保存中断时从最后提交的块继续，不清除）
+                    segments_count = self.segment_processor.save_segments_to_db(
+                        self.segments_df, getattr(self, 'segment_source_name', 'segment_info.csv'), replace=True)
                     logger.info(f"成功将 {segments_count} 条线段记录保存到数据库")
                     messagebox.showinfo("成功", f"成功将 {segments_count} 条线段记录保存到数据库")
                 self.segment_processor.close_db()
@@ -266,6 +286,30 @@ class ReadReportGUI:
             logger.error(f"保存线段数据到数据库失败: {e}")
             messagebox.showerror("错误", f"保存线段数据到数据库失败: {e}")
 
+    def archive_segment_data(self):
+        """将线段数据归档为按日期和时间周期分区的Parquet数据集"""
+        if not hasattr(self, 'segments_df'):
+            messagebox.showerror("错误", "请先读取线段数据")
+            return
+        
+        try:
+            # 获取当前应用程序目录
+            initial_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
+            
+            # 选择归档目录
+            archive_dir = filedialog.askdirectory(title="选择线段归档目录", initialdir=initial_dir)
+            if not archive_dir:
+                return
+            
+            archive = SegmentArchive(archive_dir)
+            archived_count = archive.archive_segments(self.segments_df, self.segment_source_name,
+                                                      run_name=file_run_id(self.segment_source_path))
+            logger.info(f"成功将 {archived_count} 条线段记录归档到: {archive_dir}")
+            messagebox.showinfo("成功", f"成功将 {archived_count} 条线段记录归档到: {archive_dir}")
+        except Exception as e:
+            logger.error(f"归档线段数据失败: {e}")
+            messagebox.showerror("错误", f"归档线段数据失败: {e}")
+
     def generate_summary_data(self):
         """生成汇总数据"""
         try:
@@ -319,6 +363,31 @@ class ReadReportGUI:
             logger.error(f"保存汇总数据CSV失败: {e}")
             messagebox.showerror("错误", f"保存汇总数据CSV失败: {e}")
 
+    def export_summary(self):
+        """分块导出汇总数据（格式由文件扩展名决定）"""
+        if not hasattr(self, 'summary_df'):
+            messagebox.showerror("错误", "请先生成汇总数据")
+            return
+        
+        try:
+            # 获取当前应用程序目录
+            initial_dir = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
+            
+            export_path = filedialog.asksaveasfilename(
+                title="导出汇总数据", initialdir=initial_dir, initialfile="trade_summary.xlsx",
+                defaultextension=".xlsx",
+                filetypes=[("Excel文件", "*.xlsx"), ("Parquet文件", "*.parquet"),
+                           ("Arrow IPC文件", "*.arrow"), ("CSV文件", "*.csv")])
+            if not export_path:
+                return
+            
+            rows = DataExporter().export_frame(self.summary_df, export_path)
+            logger.info(f"汇总数据已导出到: {export_path}")
+            messagebox.showinfo("成功", f"已导出 {rows} 条汇总数据到: {export_path}")
+        except Exception as e:
+            logger.error(f"导出汇总数据失败: {e}")
+            messagebox.showerror("错误", f"导出汇总数据失败: {e}")
+
     def save_summary_database(self):
         """保存汇总数据到数据库"""
         if not hasattr(self, 'summary_df'):
@@ -330,8 +399,7 @@ class ReadReportGUI:
             if self.summary_processor.connect_db():
                 # 创建汇总表
                 if self.summary_processor.create_summary_table():
-                    # 清除现有数据并保存新数据
-                    self.summary_processor.clear_summary_database()
+                    # 增量保存：只删除不再存在的行、插入新增或变化的行（中断后重新保存时只写入仍有差异的行）
                     summary_count = self.summary_processor.save_summary_to_db(self.summary_df)
                     logger.info(f"成功将 {summary_count} 条汇总记录保存到数据库")
                     messagebox.showinfo("成功", f"成功将 {summary_count} 条汇总记录保存到数据库")
@@ -346,6 +414,54 @@ class ReadReportGUI:
             logger.error(f"保存汇总数据到数据库失败: {e}")
             messagebox.showerror("错误", f"保存汇总数据到数据库失败: {e}")
 
+    def show_statistics(self):
+        """根据数据库中的成交和汇总数据计算回测统计"""
+        try:
+            logger.info("开始计算回测统计...")
+            if self.summary_processor.connect_db():
+                try:
+                    stats = BacktestStatistics().load_from_db(self.summary_processor.backend, self.summary_processor.conn)
+                finally:
+                    self.summary_processor.close_db()
+                report = format_statistics(stats)
+                logger.info(f"回测统计:\n{report}")
+                messagebox.showinfo("回测统计", "\n".join(report.split("\n")[:8]))
+            else:
+                logger.error("无法连接到数据库")
+                messagebox.showerror("错误", "无法连接到数据库")
+        except Exception as e:
+            logger.error(f"计算回测统计失败: {e}")
+            messagebox.showerror("错误", f"计算回测统计失败: {e}")
+
+    def show_chart(self):
+        """根据数据库中的成交和线段数据打开资金曲线图"""
+        try:
+            logger.info("开始读取图表数据...")
+            if self.summary_processor.connect_db():
+                try:
+                    data = load_chart_data(self.summary_processor.backend, self.summary_processor.conn)
+                finally:
+                    self.summary_processor.close_db()
+                if data['curve'].empty:
+                    messagebox.showwarning("警告", "数据库中没有成交数据，请先保存交易历史到数据库")
+                    return
+                ChartPanel(tk.Toplevel(self.root), data)
+            else:
+                logger.error("无法连接到数据库")
+                messagebox.showerror("错误", "无法连接到数据库")
+        except Exception as e:
+            logger.error(f"打开资金曲线图失败: {e}")
+            messagebox.showerror("错误", f"打开资金曲线图失败: {e}")
+
+    def clear_summary_cache(self):
+        """清除汇总结果缓存"""
+        try:
+            removed = self.summary_cache.invalidate()
+            messagebox.showinfo("成功", f"已清除 {removed} 条汇总缓存")
+        except OSError as e:
+            logger.error(f"清除汇总缓存失败: {e}")
+            messagebox.showerror("错误", f"清除汇总缓存失败: {e}")
+
 class TextRedirector:
     """重定向stdout/stderr到文本框"""
     def __init__(self, widget, tag="stdout"):
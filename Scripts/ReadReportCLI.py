@@ -0,0 +1,707 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ReadReport命令行版本
+提供与GUI相同的分析功能，适合批量处理和脚本调用
+
+示例:
+    python ReadReportCLI.py stats --backend sqlite --path pymt5.sqlite
+    python ReadReportCLI.py stats --report ReportTester.xlsx --output stats
+    python ReadReportCLI.py cube --backend sqlite --by length_bucket right_15min --where direction=buy
+    python ReadReportCLI.py montecarlo --backend sqlite --simulations 20000 --workers 8
+    python ReadReportCLI.py zigzag --bars XAUUSD_M1.csv --timeframes M5 M15 M30 --depth 12 --output segments
+    python ReadReportCLI.py retracement --backend sqlite --bars XAUUSD_M1.csv --lookback 4h --output retracement
+    python ReadReportCLI.py penetration --backend sqlite --bars XAUUSD_M1.csv --horizon 1D --output penetration
+    python ReadReportCLI.py pipeline --report ReportTester.xlsx --segments segment_info.csv --backend sqlite --workers 4
+    python ReadReportCLI.py watch D:\\MT5\\reports --backend sqlite --path pymt5.sqlite --workers 4
+    python ReadReportCLI.py orderlog --ingest trade_orders.csv --backend sqlite --path pymt5.sqlite --output reconcile
+    python ReadReportCLI.py export trade_summary trade_summary.parquet --backend sqlite --path pymt5.sqlite
+    python ReadReportCLI.py serve --backend sqlite --path pymt5.sqlite --http-port 8765 --poll 30
+    python ReadReportCLI.py migrate --backend mysql --batch-rows 5000
+    python ReadReportCLI.py chart --backend sqlite --path pymt5.sqlite --start 2025-04-01 --method lttb
+    python ReadReportCLI.py verify --copies 10 --workers 4 --output differential
+    python ReadReportCLI.py import --segments segment_info.csv --report ReportTester.xlsx --backend mysql --commit-rows 5000
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+
+from StorageBackend import create_backend, DB_ERRORS
+from BacktestStatistics import BacktestStatistics, format_statistics, deals_from_report
+from SegmentFeatureCube import SegmentFeatureCube, CUBE_DIMENSIONS, COUNT_DIMENSIONS, DEFAULT_LENGTH_BINS
+from MonteCarloSimulator import MonteCarloSimulator, SIMULATION_METHODS
+from ZigzagEngine import (ZigzagCalculator, ZigzagSegmentEngine, load_bars, resample_bars, TIMEFRAME_RULES,
+                          DEFAULT_DEPTH, DEFAULT_DEVIATION, DEFAULT_BACKSTEP)
+from RangeExtremeIndex import BarRangeIndex, attach_retracement, DEFAULT_LOOKBACK, DEFAULT_BLOCK_SIZE
+from SupportResistanceAnalyzer import SupportResistanceAnalyzer, REFERENCE_QUERY
+from AsyncPipeline import AsyncPipeline, DEFAULT_CHUNK_ROWS, DEFAULT_QUEUE_SIZE
+from IngestDaemon import IngestDaemon, DEFAULT_SETTLE_SECONDS, DEFAULT_POLL_SECONDS, DEFAULT_RETRY_SECONDS
+from OrderLogProcessor import OrderLogProcessor, OrderLogReconciler
+from DataExporter import DataExporter, EXPORT_TABLES, DEFAULT_EXPORT_CHUNK_ROWS, DEFAULT_PARQUET_COMPRESSION
+from SummaryService import SummaryReadService, create_server, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_CACHE_SIZE
+from SchemaRevision import SchemaMigrator, COLUMN_REVISIONS, DEFAULT_MIGRATION_BATCH_ROWS
+from ImportCheckpoint import CheckpointedImport, DEFAULT_COMMIT_ROWS
+from ChartDownsample import DOWNSAMPLE_METHODS
+from DifferentialHarness import DifferentialHarness, DEFAULT_COPIES, DEFAULT_TOLERANCE, DEFAULT_ZIGZAG_BARS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("ReadReportCLI.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger("ReadReportCLI")
+
+# 与GUI一致的默认数据库配置
+DEFAULT_DB_CONFIG = {
+    'backend': 'mysql',
+    'host': 'localhost',
+    'user': 'root',
+    'password': '!Aa123456',
+    'database': 'pymt5',
+    'port': 3306
+}
+
+
+def add_db_arguments(parser):
+    """添加数据库连接参数"""
+    group = parser.add_argument_group('数据库')
+    group.add_argument('--backend', default=DEFAULT_DB_CONFIG['backend'], choices=['mysql', 'sqlite', 'duckdb'],
+                       help='存储后端（默认mysql）')
+    group.add_argument('--path', help='嵌入式后端的数据库文件路径')
+    group.add_argument('--host', default=DEFAULT_DB_CONFIG['host'])
+    group.add_argument('--port', type=int, default=DEFAULT_DB_CONFIG['port'])
+    group.add_argument('--user', default=DEFAULT_DB_CONFIG['user'])
+    group.add_argument('--password', default=DEFAULT_DB_CONFIG['password'])
+    group.add_argument('--database', default=DEFAULT_DB_CONFIG['database'])
+
+
+def add_window_arguments(parser):
+    """添加时间窗口参数（MySQL中按月分区的表只扫描窗口覆盖的分区）"""
+    group = parser.add_argument_group('时间窗口')
+    group.add_argument('--start', help='起始时间（包含），如 2025-04-01')
+    group.add_argument('--end', help='结束时间（不包含），如 2025-05-01')
+
+
+def db_config_from_args(args):
+    """由命令行参数生成数据库配置"""
+    db_config = {
+        'backend': args.backend,
+        'host': args.host,
+        'user': args.user,
+        'password': args.password,
+        'database': args.database,
+        'port': args.port
+    }
+    if args.path:
+        db_config['path'] = args.path
+    return db_config
+
+
+def save_frames(output_dir, frames):
+    """将多个DataFrame保存为CSV"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, df in frames.items():
+        path = os.path.join(output_dir, f"{name}.csv")
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+        logger.info(f"已保存: {path}")
+
+
+def run_stats(args):
+    """计算回测统计"""
+    statistics = BacktestStatistics()
+    if args.report:
+        # 直接从报告文件计算，无需数据库
+        from TradeDataProcessor import TradeDataProcessor
+        _, report_deals = TradeDataProcessor(db_config_from_args(args)).read_order_deal_data(args.report)
+        if report_deals is None:
+            logger.error(f"读取报告失败: {args.report}")
+            return 1
+        stats = statistics.compute(deals_from_report(report_deals))
+    else:
+        backend = create_backend(db_config_from_args(args))
+        try:
+            conn = backend.connect()
+        except (DB_ERRORS + (ImportError,)) as e:
+            logger.error(f"数据库连接失败: {e}")
+            return 1
+        try:
+            stats = statistics.load_from_db(backend, conn, with_summary=not args.no_summary,
+                                            start=args.start, end=args.end)
+        finally:
+            conn.close()
+
+    print(format_statistics(stats))
+    if args.output:
+        save_frames(args.output, {'equity_curve': stats['curve'],
+                                  'stats_by_hour': stats['by_hour'],
+                                  'stats_by_weekday': stats['by_weekday']})
+    return 0
+
+
+def parse_filters(expressions):
+    """解析 维度=值1,值2 形式的过滤条件（小时和线段数量维度转换为整数）"""
+    filters = {}
+    for expression in expressions or []:
+        dim, _, values = expression.partition('=')
+        dim = dim.strip()
+        if dim not in CUBE_DIMENSIONS:
+            raise ValueError(f"不支持的维度: {dim}")
+        # 长度分档标签本身含逗号，如 [10,20)
+        items = [v.strip() for v in re.findall(r'\[[^)]*\)|[^,]+', values) if v.strip()]
+        if dim == 'hour' or dim in COUNT_DIMENSIONS:
+            items = [int(v) for v in items]
+        filters[dim] = items
+    return filters
+
+
+def run_cube(args):
+    """按线段特征维度查询交易绩效"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    try:
+        cube = SegmentFeatureCube(length_bins=args.bins)
+        cube.refresh(backend, conn)
+    finally:
+        conn.close()
+
+    result = cube.query(args.by, parse_filters(args.where))
+    print(result.to_string(index=False))
+    if args.output:
+        save_frames(args.output, {'segment_feature_cube': result})
+    return 0
+
+
+def run_montecarlo(args):
+    """对每个仓位的净盈亏做蒙特卡洛重采样"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    try:
+        stats = BacktestStatistics().load_from_db(backend, conn)
+    finally:
+        conn.close()
+
+    profits = stats['trades']['net_profit'].to_numpy()
+    initial_balance = args.initial_balance
+    if initial_balance is None:
+        initial_balance = stats['metrics'].get('initial_balance', 0.0)
+    simulator = MonteCarloSimulator(simulations=args.simulations, batch_size=args.batch_size,
+                                    workers=args.workers, seed=args.seed, skip_probability=args.skip_probability)
+    bands = simulator.run(profits, initial_balance, methods=args.methods)
+    print(f"交易次数: {len(profits)}，初始资金: {initial_balance:.2f}")
+    print(bands.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.output:
+        save_frames(args.output, {'monte_carlo_bands': bands})
+    return 0
+
+
+def run_zigzag(args):
+    """从K线文件重算ZigZag线段"""
+    bars = load_bars(args.bars)
+    calculator = ZigzagCalculator(depth=args.depth, deviation=args.deviation, backstep=args.backstep, point=args.point)
+    engine = ZigzagSegmentEngine(calculator)
+    frames = {}
+    for timeframe in args.timeframes or [None]:
+        timeframe_bars = resample_bars(bars, timeframe) if timeframe else bars
+        segments = engine.segments(timeframe_bars, timeframe)
+        logger.info(f"{timeframe or '原始周期'}: {len(timeframe_bars)} 根K线，{len(segments)} 条线段")
+        frames[f"zigzag_segments_{timeframe or 'bars'}"] = segments
+    if args.output:
+        save_frames(args.output, frames)
+    else:
+        for name, segments in frames.items():
+            print(name)
+            print(segments.tail(10).to_string(index=False))
+    return 0
+
+
+def run_retracement(args):
+    """按M1K线为汇总表每一行计算回撤指标"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    try:
+        summary_df = backend.read_sql("SELECT * FROM trade_summary ORDER BY open_time", conn)
+    finally:
+        conn.close()
+
+    index = BarRangeIndex(load_bars(args.bars), block_size=args.block_size)
+    result = attach_retracement(summary_df, index, lookback=args.lookback, time_column=args.time_column,
+                                start_column=args.start_column)
+    if args.output:
+        save_frames(args.output, {'trade_summary_retracement': result})
+    else:
+        columns = ['position_id', 'symbol', 'order_type', args.time_column,
+                   'retrace_range_high', 'retrace_range_low', 'retrace_price', 'retrace_diff', 'retrace_percent']
+        print(result[[c for c in columns if c in result.columns]].to_string(index=False))
+    return 0
+
+
+def run_penetration(args):
+    """按K线判断每笔交易参考价格（支撑/压力）之后是否被穿越"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    try:
+        summary_df = backend.read_sql("SELECT * FROM trade_summary ORDER BY open_time", conn)
+        segments_df = backend.read_sql(REFERENCE_QUERY, conn)
+    finally:
+        conn.close()
+
+    analyzer = SupportResistanceAnalyzer(BarRangeIndex(load_bars(args.bars)), horizon=args.horizon)
+    result = analyzer.attach(summary_df, segments_df)
+    if args.output:
+        save_frames(args.output, {'trade_summary_penetration': result})
+    else:
+        columns = ['position_id', 'order_type', 'open_time', 'open_price', 'sr_type', 'sr_level',
+                   'sr_penetrated', 'sr_penetration_time', 'sr_minutes_to_penetration']
+        print(result[[c for c in columns if c in result.columns]].to_string(index=False))
+    return 0
+
+
+def run_pipeline(args):
+    """报告和线段日志经异步流水线入库并生成汇总表"""
+    if not args.report and not args.segments:
+        logger.error("请至少指定 --report 或 --segments")
+        return 1
+    pipeline = AsyncPipeline(db_config_from_args(args), chunk_rows=args.chunk_rows, queue_size=args.queue_size,
+                             workers=args.workers, executor=args.executor, replace=not args.append,
+                             summary_workers=args.summary_workers, summary_start=args.start, summary_end=args.end)
+    try:
+        counts = pipeline.run(args.report or [], args.segments or [], summarize=not args.no_summary)
+    except (DB_ERRORS + (ImportError, ConnectionError, RuntimeError, ValueError)) as e:
+        logger.error(f"流水线执行失败: {e}")
+        return 1
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    return 0
+
+
+def run_watch(args):
+    """监视目录，自动解析入库并更新汇总表"""
+    if not os.path.isdir(args.directory):
+        logger.error(f"目录不存在: {args.directory}")
+        return 1
+    daemon = IngestDaemon(args.directory, db_config_from_args(args), workers=args.workers,
+                          max_pending=args.max_pending, settle_seconds=args.settle, poll_seconds=args.poll,
+                          replace=args.replace, summarize=not args.no_summary, retry_seconds=args.retry)
+    try:
+        daemon.run(max_cycles=args.cycles)
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库操作失败: {e}")
+        return 1
+    return 0
+
+
+def run_orderlog(args):
+    """导入order_log CSV并与报告订单和成交对账"""
+    processor = OrderLogProcessor(db_config_from_args(args))
+    if not processor.connect_db():
+        return 1
+    try:
+        if not processor.create_tables():
+            return 1
+        for path in args.ingest or []:
+            order_logs_df = processor.read_order_log(path)
+            if order_logs_df is None:
+                return 1
+            processor.save_order_logs_to_db(order_logs_df, skip_existing=not args.keep_existing)
+        if args.no_reconcile:
+            return 0
+        reconciler = OrderLogReconciler(price_tolerance=args.price_tolerance, volume_tolerance=args.volume_tolerance,
+                                        profit_tolerance=args.profit_tolerance, time_tolerance=args.time_tolerance)
+        matches_df, issues_df = processor.reconcile(report_file=args.report_file, reconciler=reconciler,
+                                                    restrict_to_report=not args.all_logs)
+    except DB_ERRORS as e:
+        logger.error(f"数据库操作失败: {e}")
+        return 1
+    finally:
+        processor.close_db()
+
+    if args.output:
+        save_frames(args.output, {'order_log_matches': matches_df, 'order_log_issues': issues_df})
+    if issues_df.empty:
+        print("order_logs与报告一致")
+    else:
+        print(issues_df['issue'].value_counts().to_string())
+        columns = ['issue', 'log_id', 'position_id', 'order_ticket', 'symbol', 'side',
+                   'entry_slippage', 'exit_slippage', 'detail']
+        print(issues_df[columns].to_string(index=False))
+    return 0
+
+
+def run_export(args):
+    """将数据表分块导出为CSV、Parquet、Arrow IPC或XLSX"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    exporter = DataExporter(chunk_rows=args.chunk_rows, compression=args.compression)
+    try:
+        rows = exporter.export_table(backend, conn, args.table, args.output, fmt=args.format,
+                                     columns=args.columns, where=args.where)
+    except (DB_ERRORS + (ImportError, ValueError, OSError)) as e:
+        logger.error(f"导出失败: {e}")
+        return 1
+    finally:
+        conn.close()
+    print(f"{args.table}: 已导出 {rows} 行到 {args.output}")
+    return 0
+
+
+def run_serve(args):
+    """启动trade_summary的本地HTTP/JSON查询服务"""
+    service = SummaryReadService(db_config_from_args(args), cache_size=args.cache_size, start=args.start, end=args.end)
+    try:
+        service.refresh()
+        server = create_server(service, args.listen, args.http_port)
+    except (DB_ERRORS + (ImportError, OSError)) as e:
+        logger.error(f"启动查询服务失败: {e}")
+        return 1
+    stop = service.start_polling(args.poll) if args.poll > 0 else None
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("查询服务已停止")
+    finally:
+        if stop is not None:
+            stop.set()
+        server.server_close()
+    return 0
+
+
+def run_migrate(args):
+    """将旧结构的数据表分批原地转换为当前的列类型，并增加新增的列"""
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    migrator = SchemaMigrator(backend, conn, batch_rows=args.batch_rows)
+    try:
+        for table in args.tables or list(COLUMN_REVISIONS):
+            missing = migrator.missing_columns(table)
+            pending = migrator.pending_revisions(table)
+            if not missing and not pending:
+                print(f"{table}: 已是当前结构")
+                continue
+            print(f"{table}: " + "，".join([f"增加 {column} {column_type}" for column, column_type in missing] +
+                                          [f"{column} -> {column_type}" for column, column_type, _, _ in pending]))
+            if not args.dry_run:
+                migrator.migrate_table(table)
+    except DB_ERRORS as e:
+        logger.error(f"迁移失败: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+def run_chart(args):
+    """打开结余/权益曲线和价格线段图表窗口"""
+    import tkinter as tk
+    from ChartPanel import ChartPanel, load_chart_data
+    backend = create_backend(db_config_from_args(args))
+    try:
+        conn = backend.connect()
+    except (DB_ERRORS + (ImportError,)) as e:
+        logger.error(f"数据库连接失败: {e}")
+        return 1
+    try:
+        data = load_chart_data(backend, conn, start=args.start, end=args.end)
+    finally:
+        conn.close()
+    if data['curve'].empty:
+        logger.error("没有成交数据")
+        return 1
+    root = tk.Tk()
+    ChartPanel(root, data, method=args.method)
+    root.mainloop()
+    return 0
+
+
+def run_verify(args):
+    """对真实数据和生成数据比较原有实现与加速实现的输出，并记录加速比"""
+    tolerances = {}
+    for expression in args.column_tolerance or []:
+        column, _, value = expression.partition('=')
+        if not column or not value:
+            logger.error(f"列容差格式应为 列名=容差: {expression}")
+            return 1
+        tolerances[column] = float(value)
+    harness = DifferentialHarness(work_dir=args.work_dir, workers=args.workers, tolerance=args.tolerance,
+                                  tolerances=tolerances, candidate_backend=args.candidate_backend)
+    try:
+        report = harness.run(args.report, args.segments, copies=args.copies, seed=args.seed, zigzag_bars=args.bars)
+    except (DB_ERRORS + (ImportError, OSError, ValueError, RuntimeError)) as e:
+        logger.error(f"差分校验失败: {e}")
+        return 1
+
+    print(report.to_string(index=False))
+    if args.output:
+        save_frames(args.output, {'differential_pairs': report, 'differential_columns': harness.column_report()})
+    if harness.failed():
+        logger.error("存在输出不一致的实现对，详见逐列比较结果")
+        return 1
+    return 0
+
+
+def run_import(args):
+    """分块提交导入报告和线段日志，中断后重新运行从最后提交的块继续"""
+    from TradeDataProcessor import TradeDataProcessor
+    from SegmentDataProcessor import SegmentDataProcessor
+    db_config = db_config_from_args(args)
+    trade_processor = TradeDataProcessor(db_config)
+    segment_processor = SegmentDataProcessor(db_config)
+    if args.status:
+        if not segment_processor.connect_db():
+            return 1
+        try:
+            checkpoints = CheckpointedImport(segment_processor).list_checkpoints()
+        finally:
+            segment_processor.close_db()
+        print(checkpoints.to_string(index=False) if not checkpoints.empty else "没有导入检查点")
+        return 0
+
+    replace = not args.append
+    for path in args.report or []:
+        orders_df, deals_df = trade_processor.read_order_deal_data(path)
+        if orders_df is None and deals_df is None:
+            return 1
+        if not trade_processor.connect_db():
+            return 1
+        try:
+            if not trade_processor.create_tables():
+                return 1
+            report_file = os.path.basename(path)
+            for save, df in ((trade_processor.save_orders_to_db, orders_df), (trade_processor.save_deals_to_db, deals_df)):
+                if df is not None and len(df) and not save(df, report_file, replace=replace,
+                                                           commit_rows=args.commit_rows):
+                    return 1
+        finally:
+            trade_processor.close_db()
+
+    for path in args.segments or []:
+        if not segment_processor.connect_db():
+            return 1
+        try:
+            if not segment_processor.create_tables():
+                return 1
+            segment_processor.import_segment_file(path, replace=replace, commit_rows=args.commit_rows)
+        except DB_ERRORS as e:
+            logger.error(f"导入线段日志失败（已提交的块保留，重新运行时继续）: {e}")
+            return 1
+        finally:
+            segment_processor.close_db()
+    return 0
+
+
+def build_parser():
+    """创建命令行解析器"""
+    parser = argparse.ArgumentParser(description='ReadReport命令行工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = subparsers.add_parser('stats', help='计算资金曲线、回撤、盈利因子等回测统计')
+    add_db_arguments(stats_parser)
+    stats_parser.add_argument('--report', help='直接从ReportTester.xlsx计算（不读取数据库）')
+    stats_parser.add_argument('--no-summary', action='store_true', help='不读取trade_summary，按平仓成交统计交易')
+    stats_parser.add_argument('--output', help='保存资金曲线和分组统计CSV的目录')
+    add_window_arguments(stats_parser)
+    stats_parser.set_defaults(func=run_stats)
+
+    cube_parser = subparsers.add_parser('cube', help='按线段特征、方向、品种、小时查询交易绩效')
+    add_db_arguments(cube_parser)
+    cube_parser.add_argument('--by', nargs='*', default=['length_bucket'], choices=list(CUBE_DIMENSIONS),
+                             help='分组维度（默认length_bucket）')
+    cube_parser.add_argument('--where', nargs='*', help='过滤条件，如 direction=buy hour=8,9')
+    cube_parser.add_argument('--bins', nargs='+', type=float, default=list(DEFAULT_LENGTH_BINS),
+                             help='第一线段长度分档边界')
+    cube_parser.add_argument('--output', help='保存查询结果CSV的目录')
+    cube_parser.set_defaults(func=run_cube)
+
+    mc_parser = subparsers.add_parser('montecarlo', help='蒙特卡洛模拟最终权益和最大回撤的分位数区间')
+    add_db_arguments(mc_parser)
+    mc_parser.add_argument('--methods', nargs='+', default=list(SIMULATION_METHODS), choices=list(SIMULATION_METHODS))
+    mc_parser.add_argument('--simulations', type=int, default=10000, help='每种方式的模拟次数')
+    mc_parser.add_argument('--batch-size', type=int, default=500, help='每批模拟次数')
+    mc_parser.add_argument('--workers', type=int, help='进程数（默认CPU核数）')
+    mc_parser.add_argument('--seed', type=int, default=20250401, help='随机数种子')
+    mc_parser.add_argument('--skip-probability', type=float, default=0.1, help='skip方式下跳过交易的概率')
+    mc_parser.add_argument('--initial-balance', type=float, help='初始资金（默认取成交记录中的初始结余）')
+    mc_parser.add_argument('--output', help='保存分位数结果CSV的目录')
+    mc_parser.set_defaults(func=run_montecarlo)
+
+    zigzag_parser = subparsers.add_parser('zigzag', help='从K线文件（CSV/Parquet）重算ZigZag线段')
+    zigzag_parser.add_argument('--bars', required=True, help='K线文件')
+    zigzag_parser.add_argument('--timeframes', nargs='*', choices=list(TIMEFRAME_RULES),
+                               help='合成的目标周期，不指定则直接使用文件中的K线')
+    zigzag_parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH)
+    zigzag_parser.add_argument('--deviation', type=int, default=DEFAULT_DEVIATION)
+    zigzag_parser.add_argument('--backstep', type=int, default=DEFAULT_BACKSTEP)
+    zigzag_parser.add_argument('--point', type=float, default=0.01, help='品种最小价格变动')
+    zigzag_parser.add_argument('--output', help='保存线段CSV的目录')
+    zigzag_parser.set_defaults(func=run_zigzag)
+
+    retrace_parser = subparsers.add_parser('retracement', help='按M1K线为每笔交易计算区间回撤指标')
+    add_db_arguments(retrace_parser)
+    retrace_parser.add_argument('--bars', required=True, help='M1K线文件（CSV/Parquet，与交易品种一致）')
+    retrace_parser.add_argument('--lookback', default=DEFAULT_LOOKBACK, help='区间回看长度（默认4h）')
+    retrace_parser.add_argument('--time-column', default='open_time', help='区间终点列（默认open_time）')
+    retrace_parser.add_argument('--start-column', help='区间起点列（指定后忽略--lookback）')
+    retrace_parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help='索引块大小')
+    retrace_parser.add_argument('--output', help='保存结果CSV的目录')
+    retrace_parser.set_defaults(func=run_retracement)
+
+    sr_parser = subparsers.add_parser('penetration', help='按K线判断每笔交易的参考价格（支撑/压力）是否被穿越')
+    add_db_arguments(sr_parser)
+    sr_parser.add_argument('--bars', required=True, help='M1K线文件（CSV/Parquet，与交易品种一致）')
+    sr_parser.add_argument('--horizon', help='从开仓起的检查窗口（如1D），默认到平仓时间')
+    sr_parser.add_argument('--output', help='保存结果CSV的目录')
+    sr_parser.set_defaults(func=run_penetration)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='解析、转换、写库重叠执行的异步入库流水线')
+    add_db_arguments(pipeline_parser)
+    pipeline_parser.add_argument('--report', nargs='*', help='ReportTester.xlsx文件')
+    pipeline_parser.add_argument('--segments', nargs='*', help='segment_info.csv文件')
+    pipeline_parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='每块行数')
+    pipeline_parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='阶段间队列的最大块数')
+    pipeline_parser.add_argument('--workers', type=int, default=2, help='转换并发数')
+    pipeline_parser.add_argument('--executor', choices=['process', 'thread'], default='process', help='转换执行器')
+    pipeline_parser.add_argument('--summary-workers', type=int, default=1,
+                                 help='按(报告文件, 交易品种)分区并行生成汇总表的进程数，0为CPU核数')
+    pipeline_parser.add_argument('--append', action='store_true', help='追加入库（默认先清除目标表）')
+    pipeline_parser.add_argument('--no-summary', action='store_true', help='入库后不生成汇总表')
+    add_window_arguments(pipeline_parser)
+    pipeline_parser.set_defaults(func=run_pipeline)
+
+    watch_parser = subparsers.add_parser('watch', help='监视目录中的报告和线段日志，自动入库并更新汇总表')
+    watch_parser.add_argument('directory', help='MT5测试代理输出目录')
+    add_db_arguments(watch_parser)
+    watch_parser.add_argument('--workers', type=int, default=2, help='解析进程数')
+    watch_parser.add_argument('--max-pending', type=int, help='同时排队解析的最大文件数（默认2倍进程数）')
+    watch_parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                              help='文件大小和修改时间稳定多少秒后开始处理')
+    watch_parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help='扫描间隔（秒）')
+    watch_parser.add_argument('--retry', type=float, default=DEFAULT_RETRY_SECONDS,
+                              help='写入数据库失败后多少秒重新处理该文件')
+    watch_parser.add_argument('--replace', action='store_true',
+                              help='报告入库前清除同一报告文件的订单和成交（默认追加，线段日志始终追加）')
+    watch_parser.add_argument('--no-summary', action='store_true', help='入库后不重新生成汇总表')
+    watch_parser.add_argument('--cycles', type=int, help='扫描次数后退出（默认一直运行）')
+    watch_parser.set_defaults(func=run_watch)
+
+    orderlog_parser = subparsers.add_parser('orderlog', help='导入EA的order_log CSV，并将order_logs与报告订单和成交对账')
+    add_db_arguments(orderlog_parser)
+    orderlog_parser.add_argument('--ingest', nargs='*', help='导入order_logs的CSV文件（CSimpleCSVLogger输出）')
+    orderlog_parser.add_argument('--keep-existing', action='store_true',
+                                 help='导入时不跳过表中已有的事件（默认按仓位ID和进出场时间跳过）')
+    orderlog_parser.add_argument('--no-reconcile', action='store_true', help='只导入，不对账')
+    orderlog_parser.add_argument('--report-file', help='只使用该报告文件的订单和成交')
+    orderlog_parser.add_argument('--all-logs', action='store_true', help='检查全部日志（默认只检查报告时间范围内的日志）')
+    orderlog_parser.add_argument('--price-tolerance', type=float, default=1e-6, help='价格差容差')
+    orderlog_parser.add_argument('--volume-tolerance', type=float, default=1e-6, help='交易量差容差')
+    orderlog_parser.add_argument('--profit-tolerance', type=float, default=0.01, help='盈利差容差')
+    orderlog_parser.add_argument('--time-tolerance', default='0s', help='时间差容差（如2s）')
+    orderlog_parser.add_argument('--output', help='保存对账结果和不一致项CSV的目录')
+    orderlog_parser.set_defaults(func=run_orderlog)
+
+    export_parser = subparsers.add_parser('export', help='将数据表分块导出为CSV、Parquet、Arrow IPC或XLSX')
+    add_db_arguments(export_parser)
+    export_parser.add_argument('table', choices=sorted(EXPORT_TABLES), help='导出的数据表')
+    export_parser.add_argument('output', help='输出文件（按扩展名判断格式: .csv .parquet .arrow .xlsx）')
+    export_parser.add_argument('--format', choices=['csv', 'parquet', 'arrow', 'xlsx'], help='指定导出格式')
+    export_parser.add_argument('--columns', nargs='*', help='导出的列（默认除自增id外的全部列）')
+    export_parser.add_argument('--where', help='过滤条件，如 "symbol = \'XAUUSD\'"')
+    export_parser.add_argument('--chunk-rows', type=int, default=DEFAULT_EXPORT_CHUNK_ROWS, help='每块行数')
+    export_parser.add_argument('--compression', default=DEFAULT_PARQUET_COMPRESSION,
+                               help='Parquet压缩算法（zstd / snappy / gzip / none）')
+    export_parser.set_defaults(func=run_export)
+
+    serve_parser = subparsers.add_parser('serve', help='在本机提供trade_summary的缓存查询HTTP/JSON接口')
+    add_db_arguments(serve_parser)
+    serve_parser.add_argument('--listen', default=DEFAULT_HOST, help='监听地址（默认只监听本机）')
+    serve_parser.add_argument('--http-port', type=int, default=DEFAULT_PORT, help='HTTP端口')
+    serve_parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='查询结果缓存条数')
+    serve_parser.add_argument('--poll', type=float, default=30, help='检查trade_summary变化的间隔秒数，0为不自动刷新')
+    add_window_arguments(serve_parser)
+    serve_parser.set_defaults(func=run_serve)
+
+    migrate_parser = subparsers.add_parser('migrate', help='将旧结构的数据表分批原地转换为当前的列类型')
+    add_db_arguments(migrate_parser)
+    migrate_parser.add_argument('--tables', nargs='*', choices=list(COLUMN_REVISIONS), help='迁移的表（默认全部）')
+    migrate_parser.add_argument('--batch-rows', type=int, default=DEFAULT_MIGRATION_BATCH_ROWS,
+                                help='每批转换的行数（每批一个事务）')
+    migrate_parser.add_argument('--dry-run', action='store_true', help='只列出需要转换的列')
+    migrate_parser.set_defaults(func=run_migrate)
+
+    chart_parser = subparsers.add_parser('chart', help='打开结余/权益曲线、开平仓标记和线段的降采样图表')
+    add_db_arguments(chart_parser)
+    chart_parser.add_argument('--method', default='minmax', choices=list(DOWNSAMPLE_METHODS),
+                              help='降采样方式：像素分桶最小/最大值（minmax）或LTTB')
+    add_window_arguments(chart_parser)
+    chart_parser.set_defaults(func=run_chart)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    verify_parser = subparsers.add_parser('verify', help='差分校验：比较原有实现与加速实现的逐列输出并记录加速比')
+    verify_parser.add_argument('--report', default=os.path.join(script_dir, 'ReportTester.xlsx'),
+                               help='ReportTester.xlsx路径（默认脚本目录中的文件）')
+    verify_parser.add_argument('--segments', default=os.path.join(script_dir, 'segment_info.csv'),
+                               help='segment_info.csv路径（默认脚本目录中的文件）')
+    verify_parser.add_argument('--copies', type=int, default=DEFAULT_COPIES,
+                               help='生成数据时真实数据平移复制的份数，0为只校验真实数据')
+    verify_parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    verify_parser.add_argument('--bars', type=int, default=DEFAULT_ZIGZAG_BARS,
+                               help='ZigZag校验生成的K线数量，0为不校验')
+    verify_parser.add_argument('--workers', type=int, default=2, help='分区并行汇总和分块转换的进程数')
+    verify_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='数值列的默认容差（绝对误差）')
+    verify_parser.add_argument('--column-tolerance', nargs='*', help='单独指定列的容差，如 profit=0.005')
+    verify_parser.add_argument('--candidate-backend', default='sqlite', choices=['sqlite', 'duckdb'],
+                               help='加速写入路径使用的嵌入式后端（原有写入路径为sqlite）')
+    verify_parser.add_argument('--work-dir', help='存放临时数据库的目录（默认使用临时目录，结束后删除）')
+    verify_parser.add_argument('--output', help='保存各实现对结果和逐列比较结果CSV的目录')
+    verify_parser.set_defaults(func=run_verify)
+
+    import_parser = subparsers.add_parser('import', help='分块提交导入报告和线段日志，中断后从最后提交的块继续')
+    add_db_arguments(import_parser)
+    import_parser.add_argument('--report', nargs='*', help='ReportTester.xlsx路径')
+    import_parser.add_argument('--segments', nargs='*', help='segment_info.csv路径（分块读取，不整体载入内存）')
+    import_parser.add_argument('--commit-rows', type=int, default=DEFAULT_COMMIT_ROWS, help='每个事务提交的行数')
+    import_parser.add_argument('--append', action='store_true', help='追加到现有数据（默认从头导入时清除目标表）')
+    import_parser.add_argument('--status', action='store_true', help='列出导入检查点')
+    import_parser.set_defaults(func=run_import)
+
+    return parser
+
+
+def main(argv=None):
+    """主函数"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
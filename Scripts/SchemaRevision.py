@@ -0,0 +1,448 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据表结构修订
+第2版收紧四张表的列类型：交易量改为DECIMAL（订单表的"请求量 / 成交量"文本拆分为volume和filled_volume），
+MT5/EA定义的取值固定的列（成交方向、时间周期、线段方向）改为ENUM，类型和注释改为较短的VARCHAR（写入更长的文本时加宽而不截断），
+线段数量改为SMALLINT。旧结构的表按id分批原地转换：先增加新类型的临时列并分批回填，全部回填后再替换原列，
+中断后重新执行会从头回填临时列。
+第3版在trade_summary中增加按开仓/平仓时间关联的线段快照列（asof_*、asof_exit_*），旧表直接增加这些列，已有行为NULL。
+第4版在trade_summary中增加行内容哈希列row_key，保存汇总时按哈希只删除和插入有变化的行，旧表的已有行为NULL（下次保存时重写）
+"""
+
+import logging
+import re
+
+import pandas as pd
+
+from StorageBackend import translate_column_type, to_db_value
+from FrameSchema import split_order_volume
+
+logger = logging.getLogger("SchemaRevision")
+
+# 当前表结构版本
+SCHEMA_REVISION = 4
+
+# 默认每批转换的行数
+DEFAULT_MIGRATION_BATCH_ROWS = 5000
+
+# 交易量类型（MT5最小交易量步长为0.01手）
+VOLUME_TYPE = 'DECIMAL(12,2)'
+
+# 类型（订单/成交类型、汇总订单类型）和注释的列宽
+TYPE_LENGTH = 20
+COMMENT_LENGTH = 64
+
+# 写入的文本超过列宽时列加宽到的最小长度（第1版结构的列宽），文本不截断
+WIDE_TEXT_LENGTH = 255
+
+# 迁移时新类型临时列的后缀
+REVISION_SUFFIX = '__rev'
+
+# MT5时间周期
+MT5_TIMEFRAMES = ('M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M10', 'M12', 'M15', 'M20', 'M30',
+                  'H1', 'H2', 'H3', 'H4', 'H6', 'H8', 'H12', 'D1', 'W1', 'MN1')
+
+# 快照时间匹配的周期：(列名后缀, 注释中的名称)，与汇总的线段统计周期一致
+ASOF_PERIODS = (('5min', '5分钟'), ('15min', '15分钟'), ('30min', '30分钟'))
+
+# trade_summary中的线段快照列：[(列, 类型, 注释)]，按开仓时间（asof_）和平仓时间（asof_exit_）关联
+SUMMARY_ASOF_COLUMNS = [
+    (f'{prefix}{feature}_{period}', column_type, f'{moment}{period_name}{label}')
+    for prefix, moment in (('asof_', '开仓时'), ('asof_exit_', '平仓时'))
+    for period, period_name in ASOF_PERIODS
+    for feature, column_type, label in (('right_segments', 'SMALLINT', '快照右线段数量'),
+                                        ('first_segment_length', 'DOUBLE', '快照第一个线段长度'),
+                                        ('snapshot_time', 'DATETIME', '快照时间'))
+]
+
+# trade_summary行内容哈希（row_key）的长度
+SUMMARY_ROW_KEY_LENGTH = 16
+
+# 表 -> [(列, 类型)]，旧表中缺少时直接增加（已有行为NULL）
+COLUMN_ADDITIONS = {
+    'trade_summary': [(column, column_type) for column, column_type, _ in SUMMARY_ASOF_COLUMNS]
+                     + [('row_key', f'CHAR({SUMMARY_ROW_KEY_LENGTH})')],
+}
+
+# ENUM列的取值（空字符串为写入时未提供的值，如结余类成交没有方向）
+COLUMN_ENUMS = {
+    ('report_deals', 'direction'): ('', 'in', 'out', 'inout', 'out by'),
+    ('segment_info', 'timeframe'): ('',) + MT5_TIMEFRAMES,
+    ('segment_info', 'segment_side'): ('', 'Left', 'Right'),
+    ('segment_info', 'direction'): ('', 'UP', 'DOWN'),
+}
+
+
+def enum_type(table, column):
+    """ENUM列的MySQL类型定义"""
+    return "ENUM(" + ", ".join(f"'{value}'" for value in COLUMN_ENUMS[(table, column)]) + ")"
+
+
+# 表 -> [(列, 新类型, 转换方式, 来源列)]，转换方式: order_volume / order_filled_volume / number / keep
+COLUMN_REVISIONS = {
+    'report_orders': [
+        ('type', f'VARCHAR({TYPE_LENGTH})', 'keep', 'type'),
+        ('volume', VOLUME_TYPE, 'order_volume', 'volume'),
+        ('filled_volume', VOLUME_TYPE, 'order_filled_volume', 'volume'),
+        ('comment', f'VARCHAR({COMMENT_LENGTH})', 'keep', 'comment'),
+    ],
+    'report_deals': [
+        ('type', f'VARCHAR({TYPE_LENGTH})', 'keep', 'type'),
+        ('direction', enum_type('report_deals', 'direction'), 'keep', 'direction'),
+        ('volume', VOLUME_TYPE, 'number', 'volume'),
+        ('comment', f'VARCHAR({COMMENT_LENGTH})', 'keep', 'comment'),
+    ],
+    'segment_info': [
+        ('timeframe', enum_type('segment_info', 'timeframe'), 'keep', 'timeframe'),
+        ('segment_side', enum_type('segment_info', 'segment_side'), 'keep', 'segment_side'),
+        ('segment_index', 'SMALLINT', 'number', 'segment_index'),
+        ('direction', enum_type('segment_info', 'direction'), 'keep', 'direction'),
+        ('trade_volume', VOLUME_TYPE, 'number', 'trade_volume'),
+        ('trade_comment', f'VARCHAR({COMMENT_LENGTH})', 'keep', 'trade_comment'),
+        ('trade_status', f'VARCHAR({TYPE_LENGTH})', 'keep', 'trade_status'),
+    ],
+    'trade_summary': [
+        ('order_type', f'VARCHAR({TYPE_LENGTH})', 'keep', 'order_type'),
+        ('volume', VOLUME_TYPE, 'number', 'volume'),
+        ('comment', f'VARCHAR({COMMENT_LENGTH})', 'keep', 'comment'),
+    ] + [(f'{prefix}right_segments_{period}', 'SMALLINT', 'number', f'{prefix}right_segments_{period}')
+         for prefix in ('', 'entry_', 'exit_') for period in ('5min', '15min', '30min')],
+}
+
+# 已警告过的ENUM取值，避免逐行重复警告
+_warned_enum_values = set()
+
+
+def enum_value(table, column, value):
+    """
+    写入ENUM列前检查取值，不在取值范围内时写入NULL（MySQL严格模式下非法取值会使整批写入失败）
+
+    Args:
+        table (str): 表名
+        column (str): 列名
+        value (str): 取值
+
+    Returns:
+        str: 合法的取值或None
+    """
+    if value is None or value in COLUMN_ENUMS[(table, column)]:
+        return value
+    if (table, column, value) not in _warned_enum_values:
+        _warned_enum_values.add((table, column, value))
+        logger.warning(f"{table}.{column} 的取值 {value!r} 不在允许范围内，写入NULL")
+    return None
+
+
+def varchar_length(column_type):
+    """VARCHAR列的长度，其他类型返回None"""
+    match = re.fullmatch(r'\s*varchar\s*\((\d+)\)\s*', str(column_type), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def insert_columns(query):
+    """插入语句的列名"""
+    return [column.strip() for column in re.search(r'\(([^)]*)\)', query).group(1).split(',')]
+
+
+# 表 -> {文本列: 当前结构的列宽}，写入前检查长度（fit_text_columns）
+TEXT_COLUMN_LENGTHS = {
+    table: {column: varchar_length(column_type) for column, column_type, _, _ in revisions
+            if varchar_length(column_type) is not None}
+    for table, revisions in COLUMN_REVISIONS.items()
+}
+
+
+def normalize_column_type(column_type, dialect):
+    """
+    规范化列类型以便比较是否需要迁移
+
+    嵌入式引擎中文本长度和ENUM不影响存储（统一为text），SQLite的整数、浮点类型分别只有一种存储方式
+    """
+    normalized = re.sub(r'\s+', '', str(column_type)).lower()
+    normalized = re.sub(r'^(tiny|small|medium|big)?int\(\d+\)', r'\1int', normalized)
+    if normalized == 'int':
+        normalized = 'integer'
+    if dialect != 'mysql' and (normalized.startswith(('varchar', 'enum(', 'char')) or normalized == 'text'):
+        return 'text'
+    if dialect == 'sqlite':
+        if re.fullmatch(r'(tiny|small|medium|big)?int(eger)?', normalized):
+            return 'integer'
+        if normalized in ('double', 'real', 'float') or normalized.startswith('decimal'):
+            return 'real'
+    return normalized
+
+
+class SchemaMigrator:
+    """将旧结构的数据表分批原地转换为当前结构"""
+
+    def __init__(self, backend, conn, batch_rows=DEFAULT_MIGRATION_BATCH_ROWS):
+        """
+        初始化迁移器
+
+        Args:
+            backend: StorageBackend后端
+            conn: 数据库连接
+            batch_rows (int): 每批转换的行数（每批一个事务）
+        """
+        self.backend = backend
+        self.conn = conn
+        self.batch_rows = max(1, int(batch_rows))
+        self.dialect = backend.name
+
+    def column_types(self, table):
+        """
+        读取表中各列的类型
+
+        Returns:
+            dict: 列名 -> 类型（表不存在时为空）
+        """
+        if self.dialect == 'mysql':
+            query = ("SELECT COLUMN_NAME AS name, COLUMN_TYPE AS type FROM information_schema.COLUMNS "
+                     f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' ORDER BY ORDINAL_POSITION")
+        elif self.dialect == 'sqlite':
+            query = f"SELECT name, type FROM pragma_table_info('{table}')"
+        else:
+            query = ("SELECT column_name AS name, data_type AS type FROM information_schema.columns "
+                     f"WHERE table_name = '{table}' ORDER BY ordinal_position")
+        columns = self.backend.read_sql(query, self.conn)
+        return dict(zip(columns['name'], columns['type']))
+
+    def fit_text_columns(self, table, query, rows):
+        """
+        写入前检查文本列的长度：超过列宽的文本不截断，MySQL中先把该列加宽
+        （严格模式下超长文本会使整批写入失败，非严格模式下会被静默截断）并记录超长的行数和最长的值；
+        嵌入式引擎不限制VARCHAR长度，原样写入
+
+        Args:
+            table (str): 表名
+            query (str): 插入语句（按列名定位文本列）
+            rows (list): 插入行
+
+        Returns:
+            list: 加宽的列
+        """
+        lengths = TEXT_COLUMN_LENGTHS.get(table)
+        if not lengths or not rows or self.dialect != 'mysql':
+            return []
+        columns = insert_columns(query)
+        types = None
+        widened = []
+        for column, length in lengths.items():
+            if column not in columns:
+                continue
+            position = columns.index(column)
+            # 不超过当前结构列宽的文本无需读取表结构
+            long_values = [row[position] for row in rows
+                           if isinstance(row[position], str) and len(row[position]) > length]
+            if not long_values:
+                continue
+            if types is None:
+                types = self.column_types(table)
+            width = varchar_length(types.get(column))
+            longest = max(long_values, key=len)
+            if width is None or len(longest) <= width:
+                continue
+            count = sum(1 for value in long_values if len(value) > width)
+            new_type = f"VARCHAR({max(len(longest), WIDE_TEXT_LENGTH)})"
+            logger.warning(f"{table}.{column} 有 {count} 行文本超过列宽 {width}，最长 {len(longest)} 个字符"
+                           f"（{longest!r}），列加宽为 {new_type}，不截断")
+            comment = self.backend.read_sql(
+                "SELECT COLUMN_COMMENT AS comment FROM information_schema.COLUMNS "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND COLUMN_NAME = '{column}'",
+                self.conn)['comment'].iloc[0]
+            cursor = self.conn.cursor()
+            try:
+                comment_clause = " COMMENT '{}'".format(comment.replace("'", "''")) if comment else ""
+                cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {column} {new_type}{comment_clause}")
+                self.conn.commit()
+            finally:
+                cursor.close()
+            types[column] = new_type
+            widened.append(column)
+        return widened
+
+    def pending_revisions(self, table):
+        """
+        需要转换的列（已是目标类型的列跳过；现有数据超出新类型范围的列保持原类型并警告）
+
+        Returns:
+            list: [(列, 新类型, 转换方式, 来源列), ...]
+        """
+        types = self.column_types(table)
+        if not types:
+            return []
+        pending = []
+        for column, column_type, convert, source in COLUMN_REVISIONS.get(table, []):
+            target = translate_column_type(column_type, self.dialect)
+            current = types.get(column)
+            if current is not None and \
+                    normalize_column_type(current, self.dialect) == normalize_column_type(target, self.dialect):
+                continue
+            if source not in types:
+                continue
+            if current is not None and not self._fits(table, column, column_type):
+                continue
+            pending.append((column, target, convert, source))
+        return pending
+
+    def _fits(self, table, column, column_type):
+        """检查现有数据能否无损转换为新的文本/ENUM类型"""
+        length = varchar_length(column_type)
+        if length is not None:
+            function = 'CHAR_LENGTH' if self.dialect == 'mysql' else 'LENGTH'
+            longest = self.backend.read_sql(f"SELECT MAX({function}({column})) AS longest FROM {table}",
+                                            self.conn)['longest'].iloc[0]
+            if pd.notna(longest) and int(longest) > length:
+                logger.warning(f"{table}.{column} 现有数据最长 {int(longest)} 个字符，超出 {column_type}，保持原类型")
+                return False
+        if (table, column) in COLUMN_ENUMS:
+            values = self.backend.read_sql(f"SELECT DISTINCT {column} AS value FROM {table}", self.conn)['value']
+            invalid = sorted(set(values.dropna()) - set(COLUMN_ENUMS[(table, column)]))
+            if invalid:
+                logger.warning(f"{table}.{column} 含有ENUM范围外的取值 {invalid[:5]}，保持原类型")
+                return False
+        return True
+
+    @staticmethod
+    def _convert(batch, convert, source):
+        values = batch[source]
+        if convert == 'order_volume':
+            return split_order_volume(values)[0]
+        if convert == 'order_filled_volume':
+            return split_order_volume(values)[1]
+        if convert == 'number':
+            # 旧结构中的空字符串转换为NULL
+            return pd.to_numeric(values, errors='coerce')
+        return values
+
+    def missing_columns(self, table):
+        """
+        当前结构中新增、旧表中缺少的列（COLUMN_ADDITIONS，表不存在时为空）
+
+        Returns:
+            list: [(列, 类型), ...]
+        """
+        types = self.column_types(table)
+        if not types:
+            return []
+        return [(column, column_type) for column, column_type in COLUMN_ADDITIONS.get(table, [])
+                if column not in types]
+
+    def add_missing_columns(self, table):
+        """
+        增加旧表中缺少的列
+
+        Returns:
+            int: 增加的列数
+        """
+        missing = self.missing_columns(table)
+        if not missing:
+            return 0
+        types = self.column_types(table)
+        cursor = self.conn.cursor()
+        try:
+            # MySQL中新列依次排在已有的最后一个新增列或created_at之前的列之后，列顺序与新建的表一致
+            anchor = None
+            if self.dialect == 'mysql':
+                existing = [column for column in types if column != 'created_at']
+                anchor = existing[-1] if existing else None
+            for column, column_type in missing:
+                position = f" AFTER {anchor}" if anchor else ""
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} "
+                               f"{translate_column_type(column_type, self.dialect)}{position}")
+                if anchor:
+                    anchor = column
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        logger.info(f"{table} 增加 {len(missing)} 列: {', '.join(column for column, _ in missing)}")
+        return len(missing)
+
+    def migrate_table(self, table):
+        """
+        将一张表转换为当前结构（先增加缺少的列，再转换列类型）
+
+        Returns:
+            int: 增加和转换的列数
+        """
+        added = self.add_missing_columns(table)
+        pending = self.pending_revisions(table)
+        if not pending:
+            return added
+        types = self.column_types(table)
+        cursor = self.conn.cursor()
+        try:
+            logger.info(f"开始迁移 {table}: " + "，".join(f"{column} -> {column_type}"
+                                                        for column, column_type, _, _ in pending))
+            # 1. 增加新类型的临时列（中断后重新执行时临时列已存在）
+            pending_columns = {column for column, _, _, _ in pending}
+            for column, column_type, _, source in pending:
+                temp_column = f"{column}{REVISION_SUFFIX}"
+                if temp_column not in types:
+                    # MySQL中临时列紧跟原列，新增列紧跟来源列，替换后列顺序与新建的表一致
+                    if column in types:
+                        anchor = column
+                    else:
+                        anchor = f"{source}{REVISION_SUFFIX}" if source in pending_columns else source
+                    position = f" AFTER {anchor}" if self.dialect == 'mysql' else ""
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {temp_column} {column_type}{position}")
+            self.conn.commit()
+
+            # 2. 按id分批回填，每批一个事务
+            sources = sorted({source for _, _, _, source in pending})
+            assignments = ", ".join(f"{column}{REVISION_SUFFIX} = %s" for column, _, _, _ in pending)
+            update = f"UPDATE {table} SET {assignments} WHERE id = %s"
+            last_id = 0
+            converted = 0
+            while True:
+                batch = self.backend.read_sql(
+                    f"SELECT id, {', '.join(sources)} FROM {table} WHERE id > {last_id} "
+                    f"ORDER BY id LIMIT {self.batch_rows}", self.conn)
+                if batch.empty:
+                    break
+                values = [self._convert(batch, convert, source).to_numpy(dtype=object)
+                          for _, _, convert, source in pending]
+                ids = batch['id'].to_numpy(dtype='int64')
+                rows = [tuple(to_db_value(v[i]) for v in values) + (int(ids[i]),) for i in range(len(batch))]
+                cursor.executemany(update, rows)
+                self.conn.commit()
+                last_id = int(ids[-1])
+                converted += len(batch)
+                logger.info(f"{table}: 已转换 {converted} 行")
+
+            # 3. 用临时列替换原列（MySQL在一条ALTER语句中完成）
+            changes = []
+            for column, _, _, _ in pending:
+                if column in types:
+                    changes.append(f"DROP COLUMN {column}")
+                changes.append(f"RENAME COLUMN {column}{REVISION_SUFFIX} TO {column}")
+            if self.dialect == 'mysql':
+                cursor.execute(f"ALTER TABLE {table} " + ", ".join(changes))
+            else:
+                for change in changes:
+                    cursor.execute(f"ALTER TABLE {table} {change}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        logger.info(f"{table} 迁移完成，共转换 {len(pending)} 列")
+        return added + len(pending)
+
+    def migrate(self, tables=None):
+        """
+        迁移多张表
+
+        Args:
+            tables (list): 表名，None为全部四张表
+
+        Returns:
+            dict: 表名 -> 增加和转换的列数
+        """
+        return {table: self.migrate_table(table) for table in (tables or list(COLUMN_REVISIONS))}
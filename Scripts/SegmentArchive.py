@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+线段日志Parquet归档
+将每次回测生成的segment_info.csv转换为按交易日期和时间周期分区的压缩Parquet数据集，
+读取时支持谓词下推和列裁剪，只读取查询涉及的文件和列。
+EA每次都输出同名的segment_info.csv，归档文件按运行标识（调用方指定的运行名，或文件路径和内容的哈希）命名，
+不同运行的记录互不覆盖，只有同一运行再次归档时才替换
+"""
+
+import os
+import re
+import hashlib
+import logging
+
+import pandas as pd
+
+from FrameSchema import optimize_segment_log_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow为可选依赖
+    pa = None
+    ds = None
+
+logger = logging.getLogger("SegmentArchive")
+
+# 分区列：交易日期 + 时间周期
+PARTITION_COLUMNS = ['TradeDate', 'Timeframe']
+
+# 内容哈希作为运行标识时保留的十六进制位数
+RUN_ID_LENGTH = 16
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("未安装pyarrow，请执行: pip install pyarrow")
+
+
+def _partitioning():
+    """分区方案（hive风格目录: TradeDate=2025-03-01/Timeframe=M15/）"""
+    return ds.partitioning(
+        pa.schema([('TradeDate', pa.string()), ('Timeframe', pa.string())]),
+        flavor='hive'
+    )
+
+
+def file_run_id(path):
+    """文件绝对路径和内容的哈希（运行标识）：不同目录中的同名、同内容文件属于不同运行"""
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:RUN_ID_LENGTH]
+
+
+def frame_run_id(df):
+    """DataFrame内容哈希（运行标识），列名参与哈希"""
+    digest = hashlib.sha1(",".join(str(c) for c in df.columns).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:RUN_ID_LENGTH]
+
+
+def _file_token(text):
+    """用于数据文件名的安全文本"""
+    return re.sub(r'[^0-9A-Za-z_.-]', '_', str(text))
+
+
+def type_segment_frame(df):
+    """
+    将segment_info.csv读取的原始DataFrame转换为强类型列
+
+    Args:
+        df (DataFrame): 线段数据（CSV原始列名）
+
+    Returns:
+        DataFrame: 强类型的线段数据
+    """
+    typed = optimize_segment_log_frame(df)
+    if 'Timeframe' in typed.columns:
+        # 分区列以文本形式写入目录名
+        typed['Timeframe'] = typed['Timeframe'].astype('string')
+    return typed
+
+
+class SegmentArchive:
+    """线段日志Parquet归档"""
+
+    def __init__(self, archive_dir, compression='zstd'):
+        """
+        初始化归档
+
+        Args:
+            archive_dir (str): 归档数据集根目录
+            compression (str): Parquet压缩算法
+        """
+        self.archive_dir = archive_dir
+        self.compression = compression
+
+    def archive_csv(self, csv_path, run_name=None):
+        """
+        将一个segment_info.csv文件写入归档
+
+        Args:
+            csv_path (str): CSV文件路径（分号分隔，UTF-16编码）
+            run_name (str): 运行名，None时使用文件路径和内容的哈希
+
+        Returns:
+            int: 写入的记录数
+        """
+        df = pd.read_csv(csv_path, sep=';', encoding='utf-16')
+        logger.info(f"读取线段日志 {csv_path}，共 {len(df)} 行")
+        return self.archive_segments(df, source_name=os.path.basename(csv_path),
+                                     run_name=run_name or file_run_id(csv_path))
+
+    def archive_segments(self, segments_df, source_name='segment_info.csv', run_name=None):
+        """
+        将线段数据写入归档
+
+        数据文件名为 <来源文件名>-<运行标识>-<序号>.parquet，并写入SourceFile、RunId列。
+        不同运行（即使来源文件同名）的记录全部保留；同一运行再次归档时先删除其已有的数据文件再写入，
+        不会产生重复记录
+
+        Args:
+            segments_df (DataFrame): 线段数据（segment_info.csv原始列名）
+            source_name (str): 来源文件名
+            run_name (str): 运行名，None时使用数据内容哈希
+
+        Returns:
+            int: 写入的记录数
+        """
+        _require_pyarrow()
+        if segments_df is None or len(segments_df) == 0:
+            logger.warning("线段数据为空，跳过归档")
+            return 0
+
+        run_id = str(run_name) if run_name else frame_run_id(segments_df)
+        typed = type_segment_frame(segments_df)
+        typed['SourceFile'] = pd.Series(source_name, index=typed.index, dtype='string')
+        typed['RunId'] = pd.Series(run_id, index=typed.index, dtype='string')
+        typed = typed[typed['TradeTime'].notna()]
+        typed['TradeDate'] = typed['TradeTime'].dt.strftime('%Y-%m-%d')
+
+        table = pa.Table.from_pandas(typed, preserve_index=False)
+        prefix = f"{_file_token(os.path.splitext(source_name)[0])}-{_file_token(run_id)}-"
+        removed = self._remove_run_files(prefix)
+        if removed:
+            logger.info(f"运行 {run_id} 已归档过，替换其 {removed} 个数据文件")
+        ds.write_dataset(
+            table,
+            self.archive_dir,
+            format='parquet',
+            partitioning=_partitioning(),
+            basename_template=f"{prefix}{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            max_partitions=100000,
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression)
+        )
+        logger.info(f"已将 {len(typed)} 条线段记录（运行 {run_id}）归档到 {self.archive_dir}")
+        return len(typed)
+
+    def _remove_run_files(self, prefix):
+        """删除同一运行已归档的数据文件，返回删除的文件数"""
+        if not os.path.isdir(self.archive_dir):
+            return 0
+        pattern = re.compile(re.escape(prefix) + r'\d+\.parquet$')
+        removed = 0
+        for root, _, files in os.walk(self.archive_dir):
+            for name in files:
+                if pattern.match(name):
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def read_segments(self, columns=None, timeframes=None, segment_sides=None,
+                      start_date=None, end_date=None, filter_expression=None):
+        """
+        从归档读取线段数据
+
+        日期和时间周期条件作用于分区目录，只会打开匹配的文件；
+        其余条件和列选择下推到Parquet读取，只解码需要的列和行组
+
+        Args:
+            columns (list): 需要读取的列，None表示全部
+            timeframes (list): 时间周期，如 ['M15']
+            segment_sides (list): 线段方向，如 ['Right']
+            start_date (str): 起始交易日期（含），格式 YYYY-MM-DD
+            end_date (str): 结束交易日期（含），格式 YYYY-MM-DD
+            filter_expression: 额外的pyarrow.dataset表达式
+
+        Returns:
+            DataFrame: 线段数据
+        """
+        _require_pyarrow()
+        if not os.path.isdir(self.archive_dir):
+            logger.warning(f"归档目录不存在: {self.archive_dir}")
+            return pd.DataFrame(columns=columns or [])
+
+        dataset = ds.dataset(self.archive_dir, format='parquet', partitioning=_partitioning())
+
+        conditions = []
+        if timeframes:
+            conditions.append(ds.field('Timeframe').isin(list(timeframes)))
+        if segment_sides:
+            conditions.append(ds.field('SegmentSide').isin(list(segment_sides)))
+        if start_date:
+            conditions.append(ds.field('TradeDate') >= str(start_date))
+        if end_date:
+            conditions.append(ds.field('TradeDate') <= str(end_date))
+        if filter_expression is not None:
+            conditions.append(filter_expression)
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        table = dataset.to_table(columns=columns, filter=expression)
+        df = table.to_pandas()
+        logger.info(f"从归档读取 {len(df)} 条线段记录")
+        return df
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+线段快照时间匹配
+为每条订单和成交按时间关联同一周期（及同一交易品种）在其时间点或之前最近的一次线段快照，
+不依赖segment_info中的order_ticket/position_id，OrderTicket=0的线段记录同样可以参与分析
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("SegmentAsOfMatcher")
+
+# 默认匹配的时间周期 -> 列名后缀
+DEFAULT_TIMEFRAMES = (('M5', '5min'), ('M15', '15min'), ('M30', '30min'))
+
+
+class SegmentAsOfMatcher:
+    """线段快照时间匹配器"""
+
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES, tolerance=None, prefix='asof_'):
+        """
+        初始化匹配器
+
+        Args:
+            timeframes (tuple): (时间周期, 列名后缀) 列表
+            tolerance (Timedelta): 快照最大允许的时间差，None表示不限制
+            prefix (str): 输出列名前缀
+        """
+        self.timeframes = tuple(timeframes)
+        self.tolerance = pd.Timedelta(tolerance) if tolerance is not None else None
+        self.prefix = prefix
+
+    def build_snapshots(self, segments_df, keep_ticket=False):
+        """
+        将线段明细聚合为快照，每个(交易品种, 周期, 记录时间)一行
+
+        同一时间点有多个订单的快照时取票号最大的一个
+
+        Args:
+            segments_df (DataFrame): 线段数据（segment_info列名）
+            keep_ticket (bool): 保留order_ticket列（分块构建后由merge_snapshots合并）
+
+        Returns:
+            DataFrame: trade_time, timeframe, [symbol], right_segments, first_segment_length, reference_price
+        """
+        columns = ['trade_time', 'timeframe', 'right_segments', 'first_segment_length', 'reference_price']
+        if segments_df is None or segments_df.empty:
+            return pd.DataFrame(columns=columns)
+
+        keys = ['symbol'] if 'symbol' in segments_df.columns else []
+        keys += ['timeframe', 'trade_time', 'order_ticket']
+
+        segments = segments_df[segments_df['trade_time'].notna()].copy()
+        segments['timeframe'] = segments['timeframe'].astype(str)
+        segments['_is_right'] = (segments['segment_side'] == 'Right').to_numpy()
+
+        grouped = segments.groupby(keys, sort=False, observed=True)
+        snapshots = grouped.agg(right_segments=('_is_right', 'sum'),
+                                reference_price=('reference_price', 'first'))
+
+        right = segments[segments['_is_right']]
+        first = right.sort_values('segment_index', kind='mergesort').drop_duplicates(keys).set_index(keys)
+        snapshots['first_segment_length'] = (first['end_price'] - first['start_price']).abs().round(2)
+        snapshots = snapshots.reset_index()
+
+        # 同一时间点保留一个快照
+        snapshots = snapshots.sort_values(keys, kind='mergesort').drop_duplicates(keys[:-1], keep='last')
+        snapshots['right_segments'] = snapshots['right_segments'].astype('int32')
+        if not keep_ticket:
+            snapshots = snapshots.drop(columns=['order_ticket'])
+        return snapshots.sort_values('trade_time', kind='mergesort').reset_index(drop=True)
+
+    def merge_snapshots(self, parts):
+        """
+        合并按票号分块构建的快照（build_snapshots(keep_ticket=True)的结果）
+
+        不同块中同一时间点的快照仍只保留票号最大的一个，结果与整表构建一致
+
+        Args:
+            parts (list): 各块的快照
+
+        Returns:
+            DataFrame: 与build_snapshots相同的列
+        """
+        parts = [part for part in parts if not part.empty]
+        if not parts:
+            return self.build_snapshots(None)
+        snapshots = pd.concat(parts, ignore_index=True)
+        keys = ['symbol'] if 'symbol' in snapshots.columns else []
+        keys += ['timeframe', 'trade_time', 'order_ticket']
+        snapshots = snapshots.sort_values(keys, kind='mergesort').drop_duplicates(keys[:-1], keep='last')
+        return snapshots.drop(columns=['order_ticket']).sort_values('trade_time', kind='mergesort').reset_index(drop=True)
+
+    def attach(self, events_df, time_column, segments_df=None, snapshots=None):
+        """
+        为事件（订单或成交）关联各周期在事件时间或之前最近的快照特征
+
+        每个周期做一次排序后的merge_asof，整体复杂度为O(n log n)
+
+        Args:
+            events_df (DataFrame): 订单或成交数据
+            time_column (str): 事件时间列，如 open_time / deal_time
+            segments_df (DataFrame): 线段数据，snapshots为None时用于构建快照
+            snapshots (DataFrame): build_snapshots的结果，可复用
+
+        Returns:
+            DataFrame: 增加 {prefix}right_segments_{后缀}、{prefix}first_segment_length_{后缀}、
+                {prefix}snapshot_time_{后缀} 列的事件数据（行顺序不变）
+        """
+        if snapshots is None:
+            snapshots = self.build_snapshots(segments_df)
+
+        result = events_df.copy()
+        if result.empty:
+            return result
+
+        by = ['symbol'] if 'symbol' in snapshots.columns and 'symbol' in result.columns else None
+        events = pd.DataFrame({'_row': np.arange(len(result)),
+                               '_time': pd.to_datetime(result[time_column].to_numpy())})
+        if by:
+            events['symbol'] = result['symbol'].astype(str).to_numpy()
+        events = events[events['_time'].notna()].sort_values('_time', kind='mergesort')
+
+        for timeframe, suffix in self.timeframes:
+            right_column = f'{self.prefix}right_segments_{suffix}'
+            length_column = f'{self.prefix}first_segment_length_{suffix}'
+            time_out_column = f'{self.prefix}snapshot_time_{suffix}'
+
+            tf_snapshots = snapshots[snapshots['timeframe'] == timeframe]
+            if tf_snapshots.empty or events.empty:
+                result[right_column] = pd.array([pd.NA] * len(result), dtype='Int32')
+                result[length_column] = np.nan
+                result[time_out_column] = pd.NaT
+                continue
+
+            right_side = tf_snapshots[(['symbol'] if by else []) +
+                                      ['trade_time', 'right_segments', 'first_segment_length']].copy()
+            if by:
+                right_side['symbol'] = right_side['symbol'].astype(str)
+            right_side['trade_time'] = pd.to_datetime(right_side['trade_time']).astype(events['_time'].dtype)
+
+            matched = pd.merge_asof(events, right_side, left_on='_time', right_on='trade_time', by=by,
+                                    direction='backward', tolerance=self.tolerance, allow_exact_matches=True)
+
+            rows = matched['_row'].to_numpy()
+            right_values = pd.array([pd.NA] * len(result), dtype='Int32')
+            right_values[rows] = pd.array(matched['right_segments'].to_numpy(), dtype='Int32')
+            length_values = np.full(len(result), np.nan)
+            length_values[rows] = matched['first_segment_length'].to_numpy(dtype=float)
+            time_values = pd.Series(pd.NaT, index=range(len(result)), dtype=events['_time'].dtype)
+            time_values.iloc[rows] = matched['trade_time'].to_numpy()
+
+            result[right_column] = right_values
+            result[length_column] = length_values
+            result[time_out_column] = time_values.to_numpy()
+
+        return result
+
+    def attach_orders(self, orders_df, segments_df=None, snapshots=None):
+        """按订单下单时间(open_time)关联快照"""
+        return self.attach(orders_df, 'open_time', segments_df, snapshots)
+
+    def attach_deals(self, deals_df, segments_df=None, snapshots=None):
+        """按成交时间(deal_time)关联快照"""
+        return self.attach(deals_df, 'deal_time', segments_df, snapshots)
@@ -7,8 +7,11 @@
 """
 
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
+from StorageBackend import create_backend, DB_ERRORS
+from FrameSchema import optimize_segment_log_frame, memory_usage_mb
+from SchemaRevision import SchemaMigrator, enum_value
+from ImportCheckpoint import CheckpointedImport, DEFAULT_COMMIT_ROWS, file_signature
+from TablePartitions import TablePartitioner
 import datetime
 import logging
 import os
@@ -24,6 +27,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SegmentDataProcessor")
 
+# 线段数据的插入语句
+SEGMENTS_INSERT_QUERY = """
+INSERT INTO segment_info 
+(trade_time, order_ticket, position_id, reference_price, reference_time, 
+ reference_bar_index, timeframe, segment_side, segment_index, start_price,
+ end_price, amplitude, direction, trade_action, trade_price, trade_volume,
+ trade_comment, trade_status)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
 class SegmentDataProcessor:
     """线段数据处理器"""
     
@@ -35,17 +48,19 @@ class SegmentDataProcessor:
             db_config (dict): 数据库配置
         """
         self.db_config = db_config
+        self.backend = create_backend(db_config)
+        self.partitioner = TablePartitioner(self.backend, None)
         self.conn = None
         self.cursor = None
     
     def connect_db(self):
-        """连接到MySQL数据库"""
+        """连接到数据库（MySQL或嵌入式后端）"""
         try:
-            self.conn = mysql.connector.connect(**self.db_config)
+            self.conn = self.backend.connect()
             self.cursor = self.conn.cursor()
-            logger.info("成功连接到MySQL数据库")
+            logger.info(f"成功连接到数据库（{self.backend.name}）")
             return True
-        except Error as e:
+        except (DB_ERRORS + (ImportError,)) as e:
             logger.error(f"数据库连接失败: {e}")
             return False
     
@@ -70,23 +85,29 @@ class SegmentDataProcessor:
                 reference_price DOUBLE COMMENT '参考价格',
                 reference_time DATETIME COMMENT '参考时间',
                 reference_bar_index INT COMMENT '参考K线索引',
-                timeframe VARCHAR(10) COMMENT '时间周期',
-                segment_side VARCHAR(10) COMMENT '线段方向（Left/Right）',
-                segment_index INT COMMENT '线段序号',
+                timeframe ENUM('', 'M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M10', 'M12', 'M15', 'M20', 'M30',
+                               'H1', 'H2', 'H3', 'H4', 'H6', 'H8', 'H12', 'D1', 'W1', 'MN1') COMMENT '时间周期',
+                segment_side ENUM('', 'Left', 'Right') COMMENT '线段方向（Left/Right）',
+                segment_index SMALLINT COMMENT '线段序号',
                 start_price DOUBLE COMMENT '起始价格',
                 end_price DOUBLE COMMENT '结束价格',
                 amplitude DOUBLE COMMENT '幅度',
-                direction VARCHAR(10) COMMENT '方向',
+                direction ENUM('', 'UP', 'DOWN') COMMENT '方向',
                 trade_action VARCHAR(20) COMMENT '交易操作类型',
                 trade_price DOUBLE COMMENT '交易价格',
-                trade_volume DOUBLE COMMENT '交易量',
-                trade_comment VARCHAR(255) COMMENT '交易注释',
-                trade_status VARCHAR(50) COMMENT '交易状态',
+                trade_volume DECIMAL(12,2) COMMENT '交易量',
+                trade_comment VARCHAR(64) COMMENT '交易注释',
+                trade_status VARCHAR(20) COMMENT '交易状态',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             
             self.conn.commit()
+            # 旧结构的表分批转换为当前的列类型
+            SchemaMigrator(self.backend, self.conn).migrate(['segment_info'])
+            # MySQL中线段表按交易时间分月分区
+            self.partitioner.conn = self.conn
+            self.partitioner.partition_table('segment_info')
             logger.info("数据表创建成功")
             return True
         except Exception as e:
@@ -109,17 +130,25 @@ class SegmentDataProcessor:
             df = pd.read_csv(file_path, sep=';', encoding='utf-16')
             logger.info(f"成功读取线段数据文件，包含 {len(df)} 行数据")
             logger.info(f"列名: {list(df.columns)}")
+            # 读取后立即转换为紧凑的列类型
+            df = optimize_segment_log_frame(df)
+            logger.info(f"线段数据占用 {memory_usage_mb(df):.2f} MB")
             return df
         except Exception as e:
             logger.error(f"读取线段数据文件失败: {e}")
             return None
     
-    def save_segments_to_db(self, segments_df):
+    def save_segments_to_db(self, segments_df, source='segment_info.csv', replace=False,
+                            commit_rows=DEFAULT_COMMIT_ROWS, raise_errors=False):
         """
-        将线段数据保存到数据库
+        将线段数据保存到数据库（按块提交，中断后重新保存同一份数据时从最后提交的块继续）
         
         Args:
             segments_df (DataFrame): 线段数据
+            source (str): 来源文件名（确定导入检查点）
+            replace (bool): 从头保存时先清除线段表（续传时不清除）
+            commit_rows (int): 每个事务提交的行数
+            raise_errors (bool): 写入失败时抛出数据库异常，而不是记录错误后返回0
             
         Returns:
             int: 成功插入的记录数
@@ -129,133 +158,178 @@ class SegmentDataProcessor:
             return 0
         
         try:
-            insert_query = """
-            INSERT INTO segment_info 
-            (trade_time, order_ticket, position_id, reference_price, reference_time, 
-             reference_bar_index, timeframe, segment_side, segment_index, start_price,
-             end_price, amplitude, direction, trade_action, trade_price, trade_volume,
-             trade_comment, trade_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
+            count = CheckpointedImport(self, commit_rows=commit_rows).run_frame(
+                'segment_info', SEGMENTS_INSERT_QUERY, segments_df, self.build_segment_rows, source, replace=replace,
+                prepare=self.prepare_segment_rows)
+            logger.info(f"成功将{count}条线段记录保存到数据库")
+            return count
+            
+        except DB_ERRORS as e:
+            logger.error(f"保存线段数据到数据库失败（已提交的块保留，重新保存时继续）: {e}")
+            if raise_errors:
+                raise
+            return 0
+
+    def import_segment_file(self, file_path, replace=False, commit_rows=DEFAULT_COMMIT_ROWS):
+        """
+        从segment_info.csv分块读取并导入线段数据，每块读取后即写入并提交，不在内存中保留整个文件；
+        中断后重新导入同一文件（大小和修改时间不变）时跳过已提交的行，从下一块继续
+        
+        Args:
+            file_path (str): CSV文件路径
+            replace (bool): 从头导入时先清除线段表（续传时不清除）
+            commit_rows (int): 每个事务提交的行数
             
-            count = 0
-            for idx, row in segments_df.iterrows():
-                # 提取各字段值
-                trade_time = None
-                order_ticket = None
-                position_id = None
-                reference_price = 0.0
-                reference_time = None
-                reference_bar_index = 0
-                timeframe = ""
-                segment_side = ""
-                segment_index = 0
-                start_price = 0.0
-                end_price = 0.0
-                amplitude = 0.0
-                direction = ""
-                trade_action = ""
-                trade_price = 0.0
-                trade_volume = 0.0
-                trade_comment = ""
-                trade_status = ""
-                
-                # 处理时间字段
-                if 'TradeTime' in row and pd.notna(row['TradeTime']):
+        Returns:
+            int: 该文件累计导入的记录数
+        """
+        def chunks_from(offset):
+            # 保留表头行，跳过已提交的数据行
+            with pd.read_csv(file_path, sep=';', encoding='utf-16', chunksize=commit_rows,
+                             skiprows=range(1, offset + 1)) as reader:
+                for chunk in reader:
+                    yield optimize_segment_log_frame(chunk)
+
+        importer = CheckpointedImport(self, commit_rows=commit_rows)
+        count = importer.run('segment_info', SEGMENTS_INSERT_QUERY, os.path.abspath(file_path),
+                             file_signature(file_path), chunks_from, self.build_segment_rows, replace=replace,
+                             prepare=self.prepare_segment_rows)
+        logger.info(f"成功将{count}条线段记录导入数据库: {file_path}")
+        return count
+    
+    def prepare_segment_rows(self, rows):
+        """写入前按交易时间添加缺少的月分区（仅MySQL分区表），返回可写入的行（分区表跳过交易时间为空的行）"""
+        self.partitioner.conn = self.conn
+        rows = self.partitioner.writable_rows('segment_info', rows)
+        self.partitioner.ensure_partitions('segment_info', (row[0] for row in rows))
+        return rows
+
+    def build_segment_rows(self, segments_df):
+        """
+        将segment_info.csv的线段数据转换为segment_info的插入行
+        
+        Args:
+            segments_df (DataFrame): 线段数据
+            
+        Returns:
+            list: 插入行（与SEGMENTS_INSERT_QUERY的列顺序一致）
+        """
+        rows = []
+        for idx, row in segments_df.iterrows():
+            # 提取各字段值
+            trade_time = None
+            order_ticket = None
+            position_id = None
+            reference_price = 0.0
+            reference_time = None
+            reference_bar_index = 0
+            timeframe = ""
+            segment_side = ""
+            segment_index = 0
+            start_price = 0.0
+            end_price = 0.0
+            amplitude = 0.0
+            direction = ""
+            trade_action = ""
+            trade_price = 0.0
+            trade_volume = 0.0
+            trade_comment = ""
+            trade_status = ""
+
+            # 处理时间字段
+            if 'TradeTime' in row and pd.notna(row['TradeTime']):
+                if isinstance(row['TradeTime'], datetime.datetime):
+                    trade_time = pd.Timestamp(row['TradeTime']).to_pydatetime()
+                else:
                     try:
                         trade_time = datetime.datetime.strptime(row['TradeTime'], '%Y.%m.%d %H:%M:%S')
                     except ValueError:
                         pass
-                
-                if 'ReferenceTime' in row and pd.notna(row['ReferenceTime']):
+
+            if 'ReferenceTime' in row and pd.notna(row['ReferenceTime']):
+                if isinstance(row['ReferenceTime'], datetime.datetime):
+                    reference_time = pd.Timestamp(row['ReferenceTime']).to_pydatetime()
+                else:
                     try:
                         reference_time = datetime.datetime.strptime(row['ReferenceTime'], '%Y.%m.%d %H:%M:%S')
                     except ValueError:
                         pass
-                
-                # 处理其他字段
-                if 'OrderTicket' in row and pd.notna(row['OrderTicket']):
-                    order_ticket = int(row['OrderTicket'])
-                
-                if 'PositionId' in row and pd.notna(row['PositionId']):
-                    position_id = int(row['PositionId'])
-                
-                if 'ReferencePrice' in row and pd.notna(row['ReferencePrice']):
-                    reference_price = float(row['ReferencePrice'])
-                
-                if 'ReferenceBarIndex' in row and pd.notna(row['ReferenceBarIndex']):
-                    reference_bar_index = int(row['ReferenceBarIndex'])
-                
-                if 'Timeframe' in row and pd.notna(row['Timeframe']):
-                    timeframe = str(row['Timeframe'])
-                
-                if 'SegmentSide' in row and pd.notna(row['SegmentSide']):
-                    segment_side = str(row['SegmentSide'])
-                
-                if 'SegmentIndex' in row and pd.notna(row['SegmentIndex']):
-                    segment_index = int(row['SegmentIndex'])
-                
-                if 'StartPrice' in row and pd.notna(row['StartPrice']):
-                    start_price = float(row['StartPrice'])
-                
-                if 'EndPrice' in row and pd.notna(row['EndPrice']):
-                    end_price = float(row['EndPrice'])
-                
-                if 'Amplitude' in row and pd.notna(row['Amplitude']):
-                    amplitude = float(row['Amplitude'])
-                
-                if 'Direction' in row and pd.notna(row['Direction']):
-                    direction = str(row['Direction'])
-                    
-                # 新增的交易操作相关字段
-                if 'TradeAction' in row and pd.notna(row['TradeAction']):
-                    trade_action = str(row['TradeAction'])
-                
-                if 'TradePrice' in row and pd.notna(row['TradePrice']):
-                    trade_price = float(row['TradePrice'])
-                
-                if 'TradeVolume' in row and pd.notna(row['TradeVolume']):
-                    trade_volume = float(row['TradeVolume'])
-                
-                if 'TradeComment' in row and pd.notna(row['TradeComment']):
-                    trade_comment = str(row['TradeComment'])
-                
-                if 'TradeStatus' in row and pd.notna(row['TradeStatus']):
-                    trade_status = str(row['TradeStatus'])
-                
-                values = (
-                    trade_time,
-                    order_ticket,
-                    position_id,
-                    reference_price,
-                    reference_time,
-                    reference_bar_index,
-                    timeframe,
-                    segment_side,
-                    segment_index,
-                    start_price,
-                    end_price,
-                    amplitude,
-                    direction,
-                    trade_action,
-                    trade_price,
-                    trade_volume,
-                    trade_comment,
-                    trade_status
-                )
-                
-                self.cursor.execute(insert_query, values)
-                count += 1
-            
-            self.conn.commit()
-            logger.info(f"成功将{count}条线段记录保存到数据库")
-            return count
-            
-        except Error as e:
-            logger.error(f"保存线段数据到数据库失败: {e}")
-            self.conn.rollback()
-            return 0
-    
+
+            # 处理其他字段
+            if 'OrderTicket' in row and pd.notna(row['OrderTicket']):
+                order_ticket = int(row['OrderTicket'])
+
+            if 'PositionId' in row and pd.notna(row['PositionId']):
+                position_id = int(row['PositionId'])
+
+            if 'ReferencePrice' in row and pd.notna(row['ReferencePrice']):
+                reference_price = float(row['ReferencePrice'])
+
+            if 'ReferenceBarIndex' in row and pd.notna(row['ReferenceBarIndex']):
+                reference_bar_index = int(row['ReferenceBarIndex'])
+
+            if 'Timeframe' in row and pd.notna(row['Timeframe']):
+                timeframe = str(row['Timeframe'])
+
+            if 'SegmentSide' in row and pd.notna(row['SegmentSide']):
+                segment_side = str(row['SegmentSide'])
+
+            if 'SegmentIndex' in row and pd.notna(row['SegmentIndex']):
+                segment_index = int(row['SegmentIndex'])
+
+            if 'StartPrice' in row and pd.notna(row['StartPrice']):
+                start_price = float(row['StartPrice'])
+
+            if 'EndPrice' in row and pd.notna(row['EndPrice']):
+                end_price = float(row['EndPrice'])
+
+            if 'Amplitude' in row and pd.notna(row['Amplitude']):
+                amplitude = float(row['Amplitude'])
+
+            if 'Direction' in row and pd.notna(row['Direction']):
+                direction = str(row['Direction'])
+
+            # 新增的交易操作相关字段
+            if 'TradeAction' in row and pd.notna(row['TradeAction']):
+                trade_action = str(row['TradeAction'])
+
+            if 'TradePrice' in row and pd.notna(row['TradePrice']):
+                trade_price = float(row['TradePrice'])
+
+            if 'TradeVolume' in row and pd.notna(row['TradeVolume']):
+                trade_volume = float(row['TradeVolume'])
+
+            if 'TradeComment' in row and pd.notna(row['TradeComment']):
+                trade_comment = str(row['TradeComment'])
+
+            if 'TradeStatus' in row and pd.notna(row['TradeStatus']):
+                trade_status = str(row['TradeStatus'])
+
+            values = (
+                trade_time,
+                order_ticket,
+                position_id,
+                reference_price,
+                reference_time,
+                reference_bar_index,
+                enum_value('segment_info', 'timeframe', timeframe),
+                enum_value('segment_info', 'segment_side', segment_side),
+                segment_index,
+                start_price,
+                end_price,
+                amplitude,
+                enum_value('segment_info', 'direction', direction),
+                trade_action,
+                trade_price,
+                trade_volume,
+                trade_comment,
+                trade_status
+            )
+
+            rows.append(values)
+        
+        return rows
+
     def clear_segment_database(self):
         """清除数据库中的线段数据"""
         try:
@@ -265,7 +339,7 @@ class SegmentDataProcessor:
             
             self.conn.commit()
             logger.info(f"已清除数据库中的线段数据: {segments_deleted} 条记录")
-        except Error as e:
+        except DB_ERRORS as e:
             logger.error(f"清除数据库线段数据失败: {e}")
             self.conn.rollback()
             raise
\ No newline at end of file
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+线段特征绩效立方体
+按线段特征（第一线段长度分档、各周期右线段数量，分别按票号关联和按开仓时间关联最近快照两种方式）、
+方向、交易品种和开仓小时预先聚合交易次数、
+胜率、盈亏，切片/钻取查询直接在聚合结果上完成；trade_summary变化时自动失效重建
+"""
+
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from FrameSchema import optimize_summary_frame
+from BacktestStatistics import CLOSED_TRADE_STATUSES
+
+logger = logging.getLogger("SegmentFeatureCube")
+
+# 第一线段长度分档边界（左闭右开，最后一档为 >= 最后一个边界）
+DEFAULT_LENGTH_BINS = (0, 5, 10, 20, 40, 80)
+
+# 立方体维度 -> 汇总表中的来源列
+CUBE_DIMENSIONS = {
+    'length_bucket': 'entry_first_segment_length',
+    'right_5min': 'entry_right_segments_5min',
+    'right_15min': 'entry_right_segments_15min',
+    'right_30min': 'entry_right_segments_30min',
+    'asof_length_5min': 'asof_first_segment_length_5min',
+    'asof_length_15min': 'asof_first_segment_length_15min',
+    'asof_length_30min': 'asof_first_segment_length_30min',
+    'asof_right_5min': 'asof_right_segments_5min',
+    'asof_right_15min': 'asof_right_segments_15min',
+    'asof_right_30min': 'asof_right_segments_30min',
+    'direction': 'order_type',
+    'symbol': 'symbol',
+    'hour': 'open_time',
+}
+
+# 按长度分档的维度
+LENGTH_DIMENSIONS = ('length_bucket', 'asof_length_5min', 'asof_length_15min', 'asof_length_30min')
+
+# 按右线段数量的维度（缺失为-1）
+COUNT_DIMENSIONS = ('right_5min', 'right_15min', 'right_30min', 'asof_right_5min', 'asof_right_15min', 'asof_right_30min')
+
+# 判断trade_summary是否变化的指纹查询
+FINGERPRINT_QUERY = """
+SELECT COUNT(*) AS row_count, MAX(id) AS max_id, SUM(profit) AS profit_sum, MAX(created_at) AS last_created
+FROM trade_summary
+"""
+
+
+def length_bucket_labels(bins):
+    """分档标签，如 [0,5)、[5,10)、>=80"""
+    labels = [f"[{bins[i]:g},{bins[i + 1]:g})" for i in range(len(bins) - 1)]
+    labels.append(f">={bins[-1]:g}")
+    return labels
+
+
+class SegmentFeatureCube:
+    """线段特征绩效立方体"""
+
+    def __init__(self, length_bins=DEFAULT_LENGTH_BINS, closed_statuses=CLOSED_TRADE_STATUSES, cache_size=256):
+        """
+        初始化立方体
+
+        Args:
+            length_bins (tuple): 第一线段长度分档边界
+            closed_statuses (tuple): 汇总表中表示已平仓交易的状态（没有exit_count列时使用）
+            cache_size (int): 查询结果缓存条数
+        """
+        self.length_bins = tuple(length_bins)
+        self.closed_statuses = tuple(closed_statuses)
+        self.cache_size = cache_size
+        self.cells = None
+        self.fingerprint = None
+        self._cache = OrderedDict()
+
+    def _dimension_frame(self, summary_df):
+        """由汇总数据生成各维度列（已平仓交易）"""
+        summary = optimize_summary_frame(summary_df)
+        if 'exit_count' in summary.columns:
+            closed = pd.to_numeric(summary['exit_count'], errors='coerce').fillna(0).to_numpy() > 0
+        else:
+            closed = summary['status'].astype(object).isin(self.closed_statuses).to_numpy()
+        trades = summary.loc[closed]
+
+        dims = pd.DataFrame(index=trades.index)
+        labels = np.array(['无'] + length_bucket_labels(self.length_bins), dtype=object)
+        for dim in LENGTH_DIMENSIONS:
+            column = CUBE_DIMENSIONS[dim]
+            if column in trades.columns:
+                length = pd.to_numeric(trades[column], errors='coerce').to_numpy(dtype='float64')
+            else:
+                length = np.full(len(trades), np.nan)
+            codes = np.searchsorted(np.asarray(self.length_bins, dtype='float64'), length, side='right') - 1
+            # 缺失或小于第一个边界的长度归入"无"
+            codes = np.where(np.isnan(length) | (codes < 0), -1, codes)
+            dims[dim] = pd.Categorical(labels[codes + 1], categories=labels, ordered=True)
+
+        for dim in COUNT_DIMENSIONS:
+            column = CUBE_DIMENSIONS[dim]
+            if column in trades.columns:
+                dims[dim] = pd.to_numeric(trades[column], errors='coerce').fillna(-1).astype('int16')
+            else:
+                dims[dim] = np.int16(-1)
+
+        order_type = trades['order_type'].astype(str).str.lower()
+        dims['direction'] = pd.Categorical(np.where(order_type.str.contains('buy'), 'buy',
+                                                    np.where(order_type.str.contains('sell'), 'sell', 'other')))
+        dims['symbol'] = trades['symbol'].astype('category')
+        dims['hour'] = trades['open_time'].dt.hour.fillna(-1).astype('int8')
+
+        net = (pd.to_numeric(trades['profit'], errors='coerce').fillna(0)
+               + pd.to_numeric(trades.get('commission', 0), errors='coerce').fillna(0)
+               + pd.to_numeric(trades.get('swap', 0), errors='coerce').fillna(0))
+        dims['profit'] = net.to_numpy(dtype='float64')
+        dims['win'] = (dims['profit'] > 0).astype('int32')
+        return dims
+
+    def build(self, summary_df, fingerprint=None):
+        """
+        构建立方体：按全部维度分组聚合为最细粒度的单元格
+
+        Args:
+            summary_df (DataFrame): 汇总数据
+            fingerprint: trade_summary指纹，用于判断缓存是否失效
+
+        Returns:
+            DataFrame: 单元格（各维度 + count, wins, profit_sum）
+        """
+        dims = self._dimension_frame(summary_df)
+        self.cells = (dims.groupby(list(CUBE_DIMENSIONS), observed=True, sort=False)
+                      .agg(count=('profit', 'size'), wins=('win', 'sum'), profit_sum=('profit', 'sum'))
+                      .reset_index())
+        self.fingerprint = fingerprint
+        self._cache.clear()
+        logger.info(f"线段特征立方体构建完成: {len(dims)} 笔交易，{len(self.cells)} 个单元格")
+        return self.cells
+
+    def invalidate(self):
+        """清除立方体和查询缓存"""
+        self.cells = None
+        self.fingerprint = None
+        self._cache.clear()
+
+    def table_fingerprint(self, backend, conn):
+        """读取trade_summary指纹（行数、最大id、盈亏合计、最后写入时间）"""
+        row = backend.read_sql(FINGERPRINT_QUERY, conn).iloc[0]
+        return tuple(None if pd.isna(v) else str(v) for v in row.tolist())
+
+    def refresh(self, backend, conn):
+        """
+        trade_summary发生变化时从数据库重建立方体，否则沿用已有结果
+
+        Returns:
+            bool: 是否重建
+        """
+        fingerprint = self.table_fingerprint(backend, conn)
+        if self.cells is not None and fingerprint == self.fingerprint:
+            return False
+        summary_df = backend.read_sql("SELECT * FROM trade_summary", conn)
+        self.build(summary_df, fingerprint)
+        return True
+
+    def query(self, by=None, filters=None):
+        """
+        切片/钻取查询
+
+        Args:
+            by (list): 分组维度，如 ['length_bucket', 'right_15min']；None表示整体汇总
+            filters (dict): 维度 -> 取值或取值列表，如 {'direction': 'buy', 'hour': [8, 9]}
+
+        Returns:
+            DataFrame: 分组维度 + count, wins, win_rate, profit_sum, profit_mean
+        """
+        if self.cells is None:
+            raise RuntimeError("立方体尚未构建，请先调用build或refresh")
+        by = list(by or [])
+        filters = dict(filters or {})
+        for dim in by + list(filters):
+            if dim not in CUBE_DIMENSIONS:
+                raise ValueError(f"不支持的维度: {dim}")
+
+        key = (tuple(by), tuple(sorted((k, tuple(np.atleast_1d(v).tolist())) for k, v in filters.items())))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key].copy()
+
+        cells = self.cells
+        if filters:
+            mask = np.ones(len(cells), dtype=bool)
+            for dim, values in filters.items():
+                mask &= cells[dim].isin(np.atleast_1d(values)).to_numpy()
+            cells = cells[mask]
+
+        if by:
+            result = cells.groupby(by, observed=True, sort=True)[['count', 'wins', 'profit_sum']].sum().reset_index()
+        else:
+            result = pd.DataFrame({'count': [cells['count'].sum()], 'wins': [cells['wins'].sum()],
+                                   'profit_sum': [cells['profit_sum'].sum()]})
+        count = result['count'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['win_rate'] = np.where(count > 0, result['wins'] / count * 100, np.nan)
+            result['profit_mean'] = np.where(count > 0, result['profit_sum'] / count, np.nan)
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result.copy()
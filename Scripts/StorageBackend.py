@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存储后端
+为各数据处理器提供可插拔的数据库连接，支持MySQL服务器以及嵌入式的SQLite/DuckDB引擎
+嵌入式引擎无需安装数据库服务器，适合在本地或CI环境中快速分析大规模回测数据。
+各后端只负责存储和按列读取，汇总仍在读取后的DataFrame上按列计算（分组、票号索引关联），与后端无关
+"""
+
+import re
+import sqlite3
+import logging
+
+import numpy as np
+import pandas as pd
+import mysql.connector
+from mysql.connector import Error
+
+try:
+    import duckdb
+except ImportError:  # DuckDB为可选依赖
+    duckdb = None
+
+logger = logging.getLogger("StorageBackend")
+
+# 仅供后端选择使用的配置键，不会传递给mysql.connector
+BACKEND_CONFIG_KEYS = ('backend', 'path')
+
+# 各后端可能抛出的数据库异常
+DB_ERRORS = (Error, sqlite3.Error) + ((duckdb.Error,) if duckdb is not None else ())
+
+
+def translate_column_type(column_type, dialect):
+    """
+    将MySQL列类型转换为嵌入式引擎的列类型（ENUM转换为文本，其余类型两种引擎都能识别）
+
+    Args:
+        column_type (str): MySQL列类型，如 DECIMAL(12,2)、ENUM('Left','Right')
+        dialect (str): 目标方言（mysql / sqlite / duckdb）
+
+    Returns:
+        str: 目标方言的列类型
+    """
+    if dialect == 'mysql':
+        return column_type
+    return re.sub(r"\bENUM\s*\((?:'[^']*'\s*,?\s*)*\)", 'TEXT' if dialect == 'sqlite' else 'VARCHAR',
+                  column_type, flags=re.IGNORECASE)
+
+
+def translate_mysql_sql(query, dialect):
+    """
+    将处理器中使用的MySQL语句转换为嵌入式引擎可执行的语句
+
+    Args:
+        query (str): MySQL语法的SQL语句
+        dialect (str): 目标方言（sqlite / duckdb）
+
+    Returns:
+        str: 转换后的SQL语句
+    """
+    sql = query.strip()
+
+    if re.match(r'CREATE\s+TABLE', sql, re.IGNORECASE):
+        table_name = re.search(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', sql, re.IGNORECASE).group(1)
+        # 去掉列注释和表选项
+        sql = re.sub(r"\s+COMMENT\s+'[^']*'", '', sql)
+        sql = re.sub(r'\)\s*ENGINE\s*=.*$', ')', sql, flags=re.IGNORECASE | re.DOTALL)
+        sql = translate_column_type(sql, dialect)
+        if dialect == 'sqlite':
+            sql = re.sub(r'\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT', sql, flags=re.IGNORECASE)
+        else:
+            sequence_name = f"seq_{table_name}_id"
+            sql = re.sub(r'\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY',
+                         f"BIGINT DEFAULT nextval('{sequence_name}') PRIMARY KEY", sql, flags=re.IGNORECASE)
+            sql = f"CREATE SEQUENCE IF NOT EXISTS {sequence_name};\n{sql}"
+        return sql
+
+    # 嵌入式表没有唯一键，ON DUPLICATE KEY UPDATE 子句不会生效，直接去掉
+    sql = re.sub(r'\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s+.*$', '', sql, flags=re.IGNORECASE | re.DOTALL)
+    # 参数占位符 %s -> ?
+    return sql.replace('%s', '?')
+
+
+def to_db_value(value):
+    """将pandas/numpy标量转换为数据库驱动可绑定的Python值（缺失值转换为None）"""
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+
+class EmbeddedCursor:
+    """嵌入式引擎游标，兼容处理器中使用的MySQL语句"""
+
+    def __init__(self, connection):
+        """
+        初始化游标
+
+        Args:
+            connection (EmbeddedConnection): 所属连接
+        """
+        self.connection = connection
+        self.rowcount = -1
+        self._result = None
+
+    def execute(self, query, params=None):
+        """执行单条SQL语句"""
+        sql = translate_mysql_sql(query, self.connection.dialect)
+        values = [to_db_value(v) for v in params] if params else []
+        raw = self.connection.raw
+        if self.connection.dialect == 'sqlite':
+            if re.match(r'CREATE\s+TABLE', sql, re.IGNORECASE):
+                raw.executescript(sql)
+                self.rowcount = -1
+                return
+            self._result = raw.execute(sql, values)
+            self.rowcount = self._result.rowcount
+            return
+
+        self._result = raw.execute(sql, values) if values else raw.execute(sql)
+        self.rowcount = -1
+        if re.match(r'(DELETE|UPDATE|INSERT)\b', sql, re.IGNORECASE):
+            # DuckDB以结果集的形式返回受影响的行数
+            row = self._result.fetchone()
+            self.rowcount = row[0] if row else 0
+
+    def executemany(self, query, seq_of_params):
+        """批量执行同一条SQL语句"""
+        sql = translate_mysql_sql(query, self.connection.dialect)
+        rows = [tuple(to_db_value(v) for v in params) for params in seq_of_params]
+        if not rows:
+            self.rowcount = 0
+            return
+
+        raw = self.connection.raw
+        if self.connection.dialect == 'duckdb':
+            # DuckDB逐行executemany很慢，改为注册DataFrame后整体INSERT ... SELECT
+            match = re.match(r'INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)', sql, re.IGNORECASE)
+            if match:
+                columns = [c.strip() for c in match.group(2).split(',')]
+                frame = pd.DataFrame(rows, columns=columns)
+                raw.register('_bulk_rows', frame)
+                try:
+                    raw.execute(f"INSERT INTO {match.group(1)} ({', '.join(columns)}) "
+                                f"SELECT {', '.join(columns)} FROM _bulk_rows")
+                finally:
+                    raw.unregister('_bulk_rows')
+                self.rowcount = len(rows)
+                return
+            # 按id批量更新同样改为注册DataFrame后整体UPDATE ... FROM
+            match = re.match(r'UPDATE\s+(\w+)\s+SET\s+(.+?)\s+WHERE\s+id\s*=\s*\?\s*$', sql,
+                             re.IGNORECASE | re.DOTALL)
+            if match:
+                columns = [c.split('=')[0].strip() for c in match.group(2).split(',')]
+                frame = pd.DataFrame(rows, columns=columns + ['_id'])
+                raw.register('_bulk_rows', frame)
+                try:
+                    assignments = ', '.join(f"{c} = _bulk_rows.{c}" for c in columns)
+                    raw.execute(f"UPDATE {match.group(1)} SET {assignments} FROM _bulk_rows "
+                                f"WHERE {match.group(1)}.id = _bulk_rows._id")
+                finally:
+                    raw.unregister('_bulk_rows')
+                self.rowcount = len(rows)
+                return
+
+        raw.executemany(sql, rows)
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self._result.fetchone() if self._result is not None else None
+
+    def fetchall(self):
+        return self._result.fetchall() if self._result is not None else []
+
+    @property
+    def description(self):
+        return self._result.description if self._result is not None else None
+
+    def close(self):
+        self._result = None
+
+
+class EmbeddedConnection:
+    """嵌入式引擎连接，提供与mysql.connector一致的commit/rollback/cursor接口"""
+
+    def __init__(self, raw, dialect):
+        """
+        初始化连接
+
+        Args:
+            raw: sqlite3或duckdb的原始连接
+            dialect (str): sqlite / duckdb
+        """
+        self.raw = raw
+        self.dialect = dialect
+        if dialect == 'duckdb':
+            # DuckDB默认自动提交，显式开启事务以保持与MySQL相同的提交语义
+            self.raw.begin()
+
+    def cursor(self):
+        return EmbeddedCursor(self)
+
+    def commit(self):
+        self.raw.commit()
+        if self.dialect == 'duckdb':
+            self.raw.begin()
+
+    def rollback(self):
+        self.raw.rollback()
+        if self.dialect == 'duckdb':
+            self.raw.begin()
+
+    def close(self):
+        if self.dialect == 'duckdb':
+            self.raw.commit()
+        self.raw.close()
+
+
+class MySQLBackend:
+    """MySQL服务器后端"""
+
+    name = 'mysql'
+
+    def __init__(self, db_config):
+        """
+        初始化后端
+
+        Args:
+            db_config (dict): 数据库配置
+        """
+        self.db_config = db_config
+
+    def connect(self):
+        """连接数据库，返回连接对象"""
+        params = {k: v for k, v in self.db_config.items() if k not in BACKEND_CONFIG_KEYS}
+        logger.info(f"连接MySQL数据库: {params.get('host')}:{params.get('port')}/{params.get('database')}")
+        return mysql.connector.connect(**params)
+
+    def read_sql(self, query, conn):
+        """执行查询并返回DataFrame"""
+        return pd.read_sql(query, conn)
+
+    def iter_sql(self, query, conn, chunk_rows):
+        """
+        以非缓冲游标流式执行查询，逐块返回DataFrame
+
+        结果在服务器端按需读取，客户端内存只保留当前块；读取完毕前同一连接不能执行其他查询
+        """
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(query)
+            columns = list(cursor.column_names)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns)
+        finally:
+            cursor.close()
+
+
+class SQLiteBackend:
+    """SQLite嵌入式后端（Python标准库自带，无需额外安装）"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_config):
+        """
+        初始化后端
+
+        Args:
+            db_config (dict): 数据库配置，path为数据库文件路径
+        """
+        self.db_config = db_config
+        self.path = db_config.get('path') or f"{db_config.get('database', 'pymt5')}.sqlite"
+
+    def connect(self):
+        """连接数据库，返回连接对象"""
+        logger.info(f"打开SQLite数据库文件: {self.path}")
+        raw = sqlite3.connect(self.path)
+        return EmbeddedConnection(raw, 'sqlite')
+
+    def read_sql(self, query, conn):
+        """执行查询并返回DataFrame"""
+        return pd.read_sql(translate_mysql_sql(query, 'sqlite'), conn.raw)
+
+    def iter_sql(self, query, conn, chunk_rows):
+        """逐块读取查询结果（SQLite游标按需逐行取数）"""
+        yield from pd.read_sql(translate_mysql_sql(query, 'sqlite'), conn.raw, chunksize=chunk_rows)
+
+
+class DuckDBBackend:
+    """DuckDB嵌入式列式后端（列式存储，导入和读取较快；汇总与其他后端一样在pandas中计算）"""
+
+    name = 'duckdb'
+
+    def __init__(self, db_config):
+        """
+        初始化后端
+
+        Args:
+            db_config (dict): 数据库配置，path为数据库文件路径
+        """
+        self.db_config = db_config
+        self.path = db_config.get('path') or f"{db_config.get('database', 'pymt5')}.duckdb"
+
+    def connect(self):
+        """连接数据库，返回连接对象"""
+        if duckdb is None:
+            raise ImportError("未安装duckdb，请执行: pip install duckdb")
+        logger.info(f"打开DuckDB数据库文件: {self.path}")
+        return EmbeddedConnection(duckdb.connect(self.path), 'duckdb')
+
+    def read_sql(self, query, conn):
+        """执行查询并以列式结果直接构造DataFrame"""
+        return conn.raw.execute(translate_mysql_sql(query, 'duckdb')).df()
+
+    def iter_sql(self, query, conn, chunk_rows):
+        """逐块读取查询结果（每块为若干个2048行的向量）"""
+        result = conn.raw.execute(translate_mysql_sql(query, 'duckdb'))
+        vectors = max(1, -(-chunk_rows // 2048))
+        while True:
+            chunk = result.fetch_df_chunk(vectors)
+            if chunk.empty:
+                break
+            yield chunk
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+    'duckdb': DuckDBBackend,
+}
+
+
+def create_backend(db_config):
+    """
+    根据配置创建存储后端
+
+    Args:
+        db_config (dict): 数据库配置，backend键指定后端类型（mysql / sqlite / duckdb），默认mysql
+
+    Returns:
+        存储后端实例
+    """
+    backend_name = str(db_config.get('backend', 'mysql')).lower()
+    if backend_name not in BACKENDS:
+        raise ValueError(f"不支持的存储后端: {backend_name}")
+    return BACKENDS[backend_name](db_config)
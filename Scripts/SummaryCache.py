@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+汇总结果缓存
+以源数据表（report_orders、report_deals、segment_info）的指纹和汇总配置作为键，
+把生成的汇总数据保存为本地Parquet文件；源数据和配置都没有变化时直接读取缓存，
+不再读取源数据表重新汇总。缓存按条数和总大小限制，超出时淘汰最久未使用的条目
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖，未安装时不使用缓存
+    pq = None
+
+logger = logging.getLogger("SummaryCache")
+
+# 汇总逻辑变化时递增，使旧缓存失效
+SUMMARY_CACHE_VERSION = 2
+
+# 默认缓存目录名（位于数据库文件或数据库配置所在的目录下）
+DEFAULT_CACHE_DIR = 'summary_cache'
+
+# 默认最多保留的缓存条数
+DEFAULT_MAX_ENTRIES = 8
+
+# 默认缓存总大小上限（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 汇总读取的源数据列（指纹覆盖这些列的全部内容，以及id）
+SOURCE_COLUMNS = (
+    ('report_orders', ('id', 'order_id', 'symbol', 'type', 'volume', 'filled_volume', 'price', 'sl', 'tp',
+                       'open_time', 'time', 'status', 'comment', 'report_file')),
+    ('report_deals', ('id', 'deal_id', 'symbol', 'type', 'direction', 'volume', 'price', 'order_id', 'commission',
+                      'swap', 'profit', 'balance', 'comment', 'deal_time', 'report_file')),
+    ('segment_info', ('id', 'trade_time', 'order_ticket', 'position_id', 'reference_price', 'reference_time',
+                      'timeframe', 'segment_side', 'segment_index', 'start_price', 'end_price', 'amplitude',
+                      'direction', 'trade_action', 'trade_price', 'trade_volume', 'trade_comment', 'trade_status')),
+)
+
+
+class _RowDigest:
+    """SQLite聚合函数：各行内容MD5前15位十六进制数之和（与行顺序无关）"""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values):
+        text = '|'.join('' if value is None else f"={value}" for value in values)
+        self.total += int(hashlib.md5(text.encode('utf-8')).hexdigest()[:15], 16)
+
+    def finalize(self):
+        return str(self.total)
+
+
+def _row_digest_expression(columns, dialect):
+    """各后端中对每行全部列求哈希并求和的表达式（结果为文本，避免大整数精度损失）"""
+    if dialect == 'mysql':
+        # 空值与空字符串区分：非空值前加'='
+        row = "CONCAT_WS('|', " + ", ".join(f"IFNULL(CONCAT('=', {column}), '')" for column in columns) + ")"
+        return f"CAST(SUM(CAST(CONV(LEFT(MD5({row}), 15), 16, 10) AS UNSIGNED)) AS CHAR)"
+    if dialect == 'duckdb':
+        return f"CAST(SUM(hash({', '.join(columns)})) AS VARCHAR)"
+    return f"row_digest({', '.join(columns)})"
+
+
+def source_checksum_query(dialect):
+    """
+    源数据指纹查询：各表的行数、最大id和全部汇总读取列的行哈希之和，
+    任何一列的原地更新、删除后重新插入都会改变指纹
+
+    Args:
+        dialect (str): mysql / sqlite / duckdb
+    """
+    parts = []
+    for table, columns in SOURCE_COLUMNS:
+        parts += [f"(SELECT COUNT(*) FROM {table}) AS {table}_count",
+                  f"(SELECT MAX(id) FROM {table}) AS {table}_max_id",
+                  f"(SELECT {_row_digest_expression(columns, dialect)} FROM {table}) AS {table}_digest"]
+    return "SELECT\n    " + ",\n    ".join(parts)
+
+
+def source_fingerprint(backend, conn):
+    """读取源数据表指纹（数值统一格式化，避免不同后端返回类型不同）"""
+    if backend.name == 'sqlite':
+        conn.raw.create_aggregate('row_digest', -1, _RowDigest)
+    row = backend.read_sql(source_checksum_query(backend.name), conn).iloc[0]
+    values = []
+    for value in row.tolist():
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            values.append(None)
+        else:
+            # MySQL的COUNT/MAX返回整数或Decimal，嵌入式后端可能返回浮点数
+            values.append(value if isinstance(value, str) else str(int(value)))
+    return tuple(values)
+
+
+def default_cache_dir(db_config=None):
+    """
+    默认缓存目录：嵌入式后端为数据库文件所在目录下的summary_cache，
+    MySQL为本程序（数据库配置所在）目录下的summary_cache，不随当前工作目录变化
+    """
+    db_config = db_config or {}
+    if db_config.get('backend') in ('sqlite', 'duckdb'):
+        path = db_config.get('path') or f"{db_config.get('database', 'pymt5')}.{db_config['backend']}"
+        return os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_CACHE_DIR)
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_CACHE_DIR)
+
+
+class SummaryCache:
+    """汇总结果的本地Parquet缓存"""
+
+    def __init__(self, cache_dir=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, db_config=None):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir (str): 缓存目录，None为default_cache_dir(db_config)
+            max_entries (int): 最多保留的缓存条数
+            max_bytes (int): 缓存文件总大小上限（字节）
+            db_config (dict): 数据库配置，用于确定默认缓存目录
+        """
+        self.cache_dir = cache_dir or default_cache_dir(db_config)
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self.enabled = pq is not None
+        if not self.enabled:
+            logger.warning("未安装pyarrow，不使用汇总缓存")
+
+    @staticmethod
+    def make_key(fingerprint, config):
+        """由源数据指纹和汇总配置生成缓存键"""
+        payload = json.dumps({'version': SUMMARY_CACHE_VERSION, 'fingerprint': list(fingerprint),
+                              'config': config}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def entries(self):
+        """
+        缓存条目，按最近使用时间从新到旧排列
+
+        Returns:
+            list: [(键, 文件路径, 大小, 最近使用时间), ...]
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((name[:-len('.parquet')], path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[3], reverse=True)
+        return entries
+
+    def get(self, key):
+        """
+        读取缓存，命中时更新最近使用时间
+
+        Returns:
+            DataFrame: 缓存的汇总数据，未命中返回None
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            summary_df = self._restore_time_units(pd.read_parquet(path), pq.read_schema(path))
+        except Exception as e:
+            logger.warning(f"读取汇总缓存失败，删除该缓存: {e}")
+            self.invalidate(key)
+            return None
+        os.utime(path, None)
+        return summary_df
+
+    @staticmethod
+    def _restore_time_units(summary_df, schema):
+        """Parquet不支持秒精度的时间戳，按写入时记录的pandas类型还原时间列的精度"""
+        metadata = json.loads(schema.metadata[b'pandas']) if schema.metadata and b'pandas' in schema.metadata else {}
+        for column in metadata.get('columns', []):
+            name, numpy_type = column.get('name'), str(column.get('numpy_type'))
+            if name in summary_df.columns and numpy_type.startswith('datetime64') \
+                    and str(summary_df[name].dtype) != numpy_type:
+                summary_df[name] = summary_df[name].astype(numpy_type)
+        return summary_df
+
+    def put(self, key, summary_df):
+        """写入缓存（先写临时文件再替换，中断时不会留下不完整的缓存），然后按容量淘汰"""
+        if not self.enabled or summary_df is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            summary_df.to_parquet(temp_path, index=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"写入汇总缓存失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        """超出条数或总大小时，从最久未使用的条目开始删除（至少保留最新一条）"""
+        entries = self.entries()
+        total = sum(entry[2] for entry in entries)
+        while len(entries) > 1 and (len(entries) > self.max_entries or total > self.max_bytes):
+            key, path, size, _ = entries.pop()
+            os.remove(path)
+            total -= size
+            logger.info(f"淘汰汇总缓存: {key[:12]}（{size / 1024 / 1024:.2f} MB）")
+
+    def invalidate(self, key=None):
+        """
+        清除缓存
+
+        Args:
+            key (str): 缓存键，None表示清除全部
+
+        Returns:
+            int: 删除的条数
+        """
+        paths = [self._path(key)] if key else [entry[1] for entry in self.entries()]
+        removed = 0
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        logger.info(f"已清除 {removed} 条汇总缓存")
+        return removed
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+汇总表本地读取服务
+把trade_summary读入内存（按列存储的DataFrame），按交易品种、时间范围、状态、线段数量阈值等条件
+筛选和分组聚合，结果放入LRU缓存，相同查询不再扫描数据；trade_summary变化时重新读取。
+可选在本机启动HTTP/JSON接口供看板调用
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from StorageBackend import create_backend
+from FrameSchema import optimize_summary_frame
+from BacktestStatistics import CLOSED_TRADE_STATUSES
+from TablePartitions import with_time_window, parse_window_time
+
+logger = logging.getLogger("SummaryService")
+
+# 默认查询结果缓存条数
+DEFAULT_CACHE_SIZE = 256
+
+# HTTP接口默认只监听本机
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# 判断trade_summary是否变化的状态查询：行数和id范围都不变时未变化
+SUMMARY_STATE_QUERY = """
+SELECT COUNT(*) AS row_count, MIN(id) AS min_id, MAX(id) AS max_id
+FROM trade_summary
+"""
+
+# 变化时比较的id列表：内存中有而表中没有的记录已删除，表中有而内存中没有的记录为新增
+SUMMARY_IDS_QUERY = """
+SELECT id FROM trade_summary
+"""
+
+# 由开仓时间派生的分组维度
+DERIVED_DIMENSIONS = {
+    'date': lambda open_time: open_time.dt.strftime('%Y-%m-%d'),
+    'hour': lambda open_time: open_time.dt.hour,
+    'weekday': lambda open_time: open_time.dt.weekday,
+}
+
+
+def _as_list(value):
+    """单个取值或逗号分隔的文本转换为列表"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [item for item in value.split(',') if item != '']
+    return list(value)
+
+
+def parse_query_params(query_string):
+    """
+    将HTTP查询字符串转换为query的参数
+
+    symbol、status、order_type、group_by、columns可重复或逗号分隔；
+    min.<列名>=值、max.<列名>=值 为数值阈值，如 min.entry_right_segments_15min=2
+
+    Args:
+        query_string (str): 查询字符串
+
+    Returns:
+        dict: query的关键字参数
+    """
+    params = parse_qs(query_string, keep_blank_values=False)
+    kwargs = {}
+    min_values, max_values = {}, {}
+    for name, values in params.items():
+        if name.startswith('min.'):
+            min_values[name[4:]] = float(values[-1])
+        elif name.startswith('max.'):
+            max_values[name[4:]] = float(values[-1])
+        elif name in ('symbol', 'status', 'order_type', 'group_by', 'columns'):
+            kwargs[{'symbol': 'symbols', 'status': 'statuses', 'order_type': 'order_types'}.get(name, name)] = \
+                [item for value in values for item in _as_list(value)]
+        elif name in ('start', 'end'):
+            kwargs[name] = values[-1]
+        elif name == 'limit':
+            kwargs['limit'] = int(values[-1])
+        else:
+            raise ValueError(f"不支持的查询参数: {name}")
+    if min_values:
+        kwargs['min_values'] = min_values
+    if max_values:
+        kwargs['max_values'] = max_values
+    return kwargs
+
+
+class SummaryReadService:
+    """汇总表内存读取服务"""
+
+    def __init__(self, db_config, cache_size=DEFAULT_CACHE_SIZE, closed_statuses=CLOSED_TRADE_STATUSES,
+                 start=None, end=None):
+        """
+        初始化服务
+
+        Args:
+            db_config (dict): 数据库配置
+            cache_size (int): 查询结果缓存条数
+            closed_statuses (tuple): 表示已平仓交易的状态（没有exit_count列时用于聚合统计）
+            start: 只读取开仓时间不早于该时间的汇总记录，None为不限
+            end: 只读取开仓时间早于该时间的汇总记录，None为不限
+        """
+        self.backend = create_backend(db_config)
+        self.cache_size = max(1, int(cache_size))
+        self.closed_statuses = tuple(closed_statuses)
+        self.start = parse_window_time(start)
+        self.end = parse_window_time(end)
+        self.summary = None
+        self.state = None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read_state(self, conn):
+        row = self.backend.read_sql(self._windowed(SUMMARY_STATE_QUERY), conn).iloc[0]
+        return tuple(0 if pd.isna(v) else int(v) for v in row.tolist())
+
+    def _windowed(self, query):
+        """按读取窗口过滤开仓时间"""
+        return with_time_window(query, 'open_time', self.start, self.end)
+
+    def refresh(self):
+        """
+        按trade_summary的变化刷新内存数据
+
+        行数和id范围都不变时不读取数据；否则比较表中和内存中的id：丢弃已删除的记录，只读取新增的记录。
+        自增id不会复用，新增记录的id总是大于此前读到的最大id，因此按 id > 最大id 读取；
+        读到的记录与新增的id不一致（表被删除后重建等）或表的列有变化（迁移增加了列）时整表重新读取。
+        save_summary_to_db只删除和插入有变化的行，重新生成汇总后只读取变化的记录
+
+        Returns:
+            str: unchanged 未变化 / incremental 增量更新 / reload 整表重新读取
+        """
+        conn = self.backend.connect()
+        try:
+            state = self._read_state(conn)
+            if self.summary is not None and state == self.state:
+                return 'unchanged'
+            mode = 'reload'
+            summary = None
+            if self.summary is not None and len(self.summary):
+                ids = self.backend.read_sql(self._windowed(SUMMARY_IDS_QUERY), conn)['id'].to_numpy(dtype='int64')
+                known = self.summary['id'].to_numpy(dtype='int64')
+                added_ids = np.setdiff1d(ids, known)
+                max_id = int(known.max())
+                added = self.backend.read_sql(
+                    self._windowed(f"SELECT * FROM trade_summary WHERE id > {max_id} ORDER BY id"), conn)
+                if len(added) == len(added_ids) and (added_ids.size == 0 or added_ids.min() > max_id) \
+                        and list(added.columns) == list(self.summary.columns):
+                    mode = 'incremental'
+                    kept = self.summary[np.isin(known, ids)].reset_index(drop=True)
+                    summary = optimize_summary_frame(pd.concat([kept, added], ignore_index=True)) if len(added) else kept
+                    removed = len(known) - len(kept)
+            if summary is None:
+                summary = optimize_summary_frame(
+                    self.backend.read_sql(self._windowed("SELECT * FROM trade_summary ORDER BY id"), conn))
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.summary = summary
+            self.state = state
+            self.version += 1
+            self._cache.clear()
+        if mode == 'incremental':
+            logger.info(f"汇总数据已增量刷新（删除 {removed} 条，新增 {len(added)} 条），共 {len(summary)} 条记录")
+        else:
+            logger.info(f"汇总数据已刷新（{mode}），共 {len(summary)} 条记录")
+        return mode
+
+    def _filter(self, summary, symbols, start, end, statuses, order_types, min_values, max_values):
+        """按条件生成行掩码"""
+        mask = np.ones(len(summary), dtype=bool)
+        if symbols:
+            mask &= summary['symbol'].isin(symbols).to_numpy()
+        if statuses:
+            mask &= summary['status'].isin(statuses).to_numpy()
+        if order_types:
+            mask &= summary['order_type'].isin(order_types).to_numpy()
+        if start is not None:
+            mask &= (summary['open_time'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (summary['open_time'] < pd.Timestamp(end)).to_numpy()
+        for bounds, compare in ((min_values, np.greater_equal), (max_values, np.less_equal)):
+            for column, value in (bounds or {}).items():
+                if column not in summary.columns:
+                    raise ValueError(f"汇总表中没有列: {column}")
+                values = pd.to_numeric(summary[column], errors='coerce').to_numpy(dtype='float64')
+                with np.errstate(invalid='ignore'):
+                    mask &= compare(values, value)
+        return mask
+
+    def _aggregate(self, rows, group_by):
+        """按分组统计已平仓交易的笔数、胜率和净盈亏"""
+        if 'exit_count' in rows.columns:
+            closed = pd.to_numeric(rows['exit_count'], errors='coerce').fillna(0).to_numpy() > 0
+        else:
+            closed = rows['status'].astype(object).isin(self.closed_statuses).to_numpy()
+        trades = rows.loc[closed]
+        net = (pd.to_numeric(trades['profit'], errors='coerce').fillna(0)
+               + pd.to_numeric(trades['commission'], errors='coerce').fillna(0)
+               + pd.to_numeric(trades['swap'], errors='coerce').fillna(0))
+        frame = pd.DataFrame({'profit': net.to_numpy(dtype='float64')}, index=trades.index)
+        frame['win'] = (frame['profit'] > 0).astype('int32')
+        for dim in group_by:
+            if dim in DERIVED_DIMENSIONS:
+                frame[dim] = DERIVED_DIMENSIONS[dim](trades['open_time'])
+            elif dim in trades.columns:
+                frame[dim] = trades[dim]
+            else:
+                raise ValueError(f"不支持的分组: {dim}")
+        result = (frame.groupby(group_by, observed=True, sort=True)
+                  .agg(count=('profit', 'size'), wins=('win', 'sum'), profit_sum=('profit', 'sum'))
+                  .reset_index())
+        count = result['count'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['win_rate'] = np.where(count > 0, result['wins'] / count * 100, np.nan)
+            result['profit_mean'] = np.where(count > 0, result['profit_sum'] / count, np.nan)
+        return result
+
+    def query(self, symbols=None, start=None, end=None, statuses=None, order_types=None,
+              min_values=None, max_values=None, group_by=None, columns=None, limit=None):
+        """
+        查询汇总数据
+
+        Args:
+            symbols (list): 交易品种
+            start (str): 开仓时间起点（含）
+            end (str): 开仓时间终点（不含）
+            statuses (list): 状态
+            order_types (list): 订单类型
+            min_values (dict): 列名 -> 最小值（含），如 {'entry_right_segments_15min': 2}
+            max_values (dict): 列名 -> 最大值（含）
+            group_by (list): 分组（汇总表的列或 date / hour / weekday），指定时返回已平仓交易的分组统计
+            columns (list): 返回的列（明细查询）
+            limit (int): 最多返回行数
+
+        Returns:
+            DataFrame: 明细或分组统计（返回副本，可随意修改）
+        """
+        return self._cached_query(dict(symbols=symbols, start=start, end=end, statuses=statuses,
+                                       order_types=order_types, min_values=min_values, max_values=max_values,
+                                       group_by=group_by, columns=columns, limit=limit), 'frame').copy()
+
+    def query_json(self, **kwargs):
+        """查询并返回JSON（bytes），序列化结果同样缓存"""
+        return self._cached_query(kwargs, 'json')
+
+    def _cached_query(self, params, output):
+        params = {name: value for name, value in params.items() if value not in (None, [], {})}
+        if self.summary is None:
+            self.refresh()
+        key = (output, json.dumps(params, sort_keys=True, default=str, ensure_ascii=False))
+        with self._lock:
+            summary, version = self.summary, self.version
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        if output == 'json':
+            result = self._cached_query(params, 'frame')
+            result = result.to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8')
+        else:
+            result = self._run_query(summary, **params)
+
+        with self._lock:
+            # 计算期间数据已刷新时不缓存旧版本的结果
+            if version == self.version:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _run_query(self, summary, symbols=None, start=None, end=None, statuses=None, order_types=None,
+                   min_values=None, max_values=None, group_by=None, columns=None, limit=None):
+        mask = self._filter(summary, symbols, start, end, statuses, order_types, min_values, max_values)
+        rows = summary.loc[mask]
+        if group_by:
+            result = self._aggregate(rows, list(group_by))
+        else:
+            if columns:
+                missing = [column for column in columns if column not in rows.columns]
+                if missing:
+                    raise ValueError(f"汇总表中没有列: {missing}")
+                rows = rows[list(columns)]
+            result = rows.reset_index(drop=True)
+        return result.head(limit) if limit else result
+
+    def info(self):
+        """服务状态：记录数、数据版本、缓存命中情况"""
+        with self._lock:
+            return {
+                'rows': 0 if self.summary is None else len(self.summary),
+                'version': self.version,
+                'cached_queries': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'window': [None if self.start is None else str(self.start), None if self.end is None else str(self.end)],
+            }
+
+    def start_polling(self, interval):
+        """
+        启动后台线程，每隔interval秒检查trade_summary并刷新
+
+        Returns:
+            threading.Event: 设置后停止轮询
+        """
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"刷新汇总数据失败: {e}")
+
+        threading.Thread(target=poll, name="SummaryServicePoll", daemon=True).start()
+        return stop
+
+
+class SummaryRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/JSON接口
+
+    GET  /summary?symbol=XAUUSD&start=2025-04-01&group_by=hour   明细或分组统计
+    GET  /info                                                   服务状态
+    POST /refresh                                                立即检查并刷新
+    """
+
+    service = None
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path == '/summary':
+                self._send(200, self.service.query_json(**parse_query_params(url.query)))
+            elif url.path == '/info':
+                self._send_json(200, self.service.info())
+            else:
+                self._send_json(404, {'error': f"未知路径: {url.path}"})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"查询失败: {e}")
+            self._send_json(500, {'error': str(e)})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/refresh':
+            self._send_json(404, {'error': f"未知路径: {self.path}"})
+            return
+        try:
+            self._send_json(200, {'refresh': self.service.refresh(), **self.service.info()})
+        except Exception as e:
+            logger.error(f"刷新汇总数据失败: {e}")
+            self._send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    创建HTTP服务（调用serve_forever运行）
+
+    Args:
+        service (SummaryReadService): 读取服务
+        host (str): 监听地址，默认只监听本机
+        port (int): 端口
+
+    Returns:
+        ThreadingHTTPServer: HTTP服务
+    """
+    handler = type('BoundSummaryRequestHandler', (SummaryRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"汇总查询服务已启动: http://{host}:{server.server_address[1]}/summary")
+    return server
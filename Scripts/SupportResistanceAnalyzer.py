@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+支撑压力穿越批量分析
+以segment_info中每笔交易的参考价格（ReferencePrice/ReferenceTime）作为支撑/压力位，
+按CSupportResistancePoint::CheckPenetration的规则（支撑被最低价跌破、压力被最高价突破）
+在K线历史上批量判断交易之后是否以及何时被穿越，结果作为汇总表的新列
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from FrameSchema import optimize_summary_frame
+
+logger = logging.getLogger("SupportResistanceAnalyzer")
+
+# 点类型（与CSupportResistancePoint::GetDescription一致）
+SR_SUPPORT = '支撑'
+SR_RESISTANCE = '压力'
+
+# 读取参考价格的查询
+REFERENCE_QUERY = """
+SELECT trade_time, order_ticket, position_id, reference_price, reference_time
+FROM segment_info
+WHERE reference_price > 0
+"""
+
+
+def reference_levels(segments_df):
+    """
+    每个订单票号的参考价格（各周期快照的参考价格相同，取最早一条）
+
+    Args:
+        segments_df (DataFrame): 线段数据（trade_time, order_ticket, position_id, reference_price, reference_time）
+
+    Returns:
+        DataFrame: order_ticket, position_id, trade_time, reference_price, reference_time（按trade_time升序）
+    """
+    columns = ['order_ticket', 'position_id', 'trade_time', 'reference_price', 'reference_time']
+    segments = segments_df[[c for c in columns if c in segments_df.columns]].copy()
+    segments['reference_price'] = pd.to_numeric(segments['reference_price'], errors='coerce')
+    segments = segments[segments['reference_price'] > 0]
+    for column in ('trade_time', 'reference_time'):
+        if column in segments.columns:
+            segments[column] = pd.to_datetime(segments[column], errors='coerce')
+    segments = segments.sort_values(['trade_time', 'order_ticket'], kind='mergesort')
+    return segments.drop_duplicates('order_ticket').reset_index(drop=True)
+
+
+class SupportResistanceAnalyzer:
+    """支撑压力穿越分析"""
+
+    def __init__(self, index, horizon=None, prefix='sr_'):
+        """
+        初始化分析器
+
+        Args:
+            index (BarRangeIndex): K线区间极值索引
+            horizon (str): 检查窗口长度（如 '1D'）；None表示到平仓时间，未平仓的到K线末尾
+            prefix (str): 新增列名前缀
+        """
+        self.index = index
+        self.horizon = pd.Timedelta(horizon) if horizon else None
+        self.prefix = prefix
+
+    def penetration(self, levels, is_support, start, end):
+        """
+        批量判断价格位在 [start, end] 内是否被穿越
+
+        Args:
+            levels (array): 价格位
+            is_support (array): True为支撑（最低价低于价格位即穿越），False为压力（最高价高于价格位即穿越）
+            start (array): 检查起始时间
+            end (array): 检查结束时间（含）
+
+        Returns:
+            DataFrame: penetrated, penetration_time, penetration_price, minutes_to_penetration
+        """
+        levels = np.asarray(levels, dtype='float64')
+        is_support = np.asarray(is_support, dtype=bool)
+        start = pd.to_datetime(pd.Series(start)).to_numpy(dtype='datetime64[ns]')
+        end = pd.to_datetime(pd.Series(end)).to_numpy(dtype='datetime64[ns]')
+
+        below_price, below_time, _ = self.index.first_below(start, end, levels)
+        above_price, above_time, _ = self.index.first_above(start, end, levels)
+        price = np.where(is_support, below_price, above_price)
+        time = np.where(is_support, below_time, above_time)
+        penetrated = ~np.isnat(time)
+        minutes = (time - start) / np.timedelta64(1, 'm')
+        return pd.DataFrame({
+            'penetrated': np.where(np.isnan(levels), False, penetrated),
+            'penetration_time': time,
+            'penetration_price': price,
+            'minutes_to_penetration': np.where(penetrated, minutes, np.nan),
+        })
+
+    def _row_levels(self, summary_df, levels_df):
+        """为汇总表每一行找到参考价格：有仓位ID的取该仓位最早的快照，否则按订单号匹配"""
+        by_position = levels_df[levels_df['position_id'] > 0].drop_duplicates('position_id').set_index('position_id')
+        by_ticket = levels_df.set_index('order_ticket')
+
+        position_id = pd.to_numeric(summary_df['position_id'], errors='coerce').to_numpy(dtype='float64')
+        order_id = pd.to_numeric(summary_df['order_id'], errors='coerce').to_numpy(dtype='float64')
+        from_position = by_position.reindex(position_id)
+        from_ticket = by_ticket.reindex(order_id)
+        use_position = from_position['reference_price'].notna().to_numpy()
+
+        price = np.where(use_position, from_position['reference_price'].to_numpy(dtype='float64'),
+                         from_ticket['reference_price'].to_numpy(dtype='float64'))
+        time = np.where(use_position, from_position['reference_time'].to_numpy(dtype='datetime64[ns]'),
+                        from_ticket['reference_time'].to_numpy(dtype='datetime64[ns]'))
+        return price, time
+
+    def attach(self, summary_df, segments_df):
+        """
+        为汇总数据每一行附加参考价格的穿越结果
+
+        参考价格高于开仓价视为压力，否则视为支撑；从开仓时间开始检查
+
+        Args:
+            summary_df (DataFrame): 汇总数据（position_id, order_id, open_price, open_time[, close_time]）
+            segments_df (DataFrame): 线段数据
+
+        Returns:
+            DataFrame: 附加了 {prefix}level, {prefix}reference_time, {prefix}type, {prefix}penetrated,
+                       {prefix}penetration_time, {prefix}penetration_price, {prefix}minutes_to_penetration 的副本
+        """
+        levels, reference_time = self._row_levels(summary_df, reference_levels(segments_df))
+        open_price = pd.to_numeric(summary_df['open_price'], errors='coerce').to_numpy(dtype='float64')
+        is_support = levels < open_price
+
+        start = pd.to_datetime(summary_df['open_time']).to_numpy(dtype='datetime64[ns]')
+        if self.horizon is not None:
+            end = start + self.horizon.to_timedelta64()
+        else:
+            end = (pd.to_datetime(summary_df['close_time']).to_numpy(dtype='datetime64[ns]')
+                   if 'close_time' in summary_df.columns else np.full(len(start), np.datetime64('NaT', 'ns')))
+            last_bar = self.index.times[-1] if len(self.index.times) else np.datetime64('NaT', 'ns')
+            end = np.where(np.isnat(end), last_bar, end)
+
+        result = self.penetration(levels, is_support, start, end)
+        output = summary_df.copy()
+        output[f'{self.prefix}level'] = levels
+        output[f'{self.prefix}reference_time'] = reference_time
+        output[f'{self.prefix}type'] = np.where(np.isnan(levels), None,
+                                                np.where(is_support, SR_SUPPORT, SR_RESISTANCE))
+        for column in result.columns:
+            output[f'{self.prefix}{column}'] = result[column].to_numpy()
+        logger.info(f"支撑压力穿越分析完成: {len(output)} 行，{int(np.isfinite(levels).sum())} 行有参考价格，"
+                    f"{int(result['penetrated'].sum())} 行被穿越")
+        return optimize_summary_frame(output)
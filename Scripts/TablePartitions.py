@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按月分区与时间窗口
+MySQL中的report_deals和segment_info按成交时间/交易时间做RANGE COLUMNS月分区，入库前按数据的时间范围
+自动添加新的月分区；读取按时间窗口过滤时，MySQL只扫描窗口覆盖的分区，客户端也只读取该时间段的数据
+（汇总为保持跨越窗口边界的仓位完整，只以窗口起点附近的时间为下界读取线段表）。
+SQLite为时间列建立索引，DuckDB按行组的最小/最大值跳过不相关的数据，都不需要分区
+"""
+
+import logging
+import re
+
+import pandas as pd
+
+logger = logging.getLogger("TablePartitions")
+
+# 分区表 -> (分区时间列, 列注释)
+PARTITIONED_TABLES = {
+    'report_deals': ('deal_time', '时间'),
+    'segment_info': ('trade_time', '交易时间'),
+}
+
+# 接收最新月份之后数据的分区
+MAXVALUE_PARTITION = 'pmax'
+
+
+def month_start(value):
+    """时间所在月份的第一天"""
+    return pd.Timestamp(value).to_period('M').to_timestamp()
+
+
+def partition_name(month):
+    """月分区名，如 p202504"""
+    return f"p{month:%Y%m}"
+
+
+def parse_window_time(value):
+    """
+    解析时间窗口的边界
+
+    Args:
+        value: 日期字符串、datetime或Timestamp，None表示不限
+
+    Returns:
+        Timestamp: 边界时间，None表示不限
+    """
+    if value is None or value == '':
+        return None
+    return pd.Timestamp(value)
+
+
+def time_window_clause(column, start=None, end=None):
+    """
+    时间窗口的SQL条件（起点包含、终点不包含），边界先解析为时间再格式化，不直接拼接输入
+
+    Returns:
+        str: 条件表达式，不限时间时返回空字符串
+    """
+    conditions = []
+    start, end = parse_window_time(start), parse_window_time(end)
+    if start is not None:
+        conditions.append(f"{column} >= '{start:%Y-%m-%d %H:%M:%S}'")
+    if end is not None:
+        conditions.append(f"{column} < '{end:%Y-%m-%d %H:%M:%S}'")
+    return " AND ".join(conditions)
+
+
+def with_time_window(query, column, start=None, end=None):
+    """为单表查询添加时间窗口条件（已有WHERE时以AND连接，有ORDER BY时插在其前）"""
+    clause = time_window_clause(column, start, end)
+    if not clause:
+        return query
+    order_by = re.search(r'\s+ORDER\s+BY\s', query, re.IGNORECASE)
+    head, tail = (query[:order_by.start()], query[order_by.start():]) if order_by else (query.rstrip(), '')
+    keyword = 'AND' if re.search(r'\bWHERE\b', head, re.IGNORECASE) else 'WHERE'
+    return f"{head} {keyword} {clause}{tail}"
+
+
+class TablePartitioner:
+    """MySQL月分区管理"""
+
+    def __init__(self, backend, conn):
+        """
+        初始化
+
+        Args:
+            backend: StorageBackend后端
+            conn: 数据库连接
+        """
+        self.backend = backend
+        self.conn = conn
+        self._months = {}
+
+    @property
+    def enabled(self):
+        return self.backend.name == 'mysql'
+
+    def partition_months(self, table):
+        """
+        已有的月分区（不含MAXVALUE分区）
+
+        Returns:
+            list: 各分区对应月份的第一天，按时间排序；表未分区时返回None
+        """
+        if table in self._months:
+            return self._months[table]
+        df = self.backend.read_sql(f"""
+            SELECT PARTITION_NAME AS name FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' ORDER BY PARTITION_ORDINAL_POSITION
+        """, self.conn)
+        names = [name for name in df['name'] if name is not None and name == name]
+        months = None
+        if names:
+            months = [pd.Timestamp(f"{name[1:5]}-{name[5:7]}-01") for name in names if name != MAXVALUE_PARTITION]
+        self._months[table] = months
+        return months
+
+    def writable_rows(self, table, rows):
+        """
+        分区表的时间列为NOT NULL，写入前跳过时间为空的行并记录警告；未分区的表（包括嵌入式后端）原样返回
+
+        Args:
+            table (str): 分区表
+            rows (list): 插入行（第一列为分区时间）
+
+        Returns:
+            list: 可以写入的行
+        """
+        if not self.enabled or self.partition_months(table) is None:
+            return rows
+        kept = [row for row in rows if row[0] is not None]
+        if len(kept) < len(rows):
+            logger.warning(f"{table} 已按月分区，跳过 {len(rows) - len(kept)} 行{PARTITIONED_TABLES[table][0]}为空的记录")
+        return kept
+
+    @staticmethod
+    def _partition_definitions(months):
+        definitions = [f"PARTITION {partition_name(month)} "
+                       f"VALUES LESS THAN ('{month + pd.DateOffset(months=1):%Y-%m-%d}')" for month in months]
+        definitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        return ", ".join(definitions)
+
+    def partition_table(self, table):
+        """
+        将未分区的表转换为按月分区（主键改为 (id, 时间列)，时间列改为NOT NULL），
+        按现有数据的时间范围逐月建立分区；嵌入式后端为时间列建立索引
+
+        Returns:
+            bool: 是否进行了转换
+        """
+        column, comment = PARTITIONED_TABLES[table]
+        cursor = self.conn.cursor()
+        try:
+            if not self.enabled:
+                if self.backend.name == 'sqlite':
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+                    self.conn.commit()
+                return False
+            if self.partition_months(table) is not None:
+                return False
+
+            bounds = self.backend.read_sql(
+                f"SELECT MIN({column}) AS first_time, MAX({column}) AS last_time, "
+                f"SUM(CASE WHEN {column} IS NULL THEN 1 ELSE 0 END) AS null_rows FROM {table}", self.conn).iloc[0]
+            null_rows = 0 if pd.isna(bounds['null_rows']) else int(bounds['null_rows'])
+            if null_rows:
+                logger.warning(f"{table} 有 {null_rows} 行 {column} 为空，无法按月分区，保持不分区")
+                return False
+            if pd.isna(bounds['first_time']):
+                months = [month_start(pd.Timestamp.now())]
+            else:
+                months = list(pd.date_range(month_start(bounds['first_time']), month_start(bounds['last_time']),
+                                            freq='MS'))
+
+            # 分区列必须包含在主键中；DDL在MySQL中隐式提交
+            cursor.execute(f"ALTER TABLE {table} MODIFY {column} DATETIME NOT NULL COMMENT '{comment}', "
+                           f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})")
+            cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS({column}) "
+                           f"({self._partition_definitions(months)})")
+            self._months[table] = months
+            logger.info(f"{table} 已按 {column} 分为 {len(months)} 个月分区"
+                        f"（{partition_name(months[0])} ~ {partition_name(months[-1])}）")
+            return True
+        finally:
+            cursor.close()
+
+    def ensure_partitions(self, table, times):
+        """
+        入库前为新数据添加月分区：把MAXVALUE分区拆分为到数据最新月份为止的各月分区和新的MAXVALUE分区
+        （新数据写入前MAXVALUE分区为空，拆分不移动数据）。早于第一个分区的数据写入第一个分区
+
+        Args:
+            table (str): 分区表
+            times (iterable): 待写入数据的时间（空值忽略）
+
+        Returns:
+            int: 新增的分区数
+        """
+        if not self.enabled:
+            return 0
+        months = self.partition_months(table)
+        if not months:
+            return 0
+        latest = pd.Series(list(times), dtype='datetime64[ns]').max()
+        if pd.isna(latest) or month_start(latest) <= months[-1]:
+            return 0
+        new_months = list(pd.date_range(months[-1] + pd.DateOffset(months=1), month_start(latest), freq='MS'))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO "
+                           f"({self._partition_definitions(new_months)})")
+        except Exception:
+            # 连接断开时DDL可能已经生效，重试前重新读取分区列表
+            self._months.pop(table, None)
+            raise
+        finally:
+            cursor.close()
+        self._months[table] = months + new_months
+        logger.info(f"{table} 新增月分区 {partition_name(new_months[0])} ~ {partition_name(new_months[-1])}")
+        return len(new_months)
@@ -7,8 +7,11 @@
 """
 
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
+from StorageBackend import create_backend, DB_ERRORS
+from FrameSchema import optimize_report_frame, parse_order_volume, memory_usage_mb
+from SchemaRevision import SchemaMigrator, enum_value
+from ImportCheckpoint import CheckpointedImport, DEFAULT_COMMIT_ROWS
+from TablePartitions import TablePartitioner
 import datetime
 import logging
 import os
@@ -24,6 +27,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TradeDataProcessor")
 
+# 订单和成交记录的插入语句
+ORDERS_INSERT_QUERY = """
+INSERT INTO report_orders 
+(open_time, order_id, symbol, type, volume, filled_volume, price, sl, tp, time, status, comment, report_file)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+open_time=VALUES(open_time), symbol=VALUES(symbol), type=VALUES(type), 
+volume=VALUES(volume), filled_volume=VALUES(filled_volume), price=VALUES(price), sl=VALUES(sl), tp=VALUES(tp), 
+time=VALUES(time), status=VALUES(status), comment=VALUES(comment), report_file=VALUES(report_file)
+"""
+
+DEALS_INSERT_QUERY = """
+INSERT INTO report_deals 
+(deal_time, deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, report_file)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+deal_time=VALUES(deal_time), symbol=VALUES(symbol), type=VALUES(type), direction=VALUES(direction),
+volume=VALUES(volume), price=VALUES(price), order_id=VALUES(order_id), commission=VALUES(commission),
+swap=VALUES(swap), profit=VALUES(profit), balance=VALUES(balance), comment=VALUES(comment), 
+report_file=VALUES(report_file)
+"""
+
 class TradeDataProcessor:
     """交易历史数据处理器"""
     
@@ -35,17 +60,19 @@ class TradeDataProcessor:
             db_config (dict): 数据库配置
         """
         self.db_config = db_config
+        self.backend = create_backend(db_config)
+        self.partitioner = TablePartitioner(self.backend, None)
         self.conn = None
         self.cursor = None
     
     def connect_db(self):
-        """连接到MySQL数据库"""
+        """连接到数据库（MySQL或嵌入式后端）"""
         try:
-            self.conn = mysql.connector.connect(**self.db_config)
+            self.conn = self.backend.connect()
             self.cursor = self.conn.cursor()
-            logger.info("成功连接到MySQL数据库")
+            logger.info(f"成功连接到数据库（{self.backend.name}）")
             return True
-        except Error as e:
+        except (DB_ERRORS + (ImportError,)) as e:
             logger.error(f"数据库连接失败: {e}")
             return False
     
@@ -67,14 +94,15 @@ class TradeDataProcessor:
                 open_time DATETIME COMMENT '开价时间',
                 order_id BIGINT COMMENT '订单号',
                 symbol VARCHAR(20) COMMENT '交易品种',
-                type VARCHAR(50) COMMENT '类型',
-                volume VARCHAR(20) COMMENT '交易量',
+                type VARCHAR(20) COMMENT '类型',
+                volume DECIMAL(12,2) COMMENT '请求交易量',
+                filled_volume DECIMAL(12,2) COMMENT '成交交易量',
                 price DOUBLE COMMENT '价位',
                 sl DOUBLE COMMENT '止损',
                 tp DOUBLE COMMENT '止盈',
                 time DATETIME COMMENT '时间',
                 status VARCHAR(20) COMMENT '状态',
-                comment VARCHAR(255) COMMENT '注释',
+                comment VARCHAR(64) COMMENT '注释',
                 report_file VARCHAR(255) COMMENT '报告文件名',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
@@ -87,22 +115,27 @@ class TradeDataProcessor:
                 deal_time DATETIME COMMENT '时间',
                 deal_id BIGINT COMMENT '成交号',
                 symbol VARCHAR(20) COMMENT '交易品种',
-                type VARCHAR(50) COMMENT '类型',
-                direction VARCHAR(20) COMMENT '趋势',
-                volume VARCHAR(20) COMMENT '交易量',
+                type VARCHAR(20) COMMENT '类型',
+                direction ENUM('', 'in', 'out', 'inout', 'out by') COMMENT '趋势',
+                volume DECIMAL(12,2) COMMENT '交易量',
                 price DOUBLE COMMENT '价位',
                 order_id BIGINT COMMENT '订单号',
                 commission DOUBLE COMMENT '手续费',
                 swap DOUBLE COMMENT '库存费',
                 profit DOUBLE COMMENT '盈利',
                 balance DOUBLE COMMENT '结余',
-                comment VARCHAR(255) COMMENT '注释',
+                comment VARCHAR(64) COMMENT '注释',
                 report_file VARCHAR(255) COMMENT '报告文件名',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             
             self.conn.commit()
+            # 旧结构的表分批转换为当前的列类型
+            SchemaMigrator(self.backend, self.conn).migrate(['report_orders', 'report_deals'])
+            # MySQL中成交表按成交时间分月分区
+            self.partitioner.conn = self.conn
+            self.partitioner.partition_table('report_deals')
             logger.info("数据表创建成功")
             return True
         except Exception as e:
@@ -212,7 +245,7 @@ class TradeDataProcessor:
             # 如果没有找到成交表头，返回订单数据
             if deals_header_row is None:
                 logger.warning("未找到成交表头")
-                return orders_df, None
+                return optimize_report_frame(orders_df, 'orders'), None
             
             # 读取成交记录表头（成交表头的下一行）
             deal_columns_row = deals_header_row + 1
@@ -252,6 +285,11 @@ class TradeDataProcessor:
                 deals_df = pd.DataFrame(columns=deal_columns)
                 logger.warning("未找到有效的成交记录数据")
             
+            # 解析完成后立即转换为紧凑的列类型
+            orders_df = optimize_report_frame(orders_df, 'orders')
+            deals_df = optimize_report_frame(deals_df, 'deals')
+            logger.info(f"订单数据占用 {memory_usage_mb(orders_df):.2f} MB，成交数据占用 {memory_usage_mb(deals_df):.2f} MB")
+            
             return orders_df, deals_df
             
         except Exception as e:
@@ -283,13 +321,18 @@ class TradeDataProcessor:
         except Exception as e:
             logger.error(f"保存CSV文件失败: {e}")
     
-    def save_orders_to_db(self, orders_df, report_file):
+    def save_orders_to_db(self, orders_df, report_file, replace=False, commit_rows=DEFAULT_COMMIT_ROWS,
+                          same_report=False, raise_errors=False):
         """
-        将订单数据保存到数据库
+        将订单数据保存到数据库（按块提交，中断后重新保存同一份数据时从最后提交的块继续）
         
         Args:
             orders_df (DataFrame): 订单数据
             report_file (str): 报告文件名
+            replace (bool): 从头保存时先清除订单表（续传时不清除）
+            commit_rows (int): 每个事务提交的行数
+            same_report (bool): replace时只清除同一报告文件（report_file）的记录，其他报告的数据保留
+            raise_errors (bool): 写入失败时抛出数据库异常，而不是记录错误后返回0
             
         Returns:
             int: 成功插入的记录数
@@ -299,157 +342,172 @@ class TradeDataProcessor:
             return 0
         
         try:
-            insert_query = """
-            INSERT INTO report_orders 
-            (open_time, order_id, symbol, type, volume, price, sl, tp, time, status, comment, report_file)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            open_time=VALUES(open_time), symbol=VALUES(symbol), type=VALUES(type), 
-            volume=VALUES(volume), price=VALUES(price), sl=VALUES(sl), tp=VALUES(tp), 
-            time=VALUES(time), status=VALUES(status), comment=VALUES(comment), report_file=VALUES(report_file)
-            """
-            
-            count = 0
-            for idx, row in orders_df.iterrows():
-                # 提取各字段值
-                open_time = None
-                order_id = None
-                symbol = ""
-                type_val = ""
-                volume = ""
-                price = 0.0
-                sl = 0.0
-                tp = 0.0
-                time_val = None
-                status = ""
-                comment = ""
-                
-                # 遍历列查找匹配的字段
-                for col in orders_df.columns:
-                    # 确保col不是NaN
-                    if pd.isna(col):
-                        continue
-                        
-                    col_name = str(col)
-                    col_lower = col_name.lower()
-                    value = row[col]
-                    
-                    # 检查值是否为空，使用any()方法处理可能的Series情况
-                    try:
-                        if pd.isna(value).any():
-                            continue
-                    except AttributeError:
-                        # 如果不是Series，直接检查
-                        if pd.isna(value):
-                            continue
-                    
-                    # 开价时间
-                    if '开价时间' in col_name:
-                        if isinstance(value, datetime.datetime):
-                            open_time = value
-                        elif isinstance(value, str):
-                            try:
-                                open_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
-                            except ValueError:
-                                pass
-                    
-                    # 订单号
-                    elif '订单' in col_name and '开价时间' not in col_name:
-                        try:
-                            order_id = int(float(value))
-                        except (ValueError, TypeError):
-                            order_id = None
-                    
-                    # 交易品种
-                    elif '交易品种' in col_name:
-                        symbol = str(value)
-                    
-                    # 类型
-                    elif '类型' in col_name:
-                        type_val = str(value)
-                    
-                    # 交易量
-                    elif '交易量' in col_name:
-                        volume = str(value)
-                    
-                    # 价位
-                    elif '价位' in col_name:
-                        try:
-                            price = float(value)
-                        except (ValueError, TypeError):
-                            price = 0.0
-                    
-                    # 止损
-                    elif '止损' in col_name:
-                        try:
-                            sl = float(value)
-                        except (ValueError, TypeError):
-                            sl = 0.0
-                    
-                    # 止盈
-                    elif '止盈' in col_name:
-                        try:
-                            tp = float(value)
-                        except (ValueError, TypeError):
-                            tp = 0.0
-                    
-                    # 时间
-                    elif '时间' in col_name and '开价时间' not in col_name:
-                        if isinstance(value, datetime.datetime):
-                            time_val = value
-                        elif isinstance(value, str):
-                            try:
-                                time_val = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
-                            except ValueError:
-                                pass
-                    
-                    # 状态
-                    elif '状态' in col_name:
-                        status = str(value)
-                    
-                    # 注释
-                    elif '注释' in col_name:
-                        comment = str(value)
-                
-                # 如果订单号为空，跳过此行
-                if order_id is None:
-                    logger.warning(f"跳过第{idx+1}行，订单号为空: {row.to_dict()}")
-                    continue
-                
-                values = (
-                    open_time,
-                    order_id,
-                    symbol,
-                    type_val,
-                    volume,
-                    price,
-                    sl,
-                    tp,
-                    time_val,
-                    status,
-                    comment,
-                    report_file
-                )
-                
-                self.cursor.execute(insert_query, values)
-                count += 1
-            
-            self.conn.commit()
+            count = CheckpointedImport(self, commit_rows=commit_rows).run_frame(
+                'report_orders', ORDERS_INSERT_QUERY, orders_df,
+                lambda chunk: self.build_order_rows(chunk, report_file), report_file, replace=replace,
+                replace_where=('report_file', report_file) if same_report else None)
             logger.info(f"成功将{count}条订单记录保存到数据库")
             return count
             
-        except Error as e:
-            logger.error(f"保存订单数据到数据库失败: {e}")
-            self.conn.rollback()
+        except DB_ERRORS as e:
+            logger.error(f"保存订单数据到数据库失败（已提交的块保留，重新保存时继续）: {e}")
+            if raise_errors:
+                raise
             return 0
     
-    def save_deals_to_db(self, deals_df, report_file):
+    def build_order_rows(self, orders_df, report_file):
         """
-        将成交记录数据保存到数据库
+        将报告订单数据转换为report_orders的插入行（按中文列名关键字匹配字段，跳过订单号为空的行）
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            report_file (str): 报告文件名
+            
+        Returns:
+            list: 插入行（与ORDERS_INSERT_QUERY的列顺序一致）
+        """
+        rows = []
+        for idx, row in orders_df.iterrows():
+            # 提取各字段值
+            open_time = None
+            order_id = None
+            symbol = ""
+            type_val = ""
+            volume = ""
+            price = 0.0
+            sl = 0.0
+            tp = 0.0
+            time_val = None
+            status = ""
+            comment = ""
+
+            # 遍历列查找匹配的字段
+            for col in orders_df.columns:
+                # 确保col不是NaN
+                if pd.isna(col):
+                    continue
+
+                col_name = str(col)
+                col_lower = col_name.lower()
+                value = row[col]
+
+                # 检查值是否为空，使用any()方法处理可能的Series情况
+                try:
+                    if pd.isna(value).any():
+                        continue
+                except AttributeError:
+                    # 如果不是Series，直接检查
+                    if pd.isna(value):
+                        continue
+
+                # 开价时间
+                if '开价时间' in col_name:
+                    if isinstance(value, datetime.datetime):
+                        open_time = value
+                    elif isinstance(value, str):
+                        try:
+                            open_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                        except ValueError:
+                            pass
+
+                # 订单号
+                elif '订单' in col_name and '开价时间' not in col_name:
+                    try:
+                        order_id = int(float(value))
+                    except (ValueError, TypeError):
+                        order_id = None
+
+                # 交易品种
+                elif '交易品种' in col_name:
+                    symbol = str(value)
+
+                # 类型
+                elif '类型' in col_name:
+                    type_val = str(value)
+
+                # 交易量
+                elif '交易量' in col_name:
+                    volume = str(value)
+
+                # 价位
+                elif '价位' in col_name:
+                    try:
+                        price = float(value)
+                    except (ValueError, TypeError):
+                        price = 0.0
+
+                # 止损
+                elif '止损' in col_name:
+                    try:
+                        sl = float(value)
+                    except (ValueError, TypeError):
+                        sl = 0.0
+
+                # 止盈
+                elif '止盈' in col_name:
+                    try:
+                        tp = float(value)
+                    except (ValueError, TypeError):
+                        tp = 0.0
+
+                # 时间
+                elif '时间' in col_name and '开价时间' not in col_name:
+                    if isinstance(value, datetime.datetime):
+                        time_val = value
+                    elif isinstance(value, str):
+                        try:
+                            time_val = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                        except ValueError:
+                            pass
+
+                # 状态
+                elif '状态' in col_name:
+                    status = str(value)
+
+                # 注释
+                elif '注释' in col_name:
+                    comment = str(value)
+
+            # 如果订单号为空，跳过此行
+            if order_id is None:
+                logger.warning(f"跳过第{idx+1}行，订单号为空: {row.to_dict()}")
+                continue
+
+            # 交易量文本拆分为请求量和成交量
+            requested_volume, filled_volume = parse_order_volume(volume)
+
+            values = (
+                open_time,
+                order_id,
+                symbol,
+                type_val,
+                requested_volume,
+                filled_volume,
+                price,
+                sl,
+                tp,
+                time_val,
+                status,
+                comment,
+                report_file
+            )
+
+            rows.append(values)
+        
+        return rows
+
+    def save_deals_to_db(self, deals_df, report_file, replace=False, commit_rows=DEFAULT_COMMIT_ROWS,
+                         same_report=False, raise_errors=False):
+        """
+        将成交记录数据保存到数据库（按块提交，中断后重新保存同一份数据时从最后提交的块继续）
         
         Args:
             deals_df (DataFrame): 成交记录数据
             report_file (str): 报告文件名
+            replace (bool): 从头保存时先清除成交表（续传时不清除）
+            commit_rows (int): 每个事务提交的行数
+            same_report (bool): replace时只清除同一报告文件（report_file）的记录，其他报告的数据保留
+            raise_errors (bool): 写入失败时抛出数据库异常，而不是记录错误后返回0
             
         Returns:
             int: 成功插入的记录数
@@ -459,166 +517,181 @@ class TradeDataProcessor:
             return 0
         
         try:
-            insert_query = """
-            INSERT INTO report_deals 
-            (deal_time, deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, report_file)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            deal_time=VALUES(deal_time), symbol=VALUES(symbol), type=VALUES(type), direction=VALUES(direction),
-            volume=VALUES(volume), price=VALUES(price), order_id=VALUES(order_id), commission=VALUES(commission),
-            swap=VALUES(swap), profit=VALUES(profit), balance=VALUES(balance), comment=VALUES(comment), 
-            report_file=VALUES(report_file)
-            """
-            
-            count = 0
-            for idx, row in deals_df.iterrows():
-                # 提取各字段值
-                deal_time = None
-                deal_id = None
-                symbol = ""
-                type_val = ""
-                direction = ""
-                volume = ""
-                price = 0.0
-                order_id = 0
-                commission = 0.0
-                swap = 0.0
-                profit = 0.0
-                balance = 0.0
-                comment = ""
-                
-                # 遍历列查找匹配的字段
-                for col in deals_df.columns:
-                    # 确保col不是NaN
-                    if pd.isna(col):
-                        continue
-                        
-                    col_name = str(col)
-                    col_lower = col_name.lower()
-                    value = row[col]
-                    
-                    # 检查值是否为空，使用any()方法处理可能的Series情况
-                    try:
-                        if pd.isna(value).any():
-                            continue
-                    except AttributeError:
-                        # 如果不是Series，直接检查
-                        if pd.isna(value):
-                            continue
-                    
-                    # 时间
-                    if '时间' in col_name and '成交' not in col_name:
-                        if isinstance(value, datetime.datetime):
-                            deal_time = value
-                        elif isinstance(value, str):
-                            try:
-                                deal_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
-                            except ValueError:
-                                pass
-                    
-                    # 成交号
-                    elif '成交' in col_name and '时间' not in col_name:
-                        try:
-                            deal_id = int(float(value))
-                        except (ValueError, TypeError):
-                            deal_id = None
-                    
-                    # 交易品种
-                    elif '交易品种' in col_name:
-                        symbol = str(value)
-                    
-                    # 类型
-                    elif '类型' in col_name:
-                        type_val = str(value)
-                    
-                    # 趋势/方向
-                    elif '趋势' in col_name or '方向' in col_name:
-                        direction = str(value)
-                    
-                    # 交易量
-                    elif '交易量' in col_name:
-                        volume = str(value)
-                    
-                    # 价位
-                    elif '价位' in col_name:
-                        try:
-                            price = float(value)
-                        except (ValueError, TypeError):
-                            price = 0.0
-                    
-                    # 订单号
-                    elif '订单' in col_name and '成交' not in col_name:
-                        try:
-                            order_id = int(float(value))
-                        except (ValueError, TypeError):
-                            order_id = 0
-                    
-                    # 手续费
-                    elif '手续费' in col_name:
-                        try:
-                            commission = float(value)
-                        except (ValueError, TypeError):
-                            commission = 0.0
-                    
-                    # 库存费/掉期
-                    elif '库存费' in col_name or '掉期' in col_name:
-                        try:
-                            swap = float(value)
-                        except (ValueError, TypeError):
-                            swap = 0.0
-                    
-                    # 盈利
-                    elif '盈利' in col_name:
-                        try:
-                            profit = float(value)
-                        except (ValueError, TypeError):
-                            profit = 0.0
-                    
-                    # 结余
-                    elif '结余' in col_name:
-                        try:
-                            balance = float(value)
-                        except (ValueError, TypeError):
-                            balance = 0.0
-                    
-                    # 注释
-                    elif '注释' in col_name:
-                        comment = str(value)
-                
-                # 如果成交号为空，跳过此行
-                if deal_id is None:
-                    logger.warning(f"跳过第{idx+1}行，成交号为空: {row.to_dict()}")
-                    continue
-                
-                values = (
-                    deal_time,
-                    deal_id,
-                    symbol,
-                    type_val,
-                    direction,
-                    volume,
-                    price,
-                    order_id,
-                    commission,
-                    swap,
-                    profit,
-                    balance,
-                    comment,
-                    report_file
-                )
-                
-                self.cursor.execute(insert_query, values)
-                count += 1
-            
-            self.conn.commit()
+            count = CheckpointedImport(self, commit_rows=commit_rows).run_frame(
+                'report_deals', DEALS_INSERT_QUERY, deals_df,
+                lambda chunk: self.build_deal_rows(chunk, report_file), report_file, replace=replace,
+                prepare=self.prepare_deal_rows, replace_where=('report_file', report_file) if same_report else None)
             logger.info(f"成功将{count}条成交记录保存到数据库")
             return count
             
-        except Error as e:
-            logger.error(f"保存成交记录数据到数据库失败: {e}")
-            self.conn.rollback()
+        except DB_ERRORS as e:
+            logger.error(f"保存成交记录数据到数据库失败（已提交的块保留，重新保存时继续）: {e}")
+            if raise_errors:
+                raise
             return 0
     
+    def prepare_deal_rows(self, rows):
+        """写入前按成交时间添加缺少的月分区（仅MySQL分区表），返回可写入的行（分区表跳过成交时间为空的行）"""
+        self.partitioner.conn = self.conn
+        rows = self.partitioner.writable_rows('report_deals', rows)
+        self.partitioner.ensure_partitions('report_deals', (row[0] for row in rows))
+        return rows
+
+    def build_deal_rows(self, deals_df, report_file):
+        """
+        将报告成交数据转换为report_deals的插入行（按中文列名关键字匹配字段，跳过成交号为空的行）
+        
+        Args:
+            deals_df (DataFrame): 成交记录数据
+            report_file (str): 报告文件名
+            
+        Returns:
+            list: 插入行（与DEALS_INSERT_QUERY的列顺序一致）
+        """
+        rows = []
+        for idx, row in deals_df.iterrows():
+            # 提取各字段值
+            deal_time = None
+            deal_id = None
+            symbol = ""
+            type_val = ""
+            direction = ""
+            volume = None
+            price = 0.0
+            order_id = 0
+            commission = 0.0
+            swap = 0.0
+            profit = 0.0
+            balance = 0.0
+            comment = ""
+
+            # 遍历列查找匹配的字段
+            for col in deals_df.columns:
+                # 确保col不是NaN
+                if pd.isna(col):
+                    continue
+
+                col_name = str(col)
+                col_lower = col_name.lower()
+                value = row[col]
+
+                # 检查值是否为空，使用any()方法处理可能的Series情况
+                try:
+                    if pd.isna(value).any():
+                        continue
+                except AttributeError:
+                    # 如果不是Series，直接检查
+                    if pd.isna(value):
+                        continue
+
+                # 时间
+                if '时间' in col_name and '成交' not in col_name:
+                    if isinstance(value, datetime.datetime):
+                        deal_time = value
+                    elif isinstance(value, str):
+                        try:
+                            deal_time = datetime.datetime.strptime(value, '%Y.%m.%d %H:%M:%S')
+                        except ValueError:
+                            pass
+
+                # 成交号
+                elif '成交' in col_name and '时间' not in col_name:
+                    try:
+                        deal_id = int(float(value))
+                    except (ValueError, TypeError):
+                        deal_id = None
+
+                # 交易品种
+                elif '交易品种' in col_name:
+                    symbol = str(value)
+
+                # 类型
+                elif '类型' in col_name:
+                    type_val = str(value)
+
+                # 趋势/方向
+                elif '趋势' in col_name or '方向' in col_name:
+                    direction = str(value)
+
+                # 交易量
+                elif '交易量' in col_name:
+                    try:
+                        volume = float(value)
+                    except (ValueError, TypeError):
+                        volume = None
+
+                # 价位
+                elif '价位' in col_name:
+                    try:
+                        price = float(value)
+                    except (ValueError, TypeError):
+                        price = 0.0
+
+                # 订单号
+                elif '订单' in col_name and '成交' not in col_name:
+                    try:
+                        order_id = int(float(value))
+                    except (ValueError, TypeError):
+                        order_id = 0
+
+                # 手续费
+                elif '手续费' in col_name:
+                    try:
+                        commission = float(value)
+                    except (ValueError, TypeError):
+                        commission = 0.0
+
+                # 库存费/掉期
+                elif '库存费' in col_name or '掉期' in col_name:
+                    try:
+                        swap = float(value)
+                    except (ValueError, TypeError):
+                        swap = 0.0
+
+                # 盈利
+                elif '盈利' in col_name:
+                    try:
+                        profit = float(value)
+                    except (ValueError, TypeError):
+                        profit = 0.0
+
+                # 结余
+                elif '结余' in col_name:
+                    try:
+                        balance = float(value)
+                    except (ValueError, TypeError):
+                        balance = 0.0
+
+                # 注释
+                elif '注释' in col_name:
+                    comment = str(value)
+
+            # 如果成交号为空，跳过此行
+            if deal_id is None:
+                logger.warning(f"跳过第{idx+1}行，成交号为空: {row.to_dict()}")
+                continue
+
+            values = (
+                deal_time,
+                deal_id,
+                symbol,
+                type_val,
+                enum_value('report_deals', 'direction', direction),
+                volume,
+                price,
+                order_id,
+                commission,
+                swap,
+                profit,
+                balance,
+                comment,
+                report_file
+            )
+
+            rows.append(values)
+        
+        return rows
+
     def clear_database(self):
         """清除数据库中的所有数据"""
         try:
@@ -632,7 +705,7 @@ class TradeDataProcessor:
             
             self.conn.commit()
             logger.info(f"已清除数据库中的数据: {orders_deleted} 条订单记录, {deals_deleted} 条成交记录")
-        except Error as e:
+        except DB_ERRORS as e:
             logger.error(f"清除数据库数据失败: {e}")
             self.conn.rollback()
             raise
\ No newline at end of file
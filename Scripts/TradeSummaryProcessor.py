@@ -6,11 +6,24 @@
 专门用于将订单表、成交表和线段表数据汇总成一个综合分析表
 """
 
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import numpy as np
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
+from StorageBackend import create_backend, DB_ERRORS, to_db_value
+from FrameSchema import (optimize_orders_frame, optimize_deals_frame, optimize_segments_frame,
+                         optimize_summary_frame, memory_usage_mb)
+from PositionReconstructor import PositionReconstructor
+from SegmentAsOfMatcher import SegmentAsOfMatcher
+from SummaryCache import source_fingerprint
+from SchemaRevision import SchemaMigrator, SUMMARY_ASOF_COLUMNS, SUMMARY_ROW_KEY_LENGTH
+from ImportCheckpoint import DEFAULT_COMMIT_ROWS
+from TablePartitions import with_time_window, parse_window_time
 import logging
-from collections import defaultdict
 
 # 配置日志
 logging.basicConfig(
@@ -23,28 +36,166 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TradeSummaryProcessor")
 
+# 默认状态规则：(状态关键字, 汇总状态)，按顺序匹配进场或出场订单状态，先匹配者优先
+DEFAULT_STATUS_RULES = [
+    ('cancel', '取消'),
+    ('expired', '过期'),
+]
+
+# 未命中状态规则时按盈利金额划分的状态：(盈利, 亏损, 持平)
+DEFAULT_PROFIT_LABELS = ('盈利', '亏损', '持平')
+
+# 汇总方式：positions 按成交方向重建的仓位汇总；orders 按线段表position_id配对订单（旧方式）
+SUMMARY_MODES = ('positions', 'orders')
+
+# 线段统计的时间周期 -> 列名后缀
+SEGMENT_TIMEFRAME_COLUMNS = (('M5', '5min'), ('M15', '15min'), ('M30', '30min'))
+
+# 流式读取源数据表时每块的行数
+DEFAULT_STREAM_CHUNK_ROWS = 200000
+
+# 流式读取的线段表查询（按票号排序，同一订单的线段连续出现）
+SEGMENTS_STREAM_QUERY = """
+SELECT 
+    trade_time, order_ticket, position_id, reference_price, reference_time, timeframe, 
+    segment_side, segment_index, start_price, end_price, amplitude, direction,
+    trade_action, trade_price, trade_volume, trade_comment, trade_status
+FROM segment_info
+ORDER BY order_ticket, id
+"""
+
+# 各周期在给定时间或之前最近一次线段快照中最早的一个（窗口汇总时确定快照匹配需要的线段下界）
+LATEST_SNAPSHOT_QUERY = """
+SELECT MIN(latest_time) AS latest_time FROM (
+    SELECT MAX(trade_time) AS latest_time FROM segment_info
+    WHERE trade_time <= '{time:%Y-%m-%d %H:%M:%S}' AND timeframe IN ({timeframes})
+    GROUP BY timeframe
+) latest
+"""
+
+# 流式读取的成交表查询（与仓位重建的处理顺序一致：按品种、成交时间排序，时间为空的成交排在最后）
+DEALS_STREAM_QUERY = """
+SELECT 
+    deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, deal_time,
+    report_file
+FROM report_deals
+ORDER BY symbol, deal_time IS NULL, deal_time, deal_id, id
+"""
+
+# 汇总读取的订单表列
+ORDERS_COLUMNS = ['order_id', 'symbol', 'type', 'volume', 'filled_volume', 'price', 'sl', 'tp',
+                  'open_time', 'time', 'status', 'comment', 'report_file']
+
+# 流式读取的订单表查询（按写入顺序，与一次性读取时的订单顺序一致）
+ORDERS_STREAM_QUERY = f"""
+SELECT {", ".join(ORDERS_COLUMNS)}
+FROM report_orders
+ORDER BY id
+"""
+
+# 分区并行汇总的分区键：报告文件（一次回测）+ 交易品种
+PARTITION_COLUMNS = ('report_file', 'symbol')
+
+# 按开仓/平仓时间关联的线段快照列（_attach_asof_features），与其余汇总列一起写入trade_summary
+ASOF_COLUMNS = [column for column, _, _ in SUMMARY_ASOF_COLUMNS]
+
+# 汇总表中快照列的定义
+ASOF_COLUMNS_DDL = ",\n".join(f"                {column} {column_type} COMMENT '{comment}'"
+                               for column, column_type, comment in SUMMARY_ASOF_COLUMNS)
+
+# 汇总表的插入语句
+SUMMARY_INSERT_QUERY = f"""
+INSERT INTO trade_summary 
+(order_id, position_id, symbol, order_type, volume, open_price, close_price, sl, tp, 
+ open_time, close_time, status, commission, swap, profit, comment,
+ right_segments_5min, right_segments_15min, right_segments_30min, first_segment_length,
+ entry_right_segments_5min, entry_right_segments_15min, entry_right_segments_30min,
+ exit_right_segments_5min, exit_right_segments_15min, exit_right_segments_30min,
+ entry_first_segment_length, exit_first_segment_length,
+ {", ".join(ASOF_COLUMNS)}, row_key)
+VALUES ({", ".join(["%s"] * (29 + len(ASOF_COLUMNS)))})
+"""
+
+def summary_row_key(values):
+    """汇总插入行（不含row_key）的内容哈希，内容完全相同的行哈希相同"""
+    return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()[:SUMMARY_ROW_KEY_LENGTH]
+
+def _coalesce(primary, fallback):
+    """按位置取primary，缺失处用fallback补齐（不按索引对齐）"""
+    primary_values = pd.Series(primary).to_numpy(dtype=object)
+    fallback_values = pd.Series(fallback).to_numpy(dtype=object)
+    return np.where(pd.isna(primary_values), fallback_values, primary_values)
+
+def _summarize_partition(settings, orders_df, deals_df, segments_df):
+    """
+    汇总一个分区（顶层函数，可被进程池序列化调用）
+    
+    Args:
+        settings (dict): TradeSummaryProcessor的汇总配置（summary_mode、status_rules、profit_labels）
+    
+    Returns:
+        tuple: positions方式为 (position_summary, order_summary)，orders方式为 (position_records, order_records)
+    """
+    processor = TradeSummaryProcessor({}, **settings)
+    if processor.summary_mode == 'positions':
+        return processor._position_summary_parts(orders_df, deals_df, segments_df)
+    return processor._collect_summary_records(orders_df, deals_df, segments_df)
+
 class TradeSummaryProcessor:
     """交易数据汇总处理器"""
     
-    def __init__(self, db_config):
+    def __init__(self, db_config, status_rules=None, profit_labels=None, summary_mode='positions',
+                 asof_features=True, streaming=False, chunk_rows=DEFAULT_STREAM_CHUNK_ROWS, cache=None, workers=1,
+                 start=None, end=None):
         """
         初始化处理器
         
         Args:
             db_config (dict): 数据库配置
+            status_rules (list): 状态规则 [(状态关键字, 汇总状态), ...]，默认DEFAULT_STATUS_RULES，
+                可追加其他MT5订单状态，如 ('rejected', '拒绝')
+            profit_labels (tuple): 按盈利划分的状态 (盈利, 亏损, 持平)
+            summary_mode (str): 汇总方式，positions（默认）或 orders，见SUMMARY_MODES
+            asof_features (bool): 是否按开仓时间和平仓时间关联最近的线段快照（asof_*、asof_exit_*列），
+                不依赖线段表中的票号，OrderTicket=0的快照同样可用；这些列与其余汇总列一起写入trade_summary表
+            streaming (bool): 流式读取线段表、成交表和订单表（线段按票号、成交按品种和时间分块读取，
+                逐块统计线段特征和增量重建仓位），内存占用取决于块大小和同时未平仓的仓位数而不是源数据表，
+                仅支持positions汇总方式
+            chunk_rows (int): 流式读取时每块的行数
+            cache (SummaryCache): 汇总结果缓存，源数据表指纹和汇总配置都未变化时直接返回缓存结果
+            workers (int): 按(报告文件, 交易品种)分区并行汇总的进程数，None为CPU核数，1为在当前进程中串行汇总；
+                结果与串行汇总一致，流式读取时不使用
+            start: 时间窗口起点（包含），只汇总开仓成交时间在窗口内的仓位和开价时间在窗口内的未成交订单
+                （orders方式按开价时间），这些仓位在窗口外的成交、订单和线段同样读取，跨越窗口边界的仓位保持完整；
+                成交表整表读取（先开先平需要窗口起点时仍未平仓的仓位），线段表只以窗口起点
+                （或更早下单的窗口内订单的下单时间）为下界读取，MySQL从下界所在的月分区开始扫描；None为不限
+            end: 时间窗口终点（不包含），None为不限
         """
+        if summary_mode not in SUMMARY_MODES:
+            raise ValueError(f"不支持的汇总方式: {summary_mode}")
         self.db_config = db_config
+        self.summary_mode = summary_mode
+        self.asof_features = asof_features
+        self.streaming = streaming
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.status_rules = list(status_rules) if status_rules is not None else list(DEFAULT_STATUS_RULES)
+        self.profit_labels = tuple(profit_labels) if profit_labels is not None else DEFAULT_PROFIT_LABELS
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.start = parse_window_time(start)
+        self.end = parse_window_time(end)
+        self.backend = create_backend(db_config)
         self.conn = None
         self.cursor = None
     
     def connect_db(self):
-        """连接到MySQL数据库"""
+        """连接到数据库（MySQL或嵌入式后端）"""
         try:
-            self.conn = mysql.connector.connect(**self.db_config)
+            self.conn = self.backend.connect()
             self.cursor = self.conn.cursor()
-            logger.info("成功连接到MySQL数据库")
+            logger.info(f"成功连接到数据库（{self.backend.name}）")
             return True
-        except Error as e:
+        except (DB_ERRORS + (ImportError,)) as e:
             logger.error(f"数据库连接失败: {e}")
             return False
     
@@ -60,14 +211,14 @@ class TradeSummaryProcessor:
         """创建汇总表"""
         try:
             # 创建汇总表
-            self.cursor.execute("""
+            self.cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS trade_summary (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 order_id BIGINT COMMENT '订单号',
                 position_id BIGINT COMMENT '仓位ID',
                 symbol VARCHAR(20) COMMENT '交易品种',
-                order_type VARCHAR(50) COMMENT '订单类型',
-                volume VARCHAR(20) COMMENT '交易量',
+                order_type VARCHAR(20) COMMENT '订单类型',
+                volume DECIMAL(12,2) COMMENT '交易量',
                 open_price DOUBLE COMMENT '开仓价格',
                 close_price DOUBLE COMMENT '平仓价格',
                 sl DOUBLE COMMENT '止损',
@@ -78,24 +229,28 @@ class TradeSummaryProcessor:
                 commission DOUBLE COMMENT '手续费',
                 swap DOUBLE COMMENT '库存费',
                 profit DOUBLE COMMENT '盈利',
-                comment VARCHAR(255) COMMENT '注释',
-                right_segments_5min INT COMMENT '5分钟右线段数量',
-                right_segments_15min INT COMMENT '15分钟右线段数量',
-                right_segments_30min INT COMMENT '30分钟右线段数量',
+                comment VARCHAR(64) COMMENT '注释',
+                right_segments_5min SMALLINT COMMENT '5分钟右线段数量',
+                right_segments_15min SMALLINT COMMENT '15分钟右线段数量',
+                right_segments_30min SMALLINT COMMENT '30分钟右线段数量',
                 first_segment_length DOUBLE COMMENT '第一个线段长度',
-                entry_right_segments_5min INT COMMENT '进场5分钟右线段数量',
-                entry_right_segments_15min INT COMMENT '进场15分钟右线段数量',
-                entry_right_segments_30min INT COMMENT '进场30分钟右线段数量',
-                exit_right_segments_5min INT COMMENT '出场5分钟右线段数量',
-                exit_right_segments_15min INT COMMENT '出场15分钟右线段数量',
-                exit_right_segments_30min INT COMMENT '出场30分钟右线段数量',
+                entry_right_segments_5min SMALLINT COMMENT '进场5分钟右线段数量',
+                entry_right_segments_15min SMALLINT COMMENT '进场15分钟右线段数量',
+                entry_right_segments_30min SMALLINT COMMENT '进场30分钟右线段数量',
+                exit_right_segments_5min SMALLINT COMMENT '出场5分钟右线段数量',
+                exit_right_segments_15min SMALLINT COMMENT '出场15分钟右线段数量',
+                exit_right_segments_30min SMALLINT COMMENT '出场30分钟右线段数量',
                 entry_first_segment_length DOUBLE COMMENT '进场第一个线段长度',
                 exit_first_segment_length DOUBLE COMMENT '出场第一个线段长度',
+{ASOF_COLUMNS_DDL},
+                row_key CHAR({SUMMARY_ROW_KEY_LENGTH}) COMMENT '汇总行内容哈希',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             
             self.conn.commit()
+            # 旧结构的表分批转换为当前的列类型（汇总读取的订单、成交和线段表一并转换）
+            SchemaMigrator(self.backend, self.conn).migrate()
             logger.info("汇总表创建成功")
             return True
         except Exception as e:
@@ -103,43 +258,97 @@ class TradeSummaryProcessor:
             self.conn.rollback()
             return False
     
+    def summary_config(self):
+        """影响汇总结果的配置（流式读取和块大小不改变结果，不计入）"""
+        return {
+            'summary_mode': self.summary_mode,
+            'asof_features': self.asof_features,
+            'status_rules': [list(rule) for rule in self.status_rules],
+            'profit_labels': list(self.profit_labels),
+            'window': [None if self.start is None else str(self.start), None if self.end is None else str(self.end)],
+        }
+
     def generate_summary_data(self):
         """
         生成汇总数据
-        以订单表为主表，关联成交表和线段表数据
+        以订单表为主表，关联成交表和线段表数据；配置了缓存时先按源数据指纹查找缓存
         """
+        if self.cache is None:
+            return self._build_summary_data()
+        try:
+            cache_key = self.cache.make_key(source_fingerprint(self.backend, self.conn), self.summary_config())
+        except DB_ERRORS as e:
+            logger.warning(f"读取源数据指纹失败，不使用缓存: {e}")
+            return self._build_summary_data()
+        summary_data = self.cache.get(cache_key)
+        if summary_data is not None:
+            logger.info(f"源数据和汇总配置未变化，使用缓存的汇总数据 {len(summary_data)} 条")
+            return optimize_summary_frame(summary_data)
+        summary_data = self._build_summary_data()
+        if summary_data is not None:
+            self.cache.put(cache_key, summary_data)
+        return summary_data
+
+    def _build_summary_data(self):
+        """读取源数据表并生成汇总数据"""
         try:
+            if self.streaming:
+                if self.summary_mode == 'positions':
+                    return self._generate_summary_streaming()
+                logger.warning("orders汇总方式需要完整的线段表，不使用流式读取")
+            
             # 读取订单表数据
             orders_query = """
             SELECT 
-                order_id, symbol, type, volume, price, sl, tp, open_time, time, status, comment
+                order_id, symbol, type, volume, filled_volume, price, sl, tp, open_time, time, status, comment,
+                report_file
             FROM report_orders
             """
-            orders_df = pd.read_sql(orders_query, self.conn)
+            orders_df = optimize_orders_frame(self.backend.read_sql(orders_query, self.conn))
             logger.info(f"读取订单数据 {len(orders_df)} 条")
             
             # 读取成交表数据
             deals_query = """
             SELECT 
-                deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, deal_time
+                deal_id, symbol, type, direction, volume, price, order_id, commission, swap, profit, balance, comment, deal_time,
+                report_file
             FROM report_deals
             """
-            deals_df = pd.read_sql(deals_query, self.conn)
+            deals_df = optimize_deals_frame(self.backend.read_sql(deals_query, self.conn))
             logger.info(f"读取成交数据 {len(deals_df)} 条")
             
             # 读取线段表数据
             segments_query = """
             SELECT 
-                order_ticket, position_id, reference_price, reference_time, timeframe, 
+                trade_time, order_ticket, position_id, reference_price, reference_time, timeframe, 
                 segment_side, segment_index, start_price, end_price, amplitude, direction,
                 trade_action, trade_price, trade_volume, trade_comment, trade_status
             FROM segment_info
             """
-            segments_df = pd.read_sql(segments_query, self.conn)
+            segments_start = None
+            if self.start is not None:
+                positions_df, _ = PositionReconstructor().reconstruct(deals_df)
+                segments_start = self._asof_segments_start(self._segments_start(orders_df, positions_df))
+            segments_query = with_time_window(segments_query, 'trade_time', segments_start)
+            segments_df = optimize_segments_frame(self.backend.read_sql(segments_query, self.conn))
             logger.info(f"读取线段数据 {len(segments_df)} 条")
+            logger.info(f"源数据占用内存: 订单 {memory_usage_mb(orders_df):.2f} MB，"
+                        f"成交 {memory_usage_mb(deals_df):.2f} MB，线段 {memory_usage_mb(segments_df):.2f} MB")
             
             # 处理数据汇总
-            summary_data = self._process_summary_data(orders_df, deals_df, segments_df)
+            if self.workers > 1:
+                summary_data = self._generate_summary_partitioned(orders_df, deals_df, segments_df)
+            elif self.summary_mode == 'positions':
+                summary_data = self._process_summary_from_positions(orders_df, deals_df, segments_df)
+            else:
+                summary_data = self._process_summary_data(orders_df, deals_df, segments_df)
+            
+            if summary_data is not None and self.summary_mode == 'orders':
+                # orders方式按开价时间选取窗口内的汇总记录（仓位以进场订单的开价时间为准）
+                summary_data = summary_data[self._in_window(summary_data['open_time'])].reset_index(drop=True)
+            
+            if summary_data is not None and self.asof_features:
+                summary_data = self._attach_asof_features(summary_data, segments_df)
             
             return summary_data
             
@@ -147,6 +356,69 @@ class TradeSummaryProcessor:
             logger.error(f"生成汇总数据失败: {e}")
             return None
     
+    def _in_window(self, times):
+        """
+        时间是否在窗口内（起点包含、终点不包含；设置了窗口时时间为空的记录不在窗口内）
+        
+        Returns:
+            ndarray: 与times等长的布尔掩码
+        """
+        times = pd.to_datetime(pd.Series(times).reset_index(drop=True), errors='coerce')
+        mask = np.ones(len(times), dtype=bool)
+        if self.start is not None:
+            mask &= (times >= self.start).to_numpy()
+        if self.end is not None:
+            mask &= (times < self.end).to_numpy()
+        return mask
+    
+    def _segments_start(self, orders_df, positions_df):
+        """
+        窗口汇总读取线段表的下界：窗口起点和相关仓位全部订单的下单时间中最早的一个
+        
+        positions方式的相关仓位是开仓成交在窗口内的仓位（进场订单可能早于起点挂单）；
+        orders方式按线段的position_id归并仓位的订单，相关仓位是窗口起点时尚未平仓的全部仓位，
+        跨越起点的仓位才能按最早的订单确定开价时间并排除在窗口外。
+        平仓在窗口终点之后的线段同样需要，因此不设上界
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            positions_df (DataFrame): 重建的全部仓位
+        
+        Returns:
+            Timestamp: 下界，未设置窗口起点时为None
+        """
+        if self.start is None:
+            return None
+        if self.summary_mode == 'orders':
+            positions_df = positions_df[~(pd.to_datetime(positions_df['close_time']) < self.start).to_numpy()]
+        else:
+            positions_df = positions_df[self._in_window(positions_df['open_time'])]
+        order_ids = PositionReconstructor().order_positions(positions_df)['order_id']
+        return self._earliest_open_time(orders_df, order_ids)
+    
+    def _asof_segments_start(self, segments_start):
+        """
+        启用快照匹配时把线段表的下界前移到各周期在下界或之前最近的一次快照，
+        下界附近的开仓时间仍能关联到与整表汇总相同的快照
+        
+        Returns:
+            Timestamp: 下界，下界之前没有线段时不变
+        """
+        if segments_start is None or not self.asof_features:
+            return segments_start
+        timeframes = ", ".join(f"'{timeframe}'" for timeframe, _ in SEGMENT_TIMEFRAME_COLUMNS)
+        latest = self.backend.read_sql(LATEST_SNAPSHOT_QUERY.format(time=segments_start, timeframes=timeframes),
+                                       self.conn)['latest_time']
+        latest = pd.to_datetime(latest, errors='coerce').min() if len(latest) else pd.NaT
+        return min(segments_start, latest) if pd.notna(latest) else segments_start
+    
+    def _earliest_open_time(self, orders_df, order_ids, earliest=None):
+        """窗口起点、earliest与order_ids中订单的下单时间中最早的一个"""
+        open_times = pd.to_datetime(orders_df.loc[orders_df['order_id'].isin(order_ids), 'open_time'],
+                                    errors='coerce')
+        candidates = [time for time in (self.start, earliest, open_times.min()) if time is not None and pd.notna(time)]
+        return min(candidates) if candidates else None
+    
     def _process_summary_data(self, orders_df, deals_df, segments_df):
         """
         处理汇总数据
@@ -157,255 +429,697 @@ class TradeSummaryProcessor:
             segments_df (DataFrame): 线段数据
         """
         try:
-            # 创建汇总数据列表
-            summary_list = []
+            position_records, order_records = self._collect_summary_records(orders_df, deals_df, segments_df)
+            summary_df = self._summary_from_records(position_records, order_records)
+            logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录")
+            return summary_df
+            
+        except Exception as e:
+            logger.error(f"处理汇总数据失败: {e}")
+            return None
+    
+    def _summary_from_records(self, position_records, order_records):
+        """将仓位和订单汇总记录转换为DataFrame，并按列统一计算状态"""
+        summary_list = [record for _, record in position_records + order_records]
+        summary_df = self._apply_status_rules(pd.DataFrame(summary_list))
+        return optimize_summary_frame(summary_df)
+    
+    def _collect_summary_records(self, orders_df, deals_df, segments_df):
+        """
+        逐个仓位和未成交订单生成汇总记录
+        
+        Returns:
+            tuple: (position_records, order_records)，元素为 (排序键, 汇总记录)；
+                仓位的排序键为其在线段表中第一次出现的行索引，订单的排序键为其在订单表中的行索引
+        """
+        position_records = []
+        order_records = []
+        
+        # 处理所有订单，而不仅仅是已成交的仓位
+        logger.info(f"处理所有 {len(orders_df)} 条订单记录")
+        
+        # 首先处理有position_id的已成交订单（进场/出场对）
+        # 从线段表中获取所有有效的position_id（大于0的）
+        valid_segments = segments_df[segments_df['position_id'] > 0]
+        valid_positions = valid_segments['position_id'].unique()
+        # 每个仓位在线段表中第一次出现的行索引（分区并行汇总时用于还原顺序）
+        first_rows = valid_segments.index[~valid_segments['position_id'].duplicated()]
+        logger.info(f"找到 {len(valid_positions)} 个有效的仓位ID")
+        
+        # 处理每个仓位
+        processed_order_ids = set()  # 记录已处理的订单ID
+        
+        for position_id, first_row in zip(valid_positions, first_rows):
+            # 获取该仓位的所有线段记录
+            position_segments = segments_df[segments_df['position_id'] == position_id]
             
-            # 处理所有订单，而不仅仅是已成交的仓位
-            logger.info(f"处理所有 {len(orders_df)} 条订单记录")
+            # 获取该仓位涉及的所有订单票号
+            order_tickets = position_segments['order_ticket'].unique()
+            processed_order_ids.update(order_tickets)
             
-            # 首先处理有position_id的已成交订单（进场/出场对）
-            # 从线段表中获取所有有效的position_id（大于0的）
-            valid_positions = segments_df[segments_df['position_id'] > 0]['position_id'].unique()
-            logger.info(f"找到 {len(valid_positions)} 个有效的仓位ID")
+            # 获取这些订单票号对应的订单记录
+            position_orders = orders_df[orders_df['order_id'].isin(order_tickets)]
             
-            # 处理每个仓位
-            processed_order_ids = set()  # 记录已处理的订单ID
+            # 获取这些订单对应的成交记录
+            position_deals = deals_df[deals_df['order_id'].isin(order_tickets)]
             
-            for position_id in valid_positions:
-                # 获取该仓位的所有线段记录
-                position_segments = segments_df[segments_df['position_id'] == position_id]
-                
-                # 获取该仓位涉及的所有订单票号
-                order_tickets = position_segments['order_ticket'].unique()
-                processed_order_ids.update(order_tickets)
-                
-                # 获取这些订单票号对应的订单记录
-                position_orders = orders_df[orders_df['order_id'].isin(order_tickets)]
-                
-                # 获取这些订单对应的成交记录
-                position_deals = deals_df[deals_df['order_id'].isin(order_tickets)]
+            # 确定进场和出场订单
+            entry_order = None
+            exit_order = None
+            
+            if len(position_orders) >= 2:
+                # 按时间排序确定进场和出场
+                sorted_orders = position_orders.sort_values('open_time')
+                entry_order = sorted_orders.iloc[0]
+                exit_order = sorted_orders.iloc[1]
+            elif len(position_orders) == 1:
+                # 只有一个订单
+                entry_order = position_orders.iloc[0]
+            
+            # 创建汇总记录
+            if entry_order is not None:
+                summary_record = {
+                    'position_id': position_id,
+                    'symbol': entry_order['symbol'],
+                    'order_type': entry_order['type'],
+                    'volume': entry_order['volume'],
+                    'open_price': entry_order['price'],
+                    'sl': entry_order['sl'],
+                    'tp': entry_order['tp'],
+                    'open_time': entry_order['open_time'],
+                    'status': entry_order['status'],
+                    'comment': entry_order['comment']
+                }
                 
-                # 确定进场和出场订单
-                entry_order = None
-                exit_order = None
+                # 如果有出场订单，添加出场信息
+                if exit_order is not None:
+                    summary_record['order_id'] = exit_order['order_id']
+                    summary_record['close_time'] = exit_order['time']
+                    summary_record['close_price'] = exit_order['price']
+                    # 合并状态（汇总完成后按列统一计算）
+                    profit_value = 0
+                    if not position_deals.empty:
+                        profit_value = position_deals['profit'].sum()
+                    self._mark_status(summary_record, entry_order['status'], exit_order['status'], profit_value)
+                    summary_record['comment'] = f"{entry_order['comment']} | {exit_order['comment']}"
+                else:
+                    summary_record['order_id'] = entry_order['order_id']
+                    summary_record['close_time'] = entry_order['time']
+                    summary_record['close_price'] = entry_order['price']
                 
-                if len(position_orders) >= 2:
-                    # 按时间排序确定进场和出场
-                    sorted_orders = position_orders.sort_values('open_time')
-                    entry_order = sorted_orders.iloc[0]
-                    exit_order = sorted_orders.iloc[1]
-                elif len(position_orders) == 1:
-                    # 只有一个订单
-                    entry_order = position_orders.iloc[0]
+                # 添加成交相关信息
+                if not position_deals.empty:
+                    # 计算总手续费、库存费和盈利
+                    summary_record['commission'] = position_deals['commission'].sum()
+                    summary_record['swap'] = position_deals['swap'].sum()
+                    summary_record['profit'] = position_deals['profit'].sum()
+                    
+                    # 获取最后一条成交记录的信息
+                    last_deal = position_deals.iloc[-1]
+                    summary_record['close_price'] = last_deal['price']
+                    summary_record['close_time'] = last_deal['deal_time']
+                    summary_record['comment'] = last_deal['comment']
                 
-                # 创建汇总记录
-                if entry_order is not None:
-                    summary_record = {
-                        'position_id': position_id,
-                        'symbol': entry_order['symbol'],
-                        'order_type': entry_order['type'],
-                        'volume': entry_order['volume'],
-                        'open_price': entry_order['price'],
-                        'sl': entry_order['sl'],
-                        'tp': entry_order['tp'],
-                        'open_time': entry_order['open_time'],
-                        'status': entry_order['status'],
-                        'comment': entry_order['comment']
-                    }
+                # 添加线段相关信息
+                if not position_segments.empty:
+                    # 分离进场和出场的线段
+                    entry_segments = pd.DataFrame()
+                    exit_segments = pd.DataFrame()
+                    
+                    if entry_order is not None:
+                        entry_segments = position_segments[position_segments['order_ticket'] == entry_order['order_id']]
                     
-                    # 如果有出场订单，添加出场信息
                     if exit_order is not None:
-                        summary_record['order_id'] = exit_order['order_id']
-                        summary_record['close_time'] = exit_order['time']
-                        summary_record['close_price'] = exit_order['price']
-                        # 合并状态
-                        profit_value = 0
-                        if not position_deals.empty:
-                            profit_value = position_deals['profit'].sum()
-                        summary_record['status'] = self._merge_status(entry_order['status'], exit_order['status'], profit_value)
-                        summary_record['comment'] = f"{entry_order['comment']} | {exit_order['comment']}"
-                    else:
-                        summary_record['order_id'] = entry_order['order_id']
-                        summary_record['close_time'] = entry_order['time']
-                        summary_record['close_price'] = entry_order['price']
+                        exit_segments = position_segments[position_segments['order_ticket'] == exit_order['order_id']]
                     
-                    # 添加成交相关信息
-                    if not position_deals.empty:
-                        # 计算总手续费、库存费和盈利
-                        summary_record['commission'] = position_deals['commission'].sum()
-                        summary_record['swap'] = position_deals['swap'].sum()
-                        summary_record['profit'] = position_deals['profit'].sum()
+                    # 进场线段统计
+                    if not entry_segments.empty:
+                        summary_record['entry_right_segments_5min'] = len(entry_segments[
+                            (entry_segments['timeframe'] == 'M5') & 
+                            (entry_segments['segment_side'] == 'Right')
+                        ])
+                        
+                        summary_record['entry_right_segments_15min'] = len(entry_segments[
+                            (entry_segments['timeframe'] == 'M15') & 
+                            (entry_segments['segment_side'] == 'Right')
+                        ])
+                        
+                        summary_record['entry_right_segments_30min'] = len(entry_segments[
+                            (entry_segments['timeframe'] == 'M30') & 
+                            (entry_segments['segment_side'] == 'Right')
+                        ])
+                        
+                        # 进场第一个线段长度
+                        first_entry_segment = entry_segments[
+                            (entry_segments['segment_side'] == 'Right')
+                        ].sort_values('segment_index').iloc[0] if not entry_segments[
+                            (entry_segments['segment_side'] == 'Right')
+                        ].empty else None
                         
-                        # 获取最后一条成交记录的信息
-                        last_deal = position_deals.iloc[-1]
-                        summary_record['close_price'] = last_deal['price']
-                        summary_record['close_time'] = last_deal['deal_time']
-                        summary_record['comment'] = last_deal['comment']
+                        if first_entry_segment is not None:
+                            summary_record['entry_first_segment_length'] = round(abs(
+                                first_entry_segment['end_price'] - first_entry_segment['start_price']
+                            ), 2)
                     
-                    # 添加线段相关信息
-                    if not position_segments.empty:
-                        # 分离进场和出场的线段
-                        entry_segments = pd.DataFrame()
-                        exit_segments = pd.DataFrame()
+                    # 出场线段统计
+                    if not exit_segments.empty:
+                        summary_record['exit_right_segments_5min'] = len(exit_segments[
+                            (exit_segments['timeframe'] == 'M5') & 
+                            (exit_segments['segment_side'] == 'Right')
+                        ])
                         
-                        if entry_order is not None:
-                            entry_segments = position_segments[position_segments['order_ticket'] == entry_order['order_id']]
+                        summary_record['exit_right_segments_15min'] = len(exit_segments[
+                            (exit_segments['timeframe'] == 'M15') & 
+                            (exit_segments['segment_side'] == 'Right')
+                        ])
                         
-                        if exit_order is not None:
-                            exit_segments = position_segments[position_segments['order_ticket'] == exit_order['order_id']]
+                        summary_record['exit_right_segments_30min'] = len(exit_segments[
+                            (exit_segments['timeframe'] == 'M30') & 
+                            (exit_segments['segment_side'] == 'Right')
+                        ])
                         
-                        # 进场线段统计
-                        if not entry_segments.empty:
-                            summary_record['entry_right_segments_5min'] = len(entry_segments[
-                                (entry_segments['timeframe'] == 'M5') & 
-                                (entry_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            summary_record['entry_right_segments_15min'] = len(entry_segments[
-                                (entry_segments['timeframe'] == 'M15') & 
-                                (entry_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            summary_record['entry_right_segments_30min'] = len(entry_segments[
-                                (entry_segments['timeframe'] == 'M30') & 
-                                (entry_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            # 进场第一个线段长度
-                            first_entry_segment = entry_segments[
-                                (entry_segments['segment_side'] == 'Right')
-                            ].sort_values('segment_index').iloc[0] if not entry_segments[
-                                (entry_segments['segment_side'] == 'Right')
-                            ].empty else None
-                            
-                            if first_entry_segment is not None:
-                                summary_record['entry_first_segment_length'] = round(abs(
-                                    first_entry_segment['end_price'] - first_entry_segment['start_price']
-                                ), 2)
+                        # 出场第一个线段长度
+                        first_exit_segment = exit_segments[
+                            (exit_segments['segment_side'] == 'Right')
+                        ].sort_values('segment_index').iloc[0] if not exit_segments[
+                            (exit_segments['segment_side'] == 'Right')
+                        ].empty else None
                         
-                        # 出场线段统计
-                        if not exit_segments.empty:
-                            summary_record['exit_right_segments_5min'] = len(exit_segments[
-                                (exit_segments['timeframe'] == 'M5') & 
-                                (exit_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            summary_record['exit_right_segments_15min'] = len(exit_segments[
-                                (exit_segments['timeframe'] == 'M15') & 
-                                (exit_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            summary_record['exit_right_segments_30min'] = len(exit_segments[
-                                (exit_segments['timeframe'] == 'M30') & 
-                                (exit_segments['segment_side'] == 'Right')
-                            ])
-                            
-                            # 出场第一个线段长度
-                            first_exit_segment = exit_segments[
-                                (exit_segments['segment_side'] == 'Right')
-                            ].sort_values('segment_index').iloc[0] if not exit_segments[
-                                (exit_segments['segment_side'] == 'Right')
-                            ].empty else None
-                            
-                            if first_exit_segment is not None:
-                                summary_record['exit_first_segment_length'] = round(abs(
-                                    first_exit_segment['end_price'] - first_exit_segment['start_price']
-                                ), 2)
-                    
-                    summary_list.append(summary_record)
+                        if first_exit_segment is not None:
+                            summary_record['exit_first_segment_length'] = round(abs(
+                                first_exit_segment['end_price'] - first_exit_segment['start_price']
+                            ), 2)
+                
+                position_records.append((first_row, summary_record))
+        
+        # 处理未成交的订单（没有position_id关联的订单）
+        logger.info(f"已处理 {len(processed_order_ids)} 条订单，剩余 {len(orders_df) - len(processed_order_ids)} 条未处理订单")
+        unprocessed_orders = orders_df[~orders_df['order_id'].isin(processed_order_ids)]
+        
+        for order_index, order_row in unprocessed_orders.iterrows():
+            order_id = order_row['order_id']
             
-            # 处理未成交的订单（没有position_id关联的订单）
-            logger.info(f"已处理 {len(processed_order_ids)} 条订单，剩余 {len(orders_df) - len(processed_order_ids)} 条未处理订单")
-            unprocessed_orders = orders_df[~orders_df['order_id'].isin(processed_order_ids)]
+            # 获取该订单的成交记录
+            order_deals = deals_df[deals_df['order_id'] == order_id]
             
-            for _, order_row in unprocessed_orders.iterrows():
-                order_id = order_row['order_id']
+            # 获取该订单的线段记录
+            order_segments = segments_df[segments_df['order_ticket'] == order_id]
+            
+            # 创建汇总记录
+            summary_record = {
+                'order_id': order_id,
+                'symbol': order_row['symbol'],
+                'order_type': order_row['type'],
+                'volume': order_row['volume'],
+                'open_price': order_row['price'],
+                'sl': order_row['sl'],
+                'tp': order_row['tp'],
+                'open_time': order_row['open_time'],
+                'close_time': order_row['time'],
+                'status': order_row['status'],
+                'comment': order_row['comment']
+            }
+            
+            # 添加成交相关信息
+            profit_value = 0
+            if not order_deals.empty:
+                # 计算总手续费、库存费和盈利
+                summary_record['commission'] = order_deals['commission'].sum()
+                summary_record['swap'] = order_deals['swap'].sum()
+                summary_record['profit'] = order_deals['profit'].sum()
+                profit_value = order_deals['profit'].sum()
                 
-                # 获取该订单的成交记录
-                order_deals = deals_df[deals_df['order_id'] == order_id]
+                # 获取最后一条成交记录的注释作为平仓注释
+                summary_record['comment'] = order_deals.iloc[-1]['comment']
                 
-                # 获取该订单的线段记录
-                order_segments = segments_df[segments_df['order_ticket'] == order_id]
+                # 获取平仓价格和时间
+                summary_record['close_price'] = order_deals.iloc[-1]['price']
+                summary_record['close_time'] = order_deals.iloc[-1]['deal_time']
+            
+            # 根据盈利金额更新状态（汇总完成后按列统一计算）
+            self._mark_status(summary_record, order_row['status'], order_row['status'], profit_value)
+            
+            # 添加线段相关信息
+            if not order_segments.empty:
+                # 按时间周期统计右线段数量
+                right_segments_5min = len(order_segments[
+                    (order_segments['timeframe'] == 'M5') & 
+                    (order_segments['segment_side'] == 'Right')
+                ])
                 
-                # 创建汇总记录
-                summary_record = {
-                    'order_id': order_id,
-                    'symbol': order_row['symbol'],
-                    'order_type': order_row['type'],
-                    'volume': order_row['volume'],
-                    'open_price': order_row['price'],
-                    'sl': order_row['sl'],
-                    'tp': order_row['tp'],
-                    'open_time': order_row['open_time'],
-                    'close_time': order_row['time'],
-                    'status': order_row['status'],
-                    'comment': order_row['comment']
-                }
+                right_segments_15min = len(order_segments[
+                    (order_segments['timeframe'] == 'M15') & 
+                    (order_segments['segment_side'] == 'Right')
+                ])
                 
-                # 添加成交相关信息
-                profit_value = 0
-                if not order_deals.empty:
-                    # 计算总手续费、库存费和盈利
-                    summary_record['commission'] = order_deals['commission'].sum()
-                    summary_record['swap'] = order_deals['swap'].sum()
-                    summary_record['profit'] = order_deals['profit'].sum()
-                    profit_value = order_deals['profit'].sum()
-                    
-                    # 获取最后一条成交记录的注释作为平仓注释
-                    summary_record['comment'] = order_deals.iloc[-1]['comment']
-                    
-                    # 获取平仓价格和时间
-                    summary_record['close_price'] = order_deals.iloc[-1]['price']
-                    summary_record['close_time'] = order_deals.iloc[-1]['deal_time']
+                right_segments_30min = len(order_segments[
+                    (order_segments['timeframe'] == 'M30') & 
+                    (order_segments['segment_side'] == 'Right')
+                ])
                 
-                # 根据盈利金额更新状态
-                summary_record['status'] = self._merge_status(order_row['status'], order_row['status'], profit_value)
+                summary_record['right_segments_5min'] = right_segments_5min
+                summary_record['right_segments_15min'] = right_segments_15min
+                summary_record['right_segments_30min'] = right_segments_30min
                 
-                # 添加线段相关信息
-                if not order_segments.empty:
-                    # 按时间周期统计右线段数量
-                    right_segments_5min = len(order_segments[
-                        (order_segments['timeframe'] == 'M5') & 
-                        (order_segments['segment_side'] == 'Right')
-                    ])
-                    
-                    right_segments_15min = len(order_segments[
-                        (order_segments['timeframe'] == 'M15') & 
-                        (order_segments['segment_side'] == 'Right')
-                    ])
-                    
-                    right_segments_30min = len(order_segments[
-                        (order_segments['timeframe'] == 'M30') & 
-                        (order_segments['segment_side'] == 'Right')
-                    ])
-                    
-                    summary_record['right_segments_5min'] = right_segments_5min
-                    summary_record['right_segments_15min'] = right_segments_15min
-                    summary_record['right_segments_30min'] = right_segments_30min
-                    
-                    # 获取参考点价格右侧第一个线段的长度
-                    first_right_segment = order_segments[
-                        (order_segments['segment_side'] == 'Right')
-                    ].sort_values('segment_index').iloc[0] if not order_segments[
-                        (order_segments['segment_side'] == 'Right')
-                    ].empty else None
-                    
-                    if first_right_segment is not None:
-                        summary_record['first_segment_length'] = round(abs(
-                            first_right_segment['end_price'] - first_right_segment['start_price']
-                        ), 2)
+                # 获取参考点价格右侧第一个线段的长度
+                first_right_segment = order_segments[
+                    (order_segments['segment_side'] == 'Right')
+                ].sort_values('segment_index').iloc[0] if not order_segments[
+                    (order_segments['segment_side'] == 'Right')
+                ].empty else None
                 
-                summary_list.append(summary_record)
+                if first_right_segment is not None:
+                    summary_record['first_segment_length'] = round(abs(
+                        first_right_segment['end_price'] - first_right_segment['start_price']
+                    ), 2)
             
-            # 转换为DataFrame
-            summary_df = pd.DataFrame(summary_list)
-            logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录")
+            order_records.append((order_index, summary_record))
+        
+        return position_records, order_records
+    
+    def _segment_features_by_ticket(self, segments_df):
+        """
+        按订单票号一次性统计线段特征
+        
+        与逐单统计的规则一致：有线段记录的订单各周期右线段数量缺省为0，
+        第一个线段长度取segment_index最小的右线段
+        
+        Args:
+            segments_df (DataFrame): 线段数据
+            
+        Returns:
+            DataFrame: 以order_ticket为索引，列为right_segments_5min/15min/30min和first_segment_length
+        """
+        columns = [f'right_segments_{suffix}' for _, suffix in SEGMENT_TIMEFRAME_COLUMNS] + ['first_segment_length']
+        if segments_df is None or segments_df.empty:
+            return pd.DataFrame(columns=columns)
+        
+        tickets = pd.Index(segments_df['order_ticket'].unique(), name='order_ticket')
+        right = segments_df[segments_df['segment_side'] == 'Right']
+        counts = right.groupby(['order_ticket', right['timeframe'].astype(str)]).size().unstack(fill_value=0)
+        
+        features = pd.DataFrame(index=tickets)
+        for timeframe, suffix in SEGMENT_TIMEFRAME_COLUMNS:
+            if timeframe in counts.columns:
+                features[f'right_segments_{suffix}'] = counts[timeframe].reindex(tickets, fill_value=0)
+            else:
+                features[f'right_segments_{suffix}'] = 0
+        
+        first = right.sort_values('segment_index', kind='mergesort').drop_duplicates('order_ticket').set_index('order_ticket')
+        features['first_segment_length'] = (first['end_price'] - first['start_price']).abs().round(2).reindex(tickets)
+        return features[columns]
+    
+    def _generate_summary_streaming(self):
+        """
+        流式读取线段表、成交表和订单表生成汇总数据
+        
+        三张表依次分块读取（同一连接上一次只有一个查询），内存占用取决于块大小、
+        同时未平仓的仓位数和汇总结果本身，而不是源数据表的大小：
+        成交表按(交易品种, 成交时间)排序，逐块增量重建仓位，已平仓的仓位逐块取出，
+        设置了时间窗口时只保留开仓成交在窗口内的仓位；
+        订单表按写入顺序读取，只保留这些仓位的进出场订单和未成交订单；
+        线段表按order_ticket排序，每块末尾未读完的票号留到下一块，完整的票号统计线段特征和快照后即释放明细
+        """
+        positions_df = self._stream_positions()
+        position_order_ids = PositionReconstructor().order_positions(positions_df)['order_id'].unique()
+        positions_df = positions_df[self._in_window(positions_df['open_time'])].reset_index(drop=True)
+        orders_by_id, pending_orders, segments_start = self._stream_orders(positions_df, position_order_ids)
+        features, order_level_features, snapshots = self._stream_segment_features(
+            self._asof_segments_start(segments_start))
+        try:
+            position_summary = self._summarize_positions(positions_df, orders_by_id, features)
+            order_summary = self._summarize_pending_orders(pending_orders, order_level_features)
+            summary_data = optimize_summary_frame(pd.concat([position_summary, order_summary], ignore_index=True))
+            logger.info(f"处理完成，共生成 {len(summary_data)} 条汇总记录（仓位 {len(position_summary)}，"
+                        f"未成交订单 {len(order_summary)}）")
+        except Exception as e:
+            logger.error(f"处理汇总数据失败: {e}")
+            return None
+        if self.asof_features:
+            summary_data = self._attach_asof_features(summary_data, None, snapshots=snapshots)
+        return summary_data
+    
+    def _stream_segment_features(self, segments_start=None):
+        """
+        按票号分块读取线段表，统计线段特征和快照
+        
+        Args:
+            segments_start (Timestamp): 只读取该时间之后的线段（见_segments_start），None为不限
+        
+        Returns:
+            tuple: (features, order_level_features, snapshots)，未启用快照匹配时snapshots为None
+        """
+        features_parts, order_features_parts, snapshot_parts = [], [], []
+        matcher = SegmentAsOfMatcher(timeframes=SEGMENT_TIMEFRAME_COLUMNS)
+        carry = None
+        total_rows = 0
+        largest_ticket = 0
+        
+        def consume(segments):
+            nonlocal largest_ticket
+            largest_ticket = max(largest_ticket, int(segments['order_ticket'].value_counts().max()))
+            features_parts.append(self._segment_features_by_ticket(segments[segments['position_id'] > 0]))
+            order_features_parts.append(self._segment_features_by_ticket(segments))
+            if self.asof_features:
+                snapshot_parts.append(matcher.build_snapshots(segments, keep_ticket=True))
+        
+        segments_query = with_time_window(SEGMENTS_STREAM_QUERY, 'trade_time', segments_start)
+        for chunk in self.backend.iter_sql(segments_query, self.conn, self.chunk_rows):
+            chunk = optimize_segments_frame(chunk)
+            total_rows += len(chunk)
+            # 最后一个票号可能在下一块中还有记录
+            last_ticket = chunk['order_ticket'].iloc[-1]
+            tail = chunk['order_ticket'].eq(last_ticket).fillna(False).to_numpy(dtype=bool)
+            if tail.all() and carry and carry[-1]['order_ticket'].iloc[-1] == last_ticket:
+                # 整块都属于同一个未读完的票号，先暂存，避免反复拼接
+                carry.append(chunk)
+                continue
+            head = pd.concat((carry or []) + [chunk[~tail]], ignore_index=True)
+            carry = [chunk[tail]]
+            if len(head):
+                consume(head)
+        if carry:
+            consume(pd.concat(carry, ignore_index=True))
+        logger.info(f"流式读取线段数据 {total_rows} 条，单个订单最多 {largest_ticket} 条")
+        
+        features = pd.concat(features_parts) if features_parts else self._segment_features_by_ticket(None)
+        order_level_features = (pd.concat(order_features_parts) if order_features_parts
+                                else self._segment_features_by_ticket(None))
+        snapshots = matcher.merge_snapshots(snapshot_parts) if self.asof_features else None
+        return features, order_level_features, snapshots
+    
+    def _stream_positions(self):
+        """
+        按(交易品种, 成交时间)分块读取成交表，增量重建仓位
+        
+        每块处理完后取出已平仓的仓位，重建器中只保留未平仓的仓位；
+        结果按建仓成交的(交易品种, 成交时间, 成交号)排序，与一次性重建的仓位顺序一致。
+        设置了时间窗口时仍读取全部成交，窗口起点时未平仓的仓位和窗口终点后才平仓的仓位才能完整重建
+        
+        Returns:
+            DataFrame: 全部仓位数据（POSITION_COLUMNS）
+        """
+        reconstructor = PositionReconstructor()
+        parts = []
+        total_rows = 0
+        for chunk in self.backend.iter_sql(DEALS_STREAM_QUERY, self.conn, self.chunk_rows):
+            total_rows += len(chunk)
+            reconstructor.feed(optimize_deals_frame(chunk))
+            parts.append(reconstructor.take_positions())
+        parts.append(reconstructor.take_positions(closed_only=False))
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            logger.info(f"流式读取成交数据 {total_rows} 条，重建仓位 0 个")
+            return reconstructor.take_positions(closed_only=False)
+        positions_df = pd.concat(parts, ignore_index=True)
+        positions_df = positions_df.sort_values(['symbol', 'open_time', 'entry_deal_id'], kind='mergesort',
+                                                ignore_index=True)
+        logger.info(f"流式读取成交数据 {total_rows} 条，重建仓位 {len(positions_df)} 个，"
+                    f"其中已平仓 {int(positions_df['is_closed'].sum())} 个")
+        return positions_df
+    
+    def _stream_orders(self, positions_df, position_order_ids):
+        """
+        分块读取订单表，只保留仓位的进出场订单和不属于任何仓位、开价时间在窗口内的订单
+        
+        Args:
+            positions_df (DataFrame): 要汇总的仓位数据
+            position_order_ids (ndarray): 属于任何仓位（包括窗口外的仓位）的订单号
+        
+        Returns:
+            tuple: (orders_by_id, pending_orders, segments_start)，orders_by_id以order_id为索引（同一订单号取第一条），
+                pending_orders以订单在订单表中的读取顺序为索引，segments_start见_segments_start
+        """
+        window_order_ids = PositionReconstructor().order_positions(positions_df)['order_id'].unique()
+        exit_order_ids = positions_df['exit_order_id'].dropna().astype('int64').unique()
+        needed_ids = np.union1d(positions_df['entry_order_id'].astype('int64').unique(), exit_order_ids)
+        
+        needed_parts, pending_parts = [], []
+        total_rows = 0
+        segments_start = None
+        for chunk in self.backend.iter_sql(ORDERS_STREAM_QUERY, self.conn, self.chunk_rows):
+            chunk = optimize_orders_frame(chunk)
+            chunk.index = pd.RangeIndex(total_rows, total_rows + len(chunk))
+            total_rows += len(chunk)
+            if self.start is not None:
+                segments_start = self._earliest_open_time(chunk, window_order_ids, segments_start)
+            needed_parts.append(chunk[chunk['order_id'].isin(needed_ids)])
+            pending_parts.append(chunk[~chunk['order_id'].isin(position_order_ids).to_numpy()
+                                       & self._in_window(chunk['open_time'])])
+        
+        empty = optimize_orders_frame(pd.DataFrame(columns=ORDERS_COLUMNS))
+        needed = pd.concat(needed_parts) if needed_parts else empty
+        pending_orders = pd.concat(pending_parts) if pending_parts else empty
+        logger.info(f"流式读取订单数据 {total_rows} 条，其中仓位的进出场订单 {len(needed)} 条，"
+                    f"未成交订单 {len(pending_orders)} 条")
+        return needed.drop_duplicates('order_id').set_index('order_id'), pending_orders, segments_start
+    
+    def _process_summary_from_positions(self, orders_df, deals_df, segments_df, features=None,
+                                        order_level_features=None):
+        """
+        基于成交方向重建的仓位生成汇总数据
+        
+        每个仓位一行（含分批平仓、反手后的新仓），订单、线段特征通过票号索引一次性关联；
+        没有成交的订单（取消、过期等）各自一行
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            deals_df (DataFrame): 成交数据
+            segments_df (DataFrame): 线段数据
+            features (DataFrame): 预先统计的已关联仓位的线段特征（流式读取时使用，此时segments_df可为None）
+            order_level_features (DataFrame): 预先统计的全部线段特征
+        """
+        try:
+            position_summary, order_summary = self._position_summary_parts(orders_df, deals_df, segments_df,
+                                                                           features, order_level_features)
+            summary_df = pd.concat([position_summary, order_summary], ignore_index=True)
+            summary_df = optimize_summary_frame(summary_df)
+            logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录（仓位 {len(position_summary)}，未成交订单 {len(order_summary)}）")
             return summary_df
             
         except Exception as e:
             logger.error(f"处理汇总数据失败: {e}")
             return None
     
+    def _position_summary_parts(self, orders_df, deals_df, segments_df, features=None, order_level_features=None):
+        """
+        生成仓位汇总和未成交订单汇总（尚未合并和转换列类型）
+        
+        Returns:
+            tuple: (position_summary, order_summary)，order_summary以订单在orders_df中的索引为索引
+        """
+        positions_df, _ = PositionReconstructor().reconstruct(deals_df)
+        logger.info(f"重建仓位 {len(positions_df)} 个")
+        # 未成交订单是不属于任何仓位（包括窗口外的仓位）的订单；只汇总开仓成交在窗口内的仓位
+        position_orders = PositionReconstructor().order_positions(positions_df)
+        positions_df = positions_df[self._in_window(positions_df['open_time'])].reset_index(drop=True)
+        
+        orders_by_id = orders_df.drop_duplicates('order_id').set_index('order_id')
+        # 进出场特征只统计已关联仓位的线段快照，未成交订单统计该订单的全部线段快照（与旧方式一致）
+        if features is None:
+            features = self._segment_features_by_ticket(segments_df[segments_df['position_id'] > 0])
+        if order_level_features is None:
+            order_level_features = self._segment_features_by_ticket(segments_df)
+        
+        position_summary = self._summarize_positions(positions_df, orders_by_id, features)
+        # 没有成交的订单
+        pending_orders = orders_df[~orders_df['order_id'].isin(position_orders['order_id']).to_numpy()
+                                   & self._in_window(orders_df['open_time'])]
+        order_summary = self._summarize_pending_orders(pending_orders, order_level_features)
+        return position_summary, order_summary
+    
+    def _summarize_positions(self, positions_df, orders_by_id, features):
+        """
+        每个重建的仓位生成一行汇总
+        
+        Args:
+            positions_df (DataFrame): PositionReconstructor重建的仓位
+            orders_by_id (DataFrame): 以order_id为索引的订单（至少包含仓位的进出场订单）
+            features (DataFrame): 以票号为索引的已关联仓位的线段特征
+        """
+        entry_orders = orders_by_id.reindex(positions_df['entry_order_id'].to_numpy())
+        exit_orders = orders_by_id.reindex(positions_df['exit_order_id'].fillna(-1).astype('int64').to_numpy())
+        entry_features = features.reindex(positions_df['entry_order_id'].to_numpy())
+        exit_features = features.reindex(positions_df['exit_order_id'].fillna(-1).astype('int64').to_numpy())
+        has_exit = positions_df['exit_order_id'].notna().to_numpy()
+        
+        entry_price = entry_orders['price'].to_numpy(dtype=float)
+        position_summary = pd.DataFrame({
+            'position_id': positions_df['position_id'].to_numpy(),
+            'symbol': _coalesce(entry_orders['symbol'], positions_df['symbol']),
+            'order_type': _coalesce(entry_orders['type'], positions_df['side']),
+            'volume': _coalesce(entry_orders['volume'], positions_df['entry_volume']),
+            'open_price': np.where(entry_price > 0, entry_price, positions_df['open_price'].to_numpy(dtype=float)),
+            'sl': entry_orders['sl'].to_numpy(),
+            'tp': entry_orders['tp'].to_numpy(),
+            'open_time': _coalesce(entry_orders['open_time'], positions_df['open_time']),
+            'status': entry_orders['status'].astype(object).to_numpy(),
+            'comment': positions_df['comment'].to_numpy(),
+            'order_id': positions_df['exit_order_id'].fillna(positions_df['entry_order_id']).astype('int64').to_numpy(),
+            'close_time': positions_df['close_time'].to_numpy(),
+            'close_price': positions_df['close_price'].to_numpy(),
+            'commission': positions_df['commission'].to_numpy(),
+            'swap': positions_df['swap'].to_numpy(),
+            'profit': positions_df['profit'].to_numpy(),
+            'exit_count': positions_df['exit_count'].to_numpy(),
+        })
+        for column in features.columns:
+            position_summary[f'entry_{column}'] = entry_features[column].to_numpy()
+            position_summary[f'exit_{column}'] = np.where(has_exit, exit_features[column].to_numpy(dtype=float), np.nan)
+        
+        if has_exit.any():
+            position_summary.loc[has_exit, 'status'] = self.classify_status(
+                entry_orders['status'].to_numpy()[has_exit],
+                exit_orders['status'].to_numpy()[has_exit],
+                positions_df['profit'].to_numpy()[has_exit]
+            )
+        
+        return position_summary
+    
+    def _summarize_pending_orders(self, pending_orders, order_level_features):
+        """
+        没有成交的订单（取消、过期等）各自生成一行汇总，以订单的行索引为索引
+        
+        Args:
+            pending_orders (DataFrame): 不属于任何仓位的订单
+            order_level_features (DataFrame): 以票号为索引的全部线段特征
+        """
+        order_features = order_level_features.reindex(pending_orders['order_id'].to_numpy())
+        order_summary = pd.DataFrame({
+            'order_id': pending_orders['order_id'].to_numpy(),
+            'symbol': pending_orders['symbol'].astype(object).to_numpy(),
+            'order_type': pending_orders['type'].astype(object).to_numpy(),
+            'volume': pending_orders['volume'].to_numpy(),
+            'open_price': pending_orders['price'].to_numpy(),
+            'sl': pending_orders['sl'].to_numpy(),
+            'tp': pending_orders['tp'].to_numpy(),
+            'open_time': pending_orders['open_time'].to_numpy(),
+            'close_time': pending_orders['time'].to_numpy(),
+            'status': self.classify_status(pending_orders['status'], pending_orders['status'],
+                                           np.zeros(len(pending_orders))),
+            'comment': pending_orders['comment'].to_numpy(),
+        }, index=pending_orders.index)
+        for column in order_level_features.columns:
+            order_summary[column] = order_features[column].to_numpy()
+        return order_summary
+    
+    def _partition_frames(self, orders_df, deals_df, segments_df):
+        """
+        按(报告文件, 交易品种)切分订单、成交和线段数据
+        
+        线段表没有品种和报告文件，按票号归入订单或成交所在的分区，
+        同一position_id的其余线段随之归入，保证每个分区看到的线段与串行汇总时相同；
+        各部分保留原始行索引
+        
+        Returns:
+            list: [(分区键, orders, deals, segments), ...]，按(交易品种, 报告文件)排序，与串行汇总的仓位顺序一致
+        """
+        def keys_of(df):
+            columns = [df[c].astype(object).where(df[c].notna(), '').astype(str) if c in df.columns
+                       else pd.Series('', index=df.index) for c in PARTITION_COLUMNS]
+            return list(zip(columns[1], columns[0]))
+        
+        order_keys = keys_of(orders_df)
+        deal_keys = keys_of(deals_df)
+        partitions = sorted(set(order_keys) | set(deal_keys))
+        part_of = {key: i for i, key in enumerate(partitions)}
+        order_parts = np.array([part_of[key] for key in order_keys], dtype='int64')
+        deal_parts = np.array([part_of[key] for key in deal_keys], dtype='int64')
+        
+        # 票号 -> 分区（多次回测的票号可能重复，此时线段归入每个包含该票号的分区）
+        ticket_parts = pd.DataFrame({
+            'order_ticket': np.concatenate([orders_df['order_id'].to_numpy(dtype='int64'),
+                                            deals_df['order_id'].to_numpy(dtype='int64')]),
+            '_part': np.concatenate([order_parts, deal_parts]),
+        }).drop_duplicates()
+        rows = pd.DataFrame({
+            '_row': np.arange(len(segments_df)),
+            'order_ticket': segments_df['order_ticket'].to_numpy(dtype='int64'),
+            'position_id': segments_df['position_id'].to_numpy(dtype='int64'),
+        })
+        by_ticket = rows.merge(ticket_parts, on='order_ticket')
+        position_parts = by_ticket.loc[by_ticket['position_id'] > 0, ['position_id', '_part']].drop_duplicates()
+        by_position = rows[rows['position_id'] > 0].merge(position_parts, on='position_id')
+        assigned = (pd.concat([by_ticket[['_row', '_part']], by_position[['_row', '_part']]])
+                    .drop_duplicates().sort_values(['_part', '_row']))
+        segment_rows = dict(tuple(assigned.groupby('_part')['_row']))
+        
+        frames = []
+        for i, key in enumerate(partitions):
+            rows_i = segment_rows.get(i)
+            segments_i = segments_df.iloc[rows_i.to_numpy()] if rows_i is not None else segments_df.iloc[:0]
+            frames.append((key, orders_df[order_parts == i], deals_df[deal_parts == i], segments_i))
+        return frames
+    
+    def _generate_summary_partitioned(self, orders_df, deals_df, segments_df):
+        """
+        按(报告文件, 交易品种)分区，在进程池中并行汇总后按确定的顺序合并
+        
+        仓位汇总按分区顺序（交易品种、报告文件）拼接，与串行汇总时按品种排序重建仓位的顺序相同；
+        未成交订单和orders方式的仓位记录按原始行索引排序；状态、列类型和快照匹配在合并后统一计算
+        
+        Args:
+            orders_df (DataFrame): 订单数据
+            deals_df (DataFrame): 成交数据
+            segments_df (DataFrame): 线段数据
+        """
+        frames = self._partition_frames(orders_df, deals_df, segments_df)
+        settings = {'summary_mode': self.summary_mode, 'status_rules': self.status_rules,
+                    'profit_labels': self.profit_labels, 'asof_features': False,
+                    'start': self.start, 'end': self.end}
+        workers = min(self.workers, len(frames))
+        logger.info(f"分区并行汇总: {len(frames)} 个分区，{workers} 个进程")
+        arguments = [[settings] * len(frames)] + [list(part) for part in zip(*[frame[1:] for frame in frames])]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_summarize_partition, *arguments))
+        else:
+            results = [_summarize_partition(*args) for args in zip(*arguments)]
+        
+        if self.summary_mode == 'positions':
+            position_parts = [result[0] for result in results if len(result[0])]
+            order_parts = [result[1] for result in results if len(result[1])]
+            position_summary = pd.concat(position_parts, ignore_index=True) if position_parts else results[0][0]
+            order_summary = (pd.concat(order_parts).sort_index(kind='mergesort') if order_parts
+                             else results[0][1])
+            summary_df = optimize_summary_frame(pd.concat([position_summary, order_summary], ignore_index=True))
+            logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录（仓位 {len(position_summary)}，"
+                        f"未成交订单 {len(order_summary)}）")
+            return summary_df
+        
+        position_records = sorted(chain.from_iterable(result[0] for result in results), key=lambda item: item[0])
+        order_records = sorted(chain.from_iterable(result[1] for result in results), key=lambda item: item[0])
+        summary_df = self._summary_from_records(position_records, order_records)
+        logger.info(f"处理完成，共生成 {len(summary_df)} 条汇总记录")
+        return summary_df
+    
+    def _attach_asof_features(self, summary_df, segments_df, snapshots=None):
+        """
+        按开仓时间和平仓时间为每条汇总记录关联各周期最近的线段快照
+        
+        开仓时间的快照写入 asof_* 列，平仓时间的快照写入 asof_exit_* 列（未平仓的记录为空），
+        保存汇总时一并写入trade_summary表
+        
+        Args:
+            summary_df (DataFrame): 汇总数据
+            segments_df (DataFrame): 线段数据（需包含trade_time）
+            snapshots (DataFrame): 已构建的快照（流式读取时使用）
+        """
+        if snapshots is None and 'trade_time' not in segments_df.columns:
+            logger.warning("线段数据缺少trade_time，跳过快照时间匹配")
+            return summary_df
+        matcher = SegmentAsOfMatcher(timeframes=SEGMENT_TIMEFRAME_COLUMNS)
+        if snapshots is None:
+            snapshots = matcher.build_snapshots(segments_df)
+        summary_df = matcher.attach_orders(summary_df, snapshots=snapshots)
+        exit_matcher = SegmentAsOfMatcher(timeframes=SEGMENT_TIMEFRAME_COLUMNS, prefix='asof_exit_')
+        summary_df = exit_matcher.attach(summary_df, 'close_time', snapshots=snapshots)
+        matched = summary_df['asof_snapshot_time_5min'].notna().sum()
+        exit_matched = summary_df['asof_exit_snapshot_time_5min'].notna().sum()
+        logger.info(f"快照时间匹配完成，{matched}/{len(summary_df)} 条记录的开仓时间、"
+                    f"{exit_matched} 条记录的平仓时间关联到5分钟线段快照")
+        return optimize_summary_frame(summary_df)
+    
     def _merge_entry_exit_data(self, summary_df, segments_df):
         """
         将进场和出场数据合并成一行
@@ -417,112 +1131,195 @@ class TradeSummaryProcessor:
         # 由于我们已经在_process_summary_data中处理了合并逻辑，这里直接返回
         return summary_df
     
-    def _merge_status(self, entry_status, exit_status, profit=0):
+    def _mark_status(self, summary_record, entry_status, exit_status, profit):
         """
-        合并订单状态
+        记录待合并的状态输入，由_apply_status_rules在整列上统一计算
         
         Args:
+            summary_record (dict): 汇总记录
             entry_status (str): 进场状态
             exit_status (str): 出场状态
             profit (float): 盈利金额
+        """
+        summary_record['_merge_status'] = True
+        summary_record['_entry_status'] = entry_status
+        summary_record['_exit_status'] = exit_status
+        summary_record['_status_profit'] = profit
+    
+    def classify_status(self, entry_status, exit_status, profit):
+        """
+        按状态规则批量合并订单状态
+        
+        任意一侧状态包含规则关键字（不区分大小写）时取该规则的状态，多条规则按顺序优先；
+        都未命中时按盈利金额划分为盈利/亏损/持平
+        
+        Args:
+            entry_status (Series): 进场状态
+            exit_status (Series): 出场状态
+            profit (Series): 盈利金额
             
         Returns:
-            str: 合并后的状态
+            ndarray: 合并后的状态
         """
-        # 如果任意一个是取消，则为取消
-        if 'cancel' in str(entry_status).lower() or 'cancel' in str(exit_status).lower():
-            return '取消'
+        entry_text = pd.Series(entry_status).astype(str).str.lower().reset_index(drop=True)
+        exit_text = pd.Series(exit_status).astype(str).str.lower().reset_index(drop=True)
+        profit_values = pd.to_numeric(pd.Series(profit), errors='coerce').fillna(0).to_numpy(dtype=float)
         
-        # 如果任意一个是过期，则为过期
-        if 'expired' in str(entry_status).lower() or 'expired' in str(exit_status).lower():
-            return '过期'
+        conditions = []
+        choices = []
+        for keyword, label in self.status_rules:
+            keyword = str(keyword).lower()
+            conditions.append((entry_text.str.contains(keyword, regex=False) |
+                               exit_text.str.contains(keyword, regex=False)).to_numpy())
+            choices.append(label)
         
-        # 根据盈利金额判断状态
-        if profit > 0:
-            return '盈利'
-        elif profit < 0:
-            return '亏损'
-        else:
-            return '持平'
+        win_label, loss_label, flat_label = self.profit_labels
+        conditions.extend([profit_values > 0, profit_values < 0])
+        choices.extend([win_label, loss_label])
+        
+        return np.select(conditions, choices, default=flat_label).astype(object)
+    
+    def _apply_status_rules(self, summary_df):
+        """
+        对记录了状态输入的汇总行按列计算合并状态，并删除辅助列
+        
+        Args:
+            summary_df (DataFrame): 汇总数据
+            
+        Returns:
+            DataFrame: 更新状态后的汇总数据
+        """
+        if summary_df.empty or '_merge_status' not in summary_df.columns:
+            return summary_df.drop(columns=['_merge_status', '_entry_status', '_exit_status', '_status_profit'],
+                                   errors='ignore')
         
-        # 默认返回原始状态
-        return entry_status if not pd.isna(entry_status) else exit_status
+        mask = summary_df['_merge_status'].fillna(False).astype(bool).to_numpy()
+        if mask.any():
+            merged = summary_df.loc[mask]
+            summary_df['status'] = summary_df['status'].astype(object)
+            summary_df.loc[mask, 'status'] = self.classify_status(
+                merged['_entry_status'], merged['_exit_status'], merged['_status_profit']
+            )
+        
+        return summary_df.drop(columns=['_merge_status', '_entry_status', '_exit_status', '_status_profit'])
     
-    def save_summary_to_db(self, summary_df):
+    def _merge_status(self, entry_status, exit_status, profit=0):
         """
-        将汇总数据保存到数据库
+        合并单条订单状态（与classify_status规则一致）
+        
+        Args:
+            entry_status (str): 进场状态
+            exit_status (str): 出场状态
+            profit (float): 盈利金额
+            
+        Returns:
+            str: 合并后的状态
+        """
+        return self.classify_status([entry_status], [exit_status], [profit])[0]
+    
+    def save_summary_to_db(self, summary_df, commit_rows=DEFAULT_COMMIT_ROWS):
+        """
+        将汇总数据增量保存到数据库
+        
+        按行内容哈希（row_key）与表中现有记录比较：只删除不再存在的行、插入新增或内容变化的行，
+        未变化的行保留原id，读取服务刷新时只需读取有变化的记录；按块提交，中断后重新保存时只写入仍有差异的行
         
         Args:
             summary_df (DataFrame): 汇总数据
+            commit_rows (int): 每个事务删除或插入的行数
             
         Returns:
-            int: 成功插入的记录数
+            int: 保存后汇总表中的汇总记录数（失败时为0）
         """
         if summary_df is None or len(summary_df) == 0:
             logger.warning("汇总数据为空，跳过保存到数据库")
             return 0
         
+        rows = self.build_summary_rows(summary_df)
         try:
-            # 先清除现有数据
-            self.cursor.execute("DELETE FROM trade_summary")
-            
-            # 插入新数据
-            insert_query = """
-            INSERT INTO trade_summary 
-            (order_id, position_id, symbol, order_type, volume, open_price, close_price, sl, tp, 
-             open_time, close_time, status, commission, swap, profit, comment,
-             right_segments_5min, right_segments_15min, right_segments_30min, first_segment_length,
-             entry_right_segments_5min, entry_right_segments_15min, entry_right_segments_30min,
-             exit_right_segments_5min, exit_right_segments_15min, exit_right_segments_30min,
-             entry_first_segment_length, exit_first_segment_length)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            count = 0
-            for _, row in summary_df.iterrows():
-                values = (
-                    row.get('order_id'),
-                    row.get('position_id'),
-                    row.get('symbol'),
-                    row.get('order_type'),
-                    row.get('volume'),
-                    row.get('open_price'),
-                    row.get('close_price'),
-                    row.get('sl'),
-                    row.get('tp'),
-                    row.get('open_time'),
-                    row.get('close_time'),
-                    row.get('status'),
-                    row.get('commission', 0),
-                    row.get('swap', 0),
-                    row.get('profit', 0),
-                    row.get('comment'),
-                    row.get('right_segments_5min', 0),
-                    row.get('right_segments_15min', 0),
-                    row.get('right_segments_30min', 0),
-                    row.get('first_segment_length', 0),
-                    row.get('entry_right_segments_5min', 0),
-                    row.get('entry_right_segments_15min', 0),
-                    row.get('entry_right_segments_30min', 0),
-                    row.get('exit_right_segments_5min', 0),
-                    row.get('exit_right_segments_15min', 0),
-                    row.get('exit_right_segments_30min', 0),
-                    row.get('entry_first_segment_length', 0),
-                    row.get('exit_first_segment_length', 0)
-                )
-                
-                self.cursor.execute(insert_query, values)
-                count += 1
+            existing = self.backend.read_sql("SELECT id, row_key FROM trade_summary ORDER BY id", self.conn)
+            # 每个哈希还需要的行数先由表中内容相同的记录抵扣，抵扣不到的记录（含没有哈希的旧记录）删除
+            needed = Counter(row[-1] for row in rows)
+            stale_ids = []
+            for row_id, row_key in zip(existing['id'].tolist(), existing['row_key'].tolist()):
+                if needed.get(row_key, 0) > 0:
+                    needed[row_key] -= 1
+                else:
+                    stale_ids.append(int(row_id))
+            new_rows = []
+            for row in rows:
+                if needed[row[-1]] > 0:
+                    needed[row[-1]] -= 1
+                    new_rows.append(row)
             
-            self.conn.commit()
-            logger.info(f"成功将 {count} 条汇总记录保存到数据库")
-            return count
+            for start in range(0, len(stale_ids), commit_rows):
+                ids = ", ".join(str(row_id) for row_id in stale_ids[start:start + commit_rows])
+                self.cursor.execute(f"DELETE FROM trade_summary WHERE id IN ({ids})")
+                self.conn.commit()
+            if new_rows:
+                # 超过列宽的文本不截断，先加宽列
+                SchemaMigrator(self.backend, self.conn).fit_text_columns('trade_summary', SUMMARY_INSERT_QUERY,
+                                                                         new_rows)
+            for start in range(0, len(new_rows), commit_rows):
+                self.cursor.executemany(SUMMARY_INSERT_QUERY, new_rows[start:start + commit_rows])
+                self.conn.commit()
+            logger.info(f"成功将 {len(rows)} 条汇总记录保存到数据库（未变化 {len(rows) - len(new_rows)} 条，"
+                        f"删除 {len(stale_ids)} 条，插入 {len(new_rows)} 条）")
+            return len(rows)
             
-        except Error as e:
-            logger.error(f"保存汇总数据到数据库失败: {e}")
+        except DB_ERRORS as e:
+            logger.error(f"保存汇总数据到数据库失败（已提交的块保留，重新保存时只写入仍有差异的行）: {e}")
             self.conn.rollback()
             return 0
     
+    def build_summary_rows(self, summary_df):
+        """
+        将汇总数据转换为trade_summary的插入行
+        
+        Args:
+            summary_df (DataFrame): 汇总数据
+            
+        Returns:
+            list: 插入行（与SUMMARY_INSERT_QUERY的列顺序一致，最后一列为行内容哈希row_key）
+        """
+        rows = []
+        for _, row in summary_df.iterrows():
+            values = (
+                row.get('order_id'),
+                row.get('position_id'),
+                row.get('symbol'),
+                row.get('order_type'),
+                row.get('volume'),
+                row.get('open_price'),
+                row.get('close_price'),
+                row.get('sl'),
+                row.get('tp'),
+                row.get('open_time'),
+                row.get('close_time'),
+                row.get('status'),
+                row.get('commission', 0),
+                row.get('swap', 0),
+                row.get('profit', 0),
+                row.get('comment'),
+                row.get('right_segments_5min', 0),
+                row.get('right_segments_15min', 0),
+                row.get('right_segments_30min', 0),
+                row.get('first_segment_length', 0),
+                row.get('entry_right_segments_5min', 0),
+                row.get('entry_right_segments_15min', 0),
+                row.get('entry_right_segments_30min', 0),
+                row.get('exit_right_segments_5min', 0),
+                row.get('exit_right_segments_15min', 0),
+                row.get('exit_right_segments_30min', 0),
+                row.get('entry_first_segment_length', 0),
+                row.get('exit_first_segment_length', 0)
+            ) + tuple(row.get(column) for column in ASOF_COLUMNS)
+            
+            values = tuple(to_db_value(v) for v in values)
+            rows.append(values + (summary_row_key(values),))
+        
+        return rows
+    
     def save_summary_to_csv(self, summary_df, csv_path="trade_summary.csv"):
         """
         将汇总数据保存为CSV文件
@@ -552,7 +1349,7 @@ class TradeSummaryProcessor:
             
             self.conn.commit()
             logger.info(f"已清除汇总表中的数据: {deleted_count} 条记录")
-        except Error as e:
+        except DB_ERRORS as e:
             logger.error(f"清除汇总表数据失败: {e}")
             self.conn.rollback()
             raise
\ No newline at end of file
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线ZigZag与线段计算
+在Python中复现EA的CZigzagCalculator（ZigzagCalculator.mqh）极值计算和
+CZigzagSegment/CTradeBasePoint的线段划分，直接从导出的K线文件（CSV/Parquet）重算线段，
+无需重新运行MT5策略测试器即可尝试不同的depth/deviation/backstep参数
+"""
+
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger("ZigzagEngine")
+
+# EA中GetSmallerTimeframeSegments使用的默认参数
+DEFAULT_DEPTH = 12
+DEFAULT_DEVIATION = 5
+DEFAULT_BACKSTEP = 3
+
+# 每侧最多记录的线段数量（与SegmentInfoLogger一致）
+MAX_LOGGED_SEGMENTS = 10
+
+# 时间周期 -> pandas重采样规则
+TIMEFRAME_RULES = {'M1': '1min', 'M5': '5min', 'M15': '15min', 'M30': '30min', 'H1': '1h', 'H4': '4h', 'D1': '1D'}
+
+# K线文件中可能出现的列名 -> 标准列名
+BAR_COLUMN_ALIASES = {
+    'time': 'time', 'datetime': 'time', 'date_time': 'time',
+    'open': 'open', 'high': 'high', 'low': 'low', 'close': 'close',
+    'tickvol': 'tick_volume', 'tick_volume': 'tick_volume', 'vol': 'volume', 'volume': 'volume',
+    'spread': 'spread',
+}
+
+
+def load_bars(path):
+    """
+    读取K线文件
+
+    支持Parquet以及CSV（含MT5导出的 <DATE> <TIME> <OPEN> ... 制表符分隔格式）
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        DataFrame: time, open, high, low, close[, tick_volume, volume, spread]，按时间升序
+    """
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        bars = pd.read_parquet(path)
+    else:
+        bars = pd.read_csv(path, sep=None, engine='python')
+
+    bars.columns = [str(c).strip().strip('<>').lower() for c in bars.columns]
+    if 'date' in bars.columns and 'time' in bars.columns:
+        bars['time'] = pd.to_datetime(bars['date'].astype(str) + ' ' + bars['time'].astype(str))
+        bars = bars.drop(columns=['date'])
+    bars = bars.rename(columns={c: BAR_COLUMN_ALIASES[c] for c in bars.columns if c in BAR_COLUMN_ALIASES})
+    missing = [c for c in ('time', 'high', 'low') if c not in bars.columns]
+    if missing:
+        raise ValueError(f"K线文件缺少列: {missing}")
+
+    bars['time'] = pd.to_datetime(bars['time'])
+    bars = bars.sort_values('time', kind='mergesort').reset_index(drop=True)
+    logger.info(f"读取K线 {path}，共 {len(bars)} 根")
+    return bars
+
+
+def resample_bars(bars, timeframe):
+    """
+    将小周期K线合成为大周期K线（如M1 -> M5/M15/M30）
+
+    Args:
+        bars (DataFrame): time, open, high, low, close
+        timeframe (str): 目标周期，见TIMEFRAME_RULES
+
+    Returns:
+        DataFrame: 合成后的K线
+    """
+    rule = TIMEFRAME_RULES[timeframe]
+    aggregations = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}
+    aggregations = {k: v for k, v in aggregations.items() if k in bars.columns}
+    for column in ('tick_volume', 'volume'):
+        if column in bars.columns:
+            aggregations[column] = 'sum'
+    resampled = bars.set_index('time').resample(rule, label='left', closed='left').agg(aggregations)
+    return resampled.dropna(subset=['high', 'low']).reset_index()
+
+
+class ZigzagCalculator:
+    """ZigZag极值计算（CZigzagCalculator::Calculate 的数组实现）"""
+
+    def __init__(self, depth=DEFAULT_DEPTH, deviation=DEFAULT_DEVIATION, backstep=DEFAULT_BACKSTEP, point=0.01):
+        """
+        初始化计算器
+
+        Args:
+            depth (int): 深度参数
+            deviation (int): 偏差参数（点数）
+            backstep (int): 回溯步数参数
+            point (float): 品种最小价格变动（_Point）
+        """
+        self.depth = int(depth)
+        self.deviation = int(deviation)
+        self.backstep = int(backstep)
+        self.point = float(point)
+
+    def _extremum_map(self, values, is_high):
+        """
+        第一遍扫描：计算HighMapBuffer / LowMapBuffer
+
+        MQL中逐根计算depth窗口的最高/最低值并与上一根的窗口值比较，窗口值变化且偏差不超过
+        deviation时为候选点，并清除其前backstep根中不如它的候选点。这些判断只依赖窗口极值序列，
+        因此可以整体用滑动窗口数组运算完成
+        """
+        n = len(values)
+        start = self.depth - 1
+        result = np.zeros(n)
+        if n <= start:
+            return result
+
+        windows = sliding_window_view(values, self.depth)
+        extreme = windows.max(axis=1) if is_high else windows.min(axis=1)   # 对应shift = start..n-1
+        previous = np.concatenate(([0.0], extreme[:-1]))                   # last_low / last_high 初始为0
+        current = values[start:]
+
+        threshold = self.deviation * self.point
+        distance = (extreme - current) if is_high else (current - extreme)
+        candidate = (extreme != previous) & ~(distance > threshold)
+
+        mapped = np.where(candidate & (current == extreme), current, 0.0)
+
+        # 回溯清除：位置j的候选点在其后backstep根内出现更优的候选值时被清零
+        if self.backstep > 0:
+            fill = -np.inf if is_high else np.inf
+            candidate_values = np.where(candidate, extreme, fill)
+            padded = np.concatenate((candidate_values[1:], np.full(self.backstep, fill)))
+            ahead = sliding_window_view(padded, self.backstep)[:len(mapped)]
+            if is_high:
+                cleared = ahead.max(axis=1) > mapped
+            else:
+                cleared = ahead.min(axis=1) < mapped
+            mapped = np.where((mapped != 0) & cleared, 0.0, mapped)
+
+        result[start:] = mapped
+        return result
+
+    def calculate(self, high, low):
+        """
+        计算ZigZag峰值和谷值缓冲区（与MQL中prev_calculated=0时的结果一致）
+
+        Args:
+            high (ndarray): 最高价，按时间升序
+            low (ndarray): 最低价，按时间升序
+
+        Returns:
+            tuple: (峰值缓冲区, 谷值缓冲区)，非极值处为0
+        """
+        high = np.asarray(high, dtype='float64')
+        low = np.asarray(low, dtype='float64')
+        n = len(high)
+        peaks = np.zeros(n)
+        bottoms = np.zeros(n)
+        if n <= self.depth:
+            return peaks, bottoms
+
+        high_map = self._extremum_map(high, True)
+        low_map = self._extremum_map(low, False)
+
+        # 第二遍：极值点最终选择，只有映射非零的K线会改变状态，仅遍历这些位置
+        search = 0                      # 0 搜索第一个极值，1 搜索峰值，-1 搜索谷值
+        last_high = last_low = 0.0
+        last_high_pos = last_low_pos = 0
+        for shift in np.flatnonzero((high_map != 0) | (low_map != 0)):
+            high_value = high_map[shift]
+            low_value = low_map[shift]
+            if search == 0:
+                if last_low == 0 and last_high == 0:
+                    if high_value != 0:
+                        last_high = high[shift]
+                        last_high_pos = shift
+                        search = -1
+                        peaks[shift] = last_high
+                    if low_value != 0:
+                        last_low = low[shift]
+                        last_low_pos = shift
+                        search = 1
+                        bottoms[shift] = last_low
+            elif search == 1:
+                if low_value != 0 and low_value < last_low and high_value == 0:
+                    bottoms[last_low_pos] = 0.0
+                    last_low_pos = shift
+                    last_low = low_value
+                    bottoms[shift] = last_low
+                if high_value != 0 and low_value == 0:
+                    last_high = high_value
+                    last_high_pos = shift
+                    peaks[shift] = last_high
+                    search = -1
+            else:
+                if high_value != 0 and high_value > last_high and low_value == 0:
+                    peaks[last_high_pos] = 0.0
+                    last_high_pos = shift
+                    last_high = high_value
+                    peaks[shift] = last_high
+                if low_value != 0 and high_value == 0:
+                    last_low = low_value
+                    last_low_pos = shift
+                    bottoms[shift] = last_low
+                    search = 1
+        return peaks, bottoms
+
+    def calculate_loop(self, high, low):
+        """
+        逐根循环的参考实现（逐行对照MQL代码），用于校验calculate的结果，数据量大时很慢
+
+        Returns:
+            tuple: (峰值缓冲区, 谷值缓冲区)
+        """
+        high = np.asarray(high, dtype='float64')
+        low = np.asarray(low, dtype='float64')
+        n = len(high)
+        peaks = np.zeros(n)
+        bottoms = np.zeros(n)
+        high_map = np.zeros(n)
+        low_map = np.zeros(n)
+        if n <= self.depth:
+            return peaks, bottoms
+
+        threshold = self.deviation * self.point
+        last_low = last_high = 0.0
+        for shift in range(self.depth - 1, n):
+            val = low[max(0, shift - self.depth + 1):shift + 1].min()
+            if val == last_low:
+                val = 0.0
+            else:
+                last_low = val
+                if (low[shift] - val) > threshold:
+                    val = 0.0
+                else:
+                    for back in range(self.backstep, 0, -1):
+                        if shift - back >= 0 and low_map[shift - back] != 0 and low_map[shift - back] > val:
+                            low_map[shift - back] = 0.0
+            low_map[shift] = val if low[shift] == val else 0.0
+
+            val = high[max(0, shift - self.depth + 1):shift + 1].max()
+            if val == last_high:
+                val = 0.0
+            else:
+                last_high = val
+                if (val - high[shift]) > threshold:
+                    val = 0.0
+                else:
+                    for back in range(self.backstep, 0, -1):
+                        if shift - back >= 0 and high_map[shift - back] != 0 and high_map[shift - back] < val:
+                            high_map[shift - back] = 0.0
+            high_map[shift] = val if high[shift] == val else 0.0
+
+        search = 0
+        last_high = last_low = 0.0
+        last_high_pos = last_low_pos = 0
+        for shift in range(self.depth - 1, n):
+            if search == 0:
+                if last_low == 0 and last_high == 0:
+                    if high_map[shift] != 0:
+                        last_high, last_high_pos, search = high[shift], shift, -1
+                        peaks[shift] = last_high
+                    if low_map[shift] != 0:
+                        last_low, last_low_pos, search = low[shift], shift, 1
+                        bottoms[shift] = last_low
+            elif search == 1:
+                if low_map[shift] != 0 and low_map[shift] < last_low and high_map[shift] == 0:
+                    bottoms[last_low_pos] = 0.0
+                    last_low_pos, last_low = shift, low_map[shift]
+                    bottoms[shift] = last_low
+                if high_map[shift] != 0 and low_map[shift] == 0:
+                    last_high, last_high_pos, search = high_map[shift], shift, -1
+                    peaks[shift] = last_high
+            else:
+                if high_map[shift] != 0 and high_map[shift] > last_high and low_map[shift] == 0:
+                    peaks[last_high_pos] = 0.0
+                    last_high_pos, last_high = shift, high_map[shift]
+                    peaks[shift] = last_high
+                if low_map[shift] != 0 and high_map[shift] == 0:
+                    last_low, last_low_pos, search = low_map[shift], shift, 1
+                    bottoms[shift] = last_low
+        return peaks, bottoms
+
+    def extremum_points(self, bars):
+        """
+        计算极值点（CZigzagCalculator::GetExtremumPoints）
+
+        同一根K线既是峰值又是谷值时取峰值；相邻的同类型极值点只保留第一个
+
+        Args:
+            bars (DataFrame): time, high, low，按时间升序
+
+        Returns:
+            DataFrame: time, bar_index, value, type（peak / bottom），按时间升序
+        """
+        peaks, bottoms = self.calculate(bars['high'].to_numpy(), bars['low'].to_numpy())
+        index = np.flatnonzero((peaks != 0) | (bottoms != 0))
+        is_peak = peaks[index] != 0
+        keep = np.concatenate(([True], is_peak[1:] != is_peak[:-1])) if len(index) else np.array([], dtype=bool)
+        index = index[keep]
+        is_peak = is_peak[keep]
+        return pd.DataFrame({
+            'time': bars['time'].to_numpy()[index],
+            'bar_index': index,
+            'value': np.where(is_peak, peaks[index], bottoms[index]),
+            'type': np.where(is_peak, 'peak', 'bottom'),
+        })
+
+
+def build_segments(points, timeframe=None):
+    """
+    由相邻极值点生成线段（CZigzagSegment），起点为较早的极值点
+
+    Args:
+        points (DataFrame): extremum_points的结果（按时间升序）
+        timeframe (str): 时间周期名称
+
+    Returns:
+        DataFrame: timeframe, start_time, end_time, start_price, end_price, amplitude, direction,
+            price_diff, price_diff_pct, bar_count，按开始时间升序
+    """
+    start = points.iloc[:-1].reset_index(drop=True)
+    end = points.iloc[1:].reset_index(drop=True)
+    start_price = start['value'].to_numpy(dtype='float64')
+    end_price = end['value'].to_numpy(dtype='float64')
+    amplitude = end_price - start_price
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_diff_pct = np.where(start_price != 0, np.abs(amplitude) / start_price * 100, 0.0)
+    return pd.DataFrame({
+        'timeframe': timeframe,
+        'start_time': start['time'].to_numpy(),
+        'end_time': end['time'].to_numpy(),
+        'start_price': start_price,
+        'end_price': end_price,
+        'amplitude': amplitude,
+        'direction': np.where(amplitude > 0, 'UP', 'DOWN'),
+        'price_diff': np.abs(amplitude),
+        'price_diff_pct': price_diff_pct,
+        'bar_count': np.abs(end['bar_index'].to_numpy() - start['bar_index'].to_numpy()),
+    })
+
+
+def split_segments(segments, reference_price, since=None, max_segments=MAX_LOGGED_SEGMENTS, tolerance=None):
+    """
+    以参考价格为界划分左/右线段（CTradeBasePoint::GetTimeframeSegments）
+
+    从最新的线段开始查找终点价格等于参考价格的关键线段：关键线段及更早的线段为左侧
+    （按开始时间从晚到早编号），之后的线段为右侧（按开始时间从早到晚编号）
+
+    Args:
+        segments (DataFrame): build_segments的结果
+        reference_price (float): 参考价格（交易基准点价格）
+        since (Timestamp): 只保留开始时间不早于该时间的线段（主线段开始时间），None表示不过滤
+        max_segments (int): 每侧最多保留的线段数
+        tolerance (float): 价格比较容差，None时要求完全相等
+
+    Returns:
+        DataFrame: segment_side, segment_index, start_price, end_price, amplitude, direction, start_time, end_time；
+            找不到关键线段时为空
+    """
+    columns = ['segment_side', 'segment_index', 'start_price', 'end_price', 'amplitude', 'direction',
+               'start_time', 'end_time']
+    if since is not None:
+        segments = segments[segments['start_time'] >= pd.Timestamp(since)]
+    newest_first = segments.iloc[::-1].reset_index(drop=True)
+    end_price = newest_first['end_price'].to_numpy(dtype='float64')
+    if tolerance is None:
+        matches = np.flatnonzero(end_price == reference_price)
+    else:
+        matches = np.flatnonzero(np.abs(end_price - reference_price) <= tolerance)
+    if len(matches) == 0:
+        return pd.DataFrame(columns=columns)
+    pivot = int(matches[0])
+
+    left = newest_first.iloc[pivot:].sort_values('start_time', ascending=False, kind='mergesort').head(max_segments)
+    right = newest_first.iloc[:pivot].sort_values('start_time', ascending=True, kind='mergesort').head(max_segments)
+    left = left.assign(segment_side='Left', segment_index=np.arange(1, len(left) + 1))
+    right = right.assign(segment_side='Right', segment_index=np.arange(1, len(right) + 1))
+    return pd.concat([left, right], ignore_index=True)[columns]
+
+
+class ZigzagSegmentEngine:
+    """按交易时间重算线段快照，输出与segment_info表相同的列"""
+
+    def __init__(self, calculator=None, window_bars=2000):
+        """
+        初始化引擎
+
+        Args:
+            calculator (ZigzagCalculator): ZigZag计算器，默认EA参数
+            window_bars (int): 每次快照使用的K线数量（EA中最多取2000根）
+        """
+        self.calculator = calculator or ZigzagCalculator()
+        self.window_bars = int(window_bars)
+
+    def segments(self, bars, timeframe=None):
+        """对整段K线计算全部线段"""
+        return build_segments(self.calculator.extremum_points(bars), timeframe)
+
+    def snapshot(self, bars, trade_time, reference_price, timeframe, since=None, tolerance=None):
+        """
+        计算某一交易时刻的线段快照（只使用交易时刻及之前的window_bars根K线，不含未来数据）
+
+        Args:
+            bars (DataFrame): 该周期的K线，按时间升序
+            trade_time (Timestamp): 交易时间
+            reference_price (float): 参考价格
+            timeframe (str): 时间周期名称
+            since (Timestamp): 主线段开始时间
+            tolerance (float): 价格比较容差
+
+        Returns:
+            DataFrame: segment_info列名的快照记录
+        """
+        times = bars['time'].to_numpy(dtype='datetime64[ns]')
+        end = int(np.searchsorted(times, np.datetime64(pd.Timestamp(trade_time), 'ns'), side='right'))
+        window = bars.iloc[max(0, end - self.window_bars):end]
+        segments = self.segments(window, timeframe)
+        snapshot = split_segments(segments, reference_price, since=since, tolerance=tolerance)
+        snapshot.insert(0, 'timeframe', timeframe)
+        snapshot.insert(0, 'reference_price', reference_price)
+        snapshot.insert(0, 'trade_time', pd.Timestamp(trade_time))
+        return snapshot
+
+    def snapshots(self, bars_by_timeframe, trades, tolerance=None):
+        """
+        为多笔交易、多个周期批量计算线段快照
+
+        Args:
+            bars_by_timeframe (dict): 时间周期 -> K线
+            trades (DataFrame): trade_time, reference_price，可选 order_ticket, position_id, since
+            tolerance (float): 价格比较容差
+
+        Returns:
+            DataFrame: 与segment_info表相同列名的快照，可直接用于汇总特征计算
+        """
+        frames = []
+        for row in trades.itertuples(index=False):
+            for timeframe, bars in bars_by_timeframe.items():
+                snapshot = self.snapshot(bars, row.trade_time, row.reference_price, timeframe,
+                                         since=getattr(row, 'since', None), tolerance=tolerance)
+                snapshot['order_ticket'] = getattr(row, 'order_ticket', 0)
+                snapshot['position_id'] = getattr(row, 'position_id', 0)
+                frames.append(snapshot)
+        if not frames:
+            return pd.DataFrame()
+        result = pd.concat(frames, ignore_index=True)
+        logger.info(f"为 {len(trades)} 笔交易重算线段快照 {len(result)} 条")
+        return result